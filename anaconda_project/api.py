@@ -84,7 +84,8 @@ class AnacondaProject(object):
                                 env_spec_name=None,
                                 command_name=None,
                                 command=None,
-                                extra_command_args=None):
+                                extra_command_args=None,
+                                verify_downloads=False):
         """Prepare a project to run one of its commands.
 
         "Locally" means a machine where development will go on,
@@ -124,6 +125,7 @@ class AnacondaProject(object):
             command_name (str): which named command to choose from the project, None for default
             command (ProjectCommand): a command object (alternative to command_name)
             extra_command_args (list): extra args to include in the returned command argv
+            verify_downloads (bool): hash every download with a checksum again, even if it looks unchanged
 
         Returns:
             a ``PrepareResult`` instance, which has a ``failed`` flag
@@ -135,7 +137,8 @@ class AnacondaProject(object):
                                                    env_spec_name=env_spec_name,
                                                    command_name=command_name,
                                                    command=command,
-                                                   extra_command_args=extra_command_args)
+                                                   extra_command_args=extra_command_args,
+                                                   verify_downloads=verify_downloads)
 
     def prepare_project_production(self,
                                    project,
@@ -143,7 +146,8 @@ class AnacondaProject(object):
                                    env_spec_name=None,
                                    command_name=None,
                                    command=None,
-                                   extra_command_args=None):
+                                   extra_command_args=None,
+                                   verify_downloads=False):
         """Prepare a project to run one of its commands.
 
         "Production" means some sort of production deployment, so
@@ -167,6 +171,7 @@ class AnacondaProject(object):
             command_name (str): which named command to choose from the project, None for default
             command (ProjectCommand): a command object (alternative to command_name)
             extra_command_args (list): extra args to include in the returned command argv
+            verify_downloads (bool): hash every download with a checksum again, even if it looks unchanged
 
         Returns:
             a ``PrepareResult`` instance, which has a ``failed`` flag
@@ -178,7 +183,8 @@ class AnacondaProject(object):
                                                    env_spec_name=env_spec_name,
                                                    command_name=command_name,
                                                    command=command,
-                                                   extra_command_args=extra_command_args)
+                                                   extra_command_args=extra_command_args,
+                                                   verify_downloads=verify_downloads)
 
     def prepare_project_check(self,
                               project,
@@ -186,7 +192,8 @@ class AnacondaProject(object):
                               env_spec_name=None,
                               command_name=None,
                               command=None,
-                              extra_command_args=None):
+                              extra_command_args=None,
+                              verify_downloads=False):
         """Prepare a project to run one of its commands.
 
         This version only checks the status of the project's
@@ -205,6 +212,7 @@ class AnacondaProject(object):
             command_name (str): which named command to choose from the project, None for default
             command (ProjectCommand): a command object (alternative to command_name)
             extra_command_args (list): extra args to include in the returned command argv
+            verify_downloads (bool): hash every download with a checksum again, even if it looks unchanged
 
         Returns:
             a ``PrepareResult`` instance, which has a ``failed`` flag
@@ -216,7 +224,8 @@ class AnacondaProject(object):
                                                    env_spec_name=env_spec_name,
                                                    command_name=command_name,
                                                    command=command,
-                                                   extra_command_args=extra_command_args)
+                                                   extra_command_args=extra_command_args,
+                                                   verify_downloads=verify_downloads)
 
     def unprepare(self, project, prepare_result, whitelist=None):
         """Attempt to clean up project-scoped resources allocated by prepare().
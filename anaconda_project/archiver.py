@@ -13,6 +13,7 @@ import errno
 import fnmatch
 import os
 import platform
+import re
 import shutil
 import subprocess
 import tarfile
@@ -20,8 +21,6 @@ import tempfile
 import uuid
 import zipfile
 from io import BytesIO
-from conda_pack._progress import progressbar
-from tqdm import tqdm
 
 from anaconda_project.frontend import NullFrontend, _new_error_recorder
 from anaconda_project.internal import logged_subprocess
@@ -80,39 +79,84 @@ class _FilePattern(object):
         # the glob string
         self.pattern = pattern
 
-    def matches(self, info):
-        # Unlike .gitignore, this is a path-unaware match; fnmatch doesn't pay
-        # any attention to "/" as a special character. However, on Windows, we
-        # have fixed up unixified_relative_path to have / instead of \, so that
-        # it will match patterns specified with /.
-        def match(path, pattern):
-            assert path.startswith("/")
-            while path != '/':
-                if fnmatch.fnmatch(path, pattern):
-                    return True
-                # this assumes that on Windows, dirname on a unixified path
-                # will do the right thing...
-                path = os.path.dirname(path)
-            return False
+    @property
+    def directories_only(self):
+        # ending with / means only match directories
+        return self.pattern.endswith("/")
 
+    @property
+    def glob(self):
+        """The fnmatch glob that the path or one of its parents has to match, with a leading "/"."""
         if self.pattern.startswith("/"):
             # we have to match the full path or one of its parents exactly
             pattern = self.pattern
         else:
             # we only have to match the end of the path (implicit "*/")
             pattern = "*/" + self.pattern
+        if self.directories_only:
+            pattern = pattern[:-1]
+        return pattern
 
-        # So that */ matches even plain "foo" we need to start with /
-        match_against = "/" + info.unixified_relative_path
+    def matches(self, info):
+        return _FilePatternSet([self]).matches(info)
 
-        # ending with / means only match directories
-        if pattern.endswith("/"):
-            if info.is_directory:
-                return match(match_against, pattern[:-1])
-            else:
-                return False
-        else:
-            return match(match_against, pattern)
+
+class _FilePatternSet(object):
+    """Matches a path if any of a list of ``_FilePattern`` would.
+
+    Rather than trying each pattern with ``fnmatch`` against the path
+    and each of its parents, we compile the patterns into one regex
+    (plus one including the directory-only patterns), and remember
+    which parent directories matched, so each directory is only
+    checked once however many files are in it.
+    """
+    def __init__(self, patterns):
+        globs = [pattern.glob for pattern in patterns if not pattern.directories_only]
+        directory_globs = [pattern.glob for pattern in patterns if pattern.directories_only]
+        self._file_regex = self._compile(globs)
+        self._directory_regex = self._compile(globs + directory_globs)
+        self._ancestor_matches = dict()
+
+    @classmethod
+    def _compile(cls, globs):
+        if len(globs) == 0:
+            return None
+        # this is what fnmatch.fnmatch() does with each glob, including
+        # normcase, which on Windows makes "/" into "\\" and ignores case.
+        return re.compile("|".join("(?:%s)" % fnmatch.translate(os.path.normcase(glob)) for glob in globs))
+
+    def _path_matches(self, path, is_directory):
+        regex = self._directory_regex if is_directory else self._file_regex
+        return regex is not None and regex.match(os.path.normcase(path)) is not None
+
+    def _path_or_parent_matches(self, path, is_directory):
+        key = (path, is_directory)
+        result = self._ancestor_matches.get(key, None)
+        if result is None:
+            parent = os.path.dirname(path)
+            result = (self._path_matches(path, is_directory)
+                      or (parent != '/' and self._path_or_parent_matches(parent, is_directory)))
+            self._ancestor_matches[key] = result
+        return result
+
+    def matches(self, info):
+        # Unlike .gitignore, this is a path-unaware match; fnmatch doesn't pay
+        # any attention to "/" as a special character. However, on Windows, we
+        # have fixed up unixified_relative_path to have / instead of \, so that
+        # it will match patterns specified with /.
+
+        # So that */ matches even plain "foo" we need to start with /
+        path = "/" + info.unixified_relative_path
+        if path == '/':
+            return False
+        if self._path_matches(path, info.is_directory):
+            return True
+        # this assumes that on Windows, dirname on a unixified path
+        # will do the right thing...
+        parent = os.path.dirname(path)
+        # a directory-only pattern matching a parent only counts for
+        # directories, as with the path itself
+        return parent != '/' and self._path_or_parent_matches(parent, info.is_directory)
 
 
 def _parse_ignore_file(filename, frontend):
@@ -202,39 +246,22 @@ def _git_filter(project_directory, frontend):
     return is_git_ignored
 
 
-def _ignore_file_filter(project_directory, frontend):
-    patterns = _load_ignore_file(project_directory, frontend)
-    if patterns is None:
-        return None
-
-    def matches_some_pattern(info):
-        for pattern in patterns:
-            if pattern.matches(info):
-                return True
-        return False
-
-    return matches_some_pattern
-
-
 def _enumerate_archive_files(project_directory, frontend, requirements):
     git_filter = _git_filter(project_directory, frontend)
-    ignore_file_filter = _ignore_file_filter(project_directory, frontend)
-    if git_filter is None or ignore_file_filter is None:
+    ignore_file_patterns = _load_ignore_file(project_directory, frontend)
+    if git_filter is None or ignore_file_patterns is None:
         return None
 
     plugin_patterns = {'/anaconda-project-local.yml'}
     for req in requirements:
         plugin_patterns.update(req.ignore_patterns)
-    plugin_patterns = [_FilePattern(s) for s in plugin_patterns]
+    plugin_patterns = [_FilePattern(s) for s in sorted(plugin_patterns)]
 
-    def is_plugin_generated(info):
-        for pattern in plugin_patterns:
-            if pattern.matches(info):
-                return True
-        return False
+    # .projectignore and plugin patterns, all checked at once
+    ignored_by_pattern = _FilePatternSet(ignore_file_patterns + plugin_patterns)
 
     def all_filters(info):
-        return git_filter(info) or ignore_file_filter(info) or is_plugin_generated(info)
+        return git_filter(info) or ignored_by_pattern.matches(info)
 
     infos = _list_project(project_directory, all_filters, frontend)
     if infos is None:
@@ -272,6 +299,8 @@ def _write_tar(archive_root_name, infos, filename, compression, packed_envs, fro
         for pack in packed_envs:
             env_name = os.path.basename(pack)
             print('Joining packed env {}'.format(env_name))
+            # conda_pack is slow to import and only needed with --pack-envs
+            from conda_pack._progress import progressbar
             with tarfile.open(pack, mode='r', dereference=False) as env:
                 with progressbar(env.getmembers()) as env_p:
                     for file in env_p:
@@ -303,6 +332,7 @@ def _write_zip(archive_root_name, infos, filename, packed_envs, frontend):
         for pack in packed_envs:
             env_name = os.path.basename(pack)
             print('Joining packed env {}'.format(env_name))
+            from conda_pack._progress import progressbar
             with zipfile.ZipFile(pack, mode='r') as env:
                 with progressbar(env.infolist()) as infolist:
                     for file in infolist:
@@ -454,6 +484,7 @@ def _extract_files_zip(zip_path, src_and_dest, frontend):
         with zipfile.ZipFile(zip_path, mode='r') as zf:
             _extractall_chmod(zf, tmpdir)
             if isinstance(frontend.underlying, NullFrontend):
+                from tqdm import tqdm
                 src_and_dest = tqdm(src_and_dest, desc='Extract ')
             for (src, dest) in src_and_dest:
                 frontend.info("Unpacking %s to %s" % (src, dest))
@@ -474,6 +505,7 @@ def _extract_files_zip(zip_path, src_and_dest, frontend):
 def _extract_files_tar(tar_path, src_and_dest, frontend):
     with tarfile.open(tar_path, mode='r') as tf:
         if isinstance(frontend.underlying, NullFrontend):
+            from tqdm import tqdm
             src_and_dest = tqdm(src_and_dest, desc='Extract ')
         for (src, dest) in src_and_dest:
             frontend.info("Unpacking %s to %s" % (src, dest))
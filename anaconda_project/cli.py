@@ -10,7 +10,9 @@ from __future__ import absolute_import, print_function
 
 # the point of this file is to make the internal main() into a public
 # entry point.
-import anaconda_project.internal.cli.main as cli_main
+import sys
+
+from anaconda_project.internal.cli import daemon_client
 
 
 def main():
@@ -18,6 +20,13 @@ def main():
 
     Conda expects us to take no args and return an exit code.
     """
+    code = daemon_client.run_in_daemon(sys.argv)
+    if code is not None:
+        return code
+
+    # imported here so we don't pay for importing every
+    # subcommand when a daemon handles the command
+    import anaconda_project.internal.cli.main as cli_main
     return cli_main.main()
 
 
@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (c) 2026, Anaconda, Inc. All rights reserved.
+#
+# Licensed under the terms of the BSD 3-Clause License.
+# The full license is in the file LICENSE.txt, distributed with this software.
+# -----------------------------------------------------------------------------
+"""Fixtures for every test."""
+from __future__ import absolute_import, print_function
+
+import pytest
+
+from anaconda_project.internal import user_dirs
+
+
+@pytest.fixture(autouse=True)
+def _isolated_user_cache_dir(monkeypatch, tmpdir_factory):
+    # keep tests out of the real per-user cache, and out of each other's;
+    # a download or conda info cached by one test would change what the next one does
+    monkeypatch.setenv(user_dirs.CACHE_DIR_ENV_VAR, str(tmpdir_factory.mktemp('user_cache')))
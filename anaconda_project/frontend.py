@@ -9,6 +9,7 @@
 from __future__ import absolute_import
 
 from abc import ABCMeta, abstractmethod
+import threading
 
 from anaconda_project.internal.metaclass import with_metaclass
 
@@ -134,3 +135,28 @@ class _ErrorRecordingFrontendProxy(Frontend):
 
 def _new_error_recorder(frontend):
     return _ErrorRecordingFrontendProxy(frontend)
+
+
+class _SerializingFrontendProxy(Frontend):
+    # Used by code running on several threads at once; each thread
+    # gets its own proxy so partial lines are buffered per thread,
+    # and whole lines are passed on one at a time.
+    def __init__(self, underlying, lock):
+        super(_SerializingFrontendProxy, self).__init__()
+        self.underlying = underlying
+        self._lock = lock
+
+    def info(self, message):
+        """Log an info-level message."""
+        with self._lock:
+            self.underlying.info(message)
+
+    def error(self, message):
+        """Log an error-level message."""
+        with self._lock:
+            self.underlying.error(message)
+
+
+def _new_serializing_frontends(frontend, count):
+    lock = threading.Lock()
+    return [_SerializingFrontendProxy(frontend, lock) for i in range(count)]
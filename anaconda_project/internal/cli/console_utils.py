@@ -33,6 +33,43 @@ def print_status_errors(status):
     print(status.status_description, file=sys.stderr)
 
 
+def print_prepare_timings(timings):
+    """Print a table of prepare timings to stderr, slowest first."""
+    rows = [("Phase", "Name", "Wall (s)", "CPU (s)")]
+    for timing in timings.sorted_by_wall():
+        rows.append((timing.phase, timing.name, "%.3f" % timing.wall, "%.3f" % timing.cpu))
+    widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+    print("Prepare timings (stages include the requirement steps they ran):", file=sys.stderr)
+    for row in rows:
+        line = "  ".join(
+            [row[0].ljust(widths[0]), row[1].ljust(widths[1]), row[2].rjust(widths[2]), row[3].rjust(widths[3])])
+        print("  " + line, file=sys.stderr)
+    _print_download_metrics([(name, metrics) for (name, metrics) in timings.metrics if 'url' in metrics])
+
+
+def _print_download_metrics(downloads):
+    if len(downloads) == 0:
+        return
+
+    def seconds(value):
+        return "-" if value is None else "%.3f" % value
+
+    def mebibytes_per_second(value):
+        return "-" if value is None else "%.1f" % (value / 1024 / 1024)
+
+    rows = [("Name", "Bytes", "First byte (s)", "Total (s)", "Avg MiB/s", "Peak MiB/s", "Retries", "From")]
+    for (name, metrics) in downloads:
+        rows.append(
+            (name, str(metrics['bytes']), seconds(metrics['time_to_first_byte']), seconds(metrics['duration']),
+             mebibytes_per_second(metrics['average_throughput']), mebibytes_per_second(metrics['peak_throughput']),
+             str(metrics['retries']), "cache" if metrics['cached'] else metrics['url']))
+    widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+    print("Downloads:", file=sys.stderr)
+    for row in rows:
+        cells = [row[0].ljust(widths[0])] + [cell.rjust(width) for (cell, width) in zip(row[1:-1], widths[1:-1])]
+        print("  " + "  ".join(cells + [row[-1]]), file=sys.stderr)
+
+
 def format_names_and_descriptions(objects, name_attr='name', description_attr='description'):
     """Format a table with names on the left and descriptions on the right."""
     pairs = []
@@ -0,0 +1,269 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (c) 2026, Anaconda, Inc. All rights reserved.
+#
+# Licensed under the terms of the BSD 3-Clause License.
+# The full license is in the file LICENSE.txt, distributed with this software.
+# -----------------------------------------------------------------------------
+"""The ``daemon`` command serves other anaconda-project invocations from one long-lived process.
+
+Requests are handled one at a time, because handling one means
+switching this process over to the client's environment, working
+directory, and output streams. Between requests we keep loaded
+projects (and everything else we cache in memory, such as ``conda
+info`` results and prepare snapshots) so later requests are faster.
+"""
+from __future__ import absolute_import, print_function
+
+from contextlib import contextmanager
+import io
+import os
+import signal
+import socket
+import socketserver
+import sys
+import threading
+import traceback
+
+import anaconda_project
+from anaconda_project.internal import prepare_snapshot
+from anaconda_project.internal.cli import daemon_client
+from anaconda_project.internal.cli.project_load import (CliFrontend, load_project, push_project_loader,
+                                                        pop_project_loader)
+import anaconda_project.internal.cli.run as run
+from anaconda_project.internal.makedirs import makedirs_ok_if_exists
+from anaconda_project.project import Project
+
+
+class _MessageWriter(object):
+    """File-like object that sends everything written to it to the client."""
+    def __init__(self, stream, key, lock):
+        self._stream = stream
+        self._key = key
+        self._lock = lock
+        self._broken = False
+
+    @property
+    def encoding(self):
+        return 'utf-8'
+
+    def write(self, data):
+        if len(data) > 0 and not self._broken:
+            with self._lock:
+                try:
+                    daemon_client.write_message(self._stream, {self._key: data})
+                except (IOError, OSError):
+                    # the client went away; finish the request anyway,
+                    # rather than failing halfway through a prepare.
+                    self._broken = True
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def isatty(self):
+        return False
+
+
+class _ProjectCache(object):
+    """Loaded projects, which we reload if their files or our environment change."""
+    def __init__(self):
+        self._projects = dict()
+
+    def _signature(self, dirname):
+        environ = dict(
+            (key, value) for (key, value) in os.environ.items() if key.startswith(prepare_snapshot._ENVIRON_PREFIXES))
+        return (prepare_snapshot._project_file_digests(dirname), environ)
+
+    def load(self, dirname):
+        signature = self._signature(dirname)
+        cached = self._projects.get(dirname)
+        if cached is not None and cached[0] == signature:
+            project = cached[1]
+            if not (project.project_file.has_unsaved_changes or project.lock_file.has_unsaved_changes):
+                return project
+        project = Project(dirname, frontend=CliFrontend(), must_exist=True)
+        self._projects[dirname] = (signature, project)
+        return project
+
+
+@contextmanager
+def _client_process_state(request, stdout, stderr):
+    old_environ = dict(os.environ)
+    old_cwd = os.getcwd()
+    old_argv = sys.argv
+    old_streams = (sys.stdin, sys.stdout, sys.stderr)
+    try:
+        os.environ.clear()
+        os.environ.update(request['environ'])
+        os.chdir(request['cwd'])
+        sys.argv = request['argv']
+        # we can't ask the client questions, so behave as if stdin were a file
+        sys.stdin = io.StringIO()
+        sys.stdout = stdout
+        sys.stderr = stderr
+        yield
+    finally:
+        (sys.stdin, sys.stdout, sys.stderr) = old_streams
+        sys.argv = old_argv
+        os.chdir(old_cwd)
+        os.environ.clear()
+        os.environ.update(old_environ)
+
+
+class _Daemon(object):
+    def __init__(self, parser, run_subcommand):
+        self._parser = parser
+        self._run_subcommand = run_subcommand
+        self._projects = _ProjectCache()
+
+    def _fallback_reason(self, request):
+        if request.get('version') != anaconda_project.__version__:
+            return "version mismatch"
+        argv = request.get('argv')
+        if not isinstance(argv, list) or len(argv) < 2 or argv[1] not in daemon_client.SERVED_COMMANDS:
+            return "unsupported command"
+        if not isinstance(request.get('environ'), dict) or not os.path.isdir(request.get('cwd', '')):
+            return "bad request"
+        return None
+
+    def _run(self, subcommand, args, exec_infos):
+        push_project_loader(self._projects.load)
+        run.push_exec_handler(exec_infos.append)
+        try:
+            # a bootstrap env means re-executing anaconda-project, which has to happen in the client
+            if subcommand == 'run' and load_project(args.directory).has_bootstrap_env_spec():
+                return None
+            return self._run_subcommand(args)
+        except SystemExit as e:
+            return e.code
+        except Exception:
+            traceback.print_exc()
+            return 1
+        finally:
+            run.pop_exec_handler()
+            pop_project_loader()
+
+    def handle(self, request, stream):
+        """Serve one request, sending the replies to stream."""
+        reason = self._fallback_reason(request)
+        if reason is not None:
+            daemon_client.write_message(stream, dict(fallback=reason))
+            return
+
+        lock = threading.Lock()
+        stdout = _MessageWriter(stream, 'stdout', lock)
+        stderr = _MessageWriter(stream, 'stderr', lock)
+        exec_infos = []
+        with _client_process_state(request, stdout, stderr):
+            try:
+                args = self._parser.parse_args(request['argv'][1:])
+            except SystemExit as e:
+                code = e.code
+            else:
+                if 'directory' in args and args.directory is not None:
+                    args.directory = os.path.realpath(os.path.abspath(args.directory))
+                code = self._run(request['argv'][1], args, exec_infos)
+
+            if code is None:
+                reply = dict(fallback="needs to run in the client")
+            elif len(exec_infos) > 0:
+                exec_info = exec_infos[-1]
+                # this adds the conda env's variables to exec_info.env,
+                # so it has to happen before we send the env back
+                exec_args = exec_info._args_for_exec()
+                reply = dict(exec=dict(
+                    args=exec_args, env=exec_info.env, cwd=exec_info.cwd, description=" ".join(exec_info.args)))
+            else:
+                reply = dict(exit=code)
+
+        with lock:
+            try:
+                daemon_client.write_message(stream, reply)
+            except (IOError, OSError):
+                pass
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        try:
+            request = daemon_client.read_message(self.rfile)
+        except ValueError:
+            return
+        if request is not None:
+            self.server.daemon.handle(request, self.wfile)
+
+
+class _Server(socketserver.UnixStreamServer):
+    def __init__(self, socket_path, daemon):
+        self.daemon = daemon
+        socketserver.UnixStreamServer.__init__(self, socket_path, _RequestHandler)
+
+    def server_bind(self):
+        # the daemon runs commands as us for anyone who can connect, so
+        # the socket has to be ours alone from the moment it exists
+        old_umask = os.umask(0o077)
+        try:
+            socketserver.UnixStreamServer.server_bind(self)
+        finally:
+            os.umask(old_umask)
+
+
+def _someone_is_listening(socket_path):
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(socket_path)
+        return True
+    except (IOError, OSError):
+        return False
+    finally:
+        sock.close()
+
+
+def serve(socket_path, parser, run_subcommand):
+    """Serve requests on socket_path until interrupted, returning exit status code."""
+    if not hasattr(socket, 'AF_UNIX'):
+        print("The anaconda-project daemon needs Unix domain sockets, which aren't available here.", file=sys.stderr)
+        return 1
+
+    if os.path.exists(socket_path):
+        if _someone_is_listening(socket_path):
+            print("An anaconda-project daemon is already listening on %s" % socket_path, file=sys.stderr)
+            return 1
+        # left behind by a daemon that was killed
+        os.remove(socket_path)
+
+    try:
+        makedirs_ok_if_exists(os.path.dirname(socket_path))
+        server = _Server(socket_path, _Daemon(parser, run_subcommand))
+    except (IOError, OSError) as e:
+        print("Failed to listen on %s: %s" % (socket_path, e), file=sys.stderr)
+        return 1
+
+    def exit_on_sigterm(signum, frame):
+        sys.exit(0)
+
+    # so we clean up the socket when killed
+    signal.signal(signal.SIGTERM, exit_on_sigterm)
+
+    print("Listening on %s" % socket_path)
+    sys.stdout.flush()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        os.remove(socket_path)
+    return 0
+
+
+def main(args):
+    """Start the daemon and return exit status code."""
+    # main imports us, so we import it here
+    import anaconda_project.internal.cli.main as cli_main
+
+    socket_path = args.socket
+    if socket_path is None:
+        socket_path = daemon_client.daemon_socket_path()
+    return serve(os.path.abspath(socket_path), cli_main._create_parser(), cli_main._run_subcommand)
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (c) 2026, Anaconda, Inc. All rights reserved.
+#
+# Licensed under the terms of the BSD 3-Clause License.
+# The full license is in the file LICENSE.txt, distributed with this software.
+# -----------------------------------------------------------------------------
+"""Client for ``anaconda-project daemon``, and the protocol it uses.
+
+This module is imported before the rest of the command line tool, so
+it should only import the standard library and cheap modules of ours.
+
+The protocol is one JSON object per line. The client sends one request
+with its argv, working directory, and environment. The daemon replies
+with any number of ``{"stdout": text}`` or ``{"stderr": text}`` messages,
+and then one of ``{"exit": code}``, ``{"exec": {...}}`` (the client should
+exec this command, for ``run``), or ``{"fallback": reason}`` (the client
+should do the work itself; only sent before any output).
+"""
+from __future__ import absolute_import, print_function
+
+import json
+import os
+import socket
+import sys
+
+import anaconda_project
+from anaconda_project.internal import user_dirs
+
+SOCKET_ENV_VAR = 'ANACONDA_PROJECT_DAEMON_SOCKET'
+
+# subcommands the daemon knows how to serve; anything else,
+# including global options before the subcommand, runs in-process.
+SERVED_COMMANDS = ('run', 'prepare', 'activate', 'list-commands', 'list-default-command', 'list-variables',
+                   'list-downloads', 'list-services', 'list-env-specs', 'list-packages', 'list-platforms')
+
+
+def daemon_socket_path():
+    """Get the Unix socket path the daemon listens on by default."""
+    path = os.environ.get(SOCKET_ENV_VAR, '')
+    if path == '':
+        path = user_dirs.user_cache_dir('daemon', 'anaconda-project.sock')
+    return path
+
+
+def write_message(stream, message):
+    """Write one protocol message to a binary stream."""
+    stream.write(json.dumps(message).encode('utf-8') + b'\n')
+    stream.flush()
+
+
+def read_message(stream):
+    """Read one protocol message from a binary stream, or None at EOF."""
+    line = stream.readline()
+    if not line:
+        return None
+    message = json.loads(line.decode('utf-8'))
+    if not isinstance(message, dict):
+        raise ValueError("daemon protocol message is not an object: %r" % (message, ))
+    return message
+
+
+def _exec(info):
+    sys.stdout.flush()
+    sys.stderr.flush()
+    try:
+        os.chdir(info['cwd'])
+        os.execvpe(info['args'][0], info['args'], info['env'])
+    except OSError as e:
+        print("Failed to execute '%s': %s" % (info['description'], e.strerror), file=sys.stderr)
+        return 1
+
+
+def run_in_daemon(argv, socket_path=None):
+    """Run a command line in the daemon, if one is running and can serve it.
+
+    Args:
+        argv (list of str): the command line, including the program name
+        socket_path (str): the socket to connect to (None for ``daemon_socket_path()``)
+
+    Returns:
+        the exit code, or None if the caller should run the command itself
+    """
+    if len(argv) < 2 or argv[1] not in SERVED_COMMANDS:
+        return None
+    # the daemon can't ask us questions
+    if sys.stdin is None or sys.stdin.isatty():
+        return None
+    if not hasattr(socket, 'AF_UNIX'):
+        return None
+
+    if socket_path is None:
+        socket_path = daemon_socket_path()
+    if not os.path.exists(socket_path):
+        return None
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    stream = None
+    got_output = False
+    try:
+        sock.connect(socket_path)
+        stream = sock.makefile('rwb')
+        write_message(
+            stream,
+            dict(version=anaconda_project.__version__, argv=list(argv), cwd=os.getcwd(), environ=dict(os.environ)))
+        while True:
+            message = read_message(stream)
+            if message is None:
+                break
+            elif 'stdout' in message:
+                got_output = True
+                sys.stdout.write(message['stdout'])
+                sys.stdout.flush()
+            elif 'stderr' in message:
+                got_output = True
+                sys.stderr.write(message['stderr'])
+                sys.stderr.flush()
+            elif 'fallback' in message and not got_output:
+                return None
+            elif 'exit' in message:
+                return message['exit']
+            elif 'exec' in message:
+                # don't hold the connection open for the life of the command
+                stream.close()
+                sock.close()
+                return _exec(message['exec'])
+    except (OSError, ValueError, KeyError):
+        # no daemon, a stale socket, or a daemon we don't understand
+        pass
+    finally:
+        if stream is not None:
+            stream.close()
+        sock.close()
+
+    if not got_output:
+        return None
+    print("Lost connection to the anaconda-project daemon.", file=sys.stderr)
+    return 1
@@ -8,6 +8,7 @@
 """The ``main`` function chooses and runs a subcommand."""
 from __future__ import absolute_import, print_function
 
+import importlib
 import logging
 import os
 import sys
@@ -19,35 +20,40 @@ from anaconda_project import __version__ as version
 from anaconda_project.verbose import push_verbose_logger, pop_verbose_logger
 from anaconda_project.project import ALL_COMMAND_TYPES
 from anaconda_project.docker import DEFAULT_BUILDER_IMAGE
-from anaconda_project.requirements_registry.registry import RequirementsRegistry
 from anaconda_project.requirements_registry.requirements.download import _hash_algorithms
 import anaconda_project
 from anaconda_project.internal.cli.bug_handler import handle_bugs
-import anaconda_project.internal.cli.init as init
-import anaconda_project.internal.cli.run as run
-import anaconda_project.internal.cli.prepare as prepare
-import anaconda_project.internal.cli.clean as clean
-import anaconda_project.internal.cli.archive as archive
-import anaconda_project.internal.cli.unarchive as unarchive
-import anaconda_project.internal.cli.upload as upload
-import anaconda_project.internal.cli.download as download
-import anaconda_project.internal.cli.dockerize as dockerize
-import anaconda_project.internal.cli.activate as activate
-import anaconda_project.internal.cli.variable_commands as variable_commands
-import anaconda_project.internal.cli.download_commands as download_commands
-import anaconda_project.internal.cli.service_commands as service_commands
-import anaconda_project.internal.cli.environment_commands as environment_commands
-import anaconda_project.internal.cli.command_commands as command_commands
-import anaconda_project.internal.cli.pixi_commands as pixi_commands
+from anaconda_project.internal import subprocess_trace
 
+# the names from RequirementsRegistry.list_service_types(), kept here so
+# building the parser doesn't need the requirements registry
+_SERVICE_TYPE_NAMES = ('redis', )
 
-def _parse_args_and_run_subcommand(argv):
+
+def _subcommand(module_name, function_name='main'):
+    """Get a main function for a subcommand, which imports the subcommand's module when called.
+
+    Between them the subcommand modules import nearly everything, so
+    we only import the one we're running.
+    """
+    def main(args):
+        module = importlib.import_module('anaconda_project.internal.cli.' + module_name)
+        return getattr(module, function_name)(args)
+
+    return main
+
+
+def _create_parser():
     parser = ArgumentParser(prog="anaconda-project", description="Actions on projects (runnable projects).")
 
     subparsers = parser.add_subparsers(help="Sub-commands")
 
     parser.add_argument('-v', '--version', action='version', version=version)
     parser.add_argument('--verbose', action='store_true', default=False, help="show verbose debugging details")
+    parser.add_argument('--trace',
+                        metavar='TRACE_FILE',
+                        default=None,
+                        help="append a JSON-lines timing record for each subprocess to TRACE_FILE")
 
     def add_directory_arg(preset):
         preset.add_argument('--directory',
@@ -101,7 +107,7 @@ def _parse_args_and_run_subcommand(argv):
                         help="[DEPRECATED] Do not add the default package set to the environment.",
                         default=None)
     preset.add_argument('-y', '--yes', action='store_true', help="Assume yes to all confirmation prompts", default=None)
-    preset.set_defaults(main=init.main)
+    preset.set_defaults(main=_subcommand('init'))
 
     preset = subparsers.add_parser('run', help="Run the project, setting up requirements first")
     add_prepare_args(preset, include_command=False)
@@ -110,25 +116,37 @@ def _parse_args_and_run_subcommand(argv):
                         default=None,
                         nargs='?',
                         help="A command name from anaconda-project.yml")
+    preset.add_argument('--timings',
+                        action='store_true',
+                        default=False,
+                        help="Print how long each prepare stage and requirement took")
     preset.add_argument('extra_args_for_command', metavar='EXTRA_ARGS_FOR_COMMAND', default=None, nargs=REMAINDER)
-    preset.set_defaults(main=run.main)
+    preset.set_defaults(main=_subcommand('run'))
 
     preset = subparsers.add_parser('prepare', help="Set up the project requirements, but does not run the project")
     preset.add_argument('--all', action='store_true', help="Prepare all environments", default=None)
     preset.add_argument('--refresh', action='store_true', help='Remove and recreate the environment', default=None)
+    preset.add_argument('--verify-downloads',
+                        action='store_true',
+                        default=False,
+                        help="Check every download against its checksum, even if it looks unchanged")
+    preset.add_argument('--timings',
+                        action='store_true',
+                        default=False,
+                        help="Print how long each prepare stage and requirement took")
     add_prepare_args(preset)
-    preset.set_defaults(main=prepare.main)
+    preset.set_defaults(main=_subcommand('prepare'))
 
     preset = subparsers.add_parser('clean',
                                    help="Removes generated state (stops services, deletes environment files, etc)")
     add_directory_arg(preset)
-    preset.set_defaults(main=clean.main)
+    preset.set_defaults(main=_subcommand('clean'))
 
     if not anaconda_project._beta_test_mode:
         preset = subparsers.add_parser('activate',
                                        help="Set up the project and output shell export commands reflecting the setup")
         add_prepare_args(preset)
-        preset.set_defaults(main=activate.main)
+        preset.set_defaults(main=_subcommand('activate'))
 
     preset = subparsers.add_parser('archive',
                                    help="Create a .zip, .tar.gz, or .tar.bz2 archive with project files in it")
@@ -139,14 +157,14 @@ def _parse_args_and_run_subcommand(argv):
                         help='Experimental: Package env_specs into the archive'
                         ' using conda-pack')
 
-    preset.set_defaults(main=archive.main)
+    preset.set_defaults(main=_subcommand('archive'))
 
     preset = subparsers.add_parser('unarchive',
                                    help="Unpack a .zip, .tar.gz, or .tar.bz2 archive with project files in it")
     preset.add_argument('filename', metavar='ARCHIVE_FILENAME')
     preset.add_argument('directory', metavar='DESTINATION_DIRECTORY', default=None, nargs='?')
 
-    preset.set_defaults(main=unarchive.main)
+    preset.set_defaults(main=_subcommand('unarchive'))
 
     preset = subparsers.add_parser('upload', help="Upload the project to Anaconda Cloud")
     add_directory_arg(preset)
@@ -159,7 +177,7 @@ def _parse_args_and_run_subcommand(argv):
                         help='Project archive suffix (.tar.gz, .tar.bz2, .zip)',
                         default='.tar.bz2',
                         choices=['.tar.gz', '.tar.bz2', '.zip'])
-    preset.set_defaults(main=upload.main)
+    preset.set_defaults(main=_subcommand('upload'))
 
     preset = subparsers.add_parser('download', help="Download the project from Anaconda Cloud")
     add_directory_arg(preset)
@@ -175,7 +193,7 @@ def _parse_args_and_run_subcommand(argv):
     preset.add_argument('-s', '--site', metavar='SITE', help='Select site to use')
     preset.add_argument('-t', '--token', metavar='TOKEN', help='Auth token or a path to a file containing a token')
     preset.add_argument('-u', '--user', metavar='USERNAME', help='User account, defaults to the current user')
-    preset.set_defaults(main=download.main)
+    preset.set_defaults(main=_subcommand('download'))
 
     preset = subparsers.add_parser('dockerize', help="Build a docker image of the Anaconda Project.")
     add_directory_arg(preset)
@@ -200,7 +218,7 @@ def _parse_args_and_run_subcommand(argv):
                         help='Optional arguments for the s2i build command. '
                         'See the output of "s2i build --help" for the available arguments. '
                         'It is recommended to include a -- separator before supplying these arguments.')
-    preset.set_defaults(main=dockerize.main)
+    preset.set_defaults(main=_subcommand('dockerize'))
 
     preset = subparsers.add_parser('add-variable', help="Add a required environment variable to the project")
     add_env_spec_arg(preset)
@@ -210,32 +228,32 @@ def _parse_args_and_run_subcommand(argv):
                         default=None,
                         help='Default value if environment variable is unset')
     add_directory_arg(preset)
-    preset.set_defaults(main=variable_commands.main_add)
+    preset.set_defaults(main=_subcommand('variable_commands', 'main_add'))
 
     preset = subparsers.add_parser('remove-variable', help="Remove an environment variable from the project")
     add_env_spec_arg(preset)
     add_directory_arg(preset)
     preset.add_argument('vars_to_remove', metavar='VARS_TO_REMOVE', default=None, nargs=REMAINDER)
-    preset.set_defaults(main=variable_commands.main_remove)
+    preset.set_defaults(main=_subcommand('variable_commands', 'main_remove'))
 
     preset = subparsers.add_parser('list-variables', help="List all variables on the project")
     add_env_spec_arg(preset)
     add_directory_arg(preset)
-    preset.set_defaults(main=variable_commands.main_list)
+    preset.set_defaults(main=_subcommand('variable_commands', 'main_list'))
 
     preset = subparsers.add_parser('set-variable',
                                    help="Set an environment variable value in anaconda-project-local.yml")
     add_env_spec_arg(preset)
     preset.add_argument('vars_and_values', metavar='VARS_AND_VALUES', default=None, nargs=REMAINDER)
     add_directory_arg(preset)
-    preset.set_defaults(main=variable_commands.main_set)
+    preset.set_defaults(main=_subcommand('variable_commands', 'main_set'))
 
     preset = subparsers.add_parser('unset-variable',
                                    help="Unset an environment variable value from anaconda-project-local.yml")
     add_env_spec_arg(preset)
     add_directory_arg(preset)
     preset.add_argument('vars_to_unset', metavar='VARS_TO_UNSET', default=None, nargs=REMAINDER)
-    preset.set_defaults(main=variable_commands.main_unset)
+    preset.set_defaults(main=_subcommand('variable_commands', 'main_unset'))
 
     preset = subparsers.add_parser('add-download', help="Add a URL to be downloaded before running commands")
     add_directory_arg(preset)
@@ -248,21 +266,18 @@ def _parse_args_and_run_subcommand(argv):
                         default=None,
                         choices=_hash_algorithms)
     preset.add_argument('--hash-value', help="The expected checksum hash of the downloaded file", default=None)
-    preset.set_defaults(main=download_commands.main_add)
+    preset.set_defaults(main=_subcommand('download_commands', 'main_add'))
 
     preset = subparsers.add_parser('remove-download', help="Remove a download from the project and from the filesystem")
     add_directory_arg(preset)
     add_env_spec_arg(preset)
     preset.add_argument('filename_variable', metavar='ENV_VAR_FOR_FILENAME', default=None)
-    preset.set_defaults(main=download_commands.main_remove)
+    preset.set_defaults(main=_subcommand('download_commands', 'main_remove'))
 
     preset = subparsers.add_parser('list-downloads', help="List all downloads on the project")
     add_directory_arg(preset)
     add_env_spec_arg(preset)
-    preset.set_defaults(main=download_commands.main_list)
-
-    service_types = RequirementsRegistry().list_service_types()
-    service_choices = list(map(lambda s: s.name, service_types))
+    preset.set_defaults(main=_subcommand('download_commands', 'main_list'))
 
     def add_service_variable_name(preset):
         preset.add_argument('--variable', metavar='ENV_VAR_FOR_SERVICE_ADDRESS', default=None)
@@ -271,19 +286,19 @@ def _parse_args_and_run_subcommand(argv):
     add_directory_arg(preset)
     add_env_spec_arg(preset)
     add_service_variable_name(preset)
-    preset.add_argument('service_type', metavar='SERVICE_TYPE', default=None, choices=service_choices)
-    preset.set_defaults(main=service_commands.main_add)
+    preset.add_argument('service_type', metavar='SERVICE_TYPE', default=None, choices=_SERVICE_TYPE_NAMES)
+    preset.set_defaults(main=_subcommand('service_commands', 'main_add'))
 
     preset = subparsers.add_parser('remove-service', help="Remove a service from the project")
     add_directory_arg(preset)
     add_env_spec_arg(preset)
     preset.add_argument('variable', metavar='SERVICE_REFERENCE', default=None)
-    preset.set_defaults(main=service_commands.main_remove)
+    preset.set_defaults(main=_subcommand('service_commands', 'main_remove'))
 
     preset = subparsers.add_parser('list-services', help="List services present in the project")
     add_directory_arg(preset)
     add_env_spec_arg(preset)
-    preset.set_defaults(main=service_commands.main_list)
+    preset.set_defaults(main=_subcommand('service_commands', 'main_list'))
 
     def add_package_args(preset):
         preset.add_argument('--pip', action='store_true', help='Install the requested packages using pip.')
@@ -298,55 +313,55 @@ def _parse_args_and_run_subcommand(argv):
     add_directory_arg(preset)
     add_package_args(preset)
     add_env_spec_name_arg(preset, required=True)
-    preset.set_defaults(main=environment_commands.main_add)
+    preset.set_defaults(main=_subcommand('environment_commands', 'main_add'))
 
     preset = subparsers.add_parser('remove-env-spec', help="Remove an environment spec from the project")
     add_directory_arg(preset)
     add_env_spec_name_arg(preset, required=True)
-    preset.set_defaults(main=environment_commands.main_remove)
+    preset.set_defaults(main=_subcommand('environment_commands', 'main_remove'))
 
     preset = subparsers.add_parser('list-env-specs', help="List all environment specs for the project")
     add_directory_arg(preset)
-    preset.set_defaults(main=environment_commands.main_list_env_specs)
+    preset.set_defaults(main=_subcommand('environment_commands', 'main_list_env_specs'))
 
     preset = subparsers.add_parser('export-env-spec', help="Save an environment spec as a conda environment file")
     add_directory_arg(preset)
     add_env_spec_name_arg(preset, required=False)
     preset.add_argument('filename', metavar='ENVIRONMENT_FILE')
-    preset.set_defaults(main=environment_commands.main_export)
+    preset.set_defaults(main=_subcommand('environment_commands', 'main_export'))
 
     preset = subparsers.add_parser('lock', help="Lock all packages at their current versions")
     add_directory_arg(preset)
     add_env_spec_name_arg(preset, required=False)
-    preset.set_defaults(main=environment_commands.main_lock)
+    preset.set_defaults(main=_subcommand('environment_commands', 'main_lock'))
 
     preset = subparsers.add_parser('unlock', help="Remove locked package versions")
     add_directory_arg(preset)
     add_env_spec_name_arg(preset, required=False)
-    preset.set_defaults(main=environment_commands.main_unlock)
+    preset.set_defaults(main=_subcommand('environment_commands', 'main_unlock'))
 
     preset = subparsers.add_parser('update', help="Update all packages to their latest versions")
     add_directory_arg(preset)
     add_env_spec_name_arg(preset, required=False)
-    preset.set_defaults(main=environment_commands.main_update)
+    preset.set_defaults(main=_subcommand('environment_commands', 'main_update'))
 
     preset = subparsers.add_parser('add-packages', help="Add packages to one or all project environments")
     add_directory_arg(preset)
     add_env_spec_arg(preset)
     add_package_args(preset)
-    preset.set_defaults(main=environment_commands.main_add_packages)
+    preset.set_defaults(main=_subcommand('environment_commands', 'main_add_packages'))
 
     preset = subparsers.add_parser('remove-packages', help="Remove packages from one or all project environments")
     add_directory_arg(preset)
     add_env_spec_arg(preset)
     preset.add_argument('--pip', action='store_true', help='Uninstall the requested packages using pip.')
     preset.add_argument('packages', metavar='PACKAGE_NAME', default=None, nargs='+')
-    preset.set_defaults(main=environment_commands.main_remove_packages)
+    preset.set_defaults(main=_subcommand('environment_commands', 'main_remove_packages'))
 
     preset = subparsers.add_parser('list-packages', help="List packages for an environment on the project")
     add_directory_arg(preset)
     add_env_spec_arg(preset)
-    preset.set_defaults(main=environment_commands.main_list_packages)
+    preset.set_defaults(main=_subcommand('environment_commands', 'main_list_packages'))
 
     def add_platforms_list(preset):
         preset.add_argument('platforms', metavar='PLATFORM_NAME', default=None, nargs='+')
@@ -355,18 +370,18 @@ def _parse_args_and_run_subcommand(argv):
     add_directory_arg(preset)
     add_env_spec_arg(preset)
     add_platforms_list(preset)
-    preset.set_defaults(main=environment_commands.main_add_platforms)
+    preset.set_defaults(main=_subcommand('environment_commands', 'main_add_platforms'))
 
     preset = subparsers.add_parser('remove-platforms', help="Remove platforms from one or all project environments")
     add_directory_arg(preset)
     add_env_spec_arg(preset)
     add_platforms_list(preset)
-    preset.set_defaults(main=environment_commands.main_remove_platforms)
+    preset.set_defaults(main=_subcommand('environment_commands', 'main_remove_platforms'))
 
     preset = subparsers.add_parser('list-platforms', help="List platforms for an environment on the project")
     add_directory_arg(preset)
     add_env_spec_arg(preset)
-    preset.set_defaults(main=environment_commands.main_list_platforms)
+    preset.set_defaults(main=_subcommand('environment_commands', 'main_list_platforms'))
 
     def add_command_name_arg(preset):
         preset.add_argument('name', metavar="NAME", help="Command name used to invoke it")
@@ -387,25 +402,44 @@ def _parse_args_and_run_subcommand(argv):
                         action="store_false",
                         help=" The command does not support project's HTTP server options")
     preset.add_argument('command', metavar="COMMAND", help="Command line or app filename to add")
-    preset.set_defaults(main=command_commands.main, supports_http_options=None)
+    preset.set_defaults(main=_subcommand('command_commands'), supports_http_options=None)
 
     preset = subparsers.add_parser('remove-command', help="Remove a command from the project")
     add_directory_arg(preset)
     add_command_name_arg(preset)
-    preset.set_defaults(main=command_commands.main_remove)
+    preset.set_defaults(main=_subcommand('command_commands', 'main_remove'))
 
     preset = subparsers.add_parser('list-default-command', help="List only the default command on the project")
     add_directory_arg(preset)
-    preset.set_defaults(main=command_commands.main_default)
+    preset.set_defaults(main=_subcommand('command_commands', 'main_default'))
 
     preset = subparsers.add_parser('list-commands', help="List the commands on the project")
     add_directory_arg(preset)
-    preset.set_defaults(main=command_commands.main_list)
+    preset.set_defaults(main=_subcommand('command_commands', 'main_list'))
 
     preset = subparsers.add_parser('export-pixi', help="Export the project as a pixi.toml file")
     add_directory_arg(preset)
     preset.add_argument('filename', metavar='PIXI_TOML_FILE', nargs='?', default='pixi.toml')
-    preset.set_defaults(main=pixi_commands.main_export_pixi)
+    preset.set_defaults(main=_subcommand('pixi_commands', 'main_export_pixi'))
+
+    preset = subparsers.add_parser('trace-summary',
+                                   help="Summarize a trace file by tool and subcommand, and downloads by host")
+    preset.add_argument('filename', metavar='TRACE_FILE')
+    preset.set_defaults(main=_subcommand('trace_commands', 'main_summarize'))
+
+    preset = subparsers.add_parser('daemon', help="Serve run, prepare, and list commands from a long-lived process")
+    preset.add_argument('--socket',
+                        metavar='SOCKET_PATH',
+                        default=None,
+                        help="Unix socket to listen on (defaults to $ANACONDA_PROJECT_DAEMON_SOCKET or one in the "
+                        "user cache directory)")
+    preset.set_defaults(main=_subcommand('daemon'))
+
+    return parser
+
+
+def _parse_args_and_run_subcommand(argv):
+    parser = _create_parser()
 
     # argparse doesn't do this for us for whatever reason
     if len(argv) < 2:
@@ -418,6 +452,10 @@ def _parse_args_and_run_subcommand(argv):
     except SystemExit as e:
         return e.code
 
+    return _run_subcommand(args)
+
+
+def _run_subcommand(args):
     if args.verbose:
         logger = (logging.getLoggerClass())(name="anaconda_project_verbose")
         logger.setLevel(logging.DEBUG)
@@ -425,6 +463,9 @@ def _parse_args_and_run_subcommand(argv):
         logger.addHandler(handler)
         push_verbose_logger(logger)
 
+    if args.trace is not None:
+        subprocess_trace.set_trace_file(os.path.abspath(args.trace))
+
     try:
         # '--directory' is used for most subcommands; for unarchive,
         # args.directory is positional and may be None
@@ -432,6 +473,8 @@ def _parse_args_and_run_subcommand(argv):
             args.directory = os.path.realpath(os.path.abspath(args.directory))
         return args.main(args)
     finally:
+        if args.trace is not None:
+            subprocess_trace.set_trace_file(None)
         if args.verbose:
             pop_verbose_logger()
 
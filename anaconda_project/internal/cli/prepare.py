@@ -9,16 +9,26 @@
 from __future__ import absolute_import, print_function
 
 import anaconda_project.internal.cli.console_utils as console_utils
+from anaconda_project.internal import prepare_snapshot
+from anaconda_project.prepare import PrepareTimings
 from anaconda_project.internal.cli.prepare_with_mode import prepare_with_ui_mode_printing_errors
 from anaconda_project.internal.cli.project_load import load_project
 
 
-def prepare_command(project_dir, ui_mode, conda_environment, command_name, all=False, refresh=False):
+def prepare_command(project_dir,
+                    ui_mode,
+                    conda_environment,
+                    command_name,
+                    all=False,
+                    refresh=False,
+                    show_timings=False,
+                    verify_downloads=False):
     """Configure the project to run.
 
     Returns:
         Prepare result (can be treated as True on success).
     """
+    requested_project_dir = project_dir
     project = load_project(project_dir)
     project_dir = project.directory_path
     if console_utils.print_project_problems(project):
@@ -28,16 +38,35 @@ def prepare_command(project_dir, ui_mode, conda_environment, command_name, all=F
     else:
         specs = {conda_environment: project.env_specs.get(conda_environment)}
     result = True
+    timings = PrepareTimings()
     for k, v in specs.items():
-        if not prepare_with_ui_mode_printing_errors(
-                project, env_spec_name=k, ui_mode=ui_mode, command_name=command_name, refresh=refresh):
+        spec_result = prepare_with_ui_mode_printing_errors(project,
+                                                           env_spec_name=k,
+                                                           ui_mode=ui_mode,
+                                                           command_name=command_name,
+                                                           refresh=refresh,
+                                                           timings=timings,
+                                                           verify_downloads=verify_downloads)
+        if spec_result:
+            # lets a later ``run`` of the same command skip preparing
+            prepare_snapshot.save(project,
+                                  spec_result,
+                                  project.command_for_name(command_name),
+                                  ui_mode=ui_mode,
+                                  env_spec_name=k,
+                                  command_name=command_name,
+                                  project_dir=requested_project_dir)
+        else:
             result = False
+    if show_timings:
+        console_utils.print_prepare_timings(timings)
     return result
 
 
 def main(args):
     """Start the prepare command and return exit status code."""
-    if prepare_command(args.directory, args.mode, args.env_spec, args.command, args.all, args.refresh):
+    if prepare_command(args.directory, args.mode, args.env_spec, args.command, args.all, args.refresh, args.timings,
+                       args.verify_downloads):
         print("The project is ready to run commands.")
         print("Use `anaconda-project list-commands` to see what's available.")
         return 0
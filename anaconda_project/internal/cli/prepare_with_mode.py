@@ -9,7 +9,6 @@
 from __future__ import absolute_import, print_function
 
 from anaconda_project import prepare
-from anaconda_project import project_ops
 from anaconda_project.requirements_registry.requirement import EnvVarRequirement
 from anaconda_project.requirements_registry.requirements.conda_env import CondaEnvRequirement
 
@@ -64,6 +63,7 @@ def _interactively_fix_missing_variables(project, result):
         values[status.requirement.env_var] = reply
 
     if len(values) > 0:
+        from anaconda_project import project_ops
         status = project_ops.set_variables(project, result.env_spec_name, values.items(), result)
         if status:
             return True
@@ -81,7 +81,9 @@ def prepare_with_ui_mode_printing_errors(project,
                                          command_name=None,
                                          command=None,
                                          extra_command_args=None,
-                                         refresh=False):
+                                         refresh=False,
+                                         timings=None,
+                                         verify_downloads=False):
     """Perform all steps needed to get a project ready to execute.
 
     This may need to ask the user questions, may start services,
@@ -97,6 +99,9 @@ def prepare_with_ui_mode_printing_errors(project,
         command_name (str): command name to use or None for default
         command (ProjectCommand): a command object or None
         extra_command_args (list of str): extra args for the command we prepare
+        refresh (bool): do a full reinstall of the environment
+        timings (PrepareTimings): collector to add timings to, or None for a new one
+        verify_downloads (bool): hash every download with a checksum again, even if it looks unchanged
 
     Returns:
         a ``PrepareResult`` instance
@@ -142,7 +147,9 @@ def prepare_with_ui_mode_printing_errors(project,
                                                      command_name=command_name,
                                                      command=command,
                                                      extra_command_args=extra_command_args,
-                                                     refresh=refresh)
+                                                     refresh=refresh,
+                                                     timings=timings,
+                                                     verify_downloads=verify_downloads)
 
         if result.failed:
             if ask and _interactively_fix_missing_variables(project, result):
@@ -36,9 +36,29 @@ class CliFrontend(Frontend):
         sys.stderr.flush()
 
 
+# The daemon pushes a loader here to reuse projects between requests.
+_project_loaders = []
+
+
+def push_project_loader(loader):
+    """Use loader(dirname) to create the Project in load_project()."""
+    _project_loaders.append(loader)
+
+
+def pop_project_loader():
+    """Remove the loader added by the most recent push_project_loader()."""
+    _project_loaders.pop()
+
+
+def _new_project(dirname):
+    if len(_project_loaders) > 0:
+        return _project_loaders[-1](dirname)
+    return Project(dirname, frontend=CliFrontend(), must_exist=True)
+
+
 def load_project(dirname):
     """Load a Project, fixing it if needed and possible."""
-    project = Project(dirname, frontend=CliFrontend(), must_exist=True)
+    project = _new_project(dirname)
 
     # No sense in engaging the user if we cannot achieve a fixed state.
     if project.unfixable_problems:
@@ -10,8 +10,11 @@ from __future__ import absolute_import, print_function
 
 import sys
 
+import anaconda_project.internal.cli.console_utils as console_utils
+from anaconda_project.internal import prepare_snapshot
 from anaconda_project.internal.cli.prepare_with_mode import prepare_with_ui_mode_printing_errors
 from anaconda_project.internal.cli.project_load import load_project
+from anaconda_project.prepare import PrepareTimings
 from anaconda_project.project_commands import ProjectCommand
 from anaconda_project.internal.cli.environment_commands import (create_bootstrap_env, run_on_bootstrap_env)
 
@@ -32,12 +35,47 @@ def _command_from_name(project, command_name):
     return command
 
 
-def run_command(project_dir, ui_mode, conda_environment, command_name, extra_command_args):
+# The daemon pushes a handler here, because the command has to
+# replace the client's process rather than the daemon's.
+_exec_handlers = []
+
+
+def push_exec_handler(handler):
+    """Handle CommandExecInfo for ``run`` with handler instead of exec'ing it."""
+    _exec_handlers.append(handler)
+
+
+def pop_exec_handler():
+    """Remove the handler added by the most recent push_exec_handler()."""
+    _exec_handlers.pop()
+
+
+def _execvpe_printing_errors(exec_info):
+    if len(_exec_handlers) > 0:
+        _exec_handlers[-1](exec_info)
+        return
+    try:
+        exec_info.execvpe()
+    except OSError as e:
+        print("Failed to execute '%s': %s" % (" ".join(exec_info.args), e.strerror), file=sys.stderr)
+
+
+def run_command(project_dir, ui_mode, conda_environment, command_name, extra_command_args, show_timings=False):
     """Run the project.
 
     Returns:
         Does not return if successful.
     """
+    # if nothing changed since we last prepared this command, skip
+    # loading and preparing the project entirely.
+    exec_info = prepare_snapshot.load_exec_info(project_dir, ui_mode, conda_environment, command_name,
+                                                extra_command_args)
+    if exec_info is not None:
+        if show_timings:
+            print("Prepare skipped: nothing changed since the last successful prepare.", file=sys.stderr)
+        _execvpe_printing_errors(exec_info)
+        return
+
     project = load_project(project_dir)
 
     if project.has_bootstrap_env_spec() and not project.is_running_in_bootstrap_env():
@@ -47,13 +85,17 @@ def run_command(project_dir, ui_mode, conda_environment, command_name, extra_com
     else:
         environ = None
         command = _command_from_name(project, command_name)
+        timings = PrepareTimings()
 
         result = prepare_with_ui_mode_printing_errors(project,
                                                       ui_mode=ui_mode,
                                                       env_spec_name=conda_environment,
                                                       command=command,
                                                       extra_command_args=extra_command_args,
-                                                      environ=environ)
+                                                      environ=environ,
+                                                      timings=timings)
+        if show_timings:
+            console_utils.print_prepare_timings(timings)
 
         if result.failed:
             # errors were printed already
@@ -63,16 +105,18 @@ def run_command(project_dir, ui_mode, conda_environment, command_name, extra_com
                   project_dir,
                   file=sys.stderr)
         else:
-            try:
-
-                result.command_exec_info.execvpe()
-            except OSError as e:
-                print("Failed to execute '%s': %s" % (" ".join(result.command_exec_info.args), e.strerror),
-                      file=sys.stderr)
+            prepare_snapshot.save(project,
+                                  result,
+                                  command,
+                                  ui_mode=ui_mode,
+                                  env_spec_name=conda_environment,
+                                  command_name=command_name,
+                                  project_dir=project_dir)
+            _execvpe_printing_errors(result.command_exec_info)
 
 
 def main(args):
     """Start the run command and return exit status code.."""
-    run_command(args.directory, args.mode, args.env_spec, args.command, args.extra_args_for_command)
+    run_command(args.directory, args.mode, args.env_spec, args.command, args.extra_args_for_command, args.timings)
     # if we returned, we failed to run the command and should have printed an error
     return 1
@@ -196,8 +196,12 @@ def _monkeypatch_can_connect_to_socket_to_fail_to_find_redis(monkeypatch):
         else:
             return True  # can't start a custom Redis here
 
+    def mock_ports_in_use(host, ports, timeout_seconds=0.5):
+        return set(port for port in ports if mock_can_connect_to_socket(host, port, timeout_seconds))
+
     monkeypatch.setattr("anaconda_project.requirements_registry.network_util.can_connect_to_socket",
                         mock_can_connect_to_socket)
+    monkeypatch.setattr("anaconda_project.requirements_registry.network_util.ports_in_use", mock_ports_in_use)
 
 
 def test_main_fails_to_redis(monkeypatch, capsys):
@@ -10,6 +10,7 @@ from __future__ import absolute_import, print_function
 import sys
 
 import anaconda_project.internal.cli.console_utils as console_utils
+from anaconda_project.prepare import PrepareTimings
 
 
 def test_stdin_is_interactive(monkeypatch):
@@ -107,6 +108,48 @@ def test_format_names_and_descriptions():
         assert console_utils.format_names_and_descriptions(case[0]) == case[1]
 
 
+def test_print_prepare_timings_with_downloads(capsys):
+    timings = PrepareTimings()
+    timings.record('provide', 'DATAFILE, OTHERFILE', 2.5, 0.5)
+    timings.record_metrics(
+        'DATAFILE',
+        dict(url='http://example.com/data.csv',
+             start=0.0,
+             time_to_first_byte=0.25,
+             duration=2.0,
+             bytes=4 * 1024 * 1024,
+             average_throughput=2 * 1024 * 1024,
+             peak_throughput=3 * 1024 * 1024,
+             retries=1,
+             cached=False))
+    timings.record_metrics(
+        'OTHERFILE',
+        dict(url='http://example.com/other.csv',
+             start=0.0,
+             time_to_first_byte=None,
+             duration=0.5,
+             bytes=10,
+             average_throughput=20,
+             peak_throughput=20,
+             retries=0,
+             cached=True))
+    timings.record_metrics('REDIS_URL', dict(something='else'))
+    console_utils.print_prepare_timings(timings)
+
+    out, err = capsys.readouterr()
+    assert '' == out
+    lines = err.splitlines()
+    start = lines.index("Downloads:")
+    assert lines[start + 1].split() == [
+        'Name', 'Bytes', 'First', 'byte', '(s)', 'Total', '(s)', 'Avg', 'MiB/s', 'Peak', 'MiB/s', 'Retries', 'From'
+    ]
+    assert lines[start + 2].split() == [
+        'DATAFILE', '4194304', '0.250', '2.000', '2.0', '3.0', '1', 'http://example.com/data.csv'
+    ]
+    assert lines[start + 3].split() == ['OTHERFILE', '10', '-', '0.500', '0.0', '0.0', '0', 'cache']
+    assert len(lines) == start + 4
+
+
 def test_console_get_password(monkeypatch, capsys):
     def mock_isatty_true():
         return True
@@ -0,0 +1,309 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (c) 2026, Anaconda, Inc. All rights reserved.
+#
+# Licensed under the terms of the BSD 3-Clause License.
+# The full license is in the file LICENSE.txt, distributed with this software.
+# -----------------------------------------------------------------------------
+from __future__ import absolute_import, print_function
+
+import codecs
+import io
+import os
+import platform
+import shutil
+import socket
+import stat
+import tempfile
+import threading
+
+import pytest
+
+import anaconda_project
+from anaconda_project.internal.cli import daemon, daemon_client
+import anaconda_project.internal.cli.main as cli_main
+from anaconda_project.internal.test.tmpfile_utils import with_directory_contents_completing_project_file
+from anaconda_project.project_file import DEFAULT_PROJECT_FILENAME
+from anaconda_project.test.project_utils import project_dir_disable_dedicated_env
+
+pytestmark = pytest.mark.skipif(platform.system() == 'Windows', reason="the daemon needs Unix domain sockets")
+
+_project_with_command = """
+commands:
+  default:
+    unix: echo hello
+    windows: echo hello
+variables:
+  FOO: { default: bar }
+"""
+
+
+def _request(dirname, *args):
+    return dict(version=anaconda_project.__version__,
+                argv=['anaconda-project'] + list(args),
+                cwd=dirname,
+                environ=dict(os.environ))
+
+
+def _handle(request):
+    stream = io.BytesIO()
+    d = daemon._Daemon(cli_main._create_parser(), cli_main._run_subcommand)
+    d.handle(request, stream)
+    stream.seek(0)
+    messages = []
+    while True:
+        message = daemon_client.read_message(stream)
+        if message is None:
+            return messages
+        messages.append(message)
+
+
+def _output(messages, key):
+    return "".join(message[key] for message in messages if key in message)
+
+
+def test_daemon_serves_list_commands():
+    def check(dirname):
+        messages = _handle(_request(dirname, 'list-commands', '--directory', dirname))
+        assert 'default' in _output(messages, 'stdout')
+        assert dict(exit=0) == messages[-1]
+
+    with_directory_contents_completing_project_file({DEFAULT_PROJECT_FILENAME: _project_with_command}, check)
+
+
+def test_daemon_restores_process_state():
+    def check(dirname):
+        old_cwd = os.getcwd()
+        old_environ = dict(os.environ)
+        request = _request(dirname, 'list-commands', '--directory', dirname)
+        request['environ']['SOMETHING_FROM_THE_CLIENT'] = 'x'
+        _handle(request)
+        assert old_cwd == os.getcwd()
+        assert old_environ == dict(os.environ)
+
+    with_directory_contents_completing_project_file({DEFAULT_PROJECT_FILENAME: _project_with_command}, check)
+
+
+def test_daemon_run_replies_with_exec():
+    def check(dirname):
+        project_dir_disable_dedicated_env(dirname)
+        messages = _handle(_request(dirname, 'run', '--directory', dirname))
+        assert 'exec' in messages[-1], messages
+        info = messages[-1]['exec']
+        assert ['/bin/sh', '-c', 'echo hello'] == info['args']
+        assert 'echo hello' == info['description']
+        assert dirname == info['cwd']
+        assert 'bar' == info['env']['FOO']
+
+    with_directory_contents_completing_project_file({DEFAULT_PROJECT_FILENAME: _project_with_command}, check)
+
+
+def test_daemon_exec_env_includes_conda_env_vars(monkeypatch):
+    from anaconda_project.project_commands import CommandExecInfo
+    real_args_for_exec = CommandExecInfo._args_for_exec
+
+    def mock_args_for_exec(self):
+        # stands in for the variables the conda env itself sets
+        self.env['FROM_CONDA_ENV'] = 'yes'
+        return real_args_for_exec(self)
+
+    monkeypatch.setattr(CommandExecInfo, '_args_for_exec', mock_args_for_exec)
+
+    def check(dirname):
+        project_dir_disable_dedicated_env(dirname)
+        messages = _handle(_request(dirname, 'run', '--directory', dirname))
+        assert 'yes' == messages[-1]['exec']['env']['FROM_CONDA_ENV']
+
+    with_directory_contents_completing_project_file({DEFAULT_PROJECT_FILENAME: _project_with_command}, check)
+
+
+def test_daemon_bad_args():
+    def check(dirname):
+        messages = _handle(_request(dirname, 'list-commands', '--no-such-option'))
+        assert 'usage:' in _output(messages, 'stderr')
+        assert dict(exit=2) == messages[-1]
+
+    with_directory_contents_completing_project_file({DEFAULT_PROJECT_FILENAME: _project_with_command}, check)
+
+
+def test_daemon_falls_back():
+    def check(dirname):
+        request = _request(dirname, 'list-commands')
+        request['version'] = 'not-' + anaconda_project.__version__
+        assert [dict(fallback="version mismatch")] == _handle(request)
+        assert [dict(fallback="unsupported command")] == _handle(_request(dirname, 'add-variable', 'FOO'))
+        assert [dict(fallback="unsupported command")] == _handle(_request(dirname, '--verbose', 'run'))
+
+    with_directory_contents_completing_project_file({DEFAULT_PROJECT_FILENAME: _project_with_command}, check)
+
+
+def test_daemon_falls_back_for_bootstrap_env():
+    def check(dirname):
+        # a bootstrap env means re-running ourselves, which the client has to do
+        messages = _handle(_request(dirname, 'run', '--directory', dirname))
+        assert [dict(fallback="needs to run in the client")] == messages
+
+    with_directory_contents_completing_project_file(
+        {
+            DEFAULT_PROJECT_FILENAME:
+            _project_with_command + "env_specs:\n  default: {}\n  bootstrap-env:\n    packages: []\n"
+        }, check)
+
+
+def test_project_cache_reloads_changed_project():
+    def check(dirname):
+        cache = daemon._ProjectCache()
+        project = cache.load(dirname)
+        assert project is cache.load(dirname)
+
+        with codecs.open(os.path.join(dirname, DEFAULT_PROJECT_FILENAME), 'a', 'utf-8') as f:
+            f.write("\n# changed\n")
+        changed = cache.load(dirname)
+        assert changed is not project
+        assert changed is cache.load(dirname)
+
+        changed.project_file.set_value('name', 'unsaved')
+        assert changed is not cache.load(dirname)
+
+    with_directory_contents_completing_project_file({DEFAULT_PROJECT_FILENAME: _project_with_command}, check)
+
+
+def test_server_socket_is_private(tmpdir):
+    socket_path = str(tmpdir.join('s'))
+    old_umask = os.umask(0o022)
+    try:
+        server = daemon._Server(socket_path, daemon._Daemon(cli_main._create_parser(), cli_main._run_subcommand))
+        try:
+            assert 0 == stat.S_IMODE(os.stat(socket_path).st_mode) & 0o077
+        finally:
+            server.server_close()
+        assert 0o022 == os.umask(0o022)
+    finally:
+        os.umask(old_umask)
+
+
+class _FakeDaemon(object):
+    """Answers one request on a real socket with canned replies."""
+    def __init__(self, replies):
+        self.directory = tempfile.mkdtemp(prefix='apd-')
+        self.socket_path = os.path.join(self.directory, 's')
+        self.requests = []
+        self._replies = replies
+        self._listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._listener.bind(self.socket_path)
+        self._listener.listen(1)
+        self._thread = threading.Thread(target=self._serve)
+        self._thread.start()
+
+    def _serve(self):
+        connection, _ = self._listener.accept()
+        stream = connection.makefile('rwb')
+        self.requests.append(daemon_client.read_message(stream))
+        for reply in self._replies:
+            daemon_client.write_message(stream, reply)
+        stream.close()
+        connection.close()
+
+    def close(self):
+        self._thread.join()
+        self._listener.close()
+        shutil.rmtree(self.directory)
+
+
+def _run_in_fake_daemon(monkeypatch, replies, argv=('anaconda-project', 'list-commands')):
+    monkeypatch.setattr('sys.stdin', io.StringIO())
+    fake = _FakeDaemon(replies)
+    try:
+        return (daemon_client.run_in_daemon(list(argv), socket_path=fake.socket_path), fake.requests)
+    finally:
+        fake.close()
+
+
+def test_client_prints_output_and_returns_exit_code(monkeypatch, capsys):
+    (code, requests) = _run_in_fake_daemon(monkeypatch, [dict(stdout="out\n"), dict(stderr="err\n"), dict(exit=3)])
+    assert 3 == code
+    assert ['anaconda-project', 'list-commands'] == requests[0]['argv']
+    assert os.getcwd() == requests[0]['cwd']
+    assert dict(os.environ) == requests[0]['environ']
+    assert anaconda_project.__version__ == requests[0]['version']
+    out, err = capsys.readouterr()
+    assert "out\n" == out
+    assert "err\n" == err
+
+
+def test_client_falls_back(monkeypatch, capsys):
+    (code, requests) = _run_in_fake_daemon(monkeypatch, [dict(fallback="version mismatch")])
+    assert code is None
+
+
+def test_client_lost_connection(monkeypatch, capsys):
+    (code, requests) = _run_in_fake_daemon(monkeypatch, [dict(stdout="out\n")])
+    assert 1 == code
+    out, err = capsys.readouterr()
+    assert "out\n" == out
+    assert "Lost connection to the anaconda-project daemon.\n" == err
+
+
+def test_client_execs(monkeypatch, capsys):
+    execs = []
+
+    def mock_execvpe(file, args, env):
+        execs.append((file, args, env))
+        raise OSError(2, "No such file or directory")
+
+    monkeypatch.setattr('os.execvpe', mock_execvpe)
+    monkeypatch.setattr('os.chdir', lambda path: None)
+    info = dict(args=['/bin/sh', '-c', 'echo hello'], env=dict(FOO='bar'), cwd='/', description='echo hello')
+    (code, requests) = _run_in_fake_daemon(monkeypatch, [dict(exec=info)], argv=('anaconda-project', 'run'))
+    assert 1 == code
+    assert [('/bin/sh', ['/bin/sh', '-c', 'echo hello'], dict(FOO='bar'))] == execs
+    out, err = capsys.readouterr()
+    assert "Failed to execute 'echo hello': No such file or directory\n" == err
+
+
+def test_client_without_daemon(monkeypatch, tmpdir):
+    monkeypatch.setattr('sys.stdin', io.StringIO())
+    monkeypatch.setenv(daemon_client.SOCKET_ENV_VAR, str(tmpdir.join('nothing-here')))
+    assert daemon_client.run_in_daemon(['anaconda-project', 'list-commands']) is None
+
+    # a socket left behind by a daemon that died
+    stale = tempfile.mkdtemp(prefix='apd-')
+    try:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.bind(os.path.join(stale, 's'))
+        sock.close()
+        assert daemon_client.run_in_daemon(['anaconda-project', 'list-commands'], socket_path=os.path.join(stale,
+                                                                                                           's')) is None
+    finally:
+        shutil.rmtree(stale)
+
+
+def test_client_skips_commands_it_cannot_forward(monkeypatch):
+    def mock_connect(*args):
+        raise AssertionError("should not connect")
+
+    monkeypatch.setattr('socket.socket', mock_connect)
+    monkeypatch.setattr('sys.stdin', io.StringIO())
+    assert daemon_client.run_in_daemon(['anaconda-project']) is None
+    assert daemon_client.run_in_daemon(['anaconda-project', 'add-variable', 'FOO']) is None
+
+    class Tty(io.StringIO):
+        def isatty(self):
+            return True
+
+    monkeypatch.setattr('sys.stdin', Tty())
+    assert daemon_client.run_in_daemon(['anaconda-project', 'list-commands']) is None
+
+
+def test_main_daemon_command(monkeypatch, tmpdir):
+    served = []
+
+    def mock_serve(socket_path, parser, run_subcommand):
+        served.append(socket_path)
+        return 0
+
+    monkeypatch.setattr('anaconda_project.internal.cli.daemon.serve', mock_serve)
+    monkeypatch.setenv(daemon_client.SOCKET_ENV_VAR, str(tmpdir.join('default.sock')))
+    assert 0 == cli_main._parse_args_and_run_subcommand(['anaconda-project', 'daemon'])
+    assert 0 == cli_main._parse_args_and_run_subcommand(['anaconda-project', 'daemon', '--socket', 'foo.sock'])
+    assert [str(tmpdir.join('default.sock')), os.path.abspath('foo.sock')] == served
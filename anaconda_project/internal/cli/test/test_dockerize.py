@@ -40,7 +40,7 @@ def test_dockerize(capsys, monkeypatch):
     params = _monkeypatch_dockerize(monkeypatch)
 
     def check(dirname):
-        code = _parse_args_and_run_subcommand(['anaconda-project', 'dockerize'])
+        code = _parse_args_and_run_subcommand(['anaconda-project', 'dockerize', '--directory', dirname])
         assert code == 0
 
         out, err = capsys.readouterr()
@@ -59,7 +59,7 @@ def test_dockerize_fail(capsys, monkeypatch):
     params = _monkeypatch_dockerize_fail(monkeypatch)
 
     def check(dirname):
-        code = _parse_args_and_run_subcommand(['anaconda-project', 'dockerize'])
+        code = _parse_args_and_run_subcommand(['anaconda-project', 'dockerize', '--directory', dirname])
         assert code == 1
 
         out, err = capsys.readouterr()
@@ -78,7 +78,8 @@ def test_dockerize_tag(capsys, monkeypatch):
     params = _monkeypatch_dockerize(monkeypatch)
 
     def check(dirname):
-        code = _parse_args_and_run_subcommand(['anaconda-project', 'dockerize', '-t', 'dockme:1'])
+        code = _parse_args_and_run_subcommand(
+            ['anaconda-project', 'dockerize', '--directory', dirname, '-t', 'dockme:1'])
         assert code == 0
 
         out, err = capsys.readouterr()
@@ -94,7 +95,8 @@ def test_dockerize_command(capsys, monkeypatch):
     params = _monkeypatch_dockerize(monkeypatch)
 
     def check(dirname):
-        code = _parse_args_and_run_subcommand(['anaconda-project', 'dockerize', '--command', 'other-command'])
+        code = _parse_args_and_run_subcommand(
+            ['anaconda-project', 'dockerize', '--directory', dirname, '--command', 'other-command'])
         assert code == 0
 
         out, err = capsys.readouterr()
@@ -110,7 +112,8 @@ def test_dockerize_build_args(capsys, monkeypatch):
     params = _monkeypatch_dockerize(monkeypatch)
 
     def check(dirname):
-        code = _parse_args_and_run_subcommand(['anaconda-project', 'dockerize', '--', '-e', 'CMD=other', '--run'])
+        code = _parse_args_and_run_subcommand(
+            ['anaconda-project', 'dockerize', '--directory', dirname, '--', '-e', 'CMD=other', '--run'])
         assert code == 0
 
         out, err = capsys.readouterr()
@@ -126,7 +129,8 @@ def test_dockerize_builder_image(capsys, monkeypatch):
     params = _monkeypatch_dockerize(monkeypatch)
 
     def check(dirname):
-        code = _parse_args_and_run_subcommand(['anaconda-project', 'dockerize', '--builder-image', 'custom:latest'])
+        code = _parse_args_and_run_subcommand(
+            ['anaconda-project', 'dockerize', '--directory', dirname, '--builder-image', 'custom:latest'])
         assert code == 0
 
         out, err = capsys.readouterr()
@@ -12,10 +12,13 @@ import re
 import os
 import platform
 import pytest
+import subprocess
 import sys
 
 import anaconda_project
 from anaconda_project.internal.cli.main import _parse_args_and_run_subcommand
+from anaconda_project.internal.test.tmpfile_utils import with_directory_contents_completing_project_file
+from anaconda_project.project_file import DEFAULT_PROJECT_FILENAME
 
 all_subcommands = ('init', 'run', 'prepare', 'clean', 'activate', 'archive', 'unarchive', 'upload', 'download',
                    'dockerize', 'add-variable', 'remove-variable', 'list-variables', 'set-variable', 'unset-variable',
@@ -23,7 +26,7 @@ all_subcommands = ('init', 'run', 'prepare', 'clean', 'activate', 'archive', 'un
                    'list-services', 'add-env-spec', 'remove-env-spec', 'list-env-specs', 'export-env-spec', 'lock',
                    'unlock', 'update', 'add-packages', 'remove-packages', 'list-packages', 'add-platforms',
                    'remove-platforms', 'list-platforms', 'add-command', 'remove-command', 'list-default-command',
-                   'list-commands', 'export-pixi')
+                   'list-commands', 'export-pixi', 'trace-summary', 'daemon')
 all_subcommands_in_curlies = "{" + ",".join(all_subcommands) + "}"
 all_subcommands_comma_space = ", ".join(["'" + s + "'" for s in all_subcommands])
 
@@ -46,7 +49,7 @@ def test_main_no_subcommand(capsys):
     out, err = capsys.readouterr()
     assert "" == out
     expected_error_msg = ('Must specify a subcommand.\n'
-                          'usage: anaconda-project [-h] [-v] [--verbose]\n'
+                          'usage: anaconda-project [-h] [-v] [--verbose] [--trace TRACE_FILE]\n'
                           '                        %s\n'
                           '                        ...\n') % all_subcommands_in_curlies
     assert _normalize_whitespace(expected_error_msg) == _normalize_whitespace(err)
@@ -77,7 +80,7 @@ def test_main_bad_subcommand(capsys):
 
 
 expected_usage_msg_format = (  # noqa
-    'usage: anaconda-project [-h] [-v] [--verbose]\n'
+    'usage: anaconda-project [-h] [-v] [--verbose] [--trace TRACE_FILE]\n'
     '                        %s\n'
     '                        ...\n'
     '\n'
@@ -134,11 +137,17 @@ expected_usage_msg_format = (  # noqa
     '                        List only the default command on the project\n'
     '    list-commands       List the commands on the project\n'
     '    export-pixi         Export the project as a pixi.toml file\n'
+    '    trace-summary       Summarize a trace file by tool and subcommand, and\n'
+    '                        downloads by host\n'
+    '    daemon              Serve run, prepare, and list commands from a long-\n'
+    '                        lived process\n'
     '\n'
     'optional arguments:\n'
     '  -h, --help            show this help message and exit\n'
     "  -v, --version         show program's version number and exit\n"
-    '  --verbose             show verbose debugging details\n')
+    '  --verbose             show verbose debugging details\n'
+    '  --trace TRACE_FILE    append a JSON-lines timing record for each subprocess\n'
+    '                        to TRACE_FILE\n')
 
 activate_help = ('    activate            Set up the project and output shell export commands\n'
                  '                        reflecting the setup\n')
@@ -247,4 +256,70 @@ Details about the error were saved to """)
     assert os.path.basename(filename).startswith("bug_details_anaconda-project_")
     assert os.path.isfile(filename)
 
-    os.remove(filename)
\ No newline at end of file
+    os.remove(filename)
+
+
+# modules that only some subcommands need, and that are slow to import
+_heavy_modules = ('binstar_client', 'requests', 'tornado', 'keyring', 'conda_pack', 'tqdm', 'jinja2',
+                  'anaconda_project.client')
+
+
+def _import_times(args, cwd=None):
+    """Run the command line in a new interpreter, returning CPU seconds spent importing and the modules imported."""
+    # CPU rather than wall clock time, so other tests running at the same time don't count
+    code = ("import sys, time\n"
+            "start = time.process_time()\n"
+            "from anaconda_project.internal.cli.main import _parse_args_and_run_subcommand\n"
+            "sys.stderr.write('import cpu seconds: %f\\n' % (time.process_time() - start))\n"
+            "sys.exit(_parse_args_and_run_subcommand(['anaconda-project'] + sys.argv[1:]))\n")
+    package_parent = os.path.dirname(os.path.dirname(os.path.abspath(anaconda_project.__file__)))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([package_parent, os.environ.get('PYTHONPATH', '')]))
+    process = subprocess.Popen([sys.executable, '-X', 'importtime', '-c', code] + list(args),
+                               stdout=subprocess.PIPE,
+                               stderr=subprocess.PIPE,
+                               cwd=cwd,
+                               env=env)
+    (out, err) = process.communicate()
+    assert 0 == process.returncode, err
+
+    seconds = None
+    modules = set()
+    for line in err.decode('utf-8').splitlines():
+        if line.startswith('import cpu seconds: '):
+            seconds = float(line.split(':')[1])
+            continue
+        match = re.match(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$', line)
+        if match is not None:
+            modules.add(match.group(4))
+    assert seconds is not None, err
+    return (seconds, modules)
+
+
+# Allows for slower machines; the heavy module check is the precise
+# one. Importing every subcommand used to take about 2.5 seconds
+# (binstar_client alone is over 1.5), where --version now takes about
+# 0.35 seconds.
+_import_seconds_budget = 1.0
+
+
+def test_version_import_budget():
+    (seconds, modules) = _import_times(['--version'])
+    assert [] == [module for module in _heavy_modules if module in modules]
+    assert seconds < _import_seconds_budget
+
+
+def test_list_commands_import_budget():
+    def check(dirname):
+        (seconds, modules) = _import_times(['list-commands', '--directory', dirname])
+        assert [] == [module for module in _heavy_modules if module in modules]
+        assert seconds < _import_seconds_budget
+
+    with_directory_contents_completing_project_file(
+        {DEFAULT_PROJECT_FILENAME: "commands:\n  default:\n    unix: echo hello\n    windows: echo hello\n"}, check)
+
+
+def test_service_type_names_match_registry():
+    from anaconda_project.internal.cli.main import _SERVICE_TYPE_NAMES
+    from anaconda_project.requirements_registry.registry import RequirementsRegistry
+
+    assert [s.name for s in RequirementsRegistry().list_service_types()] == list(_SERVICE_TYPE_NAMES)
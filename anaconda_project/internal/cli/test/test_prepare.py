@@ -29,6 +29,8 @@ class Args(object):
         self.env_spec = None
         self.mode = UI_MODE_TEXT_ASSUME_YES_DEVELOPMENT
         self.command = None
+        self.timings = False
+        self.verify_downloads = False
         for key in kwargs:
             setattr(self, key, kwargs[key])
 
@@ -82,8 +84,12 @@ def _monkeypatch_can_connect_to_socket_to_fail_to_find_redis(monkeypatch):
         else:
             return True  # can't start a custom Redis here
 
+    def mock_ports_in_use(host, ports, timeout_seconds=0.5):
+        return set(port for port in ports if mock_can_connect_to_socket(host, port, timeout_seconds))
+
     monkeypatch.setattr("anaconda_project.requirements_registry.network_util.can_connect_to_socket",
                         mock_can_connect_to_socket)
+    monkeypatch.setattr("anaconda_project.requirements_registry.network_util.ports_in_use", mock_ports_in_use)
 
 
 def test_main_fails_to_redis(monkeypatch, capsys):
@@ -116,6 +122,29 @@ services:
     assert "All ports from 6380 to 6449 were in use" in err
 
 
+def test_main_prints_timings(monkeypatch, capsys):
+    _monkeypatch_can_connect_to_socket_to_succeed(monkeypatch)
+
+    def main_with_timings(dirname):
+        project_dir_disable_dedicated_env(dirname)
+        code = main(Args(directory=dirname, all=False, refresh=False, timings=True))
+        assert 0 == code
+
+    with_directory_contents_completing_project_file({DEFAULT_PROJECT_FILENAME: """
+services:
+  REDIS_URL: redis
+"""}, main_with_timings)
+
+    out, err = capsys.readouterr()
+    assert "The project is ready to run commands." in out
+    lines = err.splitlines()
+    start = lines.index("Prepare timings (stages include the requirement steps they ran):")
+    assert lines[start + 1].split() == ['Phase', 'Name', 'Wall', '(s)', 'CPU', '(s)']
+    names = [line.split()[1] for line in lines[start + 2:]]
+    assert 'REDIS_URL' in names
+    assert 'CONDA_PREFIX' in names
+
+
 def test_prepare_command_choose_environment(capsys, monkeypatch):
     def mock_conda_create(prefix, pkgs, channels, stdout_callback, stderr_callback):
         from anaconda_project.internal.makedirs import makedirs_ok_if_exists
@@ -28,6 +28,7 @@ class Args(object):
         self.env_spec = None
         self.mode = UI_MODE_TEXT_ASSUME_YES_DEVELOPMENT
         self.command = None
+        self.timings = False
         self.extra_args_for_command = None
         for key in kwargs:
             setattr(self, key, kwargs[key])
@@ -138,6 +139,64 @@ variables:
     assert 'Environment variable WILL_NOT_BE_SET is not set' in err
 
 
+def test_run_command_failed_prepare_prints_timings(capsys):
+    def check_run_failed_prepare(dirname):
+        project_dir_disable_dedicated_env(dirname)
+        result = run_command(dirname,
+                             UI_MODE_TEXT_ASSUME_YES_DEVELOPMENT,
+                             conda_environment=None,
+                             command_name=None,
+                             extra_command_args=None,
+                             show_timings=True)
+        assert result is None
+
+    with_directory_contents_completing_project_file({DEFAULT_PROJECT_FILENAME: """
+variables:
+  - WILL_NOT_BE_SET
+"""}, check_run_failed_prepare)
+
+    out, err = capsys.readouterr()
+    assert out == ""
+    assert 'Environment variable WILL_NOT_BE_SET is not set' in err
+    assert 'Prepare timings (stages include the requirement steps they ran):' in err
+    assert 'WILL_NOT_BE_SET' in err.split('Prepare timings')[1]
+
+
+def test_run_command_uses_prepare_snapshot(monkeypatch, capsys, tmpdir):
+    monkeypatch.setenv('ANACONDA_PROJECT_CACHE_DIR', str(tmpdir))
+    monkeypatch.delenv('ANACONDA_PROJECT_DISABLE_PREPARE_SNAPSHOT', raising=False)
+
+    executed = []
+
+    def mock_execvpe(file, args, env):
+        executed.append(args)
+
+    monkeypatch.setattr('os.execvpe', mock_execvpe)
+
+    def check_run_twice(dirname):
+        project_dir_disable_dedicated_env(dirname)
+        run_command(dirname, UI_MODE_TEXT_ASSUME_YES_DEVELOPMENT, None, None, None)
+        assert 1 == len(executed)
+
+        def mock_load_project(dirname):
+            raise AssertionError("should have used the snapshot")
+
+        monkeypatch.setattr('anaconda_project.internal.cli.run.load_project', mock_load_project)
+        run_command(dirname, UI_MODE_TEXT_ASSUME_YES_DEVELOPMENT, None, None, ['--foo'], show_timings=True)
+        assert 2 == len(executed)
+        assert executed[0] + ['--foo'] == executed[1]
+
+    with_directory_contents_completing_project_file(
+        {DEFAULT_PROJECT_FILENAME: """
+commands:
+  default:
+    conda_app_entry: python --version
+"""}, check_run_twice)
+
+    out, err = capsys.readouterr()
+    assert "Prepare skipped: nothing changed since the last successful prepare.\n" == err
+
+
 def test_main(monkeypatch, capsys):
     def mock_conda_create(prefix, pkgs, channels):
         raise RuntimeError("this test should not create an environment in %s with pkgs %r" % (prefix, pkgs))
@@ -334,12 +393,9 @@ def test_run_command_verbose(monkeypatch, capsys):
         assert '--version' == executed['args'][1]
 
         # conda info is cached so may not be here depending on
-        # which other tests run
-        log_lines = [
-            "$ %s info --json" % executed['env']['CONDA_EXE'],
-            "$ %s env config vars list -p %s --json" % (executed['env']['CONDA_EXE'], executed['env']['CONDA_PREFIX']),
-            "$ %s --version" % executed['args'][0]
-        ]
+        # which other tests run; conda env vars come from the
+        # prefix's state file, so we don't run conda for those.
+        log_lines = ["$ %s info --json" % executed['env']['CONDA_EXE'], "$ %s --version" % executed['args'][0]]
         log_lines_without_conda_info = log_lines[1:]
 
         def nl(lines):
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (c) 2026, Anaconda, Inc. All rights reserved.
+#
+# Licensed under the terms of the BSD 3-Clause License.
+# The full license is in the file LICENSE.txt, distributed with this software.
+# -----------------------------------------------------------------------------
+from __future__ import absolute_import, print_function
+
+import json
+import os
+
+from anaconda_project.internal import subprocess_trace
+from anaconda_project.internal.cli.main import _parse_args_and_run_subcommand
+from anaconda_project.internal.test.tmpfile_utils import with_directory_contents
+
+
+def test_trace_summary(capsys):
+    def check(dirname):
+        code = _parse_args_and_run_subcommand(
+            ['anaconda-project', 'trace-summary',
+             os.path.join(dirname, "trace.jsonl")])
+        assert code == 0
+
+        out, err = capsys.readouterr()
+        assert '' == err
+        lines = out.splitlines()
+        assert len(lines) == 3
+        assert lines[0].split() == ['Command', 'Count', 'Failed', 'Total', '(s)', 'Max', '(s)', 'Stdout', 'Stderr']
+        assert lines[1].split() == ['conda', 'create', '2', '1', '5.000', '3.000', '30', '0']
+        assert lines[2].split() == ['redis-server', '1', '0', '0.500', '0.500', '0', '4']
+
+    lines = [
+        dict(argv=['conda', 'create'], duration=3.0, returncode=0, stdout_bytes=10, stderr_bytes=0),
+        dict(argv=['conda', 'create'], duration=2.0, returncode=1, stdout_bytes=20, stderr_bytes=0),
+        dict(argv=['redis-server', '--port', '6380'], duration=0.5, returncode=0, stdout_bytes=None, stderr_bytes=4)
+    ]
+    with_directory_contents({"trace.jsonl": "\n".join(json.dumps(line) for line in lines)}, check)
+
+
+def test_trace_summary_with_downloads(capsys):
+    def check(dirname):
+        code = _parse_args_and_run_subcommand(
+            ['anaconda-project', 'trace-summary',
+             os.path.join(dirname, "trace.jsonl")])
+        assert code == 0
+
+        out, err = capsys.readouterr()
+        assert '' == err
+        lines = out.splitlines()
+        assert len(lines) == 5
+        assert lines[1].split() == ['conda', 'create', '1', '0', '3.000', '3.000', '10', '0']
+        assert lines[2] == ''
+        assert lines[3].split() == [
+            'Download', 'host', 'Count', 'Cached', 'Retries', 'Bytes', 'Total', '(s)', 'Max', 'first', 'byte', '(s)',
+            'MiB/s'
+        ]
+        assert lines[4].split() == ['example.com', '1', '0', '2', '2097152', '2.000', '0.500', '1.0']
+
+    lines = [
+        dict(argv=['conda', 'create'], duration=3.0, returncode=0, stdout_bytes=10, stderr_bytes=0),
+        dict(download='http://example.com/data.csv',
+             time_to_first_byte=0.5,
+             duration=2.0,
+             bytes=2 * 1024 * 1024,
+             retries=2,
+             cached=False)
+    ]
+    with_directory_contents({"trace.jsonl": "\n".join(json.dumps(line) for line in lines)}, check)
+
+
+def test_trace_summary_empty(capsys):
+    def check(dirname):
+        filename = os.path.join(dirname, "trace.jsonl")
+        code = _parse_args_and_run_subcommand(['anaconda-project', 'trace-summary', filename])
+        assert code == 0
+
+        out, err = capsys.readouterr()
+        assert '' == err
+        assert "No subprocesses recorded in %s.\n" % filename == out
+
+    with_directory_contents({"trace.jsonl": ""}, check)
+
+
+def test_trace_summary_missing_file(capsys):
+    def check(dirname):
+        filename = os.path.join(dirname, "trace.jsonl")
+        code = _parse_args_and_run_subcommand(['anaconda-project', 'trace-summary', filename])
+        assert code == 1
+
+        out, err = capsys.readouterr()
+        assert '' == out
+        assert err.startswith("Failed to read trace file %s: " % filename)
+
+    with_directory_contents(dict(), check)
+
+
+def test_trace_option_sets_trace_file(monkeypatch, capsys):
+    def check(dirname):
+        filename = os.path.join(dirname, "trace.jsonl")
+        seen = dict()
+
+        def mock_summarize(args):
+            seen['trace_file'] = subprocess_trace.trace_file()
+            return 0
+
+        monkeypatch.setattr('anaconda_project.internal.cli.trace_commands.main_summarize', mock_summarize)
+        monkeypatch.delenv(subprocess_trace.TRACE_FILE_ENV_VAR, raising=False)
+        code = _parse_args_and_run_subcommand(['anaconda-project', '--trace', filename, 'trace-summary', 'foo'])
+        assert code == 0
+        assert seen['trace_file'] == filename
+        assert subprocess_trace.trace_file() is None
+
+    with_directory_contents(dict(), check)
@@ -44,29 +44,40 @@ def test_add_variable_command(monkeypatch):
 
     params = _monkeypatch_add_variables(monkeypatch)
 
-    args = Args(vars_to_add=['foo', 'baz'])
-    res = main_add(args)
-    assert res == 0
-    assert params[0] is None
-    assert ['foo', 'baz'] == params[1]
+    def check(dirname):
+        args = Args(vars_to_add=['foo', 'baz'], directory=dirname)
+        res = main_add(args)
+        assert res == 0
+        assert params[0] is None
+        assert ['foo', 'baz'] == params[1]
+
+    with_directory_contents_completing_project_file(dict(), check)
 
 
 def test_add_variable_with_default(monkeypatch):
 
     params = _monkeypatch_add_variables(monkeypatch)
 
-    res = _parse_args_and_run_subcommand(['anaconda-project', 'add-variable', '--default', 'bar', 'foo'])
-    assert res == 0
-    assert [None, ['foo'], dict(foo='bar')] == params
+    def check(dirname):
+        res = _parse_args_and_run_subcommand(
+            ['anaconda-project', 'add-variable', '--directory', dirname, '--default', 'bar', 'foo'])
+        assert res == 0
+        assert [None, ['foo'], dict(foo='bar')] == params
+
+    with_directory_contents_completing_project_file(dict(), check)
 
 
 def test_add_variable_with_env_spec(monkeypatch):
 
     params = _monkeypatch_add_variables(monkeypatch)
 
-    res = _parse_args_and_run_subcommand(['anaconda-project', 'add-variable', '--env-spec', 'bar', 'foo'])
-    assert res == 0
-    assert ['bar', ['foo'], dict(foo=None)] == params
+    def check(dirname):
+        res = _parse_args_and_run_subcommand(
+            ['anaconda-project', 'add-variable', '--directory', dirname, '--env-spec', 'bar', 'foo'])
+        assert res == 0
+        assert ['bar', ['foo'], dict(foo=None)] == params
+
+    with_directory_contents_completing_project_file(dict(), check)
 
 
 def test_add_two_variables_with_default(monkeypatch, capsys):
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (c) 2026, Anaconda, Inc. All rights reserved.
+#
+# Licensed under the terms of the BSD 3-Clause License.
+# The full license is in the file LICENSE.txt, distributed with this software.
+# -----------------------------------------------------------------------------
+"""Commands related to trace files."""
+from __future__ import absolute_import, print_function
+
+import sys
+
+from anaconda_project.internal import subprocess_trace
+
+
+def _print_table(rows):
+    widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+    for row in rows:
+        cells = [row[0].ljust(widths[0])] + [cell.rjust(width) for (cell, width) in zip(row[1:], widths[1:])]
+        print("  ".join(cells).rstrip())
+
+
+def summarize_trace(filename):
+    """Print trace records aggregated by tool and subcommand, and downloads by host."""
+    try:
+        records = subprocess_trace.load_records(filename)
+        download_records = subprocess_trace.load_download_records(filename)
+    except (IOError, OSError) as e:
+        print("Failed to read trace file %s: %s" % (filename, str(e)), file=sys.stderr)
+        return 1
+
+    summaries = subprocess_trace.summarize(records)
+    download_summaries = subprocess_trace.summarize_downloads(download_records)
+    if len(summaries) == 0 and len(download_summaries) == 0:
+        print("No subprocesses recorded in %s." % filename)
+        return 0
+
+    if len(summaries) > 0:
+        rows = [("Command", "Count", "Failed", "Total (s)", "Max (s)", "Stdout", "Stderr")]
+        for s in summaries:
+            name = s.tool if s.subcommand == '' else "%s %s" % (s.tool, s.subcommand)
+            rows.append((name, str(s.count), str(s.failures), "%.3f" % s.total, "%.3f" % s.max, str(s.stdout_bytes),
+                         str(s.stderr_bytes)))
+        _print_table(rows)
+
+    if len(download_summaries) > 0:
+        if len(summaries) > 0:
+            print("")
+        rows = [("Download host", "Count", "Cached", "Retries", "Bytes", "Total (s)", "Max first byte (s)", "MiB/s")]
+        for s in download_summaries:
+            throughput = "-" if s.average_throughput is None else "%.1f" % (s.average_throughput / 1024 / 1024)
+            rows.append((s.host, str(s.count), str(s.cached), str(s.retries), str(s.bytes), "%.3f" % s.total,
+                         "%.3f" % s.max_time_to_first_byte, throughput))
+        _print_table(rows)
+    return 0
+
+
+def main_summarize(args):
+    """Start the trace-summary command and return exit status code."""
+    return summarize_trace(args.filename)
@@ -7,8 +7,11 @@
 # -----------------------------------------------------------------------------
 from __future__ import absolute_import, print_function, division, unicode_literals
 
+import codecs
 import collections
+import copy
 import errno
+import hashlib
 import json
 import os
 import platform
@@ -19,7 +22,9 @@ import tempfile
 import yaml
 
 from anaconda_project.internal import streaming_popen
+from anaconda_project.internal import user_dirs
 from anaconda_project.internal.directory_contains import subdirectory_relative_to_directory
+from anaconda_project.internal.env_flags import env_flag
 from anaconda_project.internal.py2_compat import is_string, is_dict
 
 CONDA_EXE = os.environ.get("CONDA_EXE", "conda")
@@ -117,13 +122,160 @@ def _call_and_parse_json(extra_args, platform=None):
         raise CondaError('Invalid JSON from conda: %s' % str(e))
 
 
+def _which(command):
+    if os.path.isabs(command):
+        return command
+    return shutil.which(command) or command
+
+
+def _mtime_or_none(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _condarc_paths(root_prefix):
+    # the places conda reads configuration from, excluding
+    # anything under /etc which we can't reasonably watch.
+    home = os.path.expanduser('~')
+    paths = [
+        os.path.join(root_prefix, '.condarc'),
+        os.path.join(root_prefix, 'condarc'),
+        os.path.join(root_prefix, 'condarc.d'),
+        os.path.join(os.environ.get('XDG_CONFIG_HOME') or os.path.join(home, '.config'), 'conda', 'condarc'),
+        os.path.join(home, '.conda', '.condarc'),
+        os.path.join(home, '.conda', 'condarc'),
+        os.path.join(home, '.condarc'),
+        # conda lists "envs" from here, so creating or removing an env changes info()
+        os.path.join(home, '.conda', 'environments.txt')
+    ]
+    for var in ('CONDARC', 'CONDA_PREFIX'):
+        value = os.environ.get(var)
+        if value:
+            paths.append(value if var == 'CONDARC' else os.path.join(value, '.condarc'))
+    return paths
+
+
+def _info_cache_key(platform):
+    cmd_list = _get_conda_command(['info', '--json'])
+    exe = _which(cmd_list[0])
+    # conda lives in ROOT/bin/conda, ROOT/condabin/conda or ROOT\Scripts\conda.exe
+    root_prefix = os.path.dirname(os.path.dirname(os.path.realpath(exe)))
+    key = dict(command=cmd_list,
+               exe=exe,
+               exe_mtime=_mtime_or_none(exe),
+               platform=platform,
+               condarc=[(path, _mtime_or_none(path)) for path in _condarc_paths(root_prefix)],
+               environ=sorted((k, v) for (k, v) in os.environ.items() if k.startswith('CONDA_')))
+    return hashlib.sha256(json.dumps(key, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+_info_cache = dict()
+
+# how many conda configurations we remember conda info for
+_INFO_CACHE_ENTRIES = 32
+
+
+def _info_cache_filename(key):
+    return user_dirs.user_cache_dir('conda-info', key + '.json')
+
+
+def _prune_info_cache():
+    """Remove all but the most recently used cached conda info results."""
+    cache_dir = user_dirs.user_cache_dir('conda-info')
+    try:
+        names = [name for name in os.listdir(cache_dir) if name.endswith('.json')]
+    except OSError:
+        return
+    entries = []
+    for name in names:
+        mtime = _mtime_or_none(os.path.join(cache_dir, name))
+        if mtime is not None:
+            entries.append((mtime, name))
+    for (mtime, name) in sorted(entries, reverse=True)[_INFO_CACHE_ENTRIES:]:
+        try:
+            os.remove(os.path.join(cache_dir, name))
+        except OSError:
+            # someone else pruned it first
+            pass
+
+
 def info(platform=None):
     """Return a dictionary with configuration information.
 
     No guarantee is made about which keys exist.  Therefore this function
     should only be used for testing and debugging.
+
+    Results are cached per user, keyed by the conda executable, the
+    condarc files and the CONDA_* environment variables, so we only
+    pay for running ``conda info`` once per configuration change.
+    Only the most recently used configurations are kept. Set
+    ``ANACONDA_PROJECT_DISABLE_CONDA_INFO_CACHE`` to turn this off.
     """
-    return _call_and_parse_json(['info', '--json'], platform=platform)
+    if env_flag('ANACONDA_PROJECT_DISABLE_CONDA_INFO_CACHE'):
+        return _call_and_parse_json(['info', '--json'], platform=platform)
+
+    key = _info_cache_key(platform)
+    result = _info_cache.get(key)
+    if result is None:
+        filename = _info_cache_filename(key)
+        result = user_dirs.load_json_file(filename)
+        if isinstance(result, dict):
+            try:
+                # the mtime is when we last used it, for _prune_info_cache
+                os.utime(filename, None)
+            except OSError:
+                pass
+        else:
+            result = _call_and_parse_json(['info', '--json'], platform=platform)
+            try:
+                user_dirs.save_json_file(filename, result)
+            except (IOError, OSError):
+                # an unwritable cache dir just means we'll run conda again next time
+                pass
+            _prune_info_cache()
+        _info_cache[key] = result
+    # callers are allowed to modify what we return
+    return copy.deepcopy(result)
+
+
+# conda marks variables removed with `conda env config vars unset` this way
+_CONDA_ENV_VARS_UNSET_VAR = '***unset***'
+
+
+def _read_env_vars_from_state_file(env_prefix):
+    """Read what `conda env config vars` stored in the prefix.
+
+    Returns:
+        dict of variables, or None if we don't understand the prefix state
+    """
+    if not _contains_conda_meta(env_prefix):
+        # let conda decide what the error is
+        return None
+    state_file = os.path.join(env_prefix, 'conda-meta', 'state')
+    try:
+        with codecs.open(state_file, 'r', 'utf-8') as f:
+            state = json.load(f)
+    except (IOError, OSError) as e:
+        if e.errno == errno.ENOENT:
+            # conda only writes the file once a variable is set
+            return {}
+        return None
+    except ValueError:
+        return None
+    if not is_dict(state):
+        return None
+    env_vars = state.get('env_vars', {})
+    if not is_dict(env_vars):
+        return None
+    result = dict()
+    for (key, value) in env_vars.items():
+        if not is_string(value):
+            return None
+        if value != _CONDA_ENV_VARS_UNSET_VAR:
+            result[key] = value
+    return result
 
 
 def get_env_vars(env_prefix):
@@ -131,7 +283,14 @@ def get_env_vars(env_prefix):
 
     These are Conda Environment variables that have been
     set using `conda env config vars`.
+
+    We read them from the prefix's ``conda-meta/state`` file
+    ourselves, and only run conda if that file is in a format
+    we don't recognize.
     """
+    env_vars = _read_env_vars_from_state_file(env_prefix)
+    if env_vars is not None:
+        return env_vars
 
     try:
         return _call_and_parse_json(['env', 'config', 'vars', 'list', '-p', env_prefix, '--json'])
@@ -640,10 +799,14 @@ def current_platform():
     return conda_info.get('platform')
 
 
-_default_platforms_with_current = tuple(sorted(list(set(default_platforms + (current_platform(), )))))
+# computed on first use, since it runs conda info
+_default_platforms_with_current = None
 
 
 def default_platforms_with_current():
+    global _default_platforms_with_current
+    if _default_platforms_with_current is None:
+        _default_platforms_with_current = tuple(sorted(list(set(default_platforms + (current_platform(), )))))
     return _default_platforms_with_current
 
 
@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (c) 2026, Anaconda, Inc. All rights reserved.
+#
+# Licensed under the terms of the BSD 3-Clause License.
+# The full license is in the file LICENSE.txt, distributed with this software.
+# -----------------------------------------------------------------------------
+"""A per-user cache of downloaded files, shared between projects and keyed by their hash."""
+from __future__ import absolute_import, print_function
+
+import hashlib
+import os
+import re
+import shutil
+import time
+import uuid
+
+from anaconda_project.internal.env_flags import env_flag
+from anaconda_project.internal import user_dirs
+from anaconda_project.internal.makedirs import makedirs_ok_if_exists
+from anaconda_project.internal.rename import rename_over_existing
+
+DISABLE_ENV_VAR = 'ANACONDA_PROJECT_DISABLE_DOWNLOAD_CACHE'
+SIZE_ENV_VAR = 'ANACONDA_PROJECT_DOWNLOAD_CACHE_SIZE'
+
+# in MiB
+_DEFAULT_SIZE = 10 * 1024
+
+_TMP_MARKER = '.tmp-'
+
+# when each entry was last used, and its size and mtime when we last
+# checked its hash. Entries are hardlinked into projects, so we can't
+# touch their mtimes to keep track of use; that would change the files
+# in every project that has them.
+_INDEX_NAME = 'index.json'
+_INDEX_LOCK_NAME = 'index.lock'
+
+_ENTRY_NAME_RE = re.compile(r'^[a-z0-9_]+-[0-9a-f]+$')
+
+_HASH_BUFFER_SIZE = 4 * 1024 * 1024
+
+
+def enabled():
+    """True unless the user turned the download cache off."""
+    return not env_flag(DISABLE_ENV_VAR)
+
+
+def _size_limit():
+    try:
+        megabytes = int(os.environ.get(SIZE_ENV_VAR, _DEFAULT_SIZE))
+    except ValueError:
+        megabytes = _DEFAULT_SIZE
+    return max(0, megabytes) * 1024 * 1024
+
+
+def _cache_dir():
+    return user_dirs.user_cache_dir('downloads')
+
+
+def _entry_filename(hash_algorithm, hash_value):
+    # the hash comes from the project file, so be sure it can't name some other path
+    if hash_algorithm not in hashlib.algorithms_guaranteed or not re.match(r'^[0-9a-fA-F]+$', hash_value):
+        return None
+    return os.path.join(_cache_dir(), "%s-%s" % (hash_algorithm, hash_value.lower()))
+
+
+def _load_index():
+    index = user_dirs.load_json_file(os.path.join(_cache_dir(), _INDEX_NAME))
+    return index if isinstance(index, dict) else dict()
+
+
+def _update_index(func):
+    """Call func with the index dict, holding its lock, and save what it leaves there."""
+    cache_dir = _cache_dir()
+    with user_dirs.locked_file(os.path.join(cache_dir, _INDEX_LOCK_NAME)):
+        index = _load_index()
+        func(index)
+        user_dirs.save_json_file(os.path.join(cache_dir, _INDEX_NAME), index)
+
+
+def _record_use(name, st):
+    def update(index):
+        index[name] = dict(used=time.time(), size=st.st_size, mtime_ns=st.st_mtime_ns)
+
+    _update_index(update)
+
+
+def _verified(name, st):
+    # the index is replaced atomically, so reading it needs no lock
+    record = _load_index().get(name)
+    return isinstance(record, dict) and record.get('size') == st.st_size and record.get('mtime_ns') == st.st_mtime_ns
+
+
+def hash_file(filename, hash_algorithm):
+    """Compute the hex digest of a file with the named hashlib algorithm."""
+    hasher = getattr(hashlib, hash_algorithm)()
+    # one big buffer we read into over and over, rather than a new bytes per block
+    buf = bytearray(_HASH_BUFFER_SIZE)
+    view = memoryview(buf)
+    with open(filename, 'rb', buffering=0) as f:
+        while True:
+            count = f.readinto(buf)
+            if not count:
+                break
+            hasher.update(view[:count])
+    return hasher.hexdigest()
+
+
+def _link_or_copy(source, dest):
+    if os.path.exists(dest):
+        os.remove(dest)
+    try:
+        os.link(source, dest)
+    except (OSError, AttributeError):
+        # other filesystem, or no hardlinks here
+        shutil.copyfile(source, dest)
+
+
+def fetch(hash_algorithm, hash_value, dest):
+    """Put the cached file with the given hash at dest, if we have one.
+
+    If the cached file's size or mtime changed since we last checked
+    it (say, because a project modified its hardlink to it), it's
+    hashed again first, and thrown away if it no longer matches.
+
+    Returns:
+        True if dest now has the file
+    """
+    entry = _entry_filename(hash_algorithm, hash_value)
+    if entry is None or not os.path.isfile(entry):
+        return False
+    name = os.path.basename(entry)
+    try:
+        st = os.stat(entry)
+        if not _verified(name, st) and hash_file(entry, hash_algorithm) != hash_value.lower():
+            os.remove(entry)
+            _update_index(lambda index: index.pop(name, None))
+            return False
+        makedirs_ok_if_exists(os.path.dirname(dest))
+        _link_or_copy(entry, dest)
+        _record_use(name, st)
+        return True
+    except (IOError, OSError):
+        return False
+
+
+def store(hash_algorithm, hash_value, filename):
+    """Add a downloaded file, already checked against the given hash, to the cache.
+
+    Failures are ignored; we'll just download again next time.
+    """
+    entry = _entry_filename(hash_algorithm, hash_value)
+    if entry is None or os.path.isfile(entry):
+        return
+    tmp = entry + _TMP_MARKER + str(uuid.uuid4())
+    try:
+        makedirs_ok_if_exists(os.path.dirname(entry))
+        _link_or_copy(filename, tmp)
+        rename_over_existing(tmp, entry)
+        # the caller checked the hash, so this counts as verified
+        _record_use(os.path.basename(entry), os.stat(entry))
+        _evict(_size_limit())
+    except (IOError, OSError):
+        pass
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def _evict(limit):
+    cache_dir = _cache_dir()
+
+    def evict(index):
+        entries = []
+        for name in os.listdir(cache_dir):
+            if not _ENTRY_NAME_RE.match(name):
+                continue
+            try:
+                size = os.stat(os.path.join(cache_dir, name)).st_size
+            except OSError:
+                continue
+            record = index.get(name)
+            # entries we have no record of go first
+            used = record.get('used', 0) if isinstance(record, dict) else 0
+            entries.append((used, name, size))
+        for name in set(index.keys()) - set(name for (used, name, size) in entries):
+            del index[name]
+        total = sum(size for (used, name, size) in entries)
+        for (used, name, size) in sorted(entries):
+            if total <= limit:
+                break
+            try:
+                os.remove(os.path.join(cache_dir, name))
+                index.pop(name, None)
+                total -= size
+            except OSError:
+                pass
+
+    _update_index(evict)
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (c) 2026, Anaconda, Inc. All rights reserved.
+#
+# Licensed under the terms of the BSD 3-Clause License.
+# The full license is in the file LICENSE.txt, distributed with this software.
+# -----------------------------------------------------------------------------
+"""Remember the digests of downloaded files, so we can cheaply tell whether they still match."""
+from __future__ import absolute_import, print_function
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from anaconda_project.internal.download_cache import hash_file
+
+# local state section, keyed by the download's env var
+SECTION = 'download_digests'
+
+
+def _stat(filename):
+    st = os.stat(filename)
+    return dict(size=st.st_size, mtime_ns=st.st_mtime_ns, inode=st.st_ino)
+
+
+def _stat_and_hash(filename, hash_algorithm):
+    # stat first, so a change while we hash makes us hash again next time
+    try:
+        stat = _stat(filename)
+        return (stat, hash_file(filename, hash_algorithm))
+    except (IOError, OSError):
+        return (None, None)
+
+
+def _known_digest(local_state_file, env_var, filename, hash_algorithm):
+    saved = local_state_file.get_value([SECTION, env_var])
+    if not isinstance(saved, dict) or saved.get('algorithm') != hash_algorithm:
+        return None
+    try:
+        stat = _stat(filename)
+    except OSError:
+        return None
+    for (key, value) in stat.items():
+        if saved.get(key) != value:
+            return None
+    return saved.get('digest')
+
+
+def _remember(local_state_file, env_var, hash_algorithm, stat, digest):
+    if digest is None:
+        local_state_file.unset_value([SECTION, env_var])
+    else:
+        state = dict(stat)
+        state.update(algorithm=hash_algorithm, digest=digest.lower())
+        local_state_file.set_value([SECTION, env_var], state)
+
+
+def record(local_state_file, env_var, filename, hash_algorithm, digest):
+    """Remember that filename, as it is now, has the given digest.
+
+    This does not save the local state file.
+    """
+    try:
+        stat = _stat(filename)
+    except OSError:
+        return
+    _remember(local_state_file, env_var, hash_algorithm, stat, digest)
+
+
+def forget(local_state_file, env_var):
+    """Forget any digest for env_var's download; does not save the local state file."""
+    local_state_file.unset_value([SECTION, env_var])
+
+
+def matches(local_state_file, env_var, filename, hash_algorithm, hash_value):
+    """Whether filename has the expected digest, as far as we know without hashing it.
+
+    This only stats the file, so it's cheap and doesn't change the
+    local state file; ``hash_all`` is what hashes files and saves
+    their digests.
+
+    Returns:
+        True or False if we know the file's digest, or None if the
+        file changed (or was never hashed) since we last knew it
+    """
+    digest = _known_digest(local_state_file, env_var, filename, hash_algorithm)
+    if digest is None:
+        return None
+    return digest == hash_value.lower()
+
+
+def stale(local_state_file, files, force=False):
+    """Get those of the (env_var, filename, hash_algorithm) files whose digests we'd have to compute.
+
+    With force, that's all of them.
+    """
+    return [item for item in files if force or _known_digest(local_state_file, *item) is None]
+
+
+def hash_all(local_state_file, files):
+    """Hash the (env_var, filename, hash_algorithm) files at once on a thread pool, and save their digests."""
+    if len(files) == 0:
+        return
+    # hashlib and file reads let go of the GIL, so threads do run at once
+    workers = min(len(files), os.cpu_count() or 1)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(lambda item: _stat_and_hash(item[1], item[2]), files))
+    for ((env_var, filename, hash_algorithm), (stat, digest)) in zip(files, results):
+        _remember(local_state_file, env_var, hash_algorithm, stat, digest)
+    local_state_file.save()
@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (c) 2026, Anaconda, Inc. All rights reserved.
+#
+# Licensed under the terms of the BSD 3-Clause License.
+# The full license is in the file LICENSE.txt, distributed with this software.
+# -----------------------------------------------------------------------------
+"""Yes/no settings from environment variables."""
+from __future__ import absolute_import, print_function
+
+import os
+
+_FALSE_VALUES = ('', '0', 'false', 'no', 'off', 'n', 'f')
+
+
+def env_flag(name, environ=None):
+    """True if the variable is set to anything other than an empty or false value.
+
+    "0", "false", "no", "off" (in any case) and an empty or missing
+    variable all mean no, so ``FOO=0`` turns a flag off rather than on.
+    """
+    if environ is None:
+        environ = os.environ
+    return environ.get(name, '').strip().lower() not in _FALSE_VALUES
@@ -9,33 +9,553 @@ from __future__ import absolute_import, print_function
 
 from tornado import httpclient
 from tornado import gen
+from tornado import locks
 from tqdm import tqdm
 
 import anaconda_project.internal.makedirs as makedirs
 import anaconda_project.internal.rename as rename
+from anaconda_project.internal import user_dirs
+from anaconda_project.internal.download_cache import hash_file
 
+import collections
+import datetime
+import functools
 import os
 import hashlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# files smaller than two of these are always downloaded in one stream
+_MIN_SEGMENT_SIZE = 4 * 1024 * 1024
+
+# what _run_segmented() returns when the server can't do it
+_NOT_SEGMENTED = object()
+
+
+class _SegmentAbandoned(Exception):
+    pass
+
+
+class _MirrorStalled(Exception):
+    pass
+
+
+# a mirror sending less than this in the stall timeout is given up on
+_STALL_BYTES = 64 * 1024
+
+# how long we give each mirror to answer a HEAD request, in seconds
+_PROBE_TIMEOUT = 10
+
+# how many downloaded bytes may wait for a writer thread before the
+# IOLoop waits for it, and the most it hashes and writes at once
+_WRITE_QUEUE_SIZE = 16 * 1024 * 1024
+_WRITE_BATCH_SIZE = 4 * 1024 * 1024
+
+
+def _in_thread(fn, *args):
+    """Run fn(*args) on a new thread, returning a future a coroutine can yield."""
+    executor = ThreadPoolExecutor(max_workers=1)
+    try:
+        return executor.submit(fn, *args)
+    finally:
+        executor.shutdown(wait=False)
+
+
+def _hash_into(hasher, f):
+    for block in iter(lambda: f.read(1024 * 1024), b''):
+        hasher.update(block)
+
+
+# how long _PipelinedWriter.put() has kept this thread's IOLoop waiting
+# for writer threads, which the stall watchdog doesn't blame mirrors for
+_blocked = threading.local()
+
+
+def _seconds_blocked_on_writers():
+    return getattr(_blocked, 'seconds', 0.0)
+
+
+def _finish_all(pipelines):
+    for pipeline in pipelines:
+        pipeline.finish()
+
+
+class _PipelinedWriter(object):
+    """Hashes and writes downloaded chunks on a thread, so the IOLoop can go on reading.
+
+    Chunks are written in batches of up to ``_WRITE_BATCH_SIZE``. Once
+    ``_WRITE_QUEUE_SIZE`` bytes are waiting, ``put()`` blocks until the
+    thread catches up, since Tornado's streaming callback gives us no
+    way to stop reading one response for a while. That blocks the
+    IOLoop, so every download on it waits for the disk; they all share
+    it, so that's usually no slower than letting the others go on. The
+    time spent blocked is added up so mirrors' stall timeouts don't
+    count it.
+    """
+    def __init__(self, write, hasher, name):
+        self._write = write
+        self._hasher = hasher
+        self._chunks = collections.deque()
+        self._queued = 0
+        self._closed = False
+        self._error = None
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name=name)
+        self._thread.daemon = True
+        self._thread.start()
+
+    @property
+    def error(self):
+        """The exception the thread got writing, or None."""
+        return self._error
+
+    def put(self, chunk):
+        """Queue a chunk to write; returns False once writing has failed."""
+        with self._condition:
+            if self._queued >= _WRITE_QUEUE_SIZE and self._error is None:
+                start = time.monotonic()
+                while self._queued >= _WRITE_QUEUE_SIZE and self._error is None:
+                    self._condition.wait()
+                _blocked.seconds = _seconds_blocked_on_writers() + time.monotonic() - start
+            if self._error is not None:
+                return False
+            self._chunks.append(chunk)
+            self._queued += len(chunk)
+            self._condition.notify_all()
+        return True
+
+    def finish(self):
+        """Wait for everything queued to be written, and stop the thread."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self._thread.join()
+
+    def _next_batch(self):
+        with self._condition:
+            while len(self._chunks) == 0 and not self._closed:
+                self._condition.wait()
+            batch = []
+            size = 0
+            while len(self._chunks) > 0 and size < _WRITE_BATCH_SIZE:
+                batch.append(self._chunks.popleft())
+                size += len(batch[-1])
+            self._queued -= size
+            self._condition.notify_all()
+        return batch
+
+    def _run(self):
+        # hashlib and file writes both let go of the GIL, so we hash
+        # each batch on another thread while we write it
+        hashing = None if self._hasher is None else ThreadPoolExecutor(max_workers=1)
+        try:
+            while True:
+                batch = self._next_batch()
+                if len(batch) == 0:
+                    return
+                data = batch[0] if len(batch) == 1 else b''.join(batch)
+                hashed = None if hashing is None else hashing.submit(self._hasher.update, data)
+                try:
+                    self._write(data)
+                finally:
+                    if hashed is not None:
+                        hashed.result()
+        except Exception as e:
+            with self._condition:
+                self._error = e
+                self._chunks.clear()
+                self._queued = 0
+                self._condition.notify_all()
+        finally:
+            if hashing is not None:
+                hashing.shutdown()
+
+
+def _timeout_in_seconds():
+    return int(
+        os.getenv(
+            'ANACONDA_PROJECT_DOWNLOADS_TIMEOUT',
+            60 * 10  # pretty long because we could be dealing with huge files
+        ))
+
+
+def _stall_timeout_in_seconds():
+    try:
+        return max(1, int(os.getenv('ANACONDA_PROJECT_DOWNLOAD_STALL_TIMEOUT', 30)))
+    except ValueError:
+        return 30
+
+
+def _new_client(max_clients):
+    return httpclient.AsyncHTTPClient(
+        # No need for this, and removed in 5.0 anyway
+        # io_loop=io_loop,
+        max_clients=max_clients,
+        # without this we buffer a huge amount
+        # of stuff and then call the streaming_callback
+        # once.
+        max_buffer_size=1024 * 1024,
+        # without this we 599 on large downloads
+        max_body_size=100 * 1024 * 1024 * 1024,
+        force_instance=True)
+
+
+# peak throughput is the fastest we went over this many seconds
+_PEAK_WINDOW = 1.0
+
+
+class DownloadMetrics(object):
+    """How long a download took and how fast it went.
+
+    Throughputs are in bytes per second. ``retries`` counts the
+    requests we had to make again, such as when a server that said it
+    could send ranges didn't. ``cached`` is True if the file came from
+    the download cache instead of the network.
+    """
+    def __init__(self, url, cached=False):
+        """Start timing a download of url."""
+        self.url = url
+        self.start = time.time()
+        self.time_to_first_byte = None
+        self.duration = None
+        self.bytes = 0
+        self.peak_throughput = None
+        self.retries = 0
+        self.cached = cached
+        self._started = time.monotonic()
+        self._window_start = None
+        self._window_bytes = 0
+
+    def add(self, size):
+        """Record that size more bytes arrived."""
+        now = time.monotonic()
+        if self.time_to_first_byte is None:
+            self.time_to_first_byte = now - self._started
+            self._window_start = now
+        self.bytes += size
+        self._window_bytes += size
+        elapsed = now - self._window_start
+        if elapsed >= _PEAK_WINDOW:
+            self._end_window(elapsed)
+            self._window_start = now
+
+    def _end_window(self, elapsed):
+        if elapsed > 0:
+            self.peak_throughput = max(self.peak_throughput or 0.0, self._window_bytes / elapsed)
+        self._window_bytes = 0
+
+    def finish(self, size=None):
+        """Stop timing; size is the file's size, if we didn't see its bytes arrive."""
+        if size is not None:
+            self.bytes += size
+        now = time.monotonic()
+        self.duration = now - self._started
+        if self._window_start is not None and (self.peak_throughput is None or self._window_bytes > 0):
+            self._end_window(now - self._window_start)
+        if self.peak_throughput is None:
+            # too quick to time
+            self.peak_throughput = self.average_throughput
+
+    @property
+    def average_throughput(self):
+        """Bytes per second over the whole download, or None if it took no time."""
+        if not self.duration:
+            return None
+        return self.bytes / self.duration
+
+    def to_json(self):
+        """Get the metrics as a dict of JSON values."""
+        return dict(url=self.url,
+                    start=self.start,
+                    time_to_first_byte=self.time_to_first_byte,
+                    duration=self.duration,
+                    bytes=self.bytes,
+                    average_throughput=self.average_throughput,
+                    peak_throughput=self.peak_throughput,
+                    retries=self.retries,
+                    cached=self.cached)
+
+
+class DownloadProgress(object):
+    """One progress bar for several downloads running at once."""
+    def __init__(self, count):
+        """Show a progress bar for count downloads, whose sizes are added as they're known."""
+        self._bar = tqdm(unit='MiB', unit_scale=True, desc="Downloading %d files" % count)
+
+    def add_to_total(self, size):
+        """Add the size in MiB of another download to the total."""
+        self._bar.total = (self._bar.total or 0) + size
+        self._bar.refresh()
+
+    def update(self, size):
+        """Record that size MiB more have been downloaded."""
+        self._bar.update(size)
+
+    def close(self):
+        """Stop showing progress."""
+        self._bar.close()
 
 
 class FileDownloader(object):
-    def __init__(self, url, filename, hash_algorithm=None):
+    def __init__(self,
+                 url,
+                 filename,
+                 hash_algorithm=None,
+                 segments=1,
+                 unpacker=None,
+                 previous_validators=None,
+                 mirrors=None):
         """Downloader for the given url to the given filename, computing the given hash.
 
         hash_algorithm is the name of a hash function in hashlib
+
+        segments is how many connections to download a large file
+        over at once, if the server supports ranges
+
+        unpacker is a ``ziputils.StreamingUnpacker`` to give the
+        downloaded bytes to instead of saving them to filename
+
+        previous_validators is the ``validators`` of an earlier
+        download of the url, to download only if it has changed since
+
+        mirrors is the list of URLs with the same file to download
+        from, in the order to try them, if not just url
         """
         self._url = url
+        self._sources = list(mirrors) if mirrors else [url]
         self._filename = filename
         self._hash_algorithm = hash_algorithm
+        self._segments = segments
+        self._unpacker = unpacker
+        self._streamed = False
+        self._previous_validators = previous_validators
+        self._validators = dict()
         self._hash = None
         self._client = None
+        self._shared_client = None
+        self._shared_progress = None
         self._errors = []
         self._progress = None
         self._progress_kwargs = None
+        self._metrics = None
+
+    def _new_hasher(self):
+        if self._hash_algorithm is None:
+            return None
+        return getattr(hashlib, self._hash_algorithm)()
+
+    def _resumable_size(self, tmp_filename, sidecar_filename):
+        """Get (size, validator) to resume a kept partial download from, or (0, None)."""
+        if not (os.path.isfile(tmp_filename) and os.path.isfile(sidecar_filename)):
+            return (0, None)
+        sidecar = user_dirs.load_json_file(sidecar_filename)
+        if not isinstance(sidecar, dict) or sidecar.get('url') != self._url or not sidecar.get('validator'):
+            return (0, None)
+        size = sidecar.get('size')
+        if not isinstance(size, int) or size <= 0 or os.path.getsize(tmp_filename) < size:
+            return (0, None)
+        return (size, sidecar['validator'])
+
+    @gen.coroutine
+    def _probe_for_segments(self, client):
+        """Get (url, size, validator) if the server lets us download in segments, or None."""
+        try:
+            response = yield client.fetch(
+                httpclient.HTTPRequest(url=self._sources[0], method='HEAD', request_timeout=_timeout_in_seconds()))
+        except Exception:
+            # we'll see any real problem when we try a plain GET
+            raise gen.Return(None)
+        headers = response.headers
+        if headers.get('Accept-Ranges', '').lower() != 'bytes' or 'Content-Encoding' in headers:
+            raise gen.Return(None)
+        try:
+            size = int(headers.get('Content-Length', ''))
+        except ValueError:
+            raise gen.Return(None)
+        if size < 2 * _MIN_SEGMENT_SIZE:
+            raise gen.Return(None)
+        for (name, header) in (('etag', 'ETag'), ('last_modified', 'Last-Modified')):
+            if header in headers:
+                self._validators[name] = headers[header]
+        validator = headers.get('ETag')
+        if validator is None or validator.startswith('W/'):
+            validator = headers.get('Last-Modified')
+        raise gen.Return((response.effective_url, size, validator))
+
+    @gen.coroutine
+    def _run_segmented(self, tmp_filename):
+        """Download in parallel Range requests written into tmp_filename at their offsets.
+
+        Returns _NOT_SEGMENTED (having written nothing we keep) if the
+        server doesn't advertise ranges, the file is small, or the server
+        ignores our Range headers after all.
+        """
+        client = _new_client(max_clients=self._segments)
+        _file = None
+        # each segment writes through its own file object on its own thread
+        segment_files = []
+        pipelines = []
+        state = dict(ranges_ignored=False, finished=False)
+        try:
+            probe = yield self._probe_for_segments(client)
+            if probe is None:
+                raise gen.Return(_NOT_SEGMENTED)
+            (url, size, validator) = probe
+            count = min(self._segments, size // _MIN_SEGMENT_SIZE)
+
+            bounds = [(size * i // count, size * (i + 1) // count - 1) for i in range(count)]
+            try:
+                _file = open(tmp_filename, 'wb')
+                _file.truncate(size)
+                _file.flush()
+                for (start, end) in bounds:
+                    segment_files.append(open(tmp_filename, 'r+b'))
+                    segment_files[-1].seek(start)
+            except EnvironmentError as e:
+                self._errors.append("Failed to open %s: %s" % (tmp_filename, e))
+                raise gen.Return(None)
+
+            if self._shared_progress is not None:
+                self._shared_progress.add_to_total(size / 1024 / 1024)
+                progress = self._shared_progress
+            else:
+                self._progress = tqdm(unit='MiB',
+                                      unit_scale=True,
+                                      total=size / 1024 / 1024,
+                                      desc=os.path.basename(self._filename))
+                progress = self._progress
+
+            def segment_request(start, end, segment_file):
+                position = [start]
+                pipeline = _PipelinedWriter(segment_file.write, None, "write %s at %d" % (tmp_filename, start))
+                pipelines.append(pipeline)
+
+                def read_header(line):
+                    if line.startswith('HTTP/') and line.split()[1] != '206':
+                        state['ranges_ignored'] = True
+
+                def writer(chunk):
+                    # raising here makes Tornado drop the connection, so we
+                    # don't fetch the whole file once per segment
+                    if state['ranges_ignored'] or state['finished']:
+                        raise _SegmentAbandoned()
+                    if position[0] + len(chunk) > end + 1:
+                        # more than we asked for, so not our range
+                        state['ranges_ignored'] = True
+                        raise _SegmentAbandoned()
+                    if not pipeline.put(chunk):
+                        self._errors.append("Failed to write to %s: %s" % (tmp_filename, pipeline.error))
+                        raise _SegmentAbandoned()
+                    self._metrics.add(len(chunk))
+                    position[0] += len(chunk)
+                    progress.update(len(chunk) / 1024 / 1024)
+
+                headers = {'Range': 'bytes=%d-%d' % (start, end)}
+                if validator is not None:
+                    # so a file that changed under us comes back as a 200
+                    headers['If-Range'] = validator
+                return httpclient.HTTPRequest(url=url,
+                                              headers=headers,
+                                              header_callback=read_header,
+                                              streaming_callback=writer,
+                                              request_timeout=_timeout_in_seconds())
+
+            requests = [
+                segment_request(start, end, segment_file)
+                for ((start, end), segment_file) in zip(bounds, segment_files)
+            ]
+            try:
+                responses = yield gen.multi([client.fetch(request) for request in requests], quiet_exceptions=Exception)
+            except Exception as e:
+                if not state['ranges_ignored']:
+                    if len(self._errors) == 0:
+                        self._errors.append("Failed download to %s: %s" % (self._filename, str(e)))
+                    raise gen.Return(None)
+            finally:
+                state['finished'] = True
+                if self._progress is not None:
+                    self._progress.close()
+                    self._progress = None
+                yield _in_thread(_finish_all, pipelines)
+
+            if state['ranges_ignored']:
+                if progress is self._shared_progress:
+                    progress.add_to_total(-size / 1024 / 1024)
+                self._metrics.retries += 1
+                raise gen.Return(_NOT_SEGMENTED)
+
+            for pipeline in pipelines:
+                if pipeline.error is not None and len(self._errors) == 0:
+                    self._errors.append("Failed to write to %s: %s" % (tmp_filename, pipeline.error))
+
+            if len(self._errors) == 0:
+                try:
+                    _file.close()
+                    for segment_file in segment_files:
+                        segment_file.close()
+                    if self._hash_algorithm is not None:
+                        # the segments arrive out of order, so we hash once they're all there
+                        self._hash = yield _in_thread(hash_file, tmp_filename, self._hash_algorithm)
+                    rename.rename_over_existing(tmp_filename, self._filename)
+                except EnvironmentError as e:
+                    self._hash = None
+                    self._errors.append("Failed to rename %s to %s: %s" % (tmp_filename, self._filename, str(e)))
+
+            raise gen.Return(responses[0])
+        finally:
+            state['finished'] = True
+            for segment_file in segment_files:
+                try:
+                    segment_file.close()
+                except EnvironmentError:
+                    pass
+            if _file is not None:
+                try:
+                    _file.close()
+                    if os.path.exists(tmp_filename):
+                        os.remove(tmp_filename)
+                except EnvironmentError:
+                    pass
+            client.close()
 
     @gen.coroutine
     def run(self):
-        """Run the download on the given io_loop."""
+        """Run the download on the given io_loop.
+
+        If a download of the same URL was interrupted before, and the
+        server told us how to check the file hasn't changed since
+        (with an ETag or Last-Modified header), we keep what we got
+        in the ``.part`` file and ask for only the rest of it.
+
+        Otherwise, with more than one segment, a large file from a
+        server that advertises ``Accept-Ranges`` is fetched in that
+        many ranges at once, each written to its place in the
+        ``.part`` file, and hashed once it's all there.
+
+        With an unpacker, and no partial download to resume, nothing
+        is saved to filename; the bytes go to the unpacker as they
+        arrive, and ``streamed`` is True if they all got there.
+
+        With previous_validators, the request is conditional, and
+        if the server says the file hasn't changed we return its 304
+        response without touching filename.
+
+        With mirrors, if one fails, or sends less than
+        ``_STALL_BYTES`` in ``ANACONDA_PROJECT_DOWNLOAD_STALL_TIMEOUT``
+        seconds, we ask the next for the rest of the file. A segmented
+        download that fails starts over from the next mirror as a
+        single stream.
+        """
+        self._metrics = DownloadMetrics(self._url)
+        try:
+            response = yield self._run_download()
+        finally:
+            self._metrics.finish()
+        raise gen.Return(response)
+
+    @gen.coroutine
+    def _run_download(self):
         assert self._client is None
 
         dirname = os.path.dirname(self._filename)
@@ -45,56 +565,142 @@ class FileDownloader(object):
             self._errors.append("Could not create directory '%s': %s" % (dirname, e))
             raise gen.Return(None)
 
-        if self._hash_algorithm is not None:
-            hasher = getattr(hashlib, self._hash_algorithm)()
-        self._client = httpclient.AsyncHTTPClient(
-            # No need for this, and removed in 5.0 anyway
-            # io_loop=io_loop,
-            max_clients=1,
-            # without this we buffer a huge amount
-            # of stuff and then call the streaming_callback
-            # once.
-            max_buffer_size=1024 * 1024,
-            # without this we 599 on large downloads
-            max_body_size=100 * 1024 * 1024 * 1024,
-            force_instance=True)
+        if self._shared_client is None:
+            self._client = _new_client(max_clients=1)
+        else:
+            self._client = self._shared_client
 
         tmp_filename = self._filename + ".part"
+        sidecar_filename = tmp_filename + ".json"
+        (resume_from, validator) = self._resumable_size(tmp_filename, sidecar_filename)
+        streaming = self._unpacker is not None and resume_from == 0
+        # a partial download means it changed, so we want the rest regardless
+        conditional = bool(self._previous_validators) and resume_from == 0
+        sources = self._sources
+        if resume_from == 0 and self._segments > 1 and not streaming and not conditional:
+            response = yield self._run_segmented(tmp_filename)
+            if response is None and len(sources) > 1:
+                self._metrics.retries += 1
+                del self._errors[:]
+                sources = sources[1:]
+            elif response is not _NOT_SEGMENTED:
+                raise gen.Return(response)
+
+        state = dict(hasher=self._new_hasher(),
+                     validator=validator,
+                     keep_partial=False,
+                     write_failed=False,
+                     pipeline=None,
+                     attempt=0,
+                     skip=0,
+                     position=resume_from)
         try:
-            _file = open(tmp_filename, 'wb')
+            if streaming:
+                _file = None
+            elif resume_from > 0:
+                _file = open(tmp_filename, 'r+b')
+                _file.truncate(resume_from)
+                # hash objects can't be saved, so we hash what we have again
+                if state['hasher'] is not None:
+                    yield _in_thread(_hash_into, state['hasher'], _file)
+                _file.seek(resume_from)
+            else:
+                _file = open(tmp_filename, 'wb')
         except EnvironmentError as e:
             self._errors.append("Failed to open %s: %s" % (tmp_filename, e))
             raise gen.Return(None)
 
         def cleanup_tmp():
             try:
-                _file.close()
-                # future: we could save it in order to try
-                # resuming a failed download midstream, but
-                # pointless until the download code above
-                # knows how to resume.
-                os.remove(tmp_filename)
+                if _file is None:
+                    pass
+                elif state['keep_partial']:
+                    size = _file.tell()
+                    _file.close()
+                    user_dirs.save_json_file(sidecar_filename,
+                                             dict(url=self._url, validator=state['validator'], size=size))
+                else:
+                    _file.close()
+                    os.remove(tmp_filename)
             except EnvironmentError:
                 pass
+            if not state['keep_partial'] and os.path.exists(sidecar_filename):
+                try:
+                    os.remove(sidecar_filename)
+                except EnvironmentError:
+                    pass
+
+        def writer(attempt, chunk):
+            if attempt != state['attempt']:
+                # from a mirror we gave up on, so drop its connection
+                raise _SegmentAbandoned()
 
-        def writer(chunk):
             if len(self._errors) > 0:
                 return
 
-            if self._hash_algorithm is not None:
-                hasher.update(chunk)
+            if state['skip'] > 0:
+                # a mirror that sent the whole file when we asked for the rest
+                skipped = min(state['skip'], len(chunk))
+                state['skip'] -= skipped
+                chunk = chunk[skipped:]
+                if len(chunk) == 0:
+                    return
 
-            try:
-                _file.write(chunk)
-                if self._progress is not None:
-                    self._progress.update(len(chunk) / 1024 / 1024)
-            except EnvironmentError as e:
+            # started with the first chunk, once we know which hasher we need
+            if state['pipeline'] is None:
+                state['pipeline'] = _PipelinedWriter(self._unpacker.write if streaming else _file.write,
+                                                     state['hasher'], "write %s" % tmp_filename)
+
+            if not state['pipeline'].put(chunk):
                 # we can't actually throw this error or Tornado freaks out, so instead
                 # we ignore all future chunks once we have an error, which does mean
                 # we continue to download bytes that we don't use. yuck.
-                self._errors.append("Failed to write to %s: %s" % (tmp_filename, e))
+                self._errors.append("Failed to write to %s: %s" % (tmp_filename, state['pipeline'].error))
+                state['write_failed'] = True
+                return
 
-        def read_header(line):
+            state['position'] += len(chunk)
+            self._metrics.add(len(chunk))
+            if self._shared_progress is not None:
+                self._shared_progress.update(len(chunk) / 1024 / 1024)
+            elif self._progress is not None:
+                self._progress.update(len(chunk) / 1024 / 1024)
+
+        def read_validators(line):
+            if line.startswith('HTTP/'):
+                if line.split()[1] == '206':
+                    pass
+                elif state['attempt'] > 0:
+                    # this mirror sent all of it, so we skip what we already have
+                    state['skip'] = state['position']
+                elif resume_from > 0:
+                    # if the file changed (or the server can't do ranges) we get all of it
+                    _file.seek(0)
+                    _file.truncate()
+                    state['hasher'] = self._new_hasher()
+                    state['validator'] = None
+                    state['position'] = 0
+                return
+            (name, _, value) = line.partition(':')
+            name = name.strip().lower()
+            value = value.strip()
+            if name in ('etag', 'last-modified'):
+                self._validators[name.replace('-', '_')] = value
+            # If-Range needs a strong ETag
+            if name == 'etag' and not value.startswith('W/'):
+                state['validator'] = value
+            elif name == 'last-modified' and not state['validator']:
+                state['validator'] = value
+
+        def read_header(attempt, line):
+            if attempt != state['attempt']:
+                return
+            read_validators(line)
+            if self._shared_progress is not None:
+                # a later mirror sends what's left of what we already counted
+                if 'content-length' in line.lower() and attempt == 0:
+                    self._shared_progress.add_to_total(int(line.split(':')[1]) / 1024 / 1024)
+                return
             # Display basic progress stats when the response has no Content-Length.
             if self._progress_kwargs is None:
                 self._progress_kwargs = dict(
@@ -108,47 +714,214 @@ class FileDownloader(object):
             if line == "\r\n":
                 self._progress = tqdm(**self._progress_kwargs)
 
+        def mirror_request(attempt, url):
+            headers = dict()
+            if attempt > 0:
+                # the mirrors have the same file, so we go on from where the last one stopped
+                if state['position'] > 0:
+                    headers['Range'] = 'bytes=%d-' % state['position']
+            elif resume_from > 0:
+                headers['Range'] = 'bytes=%d-' % resume_from
+                headers['If-Range'] = validator
+            elif conditional:
+                if self._previous_validators.get('etag'):
+                    headers['If-None-Match'] = self._previous_validators['etag']
+                if self._previous_validators.get('last_modified'):
+                    headers['If-Modified-Since'] = self._previous_validators['last_modified']
+            return httpclient.HTTPRequest(url=url,
+                                          headers=headers,
+                                          header_callback=functools.partial(read_header, attempt),
+                                          streaming_callback=functools.partial(writer, attempt),
+                                          request_timeout=_timeout_in_seconds())
+
+        # a mirror we gave up on may still have its connection open, so
+        # each one after the first gets a client of its own
+        mirror_clients = []
         try:
-            timeout_in_seconds = int(os.getenv(
-                'ANACONDA_PROJECT_DOWNLOADS_TIMEOUT',
-                60 * 10  # pretty long because we could be dealing with huge files
-            ))
-            request = httpclient.HTTPRequest(url=self._url,
-                                             header_callback=read_header,
-                                             streaming_callback=writer,
-                                             request_timeout=timeout_in_seconds)
             try:
-                response = yield self._client.fetch(request)
-            except Exception as e:
-                self._errors.append("Failed download to %s: %s" % (self._filename, str(e)))
-                raise gen.Return(None)
+                failures = []
+                for (attempt, url) in enumerate(sources):
+                    state['attempt'] = attempt
+                    state['skip'] = 0
+                    self._metrics.url = url
+                    client = self._client
+                    if attempt > 0:
+                        self._metrics.retries += 1
+                        client = _new_client(max_clients=1)
+                        mirror_clients.append(client)
+                    is_last = attempt == len(sources) - 1
+                    try:
+                        response = yield self._fetch(client, mirror_request(attempt, url), watch_for_stall=not is_last)
+                        break
+                    except Exception as e:
+                        if conditional and getattr(e, 'code', None) == 304:
+                            raise gen.Return(e.response)
+                        if len(sources) > 1:
+                            failures.append("Failed download to %s from %s: %s" % (self._filename, url, str(e)))
+                        else:
+                            failures.append("Failed download to %s: %s" % (self._filename, str(e)))
+                        if is_last or len(self._errors) > 0:
+                            self._errors.extend(failures)
+                            # keep what we got if we wrote it all and can check it's still
+                            # good next time, however many mirrors failed; a 416 means what
+                            # we have doesn't fit the file anymore.
+                            state['keep_partial'] = (not streaming and not state['write_failed']
+                                                     and state['validator'] is not None
+                                                     and getattr(e, 'code', None) != 416)
+                            raise gen.Return(None)
+                    finally:
+                        if self._progress is not None:
+                            self._progress.close()
+                            self._progress = None
             finally:
-                if self._progress is not None:
-                    self._progress.close()
+                for client in mirror_clients:
+                    client.close()
+                # what we keep or rename has to be all written first
+                if state['pipeline'] is not None:
+                    yield _in_thread(state['pipeline'].finish)
+                    if state['pipeline'].error is not None:
+                        state['keep_partial'] = False
+                        message = "Failed to write to %s: %s" % (tmp_filename, state['pipeline'].error)
+                        if message not in self._errors:
+                            self._errors.append(message)
 
             # assert fetch() was supposed to throw the error, not leave it here unthrown
             assert response.error is None
 
-            if len(self._errors) == 0:
+            if len(self._errors) == 0 and streaming:
+                self._streamed = True
+            elif len(self._errors) == 0:
                 try:
                     _file.close()  # be sure tmp_filename is flushed
                     rename.rename_over_existing(tmp_filename, self._filename)
                 except EnvironmentError as e:
                     self._errors.append("Failed to rename %s to %s: %s" % (tmp_filename, self._filename, str(e)))
 
-            if len(self._errors) == 0 and self._hash_algorithm is not None:
-                self._hash = hasher.hexdigest()
+            if len(self._errors) == 0 and state['hasher'] is not None:
+                self._hash = state['hasher'].hexdigest()
 
             raise gen.Return(response)
         finally:
             cleanup_tmp()
 
+    @gen.coroutine
+    def _fetch(self, client, request, watch_for_stall):
+        future = client.fetch(request)
+        if not watch_for_stall:
+            response = yield future
+            raise gen.Return(response)
+        timeout = _stall_timeout_in_seconds()
+        while True:
+            seen = self._metrics.bytes
+            blocked = _seconds_blocked_on_writers()
+            try:
+                # if we give up on it, whatever it raises later doesn't matter
+                response = yield gen.with_timeout(datetime.timedelta(seconds=timeout),
+                                                  future,
+                                                  quiet_exceptions=(Exception, ))
+                raise gen.Return(response)
+            except gen.TimeoutError:
+                if _seconds_blocked_on_writers() > blocked:
+                    # we weren't reading for some of that time, so give it another go
+                    continue
+                if self._metrics.bytes - seen < _STALL_BYTES:
+                    raise _MirrorStalled("stalled, getting %d bytes in %d seconds" %
+                                         (self._metrics.bytes - seen, timeout))
+
+    @property
+    def metrics(self):
+        """``DownloadMetrics`` for the download, or None if it hasn't started."""
+        return self._metrics
+
     @property
     def hash(self):
         """Hash of the downloaded file if we succeeded in downloading it, None if we failed."""
         return self._hash
 
+    @property
+    def validators(self):
+        """Dict of the ``etag`` and ``last_modified`` headers the server sent, if any."""
+        return self._validators
+
+    @property
+    def streamed(self):
+        """True if the whole download went to the unpacker rather than to the filename."""
+        return self._streamed
+
     @property
     def errors(self):
         """List of errors if we failed to download, empty list if we succeeded."""
         return self._errors
+
+
+@gen.coroutine
+def rank_mirrors(urls):
+    """Order URLs of the same file by how quickly each answers a HEAD request, all at once.
+
+    Those we can't reach go last, in the order given.
+    """
+    if len(urls) < 2:
+        raise gen.Return(list(urls))
+    client = _new_client(max_clients=len(urls))
+
+    @gen.coroutine
+    def latency(url):
+        start = time.monotonic()
+        try:
+            yield client.fetch(httpclient.HTTPRequest(url=url, method='HEAD', request_timeout=_PROBE_TIMEOUT))
+        except httpclient.HTTPClientError as e:
+            # some servers just don't do HEAD, but they did answer
+            if e.code not in (405, 501):
+                raise gen.Return(None)
+        except Exception:
+            raise gen.Return(None)
+        raise gen.Return(time.monotonic() - start)
+
+    try:
+        latencies = yield [latency(url) for url in urls]
+    finally:
+        client.close()
+    reachable = sorted((seconds, index) for (index, seconds) in enumerate(latencies) if seconds is not None)
+    unreachable = [url for (url, seconds) in zip(urls, latencies) if seconds is None]
+    raise gen.Return([urls[index] for (seconds, index) in reachable] + unreachable)
+
+
+@gen.coroutine
+def download_all(downloaders, max_connections):
+    """Run several FileDownloader at once on the current IOLoop.
+
+    At most max_connections downloads run at a time, sharing one
+    HTTP client and (if there's more than one) one progress bar.
+
+    Returns:
+        a list of (response, exception) pairs in the order of downloaders,
+        where response is what ``FileDownloader.run()`` returned and
+        exception is whatever it raised, if anything
+    """
+    client = _new_client(max_clients=max_connections)
+    # we limit ourselves rather than letting the client queue requests,
+    # since the client would time out requests that wait too long
+    semaphore = locks.Semaphore(max_connections)
+    progress = None
+    if len(downloaders) > 1:
+        progress = DownloadProgress(len(downloaders))
+    for downloader in downloaders:
+        downloader._shared_client = client
+        downloader._shared_progress = progress
+
+    @gen.coroutine
+    def run_one(downloader):
+        with (yield semaphore.acquire()):
+            try:
+                response = yield downloader.run()
+            except Exception as e:
+                raise gen.Return((None, e))
+            raise gen.Return((response, None))
+
+    try:
+        results = yield [run_one(downloader) for downloader in downloaders]
+    finally:
+        if progress is not None:
+            progress.close()
+        client.close()
+    raise gen.Return(results)
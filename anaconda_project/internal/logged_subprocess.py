@@ -10,6 +10,7 @@ from __future__ import absolute_import, print_function
 import subprocess
 
 from anaconda_project import verbose
+from anaconda_project.internal.subprocess_trace import TracedProcess
 
 
 def _log_args(args):
@@ -19,14 +20,31 @@ def _log_args(args):
 
 def call(args, **kwargs):
     _log_args(args)
-    return subprocess.call(args=args, **kwargs)
+    traced = TracedProcess(args, cwd=kwargs.get('cwd'))
+    try:
+        traced.returncode = subprocess.call(args=args, **kwargs)
+        return traced.returncode
+    finally:
+        traced.finish()
 
 
 def Popen(args, **kwargs):
+    # the caller owns the process lifetime, so it's also
+    # responsible for tracing it if it wants to.
     _log_args(args)
     return subprocess.Popen(args=args, **kwargs)
 
 
 def check_output(args, **kwargs):
     _log_args(args)
-    return subprocess.check_output(args=args, **kwargs)
+    traced = TracedProcess(args, cwd=kwargs.get('cwd'))
+    try:
+        output = subprocess.check_output(args=args, **kwargs)
+        traced.returncode = 0
+        traced.stdout_bytes = len(output) if output is not None else 0
+        return output
+    except subprocess.CalledProcessError as e:
+        traced.returncode = e.returncode
+        raise
+    finally:
+        traced.finish()
@@ -508,13 +508,15 @@ def export_pixi_toml(project):
     for env_name in env_specs:
         for req in project.requirements(env_name):
             if isinstance(req, DownloadRequirement):
-                downloads[req.env_var] = req.url
+                downloads[req.env_var] = req.urls
 
     if downloads:
         lines.append('# Downloads from anaconda-project.yml (no pixi equivalent).')
         lines.append('# Consider adding setup tasks to fetch these:')
-        for var_name, url in sorted(downloads.items()):
-            lines.append('#   {} = {}'.format(var_name, url))
+        for var_name, urls in sorted(downloads.items()):
+            lines.append('#   {} = {}'.format(var_name, urls[0]))
+            for mirror in urls[1:]:
+                lines.append('#     mirror: {}'.format(mirror))
         lines.append('')
 
     # -- Services as comments
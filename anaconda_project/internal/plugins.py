@@ -6,25 +6,98 @@
 # The full license is in the file LICENSE.txt, distributed with this software.
 # -----------------------------------------------------------------------------
 
-from importlib.metadata import entry_points
+import hashlib
+from importlib.metadata import EntryPoint, entry_points
+import json
+import os
+import sys
+
+from anaconda_project.internal.env_flags import env_flag
+from anaconda_project.internal import user_dirs
+
+
+def _mtime_or_none(path):
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return None
+
+
+def _index_key():
+    # installing or removing a distribution adds or removes its
+    # metadata directory, which changes the mtime of its sys.path entry
+    paths = [os.path.abspath(path) for path in sys.path]
+    key = dict(executable=sys.executable, paths=[(path, _mtime_or_none(path)) for path in paths])
+    return hashlib.sha256(json.dumps(key, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def _index_filename(key):
+    return user_dirs.user_cache_dir('entry-points', key + '.json')
+
+
+_index_cache = dict()
+
+
+def _scan_group(group_name):
+    return sorted([ep.name, ep.value] for ep in entry_points(group=group_name))
+
+
+def _indexed_group(group_name):
+    """Return [name, value] pairs for a group, from the per-user index if it's current."""
+    if env_flag('ANACONDA_PROJECT_DISABLE_ENTRY_POINT_CACHE'):
+        return _scan_group(group_name)
+
+    key = _index_key()
+    index = _index_cache.get(key)
+    if index is None:
+        index = user_dirs.load_json_file(_index_filename(key))
+        if not isinstance(index, dict):
+            index = dict()
+        _index_cache[key] = index
+
+    if group_name not in index:
+        index[group_name] = _scan_group(group_name)
+        try:
+            user_dirs.save_json_file(_index_filename(key), index)
+        except (IOError, OSError):
+            # an unwritable cache dir just means we'll scan again next time
+            pass
+    return index[group_name]
 
 
 def get_group_named(group_name):
     """Return entry points for the given group as a dict of name -> EntryPoint."""
-    eps = entry_points(group=group_name)
-    return {ep.name: ep for ep in eps}
+    return {name: EntryPoint(name=name, value=value, group=group_name) for (name, value) in _indexed_group(group_name)}
+
+
+class _LazyPlugin(object):
+    """Stands in for a plugin, importing it the first time it's called."""
+    def __init__(self, entry_point):
+        self._entry_point = entry_point
+        self._plugin = None
+
+    def load(self):
+        """Import and return the plugin."""
+        if self._plugin is None:
+            self._plugin = self._entry_point.load()
+        return self._plugin
+
+    def __call__(self, *args, **kwargs):
+        return self.load()(*args, **kwargs)
 
 
 def _get_entry_points_plugins(entry_point_group):
-    """Return all the entry points plugins registered."""
-    return {name: plugin.load() for name, plugin in sorted(get_group_named(entry_point_group).items())}
+    """Return all the entry points plugins registered, loaded when first called."""
+    return {name: _LazyPlugin(plugin) for name, plugin in sorted(get_group_named(entry_point_group).items())}
 
 
 def get_plugins(plugin_hook_type):
     """Return all the entry points plugins registered that implement that hook.
 
     The function will return all the plugins that implement the specified
-    type of hook.
+    type of hook. The entry points are looked up in a per-user index that
+    is rebuilt when anything on ``sys.path`` changes, and each plugin is
+    only imported when it's first called.
 
     Args:
         - plugin_hook_type(str): type of hook
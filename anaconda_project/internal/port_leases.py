@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (c) 2026, Anaconda, Inc. All rights reserved.
+#
+# Licensed under the terms of the BSD 3-Clause License.
+# The full license is in the file LICENSE.txt, distributed with this software.
+# -----------------------------------------------------------------------------
+"""Per-user leases on local ports, so services started at once don't pick the same one."""
+from __future__ import absolute_import, print_function
+
+import os
+import time
+
+from anaconda_project.internal import user_dirs
+from anaconda_project.requirements_registry import network_util
+
+# a lease only has to last until the service is listening on its port
+_LEASE_SECONDS = 60
+
+# how many ports we try to connect to at once
+_PROBE_BATCH_SIZE = 64
+
+
+def _leases_filename():
+    return user_dirs.user_cache_dir('ports', 'leases.json')
+
+
+def _locked():
+    return user_dirs.locked_file(user_dirs.user_cache_dir('ports', 'leases.lock'))
+
+
+def _current_leases():
+    leases = user_dirs.load_json_file(_leases_filename())
+    if not isinstance(leases, dict):
+        return dict()
+    now = time.time()
+    return dict((port, lease) for (port, lease) in leases.items()
+                if isinstance(lease, dict) and now - lease.get('time', 0) < _LEASE_SECONDS)
+
+
+def lease_free_port(host, lower_port, upper_port, owner):
+    """Find the lowest port from lower_port to upper_port nothing listens on, and lease it to owner.
+
+    Other processes looking for a port won't pick one leased to
+    someone else until it's released or the lease runs out. We try
+    connecting to the ports a batch at a time, all of a batch at once.
+
+    Returns:
+        the port, or None if all of them were in use or leased
+    """
+    with _locked():
+        leases = _current_leases()
+        candidates = [
+            port for port in range(lower_port, upper_port + 1)
+            if leases.get(str(port), dict(owner=owner)).get('owner') == owner
+        ]
+        for start in range(0, len(candidates), _PROBE_BATCH_SIZE):
+            batch = candidates[start:start + _PROBE_BATCH_SIZE]
+            in_use = network_util.ports_in_use(host, batch)
+            free = [port for port in batch if port not in in_use]
+            if len(free) > 0:
+                leases[str(free[0])] = dict(owner=owner, pid=os.getpid(), time=time.time())
+                user_dirs.save_json_file(_leases_filename(), leases)
+                return free[0]
+        return None
+
+
+def release(port, owner):
+    """Give up owner's lease on port, once whatever we started is listening on it or failed."""
+    with _locked():
+        leases = _current_leases()
+        if leases.get(str(port), dict()).get('owner') == owner:
+            del leases[str(port)]
+            user_dirs.save_json_file(_leases_filename(), leases)
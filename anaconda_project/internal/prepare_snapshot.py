@@ -0,0 +1,235 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (c) 2026, Anaconda, Inc. All rights reserved.
+#
+# Licensed under the terms of the BSD 3-Clause License.
+# The full license is in the file LICENSE.txt, distributed with this software.
+# -----------------------------------------------------------------------------
+"""Snapshots of successful prepares, so ``run`` can skip preparing again.
+
+A snapshot records what a prepare added to the environment and which
+command it prepared. It's only valid while everything that could change
+the prepare's outcome is unchanged: the project, lock and local state
+files, the environment variables the requirements read, the anaconda-project
+version, and stat() signatures of the env prefix and any downloads. We
+only snapshot prepares whose requirements can be validated that way, so
+projects with services (which could have died) or encrypted variables
+(which live in the keyring) always get a full prepare.
+"""
+from __future__ import absolute_import, print_function
+
+import copy
+import glob
+import hashlib
+import json
+import os
+
+import anaconda_project
+from anaconda_project.internal import user_dirs
+from anaconda_project.internal.env_flags import env_flag
+from anaconda_project.local_state_file import possible_local_state_file_names
+from anaconda_project.project_commands import ProjectCommand
+from anaconda_project.project_file import possible_project_file_names
+from anaconda_project.project_lock_file import possible_project_lock_file_names
+from anaconda_project.requirements_registry.requirement import EnvVarRequirement
+from anaconda_project.requirements_registry.requirements.conda_env import CondaEnvRequirement
+from anaconda_project.requirements_registry.requirements.download import DownloadRequirement
+
+DISABLE_ENV_VAR = 'ANACONDA_PROJECT_DISABLE_PREPARE_SNAPSHOT'
+
+_SNAPSHOT_FORMAT = 1
+
+# exact classes, not isinstance(); a subclass may check things we can't
+_SNAPSHOT_REQUIREMENT_CLASSES = (EnvVarRequirement, CondaEnvRequirement, DownloadRequirement)
+
+# any of these can change which env we use or how we configure it
+_ENVIRON_PREFIXES = ('CONDA_', 'ANACONDA_PROJECT_')
+
+
+def _enabled():
+    return not env_flag(DISABLE_ENV_VAR)
+
+
+def _snapshot_filename(project_dir, ui_mode, env_spec_name, command_name):
+    inputs = json.dumps([os.path.abspath(project_dir), ui_mode, env_spec_name, command_name])
+    key = hashlib.sha256(inputs.encode('utf-8')).hexdigest()
+    return user_dirs.user_cache_dir('prepare-snapshots', key + '.json')
+
+
+def _file_digest(filename):
+    try:
+        with open(filename, 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except (IOError, OSError):
+        return None
+
+
+def _project_file_digests(directory):
+    # include every possible name, so creating a file that would
+    # take precedence also invalidates the snapshot.
+    names = possible_project_file_names + possible_project_lock_file_names + possible_local_state_file_names
+    return dict((name, _file_digest(os.path.join(directory, name))) for name in names)
+
+
+def _stat_signature(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [st.st_mtime_ns, st.st_size]
+
+
+def _env_prefix_paths(prefix):
+    # the directories DefaultCondaManager compares with its timestamp
+    # file, plus the directory of timestamp files, so installing or
+    # removing packages or re-preparing the env changes a signature.
+    paths = sorted(glob.glob(os.path.join(prefix, "lib", "python*", "site-packages")))
+    for parts in (("bin", ), ("lib", ), ("Lib", "site-packages"), ("Library", "bin"), ("Scripts", ), ("conda-meta", ),
+                  ("var", "cache", "anaconda-project", "env-specs")):
+        paths.append(os.path.join(prefix, *parts))
+    return paths
+
+
+def _signatures(paths):
+    return [[path, _stat_signature(path)] for path in paths]
+
+
+def _environ_inputs(environ, names):
+    keys = set(names)
+    keys.add('PATH')
+    keys.update(key for key in environ if key.startswith(_ENVIRON_PREFIXES))
+    return dict((key, environ.get(key)) for key in keys)
+
+
+def save(project, result, command, ui_mode, env_spec_name, command_name, project_dir, environ=None):
+    """Record a successful prepare, if it's one we know how to validate cheaply.
+
+    Args:
+        project (Project): the project we prepared
+        result (PrepareResult): the result of the prepare
+        command (ProjectCommand): the command we prepared
+        ui_mode (str): the UI mode of the prepare
+        env_spec_name (str): the env spec name we were asked for, or None for default
+        command_name (str): the command name we were asked for, or None for default
+        project_dir (str): the project directory we were asked for
+        environ (dict): the environment we prepared (None for os.environ)
+    """
+    if not _enabled() or result.failed or command is None or result.command_exec_info is None:
+        return
+    # suggestions get printed on every prepare; bootstrap envs re-exec us.
+    if project.has_bootstrap_env_spec() or len(project.suggestions) > 0:
+        return
+    if os.path.realpath(os.path.abspath(project_dir)) != os.path.realpath(project.directory_path):
+        return
+    if environ is None:
+        environ = os.environ
+
+    prefix = result.env_prefix
+    if prefix is None:
+        return
+
+    names = set(command._attributes.get('variables', {}).keys())
+    paths = _env_prefix_paths(prefix)
+    for status in result.statuses:
+        requirement = status.requirement
+        if type(requirement) not in _SNAPSHOT_REQUIREMENT_CLASSES or requirement.encrypted:
+            return
+        names.add(requirement.env_var)
+        if isinstance(requirement, DownloadRequirement):
+            paths.append(result.environ.get(requirement.env_var))
+
+    if None in paths:
+        return
+
+    added = dict((key, value) for (key, value) in result.environ.items() if environ.get(key) != value)
+    removed = sorted(key for key in environ if key not in result.environ)
+    snapshot = dict(format=_SNAPSHOT_FORMAT,
+                    version=anaconda_project.__version__,
+                    project_dir=project.directory_path,
+                    files=_project_file_digests(project.directory_path),
+                    environ_names=sorted(names),
+                    environ_inputs=_environ_inputs(environ, names),
+                    signatures=_signatures(paths),
+                    environ_added=added,
+                    environ_removed=removed,
+                    command_name=command.name,
+                    command_attributes=command._attributes)
+
+    filename = _snapshot_filename(project_dir, ui_mode, env_spec_name, command_name)
+    try:
+        # round-trip to be sure the snapshot holds plain JSON types
+        snapshot = json.loads(json.dumps(snapshot))
+        user_dirs.save_json_file(filename, snapshot)
+    except (IOError, OSError, TypeError, ValueError):
+        # the snapshot is only an optimization
+        pass
+
+
+# filename => (stat signature of the file, snapshot); a long-lived
+# process such as the daemon loads the same snapshots over and over.
+_loaded_snapshots = dict()
+
+
+def _load_snapshot_file(filename):
+    signature = _stat_signature(filename)
+    if signature is None:
+        return None
+    cached = _loaded_snapshots.get(filename)
+    if cached is None or cached[0] != signature:
+        cached = (signature, user_dirs.load_json_file(filename))
+        _loaded_snapshots[filename] = cached
+    # callers may modify what we return
+    return copy.deepcopy(cached[1])
+
+
+def _load_valid_snapshot(filename, environ):
+    snapshot = _load_snapshot_file(filename)
+    if not isinstance(snapshot, dict):
+        return None
+    if snapshot.get('format') != _SNAPSHOT_FORMAT or snapshot.get('version') != anaconda_project.__version__:
+        return None
+    if snapshot['environ_inputs'] != _environ_inputs(environ, snapshot['environ_names']):
+        return None
+    if snapshot['files'] != _project_file_digests(snapshot['project_dir']):
+        return None
+    if snapshot['signatures'] != _signatures([path for (path, signature) in snapshot['signatures']]):
+        return None
+    return snapshot
+
+
+def load_exec_info(project_dir, ui_mode, env_spec_name, command_name, extra_command_args=None, environ=None):
+    """Get a ``CommandExecInfo`` from a still-valid snapshot of a previous prepare.
+
+    Args:
+        project_dir (str): the project directory
+        ui_mode (str): the UI mode we would prepare with
+        env_spec_name (str): the env spec name to require, or None for default
+        command_name (str): the command name, or None for default
+        extra_command_args (list of str): extra args for the command
+        environ (dict): the environment to run in (None for os.environ)
+
+    Returns:
+        a ``CommandExecInfo``, or None if we need to do a full prepare
+    """
+    if not _enabled():
+        return None
+    if environ is None:
+        environ = os.environ
+
+    filename = _snapshot_filename(project_dir, ui_mode, env_spec_name, command_name)
+    try:
+        snapshot = _load_valid_snapshot(filename, environ)
+        if snapshot is None:
+            return None
+
+        run_environ = dict(environ)
+        for key in snapshot['environ_removed']:
+            run_environ.pop(key, None)
+        run_environ.update(snapshot['environ_added'])
+
+        command = ProjectCommand(name=snapshot['command_name'], attributes=snapshot['command_attributes'])
+        return command.exec_info_for_environment(run_environ, extra_args=extra_command_args)
+    except (AssertionError, AttributeError, KeyError, TypeError, ValueError):
+        # a snapshot from a different version of us, or otherwise
+        # not something we understand; just do a full prepare.
+        return None
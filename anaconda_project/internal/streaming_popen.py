@@ -17,6 +17,7 @@ except ImportError:  # pragma: no cover (py2 only)
     from Queue import Queue  # pragma: no cover (py2 only)
 
 from anaconda_project.internal import logged_subprocess
+from anaconda_project.internal.subprocess_trace import TracedProcess
 
 
 # this function exists to be mocked in tests
@@ -80,6 +81,16 @@ def popen(args, stdout_callback, stderr_callback, **kwargs):
     if stderr_callback is None:
         stderr_callback = ignore_line
 
+    traced = TracedProcess(args, cwd=kwargs.get('cwd'))
+    try:
+        (p, stdout_buffer, stderr_buffer) = _popen_and_read(args, stdout_callback, stderr_callback, traced, **kwargs)
+    finally:
+        traced.finish()
+
+    return (p, stdout_buffer, stderr_buffer)
+
+
+def _popen_and_read(args, stdout_callback, stderr_callback, traced, **kwargs):
     p = logged_subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE, **kwargs)
 
     queue = Queue()
@@ -108,6 +119,8 @@ def popen(args, stdout_callback, stderr_callback, **kwargs):
 
     stdout_buffer = []
     stderr_buffer = []
+    stdout_bytes = 0
+    stderr_bytes = 0
 
     first_error = None
     stdout_joined = False
@@ -130,10 +143,12 @@ def popen(args, stdout_callback, stderr_callback, **kwargs):
             if which is stdout_wrapper:
                 stdout_callback(data)
                 stdout_buffer.append(data)
+                stdout_bytes += len(data.encode('utf-8'))
             else:
                 assert which is stderr_wrapper
                 stderr_callback(data)
                 stderr_buffer.append(data)
+                stderr_bytes += len(data.encode('utf-8'))
 
     assert queue.empty()
 
@@ -142,6 +157,10 @@ def popen(args, stdout_callback, stderr_callback, **kwargs):
 
     p.wait()
 
+    traced.returncode = p.returncode
+    traced.stdout_bytes = stdout_bytes
+    traced.stderr_bytes = stderr_bytes
+
     stdout_buffer = _combine_lines(stdout_buffer)
     stderr_buffer = _combine_lines(stderr_buffer)
 
@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (c) 2026, Anaconda, Inc. All rights reserved.
+#
+# Licensed under the terms of the BSD 3-Clause License.
+# The full license is in the file LICENSE.txt, distributed with this software.
+# -----------------------------------------------------------------------------
+"""Structured timing trace of the subprocesses we spawn.
+
+When ``ANACONDA_PROJECT_TRACE_FILE`` is set (or ``set_trace_file`` was
+called, as the ``--trace`` CLI option does), each subprocess run through
+``logged_subprocess`` or ``streaming_popen`` appends one JSON object per
+line to that file. So does each file listed under ``downloads:`` that
+we fetch; those records have a ``download`` URL instead of ``argv``.
+"""
+from __future__ import absolute_import, print_function
+
+import collections
+import json
+import os
+import threading
+import time
+
+from anaconda_project.requirements_registry.network_util import urlparse
+
+TRACE_FILE_ENV_VAR = 'ANACONDA_PROJECT_TRACE_FILE'
+
+# tools whose first positional argument names a subcommand worth grouping by
+_TOOLS_WITH_SUBCOMMANDS = ('conda', 'pip', 'git')
+
+_trace_file = None
+_write_lock = threading.Lock()
+
+
+def set_trace_file(filename):
+    """Set the trace file, overriding the environment variable; None to go back to the environment."""
+    global _trace_file
+    _trace_file = filename
+
+
+def trace_file():
+    """Get the trace file we should append to, or None if tracing is off."""
+    if _trace_file is not None:
+        return _trace_file
+    filename = os.environ.get(TRACE_FILE_ENV_VAR, '')
+    if filename == '':
+        return None
+    return filename
+
+
+def _write_record(filename, record):
+    line = json.dumps(record, sort_keys=True) + "\n"
+    with _write_lock:
+        # append mode, one write() per record, so concurrent
+        # processes tracing to the same file don't interleave lines.
+        with open(filename, 'a') as f:
+            f.write(line)
+
+
+class TracedProcess(object):
+    """Timing information for one subprocess, filled in by the code running it."""
+    def __init__(self, args, cwd=None):
+        """Start timing a subprocess."""
+        self.args = [str(arg) for arg in args]
+        self.cwd = cwd
+        self.start = time.time()
+        self._start_clock = time.monotonic()
+        self.returncode = None
+        self.stdout_bytes = None
+        self.stderr_bytes = None
+
+    def finish(self):
+        """Stop timing and append the record to the trace file, if any."""
+        duration = time.monotonic() - self._start_clock
+        filename = trace_file()
+        if filename is None:
+            return
+        cwd = self.cwd
+        if cwd is None:
+            cwd = os.getcwd()
+        record = dict(argv=self.args,
+                      cwd=cwd,
+                      start=self.start,
+                      duration=duration,
+                      returncode=self.returncode,
+                      stdout_bytes=self.stdout_bytes,
+                      stderr_bytes=self.stderr_bytes)
+        try:
+            _write_record(filename, record)
+        except (IOError, OSError):
+            # a broken trace file must never break the actual work
+            pass
+
+
+def trace_download(metrics):
+    """Append a record of a download's ``DownloadMetrics.to_json()`` to the trace file, if any."""
+    filename = trace_file()
+    if filename is None:
+        return
+    record = dict(metrics)
+    record['download'] = record.pop('url')
+    try:
+        _write_record(filename, record)
+    except (IOError, OSError):
+        pass
+
+
+def _load(filename, is_wanted):
+    records = []
+    with open(filename, 'r') as f:
+        for line in f:
+            line = line.strip()
+            if line == '':
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(record, dict) and is_wanted(record):
+                records.append(record)
+    return records
+
+
+def load_records(filename):
+    """Load subprocess trace records from a file, skipping lines we can't parse."""
+    return _load(filename, lambda record: isinstance(record.get('argv'), list))
+
+
+def load_download_records(filename):
+    """Load download trace records from a file, skipping lines we can't parse."""
+    return _load(filename, lambda record: isinstance(record.get('download'), str))
+
+
+def tool_and_subcommand(argv):
+    """Get a (tool, subcommand) pair identifying a traced command line."""
+    if len(argv) == 0:
+        return ('', '')
+    # traces can come from Windows, so split on either separator
+    tool = argv[0].replace('\\', '/').split('/')[-1]
+    if tool.lower().endswith('.exe'):
+        tool = tool[:-4]
+    subcommand = ''
+    if tool in _TOOLS_WITH_SUBCOMMANDS:
+        for arg in argv[1:]:
+            if not arg.startswith('-'):
+                subcommand = arg
+                break
+    return (tool, subcommand)
+
+
+TraceSummary = collections.namedtuple(
+    'TraceSummary', ['tool', 'subcommand', 'count', 'failures', 'total', 'max', 'stdout_bytes', 'stderr_bytes'])
+
+
+def summarize(records):
+    """Aggregate trace records by tool and subcommand, slowest total first.
+
+    Returns:
+        list of ``TraceSummary``
+    """
+    by_key = collections.OrderedDict()
+    for record in records:
+        key = tool_and_subcommand(record['argv'])
+        summary = by_key.get(key, TraceSummary(key[0], key[1], 0, 0, 0.0, 0.0, 0, 0))
+        duration = record.get('duration') or 0.0
+        returncode = record.get('returncode')
+        by_key[key] = summary._replace(count=summary.count + 1,
+                                       failures=summary.failures + (1 if returncode not in (0, None) else 0),
+                                       total=summary.total + duration,
+                                       max=max(summary.max, duration),
+                                       stdout_bytes=summary.stdout_bytes + (record.get('stdout_bytes') or 0),
+                                       stderr_bytes=summary.stderr_bytes + (record.get('stderr_bytes') or 0))
+    return sorted(by_key.values(), key=lambda s: (-s.total, s.tool, s.subcommand))
+
+
+DownloadSummary = collections.namedtuple(
+    'DownloadSummary',
+    ['host', 'count', 'cached', 'retries', 'bytes', 'total', 'max_time_to_first_byte', 'average_throughput'])
+
+
+def summarize_downloads(records):
+    """Aggregate download records by host, slowest average throughput first.
+
+    Downloads from the download cache are counted in ``cached``, but
+    not in the bytes, time, or throughput.
+
+    Returns:
+        list of ``DownloadSummary``
+    """
+    by_host = collections.OrderedDict()
+    for record in records:
+        host = urlparse.urlsplit(record['download']).netloc
+        summary = by_host.get(host, DownloadSummary(host, 0, 0, 0, 0, 0.0, 0.0, None))
+        summary = summary._replace(count=summary.count + 1, retries=summary.retries + (record.get('retries') or 0))
+        if record.get('cached'):
+            summary = summary._replace(cached=summary.cached + 1)
+        else:
+            summary = summary._replace(bytes=summary.bytes + (record.get('bytes') or 0),
+                                       total=summary.total + (record.get('duration') or 0.0),
+                                       max_time_to_first_byte=max(summary.max_time_to_first_byte,
+                                                                  record.get('time_to_first_byte') or 0.0))
+        by_host[host] = summary
+    summaries = [
+        summary._replace(average_throughput=(summary.bytes / summary.total if summary.total > 0 else None))
+        for summary in by_host.values()
+    ]
+    return sorted(summaries, key=lambda s: (s.average_throughput is None, s.average_throughput or 0.0, s.host))
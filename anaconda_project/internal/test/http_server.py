@@ -21,32 +21,85 @@ class _DownloadView(RequestHandler):
         # Note: application is stored as self.application
         super(_DownloadView, self).__init__(application, *args, **kwargs)
 
+    def _set_headers(self, download_id, length):
+        """Set status and headers, returning the (start, end) of what we'll send, or None for a 304."""
+        # with resumable, we send an ETag and honor Range and If-None-Match
+        resumable = self.get_argument("resumable", None) is not None
+        start = 0
+        end = length
+        self.set_status(200)
+        if resumable:
+            etag = '"%s"' % download_id
+            self.set_header('ETag', etag)
+            self.set_header('Accept-Ranges', 'bytes')
+            if self.request.headers.get('If-None-Match') == etag:
+                self.set_status(304)
+                return None
+            range_header = self.request.headers.get('Range')
+            if_range = self.request.headers.get('If-Range')
+            if range_header is not None and (if_range is None or if_range == etag):
+                (first, _, last) = range_header[len('bytes='):].partition('-')
+                start = int(first)
+                if last:
+                    end = min(length, int(last) + 1)
+                self.set_status(206)
+                self.set_header('Content-Range', 'bytes %d-%d/%d' % (start, end - 1, length))
+                self.application.range_requests[download_id] = self.application.range_requests.get(download_id, 0) + 1
+        self.set_header('Content-Length', str(end - start))
+        return (start, end)
+
+    def head(self, *args, **kwargs):
+        self._set_headers(self.get_argument("id"), int(self.get_argument("length")))
+        self.finish()
+
     @gen.coroutine
     def get(self, *args, **kwargs):
         download_id = self.get_argument("id")
         hash_algorithm = self.get_argument("hash_algorithm", None)
         length = int(self.get_argument("length"))
+        # with fail_after, we hang up after that many bytes the first time
+        fail_after = self.get_argument("fail_after", None)
+        if download_id in self.application.failed:
+            fail_after = None
+        # with stall_after, we go quiet after that many bytes
+        stall_after = self.get_argument("stall_after", None)
 
         print("Planning to send %d bytes" % length)
         if hash_algorithm:
             hasher = getattr(hashlib, hash_algorithm)()
 
-        self.set_status(200)
-        self.set_header('Content-Length', str(length))
+        bounds = self._set_headers(download_id, length)
+        if bounds is None:
+            self.finish()
+            return
+        (start, end) = bounds
         data = ("abcdefghijklmnop" * 20).encode("utf-8")
-        remaining = length
-        while remaining > 0:
-            to_write = data[:remaining]
+        position = start
+        while position < end:
+            offset = position % len(data)
+            to_write = data[offset:offset + end - position]
+            if fail_after is not None and position + len(to_write) > int(fail_after):
+                self.write(to_write[:int(fail_after) - position])
+                yield self.flush()
+                self.application.failed.add(download_id)
+                self.request.connection.stream.close()
+                return
+            if stall_after is not None and position + len(to_write) > int(stall_after):
+                self.write(to_write[:int(stall_after) - position])
+                yield self.flush()
+                yield gen.sleep(10)
+                self.request.connection.stream.close()
+                return
             if hash_algorithm:
                 hasher.update(to_write)
-            remaining = remaining - len(to_write)
+            position = position + len(to_write)
             self.write(to_write)
             try:
                 yield self.flush()
             except Exception as e:
                 raise e
 
-        if hash_algorithm:
+        if hash_algorithm and (start, end) == (0, length):
             self.application.hashes[download_id] = hasher.hexdigest()
 
         self.finish()
@@ -65,6 +118,8 @@ class _ErrorView(RequestHandler):
 class _TestServerApplication(Application):
     def __init__(self, **kwargs):
         self.hashes = dict()
+        self.failed = set()
+        self.range_requests = dict()
         patterns = [(r'/download', _DownloadView), (r'/error', _ErrorView)]
         super(_TestServerApplication, self).__init__(patterns, **kwargs)
 
@@ -109,12 +164,27 @@ class _TestServer(object):
     def error_url(self):
         return self.url + "error"
 
-    def new_download_url(self, download_length, hash_algorithm):
+    def new_download_url(self, download_length, hash_algorithm, resumable=False, fail_after=None, stall_after=None):
         url = (self.url + "download?id=" + str(uuid.uuid4()) + "&length=" + str(download_length))
         if hash_algorithm:
             url += "&hash_algorithm=" + hash_algorithm
+        if resumable:
+            url += "&resumable=1"
+        if fail_after is not None:
+            url += "&fail_after=" + str(fail_after)
+        if stall_after is not None:
+            url += "&stall_after=" + str(stall_after)
         return url
 
+    @staticmethod
+    def download_content(download_length):
+        data = ("abcdefghijklmnop" * 20).encode("utf-8")
+        return (data * (download_length // len(data) + 1))[:download_length]
+
+    def range_requests_for_downloaded_url(self, download_url):
+        i = download_url.index("id=")
+        return self._application.range_requests.get(download_url[(i + 3):][:36], 0)
+
     def server_computed_hash_for_downloaded_url(self, download_url):
         i = download_url.index("id=")
         download_id = download_url[(i + 3):][:36]
@@ -13,6 +13,7 @@ import platform
 import pytest
 import random
 import stat
+import time
 
 from pprint import pprint
 
@@ -182,6 +183,8 @@ def test_conda_remove_no_packages(monkeypatch):
 
 
 def test_conda_invoke_fails(monkeypatch):
+    monkeypatch.setenv('ANACONDA_PROJECT_DISABLE_CONDA_INFO_CACHE', '1')
+
     def mock_popen(args, stdout=None, stderr=None, env=None):
         raise OSError("failed to exec")
 
@@ -197,6 +200,8 @@ def test_conda_invoke_fails(monkeypatch):
 
 
 def test_conda_invoke_nonzero_returncode(monkeypatch):
+    monkeypatch.setenv('ANACONDA_PROJECT_DISABLE_CONDA_INFO_CACHE', '1')
+
     def get_failed_command(extra_args):
         return tmp_script_commandline("""from __future__ import print_function
 import sys
@@ -214,6 +219,8 @@ sys.exit(1)
 
 
 def test_conda_invoke_zero_returncode_with_stuff_on_stderr(monkeypatch, capsys):
+    monkeypatch.setenv('ANACONDA_PROJECT_DISABLE_CONDA_INFO_CACHE', '1')
+
     def get_command(extra_args):
         return tmp_script_commandline("""from __future__ import print_function
 import sys
@@ -232,6 +239,8 @@ sys.exit(0)
 
 
 def test_conda_invoke_zero_returncode_with_invalid_json(monkeypatch, capsys):
+    monkeypatch.setenv('ANACONDA_PROJECT_DISABLE_CONDA_INFO_CACHE', '1')
+
     def get_command(extra_args):
         return tmp_script_commandline("""from __future__ import print_function
 import sys
@@ -248,6 +257,224 @@ sys.exit(0)
     with_directory_contents(dict(), do_test)
 
 
+def _mock_info_calls(monkeypatch, dirname):
+    monkeypatch.delenv('ANACONDA_PROJECT_DISABLE_CONDA_INFO_CACHE', raising=False)
+    monkeypatch.setenv('ANACONDA_PROJECT_CACHE_DIR', os.path.join(dirname, "cache"))
+    monkeypatch.setattr('anaconda_project.internal.conda_api._info_cache', dict())
+    calls = []
+
+    def mock_call_and_parse_json(extra_args, platform=None):
+        calls.append((extra_args, platform))
+        return {'platform': platform or 'linux-64', 'calls': len(calls)}
+
+    monkeypatch.setattr('anaconda_project.internal.conda_api._call_and_parse_json', mock_call_and_parse_json)
+    return calls
+
+
+def test_conda_info_cached_in_process_and_on_disk(monkeypatch):
+    def do_test(dirname):
+        calls = _mock_info_calls(monkeypatch, dirname)
+
+        first = conda_api.info()
+        assert first == {'platform': 'linux-64', 'calls': 1}
+        first['modified'] = True
+        assert conda_api.info() == {'platform': 'linux-64', 'calls': 1}
+        assert len(calls) == 1
+
+        cached = os.listdir(os.path.join(dirname, "cache", "conda-info"))
+        assert len(cached) == 1
+
+        # a fresh process would only have the on-disk cache
+        monkeypatch.setattr('anaconda_project.internal.conda_api._info_cache', dict())
+        assert conda_api.info() == {'platform': 'linux-64', 'calls': 1}
+        assert len(calls) == 1
+
+        # the platform is part of the key
+        assert conda_api.info(platform='win-64') == {'platform': 'win-64', 'calls': 2}
+        assert len(calls) == 2
+
+    with_directory_contents(dict(), do_test)
+
+
+def test_conda_info_cache_invalidated_by_condarc(monkeypatch):
+    def do_test(dirname):
+        calls = _mock_info_calls(monkeypatch, dirname)
+        condarc = os.path.join(dirname, "condarc")
+        monkeypatch.setenv('CONDARC', condarc)
+
+        conda_api.info()
+        conda_api.info()
+        assert len(calls) == 1
+
+        with open(condarc, 'w') as f:
+            f.write("channels: [foo]\n")
+        assert conda_api.info() == {'platform': 'linux-64', 'calls': 2}
+        assert len(calls) == 2
+
+    with_directory_contents(dict(), do_test)
+
+
+def test_conda_info_cache_invalidated_by_environ(monkeypatch):
+    def do_test(dirname):
+        calls = _mock_info_calls(monkeypatch, dirname)
+        monkeypatch.delenv('CONDA_ENVS_PATH', raising=False)
+
+        conda_api.info()
+        assert len(calls) == 1
+
+        monkeypatch.setenv('CONDA_ENVS_PATH', dirname)
+        conda_api.info()
+        assert len(calls) == 2
+
+        monkeypatch.delenv('CONDA_ENVS_PATH')
+        conda_api.info()
+        assert len(calls) == 2
+
+    with_directory_contents(dict(), do_test)
+
+
+def test_conda_info_cache_ignores_corrupt_file(monkeypatch):
+    def do_test(dirname):
+        calls = _mock_info_calls(monkeypatch, dirname)
+
+        conda_api.info()
+        assert len(calls) == 1
+        cache_dir = os.path.join(dirname, "cache", "conda-info")
+        [cached] = os.listdir(cache_dir)
+        with open(os.path.join(cache_dir, cached), 'w') as f:
+            f.write("not json")
+
+        monkeypatch.setattr('anaconda_project.internal.conda_api._info_cache', dict())
+        assert conda_api.info() == {'platform': 'linux-64', 'calls': 2}
+
+    with_directory_contents(dict(), do_test)
+
+
+def test_conda_info_cache_unwritable(monkeypatch):
+    def do_test(dirname):
+        calls = _mock_info_calls(monkeypatch, dirname)
+        # the cache "directory" is a file
+        with open(os.path.join(dirname, "cache"), 'w') as f:
+            f.write("")
+
+        assert conda_api.info() == {'platform': 'linux-64', 'calls': 1}
+        assert conda_api.info() == {'platform': 'linux-64', 'calls': 1}
+        assert len(calls) == 1
+
+    with_directory_contents(dict(), do_test)
+
+
+def test_conda_info_cache_disabled(monkeypatch):
+    def do_test(dirname):
+        calls = _mock_info_calls(monkeypatch, dirname)
+        monkeypatch.setenv('ANACONDA_PROJECT_DISABLE_CONDA_INFO_CACHE', '1')
+
+        conda_api.info()
+        conda_api.info()
+        assert len(calls) == 2
+        assert not os.path.exists(os.path.join(dirname, "cache"))
+
+    with_directory_contents(dict(), do_test)
+
+
+def test_conda_info_cache_not_disabled_by_false_value(monkeypatch):
+    def do_test(dirname):
+        calls = _mock_info_calls(monkeypatch, dirname)
+        monkeypatch.setenv('ANACONDA_PROJECT_DISABLE_CONDA_INFO_CACHE', '0')
+
+        conda_api.info()
+        conda_api.info()
+        assert len(calls) == 1
+
+    with_directory_contents(dict(), do_test)
+
+
+def test_conda_info_cache_keeps_most_recently_used(monkeypatch):
+    def do_test(dirname):
+        calls = _mock_info_calls(monkeypatch, dirname)
+        monkeypatch.setattr('anaconda_project.internal.conda_api._INFO_CACHE_ENTRIES', 2)
+        cache_dir = os.path.join(dirname, "cache", "conda-info")
+
+        def files_by_platform():
+            result = dict()
+            for name in os.listdir(cache_dir):
+                with open(os.path.join(cache_dir, name)) as f:
+                    result[json.load(f)['platform']] = os.path.join(cache_dir, name)
+            return result
+
+        conda_api.info(platform='linux-64')
+        conda_api.info(platform='osx-64')
+        # pretend they were used a while ago, linux-64 first
+        for (age, filename) in ((200, files_by_platform()['linux-64']), (100, files_by_platform()['osx-64'])):
+            mtime = time.time() - age
+            os.utime(filename, (mtime, mtime))
+
+        # using linux-64 from disk makes it the most recent
+        monkeypatch.setattr('anaconda_project.internal.conda_api._info_cache', dict())
+        conda_api.info(platform='linux-64')
+        assert len(calls) == 2
+
+        conda_api.info(platform='win-64')
+        assert len(calls) == 3
+        assert ['linux-64', 'win-64'] == sorted(files_by_platform().keys())
+
+    with_directory_contents(dict(), do_test)
+
+
+def _fail_if_conda_called(monkeypatch):
+    def mock_call_and_parse_json(extra_args, platform=None):
+        raise AssertionError("should not have run conda %r" % extra_args)
+
+    monkeypatch.setattr('anaconda_project.internal.conda_api._call_and_parse_json', mock_call_and_parse_json)
+
+
+def test_get_env_vars_from_state_file(monkeypatch):
+    def do_test(dirname):
+        _fail_if_conda_called(monkeypatch)
+        assert conda_api.get_env_vars(dirname) == {'FOO': 'bar', 'BAZ': ''}
+
+    state = json.dumps({'env_vars': {'FOO': 'bar', 'BAZ': '', 'GONE': '***unset***'}})
+    with_directory_contents({'conda-meta/state': state}, do_test)
+
+
+def test_get_env_vars_state_file_without_env_vars(monkeypatch):
+    def do_test(dirname):
+        _fail_if_conda_called(monkeypatch)
+        assert conda_api.get_env_vars(dirname) == {}
+
+    with_directory_contents({'conda-meta/state': '{"something_else": 42}'}, do_test)
+
+
+def test_get_env_vars_no_state_file(monkeypatch):
+    def do_test(dirname):
+        _fail_if_conda_called(monkeypatch)
+        assert conda_api.get_env_vars(dirname) == {}
+
+    with_directory_contents({'conda-meta/history': ''}, do_test)
+
+
+@pytest.mark.parametrize('state', ['not json', '[1, 2]', '{"env_vars": [1]}', '{"env_vars": {"FOO": 1}}', None])
+def test_get_env_vars_unrecognized_state_falls_back_to_conda(monkeypatch, state):
+    def do_test(dirname):
+        calls = []
+
+        def mock_call_and_parse_json(extra_args, platform=None):
+            calls.append(extra_args)
+            return {'FROM_CONDA': 'yes'}
+
+        monkeypatch.setattr('anaconda_project.internal.conda_api._call_and_parse_json', mock_call_and_parse_json)
+        prefix = os.path.join(dirname, 'env')
+        assert conda_api.get_env_vars(prefix) == {'FROM_CONDA': 'yes'}
+        assert calls == [['env', 'config', 'vars', 'list', '-p', prefix, '--json']]
+
+    if state is None:
+        # no conda-meta at all
+        contents = {'env/foo': ''}
+    else:
+        contents = {'env/conda-meta/state': state}
+    with_directory_contents(contents, do_test)
+
+
 def test_conda_create_disable_override_channels(monkeypatch):
     monkeypatch.setenv('ANACONDA_PROJECT_DISABLE_OVERRIDE_CHANNELS', True)
 
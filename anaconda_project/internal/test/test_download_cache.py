@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (c) 2026, Anaconda, Inc. All rights reserved.
+#
+# Licensed under the terms of the BSD 3-Clause License.
+# The full license is in the file LICENSE.txt, distributed with this software.
+# -----------------------------------------------------------------------------
+from __future__ import absolute_import, print_function
+
+import hashlib
+import os
+import time
+
+from anaconda_project.internal import download_cache, user_dirs
+
+_data = b"some downloaded data"
+_md5 = hashlib.md5(_data).hexdigest()
+
+
+def _setup(monkeypatch, tmpdir):
+    monkeypatch.setenv(user_dirs.CACHE_DIR_ENV_VAR, str(tmpdir.join('cache')))
+    monkeypatch.delenv(download_cache.DISABLE_ENV_VAR, raising=False)
+    monkeypatch.delenv(download_cache.SIZE_ENV_VAR, raising=False)
+    source = tmpdir.join('project1', 'data.csv')
+    source.write_binary(_data, ensure=True)
+    return str(source)
+
+
+def test_store_and_fetch(monkeypatch, tmpdir):
+    source = _setup(monkeypatch, tmpdir)
+    dest = str(tmpdir.join('project2', 'data.csv'))
+    assert not download_cache.fetch('md5', _md5, dest)
+    assert not os.path.exists(dest)
+
+    download_cache.store('md5', _md5, source)
+    assert download_cache.fetch('md5', _md5.upper(), dest)
+    with open(dest, 'rb') as f:
+        assert _data == f.read()
+    assert [] == [name for name in os.listdir(str(tmpdir.join('cache', 'downloads'))) if '.tmp-' in name]
+
+
+def test_fetch_discards_corrupted_entry(monkeypatch, tmpdir):
+    source = _setup(monkeypatch, tmpdir)
+    download_cache.store('md5', _md5, source)
+    entry = str(tmpdir.join('cache', 'downloads', 'md5-' + _md5))
+    assert os.path.isfile(entry)
+
+    # a hardlinked project file changed in place
+    with open(source, 'ab') as f:
+        f.write(b"more")
+    dest = str(tmpdir.join('project2', 'data.csv'))
+    assert not download_cache.fetch('md5', _md5, dest)
+    assert not os.path.exists(entry)
+    assert not os.path.exists(dest)
+
+
+def test_rejects_bad_hashes(monkeypatch, tmpdir):
+    source = _setup(monkeypatch, tmpdir)
+    download_cache.store('md5', '../../escape', source)
+    download_cache.store('not_a_hash', _md5, source)
+    assert not os.path.exists(str(tmpdir.join('cache', 'downloads')))
+    assert not download_cache.fetch('md5', '../../escape', str(tmpdir.join('dest')))
+
+
+def test_fetch_leaves_entry_mtime_alone(monkeypatch, tmpdir):
+    source = _setup(monkeypatch, tmpdir)
+    download_cache.store('md5', _md5, source)
+    # the entry is the same file as the project's download
+    old = time.time() - 100
+    os.utime(source, (old, old))
+    assert download_cache.fetch('md5', _md5, str(tmpdir.join('project2', 'data.csv')))
+    assert old == os.path.getmtime(source)
+
+
+def test_fetch_hashes_only_changed_entries(monkeypatch, tmpdir):
+    source = _setup(monkeypatch, tmpdir)
+    download_cache.store('md5', _md5, source)
+    hashed = []
+    real_hash_file = download_cache.hash_file
+
+    def mock_hash_file(filename, hash_algorithm):
+        hashed.append(filename)
+        return real_hash_file(filename, hash_algorithm)
+
+    monkeypatch.setattr('anaconda_project.internal.download_cache.hash_file', mock_hash_file)
+    dest = str(tmpdir.join('project2', 'data.csv'))
+    assert download_cache.fetch('md5', _md5, dest)
+    assert download_cache.fetch('md5', _md5, dest)
+    assert [] == hashed
+
+    # touched but not changed, so it's hashed once and then trusted again
+    old = time.time() - 100
+    os.utime(source, (old, old))
+    assert download_cache.fetch('md5', _md5, dest)
+    assert download_cache.fetch('md5', _md5, dest)
+    assert [str(tmpdir.join('cache', 'downloads', 'md5-' + _md5))] == hashed
+
+
+def test_store_evicts_least_recently_used(monkeypatch, tmpdir):
+    _setup(monkeypatch, tmpdir)
+    # two MiB, so three of our two-thirds-of-a-MiB entries are one too many
+    monkeypatch.setenv(download_cache.SIZE_ENV_VAR, '2')
+    hashes = []
+    for i in range(3):
+        data = (b"%d" % i) * (700 * 1024)
+        source = tmpdir.join('file%d' % i)
+        source.write_binary(data)
+        hashes.append(hashlib.md5(data).hexdigest())
+    download_cache.store('md5', hashes[0], str(tmpdir.join('file0')))
+    time.sleep(0.05)
+    download_cache.store('md5', hashes[1], str(tmpdir.join('file1')))
+    time.sleep(0.05)
+    # using the first one makes the second the least recently used
+    assert download_cache.fetch('md5', hashes[0], str(tmpdir.join('project2', 'file0')))
+    time.sleep(0.05)
+    download_cache.store('md5', hashes[2], str(tmpdir.join('file2')))
+
+    names = sorted(name for name in os.listdir(str(tmpdir.join('cache', 'downloads'))) if name.startswith('md5-'))
+    assert sorted(['md5-' + hashes[0], 'md5-' + hashes[2]]) == names
+    index = user_dirs.load_json_file(str(tmpdir.join('cache', 'downloads', 'index.json')))
+    assert sorted(names) == sorted(index.keys())
+
+
+def test_store_ignores_errors(monkeypatch, tmpdir):
+    source = _setup(monkeypatch, tmpdir)
+
+    def mock_rename(src, dest):
+        raise OSError("nope")
+
+    monkeypatch.setattr('anaconda_project.internal.download_cache.rename_over_existing', mock_rename)
+    download_cache.store('md5', _md5, source)
+    assert [] == os.listdir(str(tmpdir.join('cache', 'downloads')))
+
+
+def test_enabled(monkeypatch):
+    monkeypatch.delenv(download_cache.DISABLE_ENV_VAR, raising=False)
+    assert download_cache.enabled()
+    monkeypatch.setenv(download_cache.DISABLE_ENV_VAR, '1')
+    assert not download_cache.enabled()
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (c) 2026, Anaconda, Inc. All rights reserved.
+#
+# Licensed under the terms of the BSD 3-Clause License.
+# The full license is in the file LICENSE.txt, distributed with this software.
+# -----------------------------------------------------------------------------
+from __future__ import absolute_import, print_function
+
+import hashlib
+import os
+
+from anaconda_project.internal import download_digests
+from anaconda_project.internal.download_cache import hash_file
+from anaconda_project.local_state_file import LocalStateFile
+
+_data = b"some downloaded data"
+_md5 = hashlib.md5(_data).hexdigest()
+
+
+def _setup(monkeypatch, tmpdir):
+    hashed = []
+
+    def mock_hash_file(filename, hash_algorithm):
+        hashed.append(filename)
+        return hash_file(filename, hash_algorithm)
+
+    monkeypatch.setattr('anaconda_project.internal.download_digests.hash_file', mock_hash_file)
+    filename = tmpdir.join('data.csv')
+    filename.write_binary(_data)
+    return (LocalStateFile.load_for_directory(str(tmpdir)), str(filename), hashed)
+
+
+def test_matches_only_what_was_hashed(monkeypatch, tmpdir):
+    (local_state_file, filename, hashed) = _setup(monkeypatch, tmpdir)
+    assert download_digests.matches(local_state_file, 'DATAFILE', filename, 'md5', _md5) is None
+    assert [] == hashed
+
+    download_digests.hash_all(local_state_file, [('DATAFILE', filename, 'md5')])
+    assert [filename] == hashed
+    assert download_digests.matches(local_state_file, 'DATAFILE', filename, 'md5', _md5.upper()) is True
+    assert download_digests.matches(local_state_file, 'DATAFILE', filename, 'md5', 'f' * 32) is False
+    assert [filename] == hashed
+    # it was saved, so another process knows too
+    reloaded = LocalStateFile.load_for_directory(str(tmpdir))
+    assert _md5 == reloaded.get_value([download_digests.SECTION, 'DATAFILE', 'digest'])
+
+    with open(filename, 'ab') as f:
+        f.write(b"more")
+    assert download_digests.matches(local_state_file, 'DATAFILE', filename, 'md5', _md5) is None
+    assert [filename] == hashed
+
+
+def test_matches_does_not_save(monkeypatch, tmpdir):
+    (local_state_file, filename, hashed) = _setup(monkeypatch, tmpdir)
+    download_digests.record(local_state_file, 'DATAFILE', filename, 'md5', _md5)
+    assert download_digests.matches(local_state_file, 'DATAFILE', filename, 'md5', _md5)
+    assert not os.path.exists(local_state_file.filename)
+
+
+def test_matches_missing_file(monkeypatch, tmpdir):
+    (local_state_file, filename, hashed) = _setup(monkeypatch, tmpdir)
+    download_digests.record(local_state_file, 'DATAFILE', filename, 'md5', _md5)
+    os.remove(filename)
+    assert download_digests.matches(local_state_file, 'DATAFILE', filename, 'md5', _md5) is None
+    assert [] == hashed
+
+
+def test_record_and_forget(monkeypatch, tmpdir):
+    (local_state_file, filename, hashed) = _setup(monkeypatch, tmpdir)
+    download_digests.record(local_state_file, 'DATAFILE', filename, 'md5', _md5)
+    assert download_digests.matches(local_state_file, 'DATAFILE', filename, 'md5', _md5)
+    # another algorithm means another digest, which we don't know
+    assert download_digests.matches(local_state_file, 'DATAFILE', filename, 'sha1',
+                                    hashlib.sha1(_data).hexdigest()) is None
+    assert [] == hashed
+
+    download_digests.forget(local_state_file, 'DATAFILE')
+    assert local_state_file.get_value([download_digests.SECTION, 'DATAFILE']) is None
+
+
+def test_stale_and_hash_all(monkeypatch, tmpdir):
+    (local_state_file, filename, hashed) = _setup(monkeypatch, tmpdir)
+    other = tmpdir.join('other.csv')
+    other.write_binary(b"other data")
+    files = [('DATAFILE', filename, 'md5'), ('OTHERFILE', str(other), 'sha256')]
+    download_digests.record(local_state_file, 'DATAFILE', filename, 'md5', _md5)
+
+    assert files[1:] == download_digests.stale(local_state_file, files)
+    assert files == download_digests.stale(local_state_file, files, force=True)
+
+    download_digests.hash_all(local_state_file, files)
+    assert sorted([filename, str(other)]) == sorted(hashed)
+    assert [] == download_digests.stale(local_state_file, files)
+    assert hashlib.sha256(b"other data").hexdigest() == local_state_file.get_value(
+        [download_digests.SECTION, 'OTHERFILE', 'digest'])
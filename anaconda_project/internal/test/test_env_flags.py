@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (c) 2026, Anaconda, Inc. All rights reserved.
+#
+# Licensed under the terms of the BSD 3-Clause License.
+# The full license is in the file LICENSE.txt, distributed with this software.
+# -----------------------------------------------------------------------------
+from __future__ import absolute_import, print_function
+
+from anaconda_project.internal.env_flags import env_flag
+
+
+def test_env_flag_true_values():
+    for value in ('1', 'true', 'TRUE', 'yes', 'on', ' y '):
+        assert env_flag('FOO', dict(FOO=value))
+
+
+def test_env_flag_false_values():
+    for value in ('', '0', 'false', 'False', 'no', 'OFF', ' 0 '):
+        assert not env_flag('FOO', dict(FOO=value))
+    assert not env_flag('FOO', dict())
+
+
+def test_env_flag_defaults_to_os_environ(monkeypatch):
+    monkeypatch.setenv('ANACONDA_PROJECT_TEST_FLAG', 'yes')
+    assert env_flag('ANACONDA_PROJECT_TEST_FLAG')
+    monkeypatch.setenv('ANACONDA_PROJECT_TEST_FLAG', 'no')
+    assert not env_flag('ANACONDA_PROJECT_TEST_FLAG')
@@ -7,16 +7,23 @@
 # -----------------------------------------------------------------------------
 from __future__ import absolute_import, print_function
 
-from anaconda_project.internal.http_client import FileDownloader
+from anaconda_project.internal import http_client, user_dirs
+from anaconda_project.internal.http_client import (FileDownloader, DownloadMetrics, download_all, rank_mirrors,
+                                                   _PipelinedWriter)
 from anaconda_project.internal.test.http_server import HttpServerTestContext
 from anaconda_project.internal.test.tmpfile_utils import with_directory_contents
+from anaconda_project.internal.ziputils import StreamingUnpacker
 
+from tornado import gen
+from tornado.concurrent import Future
 from tornado.ioloop import IOLoop
 
+import hashlib
 import os
 import sys
 import platform
 import stat
+import threading
 
 
 def _download_file(length, hash_algorithm):
@@ -35,6 +42,15 @@ def _download_file(length, hash_algorithm):
             statinfo = os.stat(filename)
             assert statinfo.st_size == length
             assert not os.path.isfile(filename + ".part")
+            metrics = download.metrics.to_json()
+            assert length == metrics['bytes']
+            assert url == metrics['url']
+            assert 0 == metrics['retries']
+            assert not metrics['cached']
+            assert metrics['duration'] > 0
+            if length > 0:
+                assert 0 < metrics['time_to_first_byte'] <= metrics['duration']
+                assert metrics['peak_throughput'] > 0
 
     with_directory_contents(dict(), inside_directory_download_file)
 
@@ -68,6 +84,520 @@ def _test_download_huge_file_md5():
     _download_file(int(giga * 0.2), 'md5')
 
 
+def test_download_all():
+    def inside_directory_download_all(dirname):
+        with HttpServerTestContext() as server:
+            urls = [server.new_download_url(download_length=1024 * i, hash_algorithm='md5') for i in range(1, 4)]
+            urls.append(server.error_url)
+            downloads = [
+                FileDownloader(url=url, filename=os.path.join(dirname, "file%d" % i), hash_algorithm='md5')
+                for (i, url) in enumerate(urls)
+            ]
+            results = IOLoop.current().run_sync(lambda: download_all(downloads, max_connections=2))
+            assert 4 == len(results)
+            for (i, (url, download, (response, exception))) in enumerate(zip(urls[:3], downloads, results)):
+                assert exception is None
+                assert [] == download.errors
+                assert response.code == 200
+                assert download.hash == server.server_computed_hash_for_downloaded_url(url)
+                assert os.stat(os.path.join(dirname, "file%d" % i)).st_size == 1024 * (i + 1)
+            (response, exception) = results[3]
+            assert response is None
+            assert exception is None
+            error_filename = os.path.join(dirname, "file3")
+            assert ['Failed download to %s: HTTP 404: Not Found' % error_filename] == downloads[3].errors
+
+    with_directory_contents(dict(), inside_directory_download_all)
+
+
+def test_download_all_exception(monkeypatch):
+    from tornado import gen
+
+    @gen.coroutine
+    def mock_run(self):
+        raise ValueError("boom")
+
+    monkeypatch.setattr('anaconda_project.internal.http_client.FileDownloader.run', mock_run)
+    downloads = [FileDownloader(url="http://localhost/nope", filename="nope")]
+    [(response, exception)] = IOLoop.current().run_sync(lambda: download_all(downloads, max_connections=1))
+    assert response is None
+    assert "boom" == str(exception)
+
+
+def _interrupted_download(dirname, server, resumable):
+    filename = os.path.join(dirname, "downloaded-file")
+    url = server.new_download_url(download_length=300000, hash_algorithm='md5', resumable=resumable, fail_after=100000)
+    download = FileDownloader(url=url, filename=filename, hash_algorithm='md5')
+    response = IOLoop.current().run_sync(download.run)
+    assert response is None
+    assert 1 == len(download.errors)
+    assert download.errors[0].startswith("Failed download to %s: " % filename)
+    return (url, filename)
+
+
+def _check_finished_download(server, url, filename):
+    download = FileDownloader(url=url, filename=filename, hash_algorithm='md5')
+    response = IOLoop.current().run_sync(download.run)
+    assert [] == download.errors
+    expected = server.download_content(300000)
+    with open(filename, 'rb') as f:
+        assert expected == f.read()
+    assert hashlib.md5(expected).hexdigest() == download.hash
+    assert not os.path.exists(filename + ".part")
+    assert not os.path.exists(filename + ".part.json")
+    return response
+
+
+def test_download_resumes_after_failure():
+    def inside_directory_resume(dirname):
+        with HttpServerTestContext() as server:
+            (url, filename) = _interrupted_download(dirname, server, resumable=True)
+            assert 0 < os.path.getsize(filename + ".part") <= 100000
+            assert os.path.isfile(filename + ".part.json")
+
+            response = _check_finished_download(server, url, filename)
+            assert 206 == response.code
+
+    with_directory_contents(dict(), inside_directory_resume)
+
+
+def test_download_restarts_when_file_changed():
+    def inside_directory_restart(dirname):
+        with HttpServerTestContext() as server:
+            (url, filename) = _interrupted_download(dirname, server, resumable=True)
+            sidecar = user_dirs.load_json_file(filename + ".part.json")
+            sidecar['validator'] = '"something-else"'
+            user_dirs.save_json_file(filename + ".part.json", sidecar)
+
+            response = _check_finished_download(server, url, filename)
+            assert 200 == response.code
+
+    with_directory_contents(dict(), inside_directory_restart)
+
+
+def test_download_does_not_resume_other_url():
+    def inside_directory_other_url(dirname):
+        with HttpServerTestContext() as server:
+            (url, filename) = _interrupted_download(dirname, server, resumable=True)
+            with open(filename + ".part", 'wb') as f:
+                f.write(b"not the same file")
+            url = server.new_download_url(download_length=300000, hash_algorithm='md5', resumable=True)
+
+            response = _check_finished_download(server, url, filename)
+            assert 200 == response.code
+
+    with_directory_contents(dict(), inside_directory_other_url)
+
+
+def test_download_without_validator_is_not_kept():
+    def inside_directory_no_validator(dirname):
+        with HttpServerTestContext() as server:
+            (url, filename) = _interrupted_download(dirname, server, resumable=False)
+            assert not os.path.exists(filename + ".part")
+            assert not os.path.exists(filename + ".part.json")
+
+    with_directory_contents(dict(), inside_directory_no_validator)
+
+
+def _segmented_download(monkeypatch, dirname, server, resumable):
+    # small segments, so we don't need huge files to test them
+    monkeypatch.setattr('anaconda_project.internal.http_client._MIN_SEGMENT_SIZE', 50000)
+    filename = os.path.join(dirname, "downloaded-file")
+    url = server.new_download_url(download_length=300000, hash_algorithm='md5', resumable=resumable)
+    download = FileDownloader(url=url, filename=filename, hash_algorithm='md5', segments=4)
+    response = IOLoop.current().run_sync(download.run)
+    assert [] == download.errors
+    expected = server.download_content(300000)
+    with open(filename, 'rb') as f:
+        assert expected == f.read()
+    assert hashlib.md5(expected).hexdigest() == download.hash
+    assert not os.path.exists(filename + ".part")
+    return (url, response, download.metrics)
+
+
+def test_download_in_segments(monkeypatch):
+    def inside_directory_segments(dirname):
+        with HttpServerTestContext() as server:
+            (url, response, metrics) = _segmented_download(monkeypatch, dirname, server, resumable=True)
+            assert 206 == response.code
+            assert 4 == server.range_requests_for_downloaded_url(url)
+            assert 300000 == metrics.bytes
+            assert 0 == metrics.retries
+
+    with_directory_contents(dict(), inside_directory_segments)
+
+
+def test_download_in_segments_falls_back_without_ranges(monkeypatch):
+    def inside_directory_no_ranges(dirname):
+        with HttpServerTestContext() as server:
+            (url, response, metrics) = _segmented_download(monkeypatch, dirname, server, resumable=False)
+            assert 200 == response.code
+            assert 0 == server.range_requests_for_downloaded_url(url)
+
+    with_directory_contents(dict(), inside_directory_no_ranges)
+
+
+def test_download_in_segments_falls_back_when_ranges_ignored(monkeypatch):
+    def inside_directory_ranges_ignored(dirname):
+        with HttpServerTestContext() as server:
+            # a server that advertises ranges, but whose file changed from what we probed
+            monkeypatch.setattr('anaconda_project.internal.http_client.FileDownloader._probe_for_segments',
+                                _probe_with_validator('"stale"'))
+            (url, response, metrics) = _segmented_download(monkeypatch, dirname, server, resumable=True)
+            assert 200 == response.code
+            assert 0 == server.range_requests_for_downloaded_url(url)
+            # we asked once for ranges, then again for all of it
+            assert 1 == metrics.retries
+
+    with_directory_contents(dict(), inside_directory_ranges_ignored)
+
+
+def test_download_in_segments_has_http_error(monkeypatch):
+    def inside_directory_segment_error(dirname):
+        monkeypatch.setattr('anaconda_project.internal.http_client._MIN_SEGMENT_SIZE', 50000)
+        monkeypatch.setattr('anaconda_project.internal.http_client.FileDownloader._probe_for_segments',
+                            _probe_with_validator(None))
+        filename = os.path.join(dirname, "downloaded-file")
+        with HttpServerTestContext() as server:
+            download = FileDownloader(url=server.error_url, filename=filename, hash_algorithm='md5', segments=4)
+            response = IOLoop.current().run_sync(download.run)
+            assert ['Failed download to %s: HTTP 404: Not Found' % filename] == download.errors
+            assert response is None
+            assert download.hash is None
+            assert not os.path.isfile(filename)
+            assert not os.path.isfile(filename + ".part")
+
+    with_directory_contents(dict(), inside_directory_segment_error)
+
+
+def _mirrored_download(dirname, server, first_url, second_url, **kwargs):
+    filename = os.path.join(dirname, "downloaded-file")
+    download = FileDownloader(url=first_url,
+                              filename=filename,
+                              hash_algorithm='md5',
+                              mirrors=[first_url, second_url],
+                              **kwargs)
+    response = IOLoop.current().run_sync(download.run)
+    assert [] == download.errors
+    expected = server.download_content(300000)
+    with open(filename, 'rb') as f:
+        assert expected == f.read()
+    assert hashlib.md5(expected).hexdigest() == download.hash
+    assert not os.path.exists(filename + ".part")
+    assert 1 == download.metrics.retries
+    assert second_url == download.metrics.url
+    return response
+
+
+def test_download_fails_over_to_mirror():
+    def inside_directory_mirror(dirname):
+        with HttpServerTestContext() as server:
+            failing = server.new_download_url(download_length=300000, hash_algorithm='md5', fail_after=100000)
+            mirror = server.new_download_url(download_length=300000, hash_algorithm='md5', resumable=True)
+            response = _mirrored_download(dirname, server, failing, mirror)
+            # the mirror sent only what we didn't have
+            assert 206 == response.code
+            assert 1 == server.range_requests_for_downloaded_url(mirror)
+
+    with_directory_contents(dict(), inside_directory_mirror)
+
+
+def test_download_fails_over_to_mirror_without_ranges():
+    def inside_directory_mirror_no_ranges(dirname):
+        with HttpServerTestContext() as server:
+            failing = server.new_download_url(download_length=300000, hash_algorithm='md5', fail_after=100000)
+            mirror = server.new_download_url(download_length=300000, hash_algorithm='md5')
+            response = _mirrored_download(dirname, server, failing, mirror)
+            assert 200 == response.code
+
+    with_directory_contents(dict(), inside_directory_mirror_no_ranges)
+
+
+def test_download_fails_over_from_stalled_mirror(monkeypatch):
+    def inside_directory_stalled_mirror(dirname):
+        monkeypatch.setenv('ANACONDA_PROJECT_DOWNLOAD_STALL_TIMEOUT', '1')
+        with HttpServerTestContext() as server:
+            stalled = server.new_download_url(download_length=300000, hash_algorithm='md5', stall_after=100000)
+            mirror = server.new_download_url(download_length=300000, hash_algorithm='md5', resumable=True)
+            response = _mirrored_download(dirname, server, stalled, mirror)
+            assert 206 == response.code
+
+    with_directory_contents(dict(), inside_directory_stalled_mirror)
+
+
+def test_download_fails_over_from_segmented_download(monkeypatch):
+    def inside_directory_segmented_mirror(dirname):
+        monkeypatch.setattr('anaconda_project.internal.http_client._MIN_SEGMENT_SIZE', 50000)
+        monkeypatch.setattr('anaconda_project.internal.http_client.FileDownloader._probe_for_segments',
+                            _probe_with_validator(None))
+        with HttpServerTestContext() as server:
+            # one of the segments fails
+            failing = server.new_download_url(download_length=300000,
+                                              hash_algorithm='md5',
+                                              resumable=True,
+                                              fail_after=100000)
+            mirror = server.new_download_url(download_length=300000, hash_algorithm='md5')
+            response = _mirrored_download(dirname, server, failing, mirror, segments=4)
+            assert 200 == response.code
+            assert 4 == server.range_requests_for_downloaded_url(failing)
+
+    with_directory_contents(dict(), inside_directory_segmented_mirror)
+
+
+def test_download_all_mirrors_fail():
+    def inside_directory_mirrors_fail(dirname):
+        filename = os.path.join(dirname, "downloaded-file")
+        with HttpServerTestContext() as server:
+            failing = server.new_download_url(download_length=300000, hash_algorithm='md5', fail_after=100000)
+            download = FileDownloader(url=failing,
+                                      filename=filename,
+                                      hash_algorithm='md5',
+                                      mirrors=[failing, server.error_url])
+            response = IOLoop.current().run_sync(download.run)
+            assert response is None
+            assert 2 == len(download.errors)
+            assert download.errors[0].startswith("Failed download to %s from %s: " % (filename, failing))
+            assert ("Failed download to %s from %s: HTTP 404: Not Found" %
+                    (filename, server.error_url)) == download.errors[1]
+            assert not os.path.exists(filename)
+            assert not os.path.exists(filename + ".part")
+
+    with_directory_contents(dict(), inside_directory_mirrors_fail)
+
+
+def test_download_keeps_partial_when_all_mirrors_fail():
+    def inside_directory_mirrors_fail_resumable(dirname):
+        filename = os.path.join(dirname, "downloaded-file")
+        with HttpServerTestContext() as server:
+            url = server.new_download_url(download_length=300000,
+                                          hash_algorithm='md5',
+                                          resumable=True,
+                                          fail_after=100000)
+            download = FileDownloader(url=url, filename=filename, hash_algorithm='md5', mirrors=[url, server.error_url])
+            response = IOLoop.current().run_sync(download.run)
+            assert response is None
+            assert 2 == len(download.errors)
+            assert 0 < os.path.getsize(filename + ".part") <= 100000
+            assert os.path.isfile(filename + ".part.json")
+
+            response = _check_finished_download(server, url, filename)
+            assert 206 == response.code
+
+    with_directory_contents(dict(), inside_directory_mirrors_fail_resumable)
+
+
+def test_rank_mirrors():
+    with HttpServerTestContext() as server:
+        url = server.new_download_url(download_length=100, hash_algorithm=None)
+        # nothing listens on the discard port
+        unreachable = "http://127.0.0.1:9/nothing"
+        assert [url, unreachable] == IOLoop.current().run_sync(lambda: rank_mirrors([unreachable, url]))
+        assert [url] == IOLoop.current().run_sync(lambda: rank_mirrors([url]))
+
+
+def _probe_with_validator(validator):
+    from tornado import gen
+
+    @gen.coroutine
+    def mock_probe(self, client):
+        raise gen.Return((self._url, 300000, validator))
+
+    return mock_probe
+
+
+def test_download_to_unpacker():
+    def inside_directory_unpacker(dirname):
+        filename = os.path.join(dirname, "downloaded-file")
+        with HttpServerTestContext() as server:
+            url = server.new_download_url(download_length=300000, hash_algorithm='md5')
+            unpacker = StreamingUnpacker(os.path.join(dirname, "unpacked"))
+            download = FileDownloader(url=url, filename=filename, hash_algorithm='md5', unpacker=unpacker)
+            response = IOLoop.current().run_sync(download.run)
+            assert [] == download.errors
+            assert 200 == response.code
+            assert download.streamed
+            assert download.hash == server.server_computed_hash_for_downloaded_url(url)
+            assert not os.path.exists(filename)
+            assert not os.path.exists(filename + ".part")
+            # the test server doesn't send an archive
+            errors = []
+            assert not unpacker.finish(errors)
+            assert errors[0].startswith("Failed to unzip ")
+            assert [] == os.listdir(dirname)
+
+    with_directory_contents(dict(), inside_directory_unpacker)
+
+
+def test_download_writes_off_the_ioloop_thread():
+    class RecordingUnpacker(object):
+        def __init__(self):
+            self.threads = set()
+            self.size = 0
+
+        def write(self, chunk):
+            self.threads.add(threading.current_thread())
+            self.size += len(chunk)
+
+    def inside_directory_writer_thread(dirname):
+        filename = os.path.join(dirname, "downloaded-file")
+        with HttpServerTestContext() as server:
+            url = server.new_download_url(download_length=300000, hash_algorithm='md5')
+            unpacker = RecordingUnpacker()
+            download = FileDownloader(url=url, filename=filename, hash_algorithm='md5', unpacker=unpacker)
+            response = IOLoop.current().run_sync(download.run)
+            assert [] == download.errors
+            assert 200 == response.code
+            assert 300000 == unpacker.size
+            assert download.hash == server.server_computed_hash_for_downloaded_url(url)
+            assert 1 == len(unpacker.threads)
+            assert threading.current_thread() not in unpacker.threads
+
+    with_directory_contents(dict(), inside_directory_writer_thread)
+
+
+def test_pipelined_writer_batches_and_waits_for_writes(monkeypatch):
+    monkeypatch.setattr('anaconda_project.internal.http_client._WRITE_QUEUE_SIZE', 20)
+    monkeypatch.setattr('anaconda_project.internal.http_client._WRITE_BATCH_SIZE', 20)
+    started = threading.Event()
+    release = threading.Event()
+    written = []
+
+    def write(data):
+        started.set()
+        release.wait()
+        written.append(data)
+
+    hasher = hashlib.md5()
+    writer = _PipelinedWriter(write, hasher, "test writer")
+    assert writer.put(b"0123456789")
+    started.wait()
+    # the thread is busy with the first chunk, so these fill the queue
+    for chunk in (b"abcdefghij", b"klmnopqrst"):
+        assert writer.put(chunk)
+    blocked = threading.Thread(target=lambda: writer.put(b"ABCDEFGHIJ"))
+    blocked.start()
+    blocked.join(0.2)
+    assert blocked.is_alive()
+
+    release.set()
+    blocked.join()
+    writer.finish()
+    assert [b"0123456789", b"abcdefghijklmnopqrst", b"ABCDEFGHIJ"] == written
+    assert hashlib.md5(b"".join(written)).hexdigest() == hasher.hexdigest()
+    assert writer.error is None
+
+
+def test_pipelined_writer_counts_time_blocked(monkeypatch):
+    monkeypatch.setattr('anaconda_project.internal.http_client._WRITE_QUEUE_SIZE', 10)
+    release = threading.Event()
+    writer = _PipelinedWriter(lambda data: release.wait(), None, "test writer")
+    before = http_client._seconds_blocked_on_writers()
+    assert writer.put(b"0123456789")
+    assert writer.put(b"abcdefghij")
+    threading.Timer(0.2, release.set).start()
+    # the queue is full until the writer gets going again
+    assert writer.put(b"ABCDEFGHIJ")
+    writer.finish()
+    assert http_client._seconds_blocked_on_writers() - before >= 0.1
+
+
+def test_fetch_does_not_count_time_blocked_as_stalled(monkeypatch):
+    monkeypatch.setenv('ANACONDA_PROJECT_DOWNLOAD_STALL_TIMEOUT', '1')
+    downloader = FileDownloader(url='http://example.com/data', filename='data', hash_algorithm=None)
+    downloader._metrics = DownloadMetrics('http://example.com/data')
+
+    class FakeClient(object):
+        def fetch(self, request):
+            self.future = Future()
+            return self.future
+
+    client = FakeClient()
+
+    def block_writers():
+        # as if a writer's put() had kept the IOLoop waiting
+        http_client._blocked.seconds = http_client._seconds_blocked_on_writers() + 0.5
+
+    @gen.coroutine
+    def fetch():
+        IOLoop.current().call_later(0.5, block_writers)
+        IOLoop.current().call_later(1.5, lambda: client.future.set_result('response'))
+        response = yield downloader._fetch(client, 'request', watch_for_stall=True)
+        raise gen.Return(response)
+
+    assert 'response' == IOLoop(make_current=False).run_sync(fetch)
+
+
+def test_pipelined_writer_fails():
+    def write(data):
+        raise IOError("FAIL")
+
+    writer = _PipelinedWriter(write, None, "test writer")
+    writer.put(b"data")
+    writer.finish()
+    assert "FAIL" == str(writer.error)
+    assert not writer.put(b"more")
+
+
+def test_download_metrics_peak_throughput(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr('anaconda_project.internal.http_client.time.monotonic', lambda: now[0])
+    metrics = DownloadMetrics('http://example.com/data')
+    for (seconds, size) in ((0.5, 1000), (0.5, 1000), (0.5, 1000), (0.5, 4000)):
+        now[0] += seconds
+        metrics.add(size)
+    metrics.finish()
+    assert 0.5 == metrics.time_to_first_byte
+    assert 2.0 == metrics.duration
+    assert 7000 == metrics.bytes
+    assert 3500.0 == metrics.average_throughput
+    # the second window, from 1.5 to 2.0 seconds
+    assert 8000.0 == metrics.peak_throughput
+
+
+def test_download_metrics_for_cached_file():
+    metrics = DownloadMetrics('http://example.com/data', cached=True)
+    metrics.finish(size=1234)
+    json = metrics.to_json()
+    assert json['cached']
+    assert 1234 == json['bytes']
+    assert json['time_to_first_byte'] is None
+    assert json['peak_throughput'] == json['average_throughput']
+
+
+def test_download_not_modified():
+    def inside_directory_not_modified(dirname):
+        filename = os.path.join(dirname, "downloaded-file")
+        with HttpServerTestContext() as server:
+            url = server.new_download_url(download_length=1000, hash_algorithm='md5', resumable=True)
+            download = FileDownloader(url=url, filename=filename, hash_algorithm='md5')
+            response = IOLoop.current().run_sync(download.run)
+            assert 200 == response.code
+            validators = download.validators
+            assert ['etag'] == list(validators.keys())
+
+            with open(filename, 'wb') as f:
+                f.write(b"unchanged")
+            download = FileDownloader(url=url, filename=filename, hash_algorithm='md5', previous_validators=validators)
+            response = IOLoop.current().run_sync(download.run)
+            assert [] == download.errors
+            assert 304 == response.code
+            assert download.hash is None
+            with open(filename, 'rb') as f:
+                assert b"unchanged" == f.read()
+            assert not os.path.exists(filename + ".part")
+
+            # a stale validator gets us the file again
+            download = FileDownloader(url=url,
+                                      filename=filename,
+                                      hash_algorithm='md5',
+                                      previous_validators=dict(etag='"stale"'))
+            response = IOLoop.current().run_sync(download.run)
+            assert 200 == response.code
+            assert download.hash == server.server_computed_hash_for_downloaded_url(url)
+
+    with_directory_contents(dict(), inside_directory_not_modified)
+
+
 def test_download_has_http_error():
     def inside_directory_get_http_error(dirname):
         filename = os.path.join(dirname, "downloaded-file")
@@ -190,6 +190,21 @@ downloads:
         assert '# Downloads from anaconda-project.yml' in result
         assert 'DATASET = https://example.com/data.csv' in result
 
+    def test_download_mirrors_as_comments(self):
+        project = self._make_project("""
+name: DlTest
+packages: []
+platforms:
+  - linux-64
+downloads:
+  DATASET:
+    url: [https://example.com/data.csv, https://mirror.example.com/data.csv]
+    md5: 12345abcdef
+""")
+        result = export_pixi_toml(project)
+        assert ('#   DATASET = https://example.com/data.csv\n'
+                '#     mirror: https://mirror.example.com/data.csv\n') in result
+
     def test_project_dir_translated(self):
         project = self._make_project("""
 name: PdTest
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (c) 2026, Anaconda, Inc. All rights reserved.
+#
+# Licensed under the terms of the BSD 3-Clause License.
+# The full license is in the file LICENSE.txt, distributed with this software.
+# -----------------------------------------------------------------------------
+from __future__ import absolute_import, print_function
+
+from importlib.metadata import EntryPoint
+import os
+
+from anaconda_project.internal import plugins, user_dirs
+
+_group = 'anaconda_project.plugins.command_run'
+
+
+def _mock_entry_points(monkeypatch, tmpdir):
+    scans = []
+
+    def mock_entry_points(group):
+        scans.append(group)
+        return [EntryPoint(name='my_plugin', value='my_module:MyCommand', group=group)]
+
+    monkeypatch.setattr('anaconda_project.internal.plugins.entry_points', mock_entry_points)
+    monkeypatch.setattr('anaconda_project.internal.plugins._index_cache', dict())
+    monkeypatch.setenv(user_dirs.CACHE_DIR_ENV_VAR, str(tmpdir.join('cache')))
+    monkeypatch.delenv('ANACONDA_PROJECT_DISABLE_ENTRY_POINT_CACHE', raising=False)
+    site = tmpdir.mkdir('site')
+    monkeypatch.setattr('sys.path', [str(site)])
+    return (scans, str(site))
+
+
+def test_get_group_named_uses_index(monkeypatch, tmpdir):
+    (scans, site) = _mock_entry_points(monkeypatch, tmpdir)
+
+    group = plugins.get_group_named(_group)
+    assert ['my_plugin'] == list(group.keys())
+    assert 'my_module:MyCommand' == group['my_plugin'].value
+    assert _group == group['my_plugin'].group
+    assert [_group] == scans
+
+    plugins.get_group_named(_group)
+    assert [_group] == scans
+
+    # a new process would find the index on disk
+    monkeypatch.setattr('anaconda_project.internal.plugins._index_cache', dict())
+    plugins.get_group_named(_group)
+    assert [_group] == scans
+
+    # groups are added to the index as needed
+    plugins.get_group_named('other')
+    assert [_group, 'other'] == scans
+
+
+def test_get_group_named_rescans_when_sys_path_changes(monkeypatch, tmpdir):
+    (scans, site) = _mock_entry_points(monkeypatch, tmpdir)
+
+    plugins.get_group_named(_group)
+    mtime = os.path.getmtime(site)
+    os.utime(site, (mtime + 10, mtime + 10))
+    plugins.get_group_named(_group)
+    assert [_group, _group] == scans
+
+    monkeypatch.setattr('sys.path', [site, str(tmpdir)])
+    plugins.get_group_named(_group)
+    assert [_group, _group, _group] == scans
+
+
+def test_get_group_named_without_cache(monkeypatch, tmpdir):
+    (scans, site) = _mock_entry_points(monkeypatch, tmpdir)
+    monkeypatch.setenv('ANACONDA_PROJECT_DISABLE_ENTRY_POINT_CACHE', '1')
+
+    plugins.get_group_named(_group)
+    plugins.get_group_named(_group)
+    assert [_group, _group] == scans
+    assert not os.path.exists(str(tmpdir.join('cache')))
+
+
+def test_get_group_named_unwritable_cache(monkeypatch, tmpdir):
+    (scans, site) = _mock_entry_points(monkeypatch, tmpdir)
+
+    def mock_save_json_file(filename, value):
+        raise IOError("nope")
+
+    monkeypatch.setattr('anaconda_project.internal.user_dirs.save_json_file', mock_save_json_file)
+    assert ['my_plugin'] == list(plugins.get_group_named(_group).keys())
+
+
+def test_get_plugins_loads_lazily(monkeypatch, tmpdir):
+    (scans, site) = _mock_entry_points(monkeypatch, tmpdir)
+    loads = []
+
+    class MyCommand(object):
+        def __init__(self, name, attributes):
+            self.name = name
+            self.attributes = attributes
+
+    def mock_load(self):
+        loads.append(self.value)
+        return MyCommand
+
+    monkeypatch.setattr('importlib.metadata.EntryPoint.load', mock_load)
+
+    found = plugins.get_plugins('command_run')
+    assert ['my_plugin'] == list(found.keys())
+    assert [] == loads
+
+    command = found['my_plugin'](name='foo', attributes=dict(my_plugin='bar'))
+    assert isinstance(command, MyCommand)
+    assert 'foo' == command.name
+    found['my_plugin'](name='foo', attributes=dict())
+    assert MyCommand is found['my_plugin'].load()
+    assert ['my_module:MyCommand'] == loads
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (c) 2026, Anaconda, Inc. All rights reserved.
+#
+# Licensed under the terms of the BSD 3-Clause License.
+# The full license is in the file LICENSE.txt, distributed with this software.
+# -----------------------------------------------------------------------------
+from __future__ import absolute_import, print_function
+
+from anaconda_project.internal import port_leases, user_dirs
+
+
+def _setup(monkeypatch, tmpdir, in_use=()):
+    monkeypatch.setenv(user_dirs.CACHE_DIR_ENV_VAR, str(tmpdir))
+    probed = []
+
+    def mock_ports_in_use(host, ports, timeout_seconds=0.5):
+        probed.append(list(ports))
+        return set(ports) & set(in_use)
+
+    monkeypatch.setattr('anaconda_project.requirements_registry.network_util.ports_in_use', mock_ports_in_use)
+    return probed
+
+
+def test_lease_skips_ports_in_use_and_leased(monkeypatch, tmpdir):
+    probed = _setup(monkeypatch, tmpdir, in_use=[7000])
+    assert 7001 == port_leases.lease_free_port('localhost', 7000, 7010, owner='a')
+    # someone else starting a service at the same time
+    assert 7002 == port_leases.lease_free_port('localhost', 7000, 7010, owner='b')
+    assert [list(range(7000, 7011)), [7000] + list(range(7002, 7011))] == probed
+    # but our own lease is still ours
+    assert 7001 == port_leases.lease_free_port('localhost', 7000, 7010, owner='a')
+
+    port_leases.release(7001, owner='b')
+    assert 7003 == port_leases.lease_free_port('localhost', 7000, 7010, owner='c')
+    port_leases.release(7001, owner='a')
+    assert 7001 == port_leases.lease_free_port('localhost', 7000, 7010, owner='d')
+
+
+def test_lease_expires(monkeypatch, tmpdir):
+    _setup(monkeypatch, tmpdir)
+    assert 7000 == port_leases.lease_free_port('localhost', 7000, 7001, owner='a')
+    assert 7001 == port_leases.lease_free_port('localhost', 7000, 7001, owner='b')
+    assert port_leases.lease_free_port('localhost', 7000, 7001, owner='c') is None
+
+    monkeypatch.setattr('anaconda_project.internal.port_leases._LEASE_SECONDS', 0)
+    assert 7000 == port_leases.lease_free_port('localhost', 7000, 7001, owner='c')
+
+
+def test_lease_probes_in_batches(monkeypatch, tmpdir):
+    monkeypatch.setattr('anaconda_project.internal.port_leases._PROBE_BATCH_SIZE', 4)
+    probed = _setup(monkeypatch, tmpdir, in_use=range(7000, 7005))
+    assert 7005 == port_leases.lease_free_port('localhost', 7000, 7020, owner='a')
+    assert [[7000, 7001, 7002, 7003], [7004, 7005, 7006, 7007]] == probed
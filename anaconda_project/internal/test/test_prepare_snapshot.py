@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (c) 2026, Anaconda, Inc. All rights reserved.
+#
+# Licensed under the terms of the BSD 3-Clause License.
+# The full license is in the file LICENSE.txt, distributed with this software.
+# -----------------------------------------------------------------------------
+from __future__ import absolute_import, print_function
+
+import codecs
+import os
+
+from anaconda_project.internal import prepare_snapshot
+from anaconda_project.internal.cli.prepare_with_mode import UI_MODE_TEXT_ASSUME_YES_DEVELOPMENT
+from anaconda_project.internal.test.tmpfile_utils import (with_directory_contents,
+                                                          with_directory_contents_completing_project_file)
+from anaconda_project.prepare import prepare_without_interaction
+from anaconda_project.project_file import DEFAULT_PROJECT_FILENAME
+from anaconda_project.test.project_utils import project_no_dedicated_env
+
+_project_with_command = """
+commands:
+  default:
+    unix: echo hello
+    windows: echo hello
+variables:
+  FOO: {}
+"""
+
+
+def _prepare_and_save(dirname, environ, command_name=None):
+    project = project_no_dedicated_env(dirname)
+    result = prepare_without_interaction(project, environ=environ, command_name=command_name)
+    assert result
+    prepare_snapshot.save(project,
+                          result,
+                          project.command_for_name(command_name),
+                          ui_mode=UI_MODE_TEXT_ASSUME_YES_DEVELOPMENT,
+                          env_spec_name=None,
+                          command_name=command_name,
+                          project_dir=dirname,
+                          environ=environ)
+    return result
+
+
+def _load(dirname, environ, extra_args=None):
+    return prepare_snapshot.load_exec_info(dirname,
+                                           UI_MODE_TEXT_ASSUME_YES_DEVELOPMENT,
+                                           None,
+                                           None,
+                                           extra_command_args=extra_args,
+                                           environ=environ)
+
+
+def _snapshot_count():
+    directory = prepare_snapshot.user_dirs.user_cache_dir('prepare-snapshots')
+    if not os.path.isdir(directory):
+        return 0
+    return len(os.listdir(directory))
+
+
+def test_save_and_load_exec_info(monkeypatch, tmpdir):
+    monkeypatch.setenv('ANACONDA_PROJECT_CACHE_DIR', str(tmpdir))
+    monkeypatch.delenv(prepare_snapshot.DISABLE_ENV_VAR, raising=False)
+
+    def check(dirname):
+        environ = dict(os.environ, FOO='bar')
+        result = _prepare_and_save(dirname, environ)
+        assert 1 == _snapshot_count()
+
+        exec_info = _load(dirname, dict(environ), extra_args=['world'])
+        assert exec_info is not None
+        assert ['echo hello world'] == exec_info.args
+        assert ['echo hello'] == result.command_exec_info.args
+        assert result.command_exec_info.shell == exec_info.shell
+        assert result.command_exec_info.cwd == exec_info.cwd
+        assert 'bar' == exec_info.env['FOO']
+        assert dirname == exec_info.env['PROJECT_DIR']
+        assert result.environ['CONDA_PREFIX'] == exec_info.env['CONDA_PREFIX']
+
+    with_directory_contents_completing_project_file({DEFAULT_PROJECT_FILENAME: _project_with_command}, check)
+
+
+def test_snapshot_invalid_after_project_file_changes(monkeypatch, tmpdir):
+    monkeypatch.setenv('ANACONDA_PROJECT_CACHE_DIR', str(tmpdir))
+    monkeypatch.delenv(prepare_snapshot.DISABLE_ENV_VAR, raising=False)
+
+    def check(dirname):
+        environ = dict(os.environ, FOO='bar')
+        _prepare_and_save(dirname, environ)
+        assert _load(dirname, environ) is not None
+
+        with codecs.open(os.path.join(dirname, DEFAULT_PROJECT_FILENAME), 'a', 'utf-8') as f:
+            f.write("\n# changed\n")
+        assert _load(dirname, environ) is None
+
+    with_directory_contents_completing_project_file({DEFAULT_PROJECT_FILENAME: _project_with_command}, check)
+
+
+def test_snapshot_invalid_after_local_state_file_created(monkeypatch, tmpdir):
+    monkeypatch.setenv('ANACONDA_PROJECT_CACHE_DIR', str(tmpdir))
+    monkeypatch.delenv(prepare_snapshot.DISABLE_ENV_VAR, raising=False)
+
+    def check(dirname):
+        environ = dict(os.environ, FOO='bar')
+        _prepare_and_save(dirname, environ)
+        assert _load(dirname, environ) is not None
+
+        with codecs.open(os.path.join(dirname, 'anaconda-project-local.yaml'), 'w', 'utf-8') as f:
+            f.write("variables:\n  FOO: baz\n")
+        assert _load(dirname, environ) is None
+
+    with_directory_contents_completing_project_file({DEFAULT_PROJECT_FILENAME: _project_with_command}, check)
+
+
+def test_snapshot_invalid_after_environ_changes(monkeypatch, tmpdir):
+    monkeypatch.setenv('ANACONDA_PROJECT_CACHE_DIR', str(tmpdir))
+    monkeypatch.delenv(prepare_snapshot.DISABLE_ENV_VAR, raising=False)
+
+    def check(dirname):
+        environ = dict(os.environ, FOO='bar')
+        _prepare_and_save(dirname, environ)
+        assert _load(dirname, environ) is not None
+
+        assert _load(dirname, dict(environ, FOO='baz')) is None
+        assert _load(dirname, dict(environ, PATH=environ['PATH'] + os.pathsep + dirname)) is None
+        assert _load(dirname, dict(environ, ANACONDA_PROJECT_ENVS_PATH=dirname)) is None
+        # unrelated variables don't matter
+        assert _load(dirname, dict(environ, SOMETHING_UNRELATED='x')) is not None
+
+    with_directory_contents_completing_project_file({DEFAULT_PROJECT_FILENAME: _project_with_command}, check)
+
+
+def test_snapshot_invalid_after_env_prefix_changes(monkeypatch, tmpdir):
+    monkeypatch.setenv('ANACONDA_PROJECT_CACHE_DIR', str(tmpdir))
+    monkeypatch.delenv(prepare_snapshot.DISABLE_ENV_VAR, raising=False)
+
+    def check(dirname):
+        environ = dict(os.environ, FOO='bar')
+        _prepare_and_save(dirname, environ)
+        assert _load(dirname, environ) is not None
+
+        real_stat_signature = prepare_snapshot._stat_signature
+
+        def mock_stat_signature(path):
+            signature = real_stat_signature(path)
+            if path.endswith('conda-meta') and signature is not None:
+                signature[0] += 1
+            return signature
+
+        monkeypatch.setattr('anaconda_project.internal.prepare_snapshot._stat_signature', mock_stat_signature)
+        assert _load(dirname, environ) is None
+
+    with_directory_contents_completing_project_file({DEFAULT_PROJECT_FILENAME: _project_with_command}, check)
+
+
+def test_snapshot_disabled(monkeypatch, tmpdir):
+    monkeypatch.setenv('ANACONDA_PROJECT_CACHE_DIR', str(tmpdir))
+    monkeypatch.setenv(prepare_snapshot.DISABLE_ENV_VAR, '1')
+
+    def check(dirname):
+        environ = dict(os.environ, FOO='bar')
+        _prepare_and_save(dirname, environ)
+        assert 0 == _snapshot_count()
+        assert _load(dirname, environ) is None
+
+    with_directory_contents_completing_project_file({DEFAULT_PROJECT_FILENAME: _project_with_command}, check)
+
+
+def test_no_snapshot_with_encrypted_variable(monkeypatch, tmpdir):
+    monkeypatch.setenv('ANACONDA_PROJECT_CACHE_DIR', str(tmpdir))
+    monkeypatch.delenv(prepare_snapshot.DISABLE_ENV_VAR, raising=False)
+
+    def check(dirname):
+        environ = dict(os.environ, FOO='bar', DB_PASSWORD='secret')
+        _prepare_and_save(dirname, environ)
+        assert 0 == _snapshot_count()
+
+    with_directory_contents_completing_project_file(
+        {DEFAULT_PROJECT_FILENAME: _project_with_command + "  DB_PASSWORD: {}\n"}, check)
+
+
+def test_no_snapshot_with_service(monkeypatch, tmpdir):
+    monkeypatch.setenv('ANACONDA_PROJECT_CACHE_DIR', str(tmpdir))
+    monkeypatch.delenv(prepare_snapshot.DISABLE_ENV_VAR, raising=False)
+    monkeypatch.setattr("anaconda_project.requirements_registry.network_util.can_connect_to_socket",
+                        lambda host, port, timeout_seconds=0.5: True)
+
+    def check(dirname):
+        environ = dict(os.environ, FOO='bar', REDIS_URL='redis://localhost:6379')
+        _prepare_and_save(dirname, environ)
+        assert 0 == _snapshot_count()
+
+    with_directory_contents_completing_project_file(
+        {DEFAULT_PROJECT_FILENAME: _project_with_command + "services:\n  REDIS_URL: redis\n"}, check)
+
+
+def test_no_snapshot_without_command(monkeypatch, tmpdir):
+    monkeypatch.setenv('ANACONDA_PROJECT_CACHE_DIR', str(tmpdir))
+    monkeypatch.delenv(prepare_snapshot.DISABLE_ENV_VAR, raising=False)
+
+    def check(dirname):
+        environ = dict(os.environ, FOO='bar')
+        _prepare_and_save(dirname, environ)
+        assert 0 == _snapshot_count()
+
+    with_directory_contents_completing_project_file({DEFAULT_PROJECT_FILENAME: "variables:\n  FOO: {}\n"}, check)
+
+
+def test_load_corrupt_snapshot(monkeypatch, tmpdir):
+    monkeypatch.setenv('ANACONDA_PROJECT_CACHE_DIR', str(tmpdir))
+    monkeypatch.delenv(prepare_snapshot.DISABLE_ENV_VAR, raising=False)
+
+    def check(dirname):
+        filename = prepare_snapshot._snapshot_filename(dirname, UI_MODE_TEXT_ASSUME_YES_DEVELOPMENT, None, None)
+        prepare_snapshot.user_dirs.save_json_file(filename, dict(format=prepare_snapshot._SNAPSHOT_FORMAT))
+        assert _load(dirname, dict(os.environ)) is None
+
+        with codecs.open(filename, 'w', 'utf-8') as f:
+            f.write("not json")
+        assert _load(dirname, dict(os.environ)) is None
+
+    with_directory_contents(dict(), check)
@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (c) 2026, Anaconda, Inc. All rights reserved.
+#
+# Licensed under the terms of the BSD 3-Clause License.
+# The full license is in the file LICENSE.txt, distributed with this software.
+# -----------------------------------------------------------------------------
+from __future__ import absolute_import, print_function
+
+import json
+import os
+import sys
+
+from anaconda_project.internal import subprocess_trace
+from anaconda_project.internal import logged_subprocess
+from anaconda_project.internal import streaming_popen
+from anaconda_project.internal.test.tmpfile_utils import with_directory_contents
+
+
+def _read_lines(filename):
+    with open(filename) as f:
+        return [json.loads(line) for line in f.readlines()]
+
+
+def test_trace_file_from_environment(monkeypatch):
+    monkeypatch.delenv(subprocess_trace.TRACE_FILE_ENV_VAR, raising=False)
+    assert subprocess_trace.trace_file() is None
+    monkeypatch.setenv(subprocess_trace.TRACE_FILE_ENV_VAR, '')
+    assert subprocess_trace.trace_file() is None
+    monkeypatch.setenv(subprocess_trace.TRACE_FILE_ENV_VAR, '/foo/trace.jsonl')
+    assert subprocess_trace.trace_file() == '/foo/trace.jsonl'
+    subprocess_trace.set_trace_file('/bar/trace.jsonl')
+    try:
+        assert subprocess_trace.trace_file() == '/bar/trace.jsonl'
+    finally:
+        subprocess_trace.set_trace_file(None)
+    assert subprocess_trace.trace_file() == '/foo/trace.jsonl'
+
+
+def test_no_trace_file_written_when_disabled(monkeypatch):
+    monkeypatch.delenv(subprocess_trace.TRACE_FILE_ENV_VAR, raising=False)
+
+    def mock_write_record(filename, record):
+        raise AssertionError("should not have written %r" % record)
+
+    monkeypatch.setattr('anaconda_project.internal.subprocess_trace._write_record', mock_write_record)
+    traced = subprocess_trace.TracedProcess(['foo'])
+    traced.finish()
+
+
+def test_trace_logged_subprocess_call(monkeypatch):
+    def check(dirname):
+        trace = os.path.join(dirname, "trace.jsonl")
+        monkeypatch.setenv(subprocess_trace.TRACE_FILE_ENV_VAR, trace)
+        code = logged_subprocess.call([sys.executable, '-c', 'import sys; sys.exit(3)'], cwd=dirname)
+        assert code == 3
+
+        records = _read_lines(trace)
+        assert len(records) == 1
+        record = records[0]
+        assert record['argv'] == [sys.executable, '-c', 'import sys; sys.exit(3)']
+        assert record['cwd'] == dirname
+        assert record['returncode'] == 3
+        assert record['duration'] >= 0
+        assert record['start'] > 0
+
+    with_directory_contents(dict(), check)
+
+
+def test_trace_logged_subprocess_check_output(monkeypatch):
+    def check(dirname):
+        trace = os.path.join(dirname, "trace.jsonl")
+        monkeypatch.setenv(subprocess_trace.TRACE_FILE_ENV_VAR, trace)
+        output = logged_subprocess.check_output([sys.executable, '-c', 'print("hello")'])
+        assert output.strip() == b'hello'
+
+        records = _read_lines(trace)
+        assert len(records) == 1
+        assert records[0]['returncode'] == 0
+        assert records[0]['stdout_bytes'] == len(output)
+        assert records[0]['cwd'] == os.getcwd()
+
+    with_directory_contents(dict(), check)
+
+
+def test_trace_streaming_popen(monkeypatch):
+    def check(dirname):
+        trace = os.path.join(dirname, "trace.jsonl")
+        monkeypatch.setenv(subprocess_trace.TRACE_FILE_ENV_VAR, trace)
+        script = 'import sys; sys.stdout.write("abc"); sys.stderr.write("de"); sys.exit(1)'
+        (p, out, err) = streaming_popen.popen([sys.executable, '-c', script], None, None)
+        assert p.returncode == 1
+
+        records = _read_lines(trace)
+        assert len(records) == 1
+        assert records[0]['returncode'] == 1
+        assert records[0]['stdout_bytes'] == 3
+        assert records[0]['stderr_bytes'] == 2
+
+    with_directory_contents(dict(), check)
+
+
+def test_trace_streaming_popen_failed_to_start(monkeypatch):
+    def check(dirname):
+        trace = os.path.join(dirname, "trace.jsonl")
+        monkeypatch.setenv(subprocess_trace.TRACE_FILE_ENV_VAR, trace)
+        try:
+            streaming_popen.popen([os.path.join(dirname, "nope")], None, None)
+            assert False, "should have failed"
+        except OSError:
+            pass
+
+        records = _read_lines(trace)
+        assert len(records) == 1
+        assert records[0]['returncode'] is None
+
+    with_directory_contents(dict(), check)
+
+
+def test_trace_write_failure_ignored(monkeypatch):
+    def check(dirname):
+        trace = os.path.join(dirname, "does-not-exist", "trace.jsonl")
+        monkeypatch.setenv(subprocess_trace.TRACE_FILE_ENV_VAR, trace)
+        traced = subprocess_trace.TracedProcess(['foo'])
+        traced.finish()
+        assert not os.path.exists(trace)
+
+    with_directory_contents(dict(), check)
+
+
+def test_tool_and_subcommand():
+    assert ('', '') == subprocess_trace.tool_and_subcommand([])
+    assert ('conda', 'create') == subprocess_trace.tool_and_subcommand(['/opt/bin/conda', '--yes', 'create'])
+    assert ('conda', 'env') == subprocess_trace.tool_and_subcommand(['conda', 'env', 'config', 'vars', 'list'])
+    assert ('pip', 'freeze') == subprocess_trace.tool_and_subcommand(['C:\\env\\Scripts\\pip.exe', 'freeze'])
+    assert ('git', 'ls-files') == subprocess_trace.tool_and_subcommand(['git', 'ls-files', '--others'])
+    assert ('redis-server', '') == subprocess_trace.tool_and_subcommand(['redis-server', '--pidfile', 'x'])
+    assert ('conda', '') == subprocess_trace.tool_and_subcommand(['conda', '--version'])
+
+
+def test_load_records_and_summarize():
+    def check(dirname):
+        trace = os.path.join(dirname, "trace.jsonl")
+        loaded = subprocess_trace.load_records(trace)
+        assert len(loaded) == 4
+
+        summaries = subprocess_trace.summarize(loaded)
+        assert [(s.tool, s.subcommand) for s in summaries] == [('conda', 'create'), ('pip', 'freeze'),
+                                                               ('conda', 'info')]
+        create = summaries[0]
+        assert create.count == 2
+        assert create.failures == 1
+        assert create.total == 5.0
+        assert create.max == 3.0
+        assert create.stdout_bytes == 30
+        assert create.stderr_bytes == 0
+
+    lines = [
+        dict(argv=['conda', 'create'], duration=3.0, returncode=0, stdout_bytes=10, stderr_bytes=0),
+        dict(argv=['conda', 'create'], duration=2.0, returncode=1, stdout_bytes=20, stderr_bytes=None),
+        dict(argv=['conda', 'info'], duration=0.5, returncode=0, stdout_bytes=1, stderr_bytes=0),
+        dict(argv=['pip', 'freeze'], duration=1.0, returncode=None, stdout_bytes=None, stderr_bytes=None)
+    ]
+    content = "\n".join(json.dumps(line) for line in lines) + "\nnot json\n\n[1, 2]\n"
+    with_directory_contents({"trace.jsonl": content}, check)
+
+
+def test_trace_download_and_summarize_downloads(monkeypatch):
+    def check(dirname):
+        trace = os.path.join(dirname, "trace.jsonl")
+        monkeypatch.setenv(subprocess_trace.TRACE_FILE_ENV_VAR, trace)
+        downloads = [('http://fast.example.com/a', 1.0, 4000, False), ('http://fast.example.com/b', 1.0, 2000, False),
+                     ('http://slow.example.com/c', 2.0, 1000, False), ('http://slow.example.com/d', 0.1, 1000000, True)]
+        for (url, duration, size, cached) in downloads:
+            subprocess_trace.trace_download(
+                dict(url=url,
+                     start=0.0,
+                     time_to_first_byte=duration / 2,
+                     duration=duration,
+                     bytes=size,
+                     average_throughput=size / duration,
+                     peak_throughput=size / duration,
+                     retries=1 if cached else 0,
+                     cached=cached))
+        # download records aren't subprocess records
+        assert [] == subprocess_trace.load_records(trace)
+        loaded = subprocess_trace.load_download_records(trace)
+        assert 'http://fast.example.com/a' == loaded[0]['download']
+        assert 'url' not in loaded[0]
+
+        summaries = subprocess_trace.summarize_downloads(loaded)
+        assert [('slow.example.com', 2, 1, 1, 1000, 2.0, 1.0, 500.0),
+                ('fast.example.com', 2, 0, 0, 6000, 2.0, 0.5, 3000.0)] == [tuple(s) for s in summaries]
+
+    with_directory_contents(dict(), check)
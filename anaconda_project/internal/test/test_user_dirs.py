@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (c) 2026, Anaconda, Inc. All rights reserved.
+#
+# Licensed under the terms of the BSD 3-Clause License.
+# The full license is in the file LICENSE.txt, distributed with this software.
+# -----------------------------------------------------------------------------
+from __future__ import absolute_import, print_function
+
+import os
+import threading
+
+from anaconda_project.internal import user_dirs
+from anaconda_project.internal.test.tmpfile_utils import with_directory_contents
+
+
+def test_user_cache_dir_override(monkeypatch):
+    monkeypatch.setenv(user_dirs.CACHE_DIR_ENV_VAR, '/foo/cache')
+    assert user_dirs.user_cache_dir() == '/foo/cache'
+    assert user_dirs.user_cache_dir('a', 'b') == os.path.join('/foo/cache', 'a', 'b')
+
+
+def test_user_cache_dir_linux(monkeypatch):
+    monkeypatch.delenv(user_dirs.CACHE_DIR_ENV_VAR, raising=False)
+    monkeypatch.setattr('platform.system', lambda: 'Linux')
+    monkeypatch.setenv('XDG_CACHE_HOME', '/xdg')
+    assert user_dirs.user_cache_dir() == os.path.join('/xdg', 'anaconda-project')
+    monkeypatch.delenv('XDG_CACHE_HOME')
+    assert user_dirs.user_cache_dir() == os.path.join(os.path.expanduser('~'), '.cache', 'anaconda-project')
+
+
+def test_user_cache_dir_mac(monkeypatch):
+    monkeypatch.delenv(user_dirs.CACHE_DIR_ENV_VAR, raising=False)
+    monkeypatch.setattr('platform.system', lambda: 'Darwin')
+    assert user_dirs.user_cache_dir() == os.path.join(os.path.expanduser('~'), 'Library', 'Caches', 'anaconda-project')
+
+
+def test_user_cache_dir_windows(monkeypatch):
+    monkeypatch.delenv(user_dirs.CACHE_DIR_ENV_VAR, raising=False)
+    monkeypatch.setattr('platform.system', lambda: 'Windows')
+    monkeypatch.setenv('LOCALAPPDATA', 'C:\\Local')
+    assert user_dirs.user_cache_dir() == os.path.join('C:\\Local', 'anaconda-project', 'Cache')
+
+
+def test_ensure_user_cache_dir(monkeypatch):
+    def check(dirname):
+        monkeypatch.setenv(user_dirs.CACHE_DIR_ENV_VAR, os.path.join(dirname, "cache"))
+        path = user_dirs.ensure_user_cache_dir('foo')
+        assert path == os.path.join(dirname, "cache", "foo")
+        assert os.path.isdir(path)
+        # twice is fine
+        assert path == user_dirs.ensure_user_cache_dir('foo')
+
+    with_directory_contents(dict(), check)
+
+
+def test_save_and_load_json_file():
+    def check(dirname):
+        filename = os.path.join(dirname, "sub", "foo.json")
+        assert user_dirs.load_json_file(filename) is None
+        user_dirs.save_json_file(filename, dict(a=[1, 2]))
+        assert user_dirs.load_json_file(filename) == dict(a=[1, 2])
+        user_dirs.save_json_file(filename, dict(b=3))
+        assert user_dirs.load_json_file(filename) == dict(b=3)
+        assert os.listdir(os.path.dirname(filename)) == ["foo.json"]
+
+    with_directory_contents(dict(), check)
+
+
+def test_load_corrupt_json_file():
+    def check(dirname):
+        assert user_dirs.load_json_file(os.path.join(dirname, "foo.json")) is None
+
+    with_directory_contents({"foo.json": "{not json"}, check)
+
+
+def test_locked_file_waits_for_other_holder():
+    def check(dirname):
+        filename = os.path.join(dirname, "sub", "foo.lock")
+        events = []
+
+        def hold_lock():
+            with user_dirs.locked_file(filename):
+                events.append('acquired in thread')
+
+        with user_dirs.locked_file(filename):
+            thread = threading.Thread(target=hold_lock)
+            thread.start()
+            thread.join(0.2)
+            events.append('released')
+        thread.join()
+        assert ['released', 'acquired in thread'] == events
+        assert os.path.isfile(filename)
+
+    with_directory_contents(dict(), check)
@@ -8,9 +8,14 @@
 from __future__ import absolute_import, print_function
 
 import codecs
+import io
 import os
+import tarfile
+import threading
 
-from anaconda_project.internal.ziputils import unpack_zip
+import pytest
+
+from anaconda_project.internal.ziputils import StreamingUnpacker, unpack_zip, _ChunkPipe
 from anaconda_project.internal.test.tmpfile_utils import (with_directory_contents, with_tmp_zipfile)
 
 
@@ -224,3 +229,147 @@ def test_unzip_bad_zipfile():
         assert [('Failed to unzip %s: File is not a zip file' % zipname)] == errors
 
     with_directory_contents(dict(foo="not a zip file\n"), do_test)
+
+
+def _tar_bytes(contents, mode):
+    out = io.BytesIO()
+    with tarfile.open(fileobj=out, mode=mode) as tf:
+        for key, value in contents.items():
+            data = value.encode('utf-8')
+            info = tarfile.TarInfo(key)
+            info.size = len(data)
+            tf.addfile(info, io.BytesIO(data))
+    return out.getvalue()
+
+
+def _stream(data, target_path, errors):
+    unpacker = StreamingUnpacker(target_path)
+    # odd-sized chunks, so the archive's blocks are split up
+    for i in range(0, len(data), 7):
+        unpacker.write(data[i:i + 7])
+    return unpacker.finish(errors)
+
+
+def test_unzip_tar_file():
+    def do_test(dirname):
+        tar_path = os.path.join(dirname, 'archive.tar.gz')
+        with open(tar_path, 'wb') as f:
+            f.write(_tar_bytes(dict(foo="hello world\n", bar="goodbye world\n"), 'w:gz'))
+        target_path = os.path.join(dirname, 'boo')
+        errors = []
+        assert unpack_zip(tar_path, target_path, errors)
+        assert [] == errors
+        assert codecs.open(os.path.join(target_path, 'foo'), 'r', 'utf-8').read() == "hello world\n"
+        assert codecs.open(os.path.join(target_path, 'bar'), 'r', 'utf-8').read() == "goodbye world\n"
+
+    with_directory_contents(dict(), do_test)
+
+
+@pytest.mark.parametrize('mode', ['w', 'w:gz', 'w:bz2', 'w:xz'])
+def test_stream_unpack_tar(mode):
+    def do_test(dirname):
+        target_path = os.path.join(dirname, 'boo')
+        errors = []
+        assert _stream(_tar_bytes({'foo/bar': "hello world\n"}, mode), target_path, errors)
+        assert [] == errors
+        assert codecs.open(os.path.join(target_path, 'foo', 'bar'), 'r', 'utf-8').read() == "hello world\n"
+        assert ['boo'] == os.listdir(dirname)
+
+    with_directory_contents(dict(), do_test)
+
+
+def test_stream_unpack_zip():
+    def do_test(zipname, workingdir):
+        target_path = os.path.join(workingdir, 'foo')  # same name as what's in the zip
+        with open(zipname, 'rb') as f:
+            data = f.read()
+        errors = []
+        assert _stream(data, target_path, errors)
+        assert [] == errors
+        assert codecs.open(os.path.join(target_path, 'bar'), 'r', 'utf-8').read() == "hello world\n"
+        assert ['foo'] == os.listdir(workingdir)
+
+    with_tmp_zipfile({'foo/bar': "hello world\n"}, do_test)
+
+
+def test_stream_unpack_not_an_archive():
+    def do_test(dirname):
+        target_path = os.path.join(dirname, 'boo')
+        errors = []
+        assert not _stream(b"This is not an archive.", target_path, errors)
+        assert 1 == len(errors)
+        assert errors[0].startswith("Failed to unzip %s: " % target_path)
+        assert [] == os.listdir(dirname)
+
+    with_directory_contents(dict(), do_test)
+
+
+def test_stream_unpack_refuses_paths_outside_target():
+    def do_test(dirname):
+        target_path = os.path.join(dirname, 'inner', 'boo')
+        errors = []
+        assert not _stream(_tar_bytes({'../escaped': "gotcha\n"}, 'w'), target_path, errors)
+        assert 1 == len(errors)
+        assert not os.path.exists(os.path.join(dirname, 'inner', 'escaped'))
+        assert [] == os.listdir(os.path.join(dirname, 'inner'))
+
+    with_directory_contents(dict(), do_test)
+
+
+def test_stream_unpack_tar_with_trailing_data():
+    def do_test(dirname):
+        target_path = os.path.join(dirname, 'boo')
+        errors = []
+        # tarfile stops reading at the end of the archive, which mustn't leave us waiting
+        data = _tar_bytes({'foo': "hello world\n"}, 'w') + b"\0" * 1024 * 50
+        assert _stream(data, target_path, errors)
+        assert [] == errors
+
+    with_directory_contents(dict(), do_test)
+
+
+def test_stream_unpack_failure_with_more_data():
+    def do_test(dirname):
+        target_path = os.path.join(dirname, 'boo')
+        errors = []
+        assert not _stream(b"This is not an archive." * 1000, target_path, errors)
+        assert 1 == len(errors)
+
+    with_directory_contents(dict(), do_test)
+
+
+def test_chunk_pipe_bounded(monkeypatch):
+    monkeypatch.setattr('anaconda_project.internal.ziputils._PIPE_MAX_CHUNKS', 2)
+    pipe = _ChunkPipe()
+    pipe.put(b"ab")
+    pipe.put(b"cd")
+    blocked = threading.Thread(target=lambda: pipe.put(b"ef"))
+    blocked.start()
+    blocked.join(0.2)
+    assert blocked.is_alive()
+
+    assert b"abc" == pipe.read(3)
+    blocked.join()
+    pipe.put(b"gh")
+    blocked = threading.Thread(target=lambda: pipe.put(b"ij"))
+    blocked.start()
+    blocked.join(0.2)
+    assert blocked.is_alive()
+
+    # once the reader is done, chunks are dropped rather than waited on
+    pipe.stop_reading()
+    blocked.join()
+    pipe.put(b"kl")
+    pipe.close()
+
+
+def test_stream_unpack_abort():
+    def do_test(dirname):
+        target_path = os.path.join(dirname, 'boo')
+        unpacker = StreamingUnpacker(target_path)
+        data = _tar_bytes(dict(foo="hello world\n"), 'w:gz')
+        unpacker.write(data[:len(data) // 2])
+        unpacker.abort()
+        assert [] == os.listdir(dirname)
+
+    with_directory_contents(dict(), do_test)
@@ -7,8 +7,10 @@
 # -----------------------------------------------------------------------------
 from __future__ import print_function, absolute_import
 
+import atexit
 import codecs
 import os
+import shutil
 import sys
 try:
     from backports.tempfile import TemporaryDirectory
@@ -22,8 +24,10 @@ from anaconda_project.local_state_file import LocalStateFile
 from anaconda_project.yaml_file import _load_string
 from anaconda_project.project_file import (possible_project_file_names, DEFAULT_PROJECT_FILENAME)
 
-local_tmp = os.path.abspath("./build/tmp")
-makedirs_ok_if_exists(local_tmp)
+# one scratch directory per test run, rather than ./build/tmp under
+# whatever directory the tests happen to be run from
+local_tmp = os.path.realpath(tempfile.mkdtemp(prefix="anaconda-project-tests-"))
+atexit.register(shutil.rmtree, local_tmp, ignore_errors=True)
 
 
 def with_directory_contents(contents, func):
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (c) 2026, Anaconda, Inc. All rights reserved.
+#
+# Licensed under the terms of the BSD 3-Clause License.
+# The full license is in the file LICENSE.txt, distributed with this software.
+# -----------------------------------------------------------------------------
+"""Per-user directories for state shared between projects."""
+from __future__ import absolute_import, print_function
+
+import codecs
+import contextlib
+import json
+import os
+import platform
+import uuid
+
+from anaconda_project.internal.makedirs import makedirs_ok_if_exists
+from anaconda_project.internal.rename import rename_over_existing
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover (Windows)
+    fcntl = None
+    import msvcrt
+
+CACHE_DIR_ENV_VAR = 'ANACONDA_PROJECT_CACHE_DIR'
+
+
+def user_cache_dir(*subdirs):
+    """Get the per-user anaconda-project cache directory, or a subdirectory of it.
+
+    The directory is not created; use ``ensure_user_cache_dir`` for that.
+    """
+    base = os.environ.get(CACHE_DIR_ENV_VAR, '')
+    if base == '':
+        system = platform.system()
+        if system == 'Windows':
+            local = os.environ.get('LOCALAPPDATA') or os.path.join(os.path.expanduser('~'), 'AppData', 'Local')
+            base = os.path.join(local, 'anaconda-project', 'Cache')
+        elif system == 'Darwin':
+            base = os.path.join(os.path.expanduser('~'), 'Library', 'Caches', 'anaconda-project')
+        else:
+            xdg = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+            base = os.path.join(xdg, 'anaconda-project')
+    return os.path.join(base, *subdirs)
+
+
+def ensure_user_cache_dir(*subdirs):
+    """Get the per-user cache directory or subdirectory, creating it if needed."""
+    return makedirs_ok_if_exists(user_cache_dir(*subdirs))
+
+
+def load_json_file(filename):
+    """Load a JSON file we wrote ourselves, or None if it's missing or corrupt."""
+    try:
+        with codecs.open(filename, 'r', 'utf-8') as f:
+            return json.load(f)
+    except (IOError, OSError, ValueError):
+        return None
+
+
+def save_json_file(filename, value):
+    """Atomically replace a JSON file, so concurrent readers never see half of it."""
+    makedirs_ok_if_exists(os.path.dirname(filename))
+    tmp = "%s.tmp-%s" % (filename, uuid.uuid4())
+    try:
+        with codecs.open(tmp, 'w', 'utf-8') as f:
+            json.dump(value, f, sort_keys=True)
+        rename_over_existing(tmp, filename)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+@contextlib.contextmanager
+def locked_file(filename):
+    """Hold an exclusive lock on filename, creating it if needed, so other processes wait for us."""
+    makedirs_ok_if_exists(os.path.dirname(filename))
+    with open(filename, 'a+b') as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:  # pragma: no cover (Windows)
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:  # pragma: no cover (Windows)
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
@@ -8,50 +8,238 @@
 from __future__ import absolute_import, print_function
 
 import os
+import queue
 import shutil
+import tarfile
 import tempfile
+import threading
 import zipfile
 
 from anaconda_project.internal import rename
+from anaconda_project.internal.makedirs import makedirs_ok_if_exists
+
+# a streamed zip bigger than this goes to a temporary file until it's all here
+_SPOOL_MAX_MEMORY = 64 * 1024 * 1024
+
+# how many downloaded chunks (each up to a few MiB) may wait for a
+# streamed tar to be extracted before the download waits
+_PIPE_MAX_CHUNKS = 4
+
+
+def _extract_tar(tf, tmp_dir):
+    if hasattr(tarfile, 'data_filter'):
+        tf.extractall(tmp_dir, filter='data')
+        return
+    # older Pythons without extraction filters
+    for member in tf:
+        name = os.path.normpath(member.name)
+        if os.path.isabs(name) or name.split(os.sep)[0] == os.pardir or member.issym() or member.islnk():
+            raise ValueError("Refusing to extract %s outside of the archive directory" % member.name)
+        tf.extract(member, tmp_dir)
 
 
 # we overwrite as long as the zip contains a file and target_path
 # is a file, or the zip is a dir and target_path is a dir, but if
 # they don't match we don't overwrite. Hopefully this will catch
 # most mistaken collisions.
+def _move_unpacked(tmp_dir, target_path, errors):
+    target_file = os.path.basename(target_path)
+    extracted = os.listdir(tmp_dir)
+    if len(extracted) == 0:
+        errors.append("Zip archive was empty.")
+        return False
+    elif len(extracted) == 1 and extracted[0] == target_file:
+        # don't keep a pointless directory level, if
+        # the zip just contains a single directory or
+        # file with the same name as the target
+        src_path = os.path.join(tmp_dir, extracted[0])
+    else:
+        src_path = tmp_dir
+    src_is_dir = os.path.isdir(src_path)
+    target_is_dir = os.path.isdir(target_path)
+    if os.path.exists(target_path) and (src_is_dir != target_is_dir):
+        if src_is_dir:
+            errors.append("%s exists and isn't a directory, not unzipping a directory over it." % target_path)
+        else:
+            errors.append("%s exists and is a directory, not unzipping a plain file over it." % target_path)
+        return False
+    else:
+        rename.rename_over_existing(src_path, target_path)
+    return True
+
+
 def unpack_zip(zip_path, target_path, errors):
+    """Unpack a zip (or tar) archive to target_path, appending any problems to errors."""
     try:
-        with zipfile.ZipFile(zip_path, mode='r') as zf:
-            target_dir, target_file = os.path.split(target_path)
-            tmp_dir = tempfile.mkdtemp(prefix=(target_path + "_tmp"), dir=target_dir)
-            try:
-                zf.extractall(tmp_dir)
-                extracted = os.listdir(tmp_dir)
-                if len(extracted) == 0:
-                    errors.append("Zip archive was empty.")
-                    return False
-                elif len(extracted) == 1 and extracted[0] == target_file:
-                    # don't keep a pointless directory level, if
-                    # the zip just contains a single directory or
-                    # file with the same name as the target
-                    src_path = os.path.join(tmp_dir, extracted[0])
-                else:
-                    src_path = tmp_dir
-                src_is_dir = os.path.isdir(src_path)
-                target_is_dir = os.path.isdir(target_path)
-                if os.path.exists(target_path) and (src_is_dir != target_is_dir):
-                    if src_is_dir:
-                        errors.append("%s exists and isn't a directory, not unzipping a directory over it." %
-                                      target_path)
-                    else:
-                        errors.append("%s exists and is a directory, not unzipping a plain file over it." % target_path)
-                    return False
-                else:
-                    rename.rename_over_existing(src_path, target_path)
-            finally:
-                if os.path.isdir(tmp_dir):
-                    shutil.rmtree(path=tmp_dir)
-            return True
+        target_dir = os.path.dirname(target_path)
+        tmp_dir = tempfile.mkdtemp(prefix=(target_path + "_tmp"), dir=target_dir)
+        try:
+            if not zipfile.is_zipfile(zip_path) and tarfile.is_tarfile(zip_path):
+                with tarfile.open(zip_path, mode='r:*') as tf:
+                    _extract_tar(tf, tmp_dir)
+            else:
+                with zipfile.ZipFile(zip_path, mode='r') as zf:
+                    zf.extractall(tmp_dir)
+            return _move_unpacked(tmp_dir, target_path, errors)
+        finally:
+            if os.path.isdir(tmp_dir):
+                shutil.rmtree(path=tmp_dir)
     except Exception as e:
         errors.append("Failed to unzip %s: %s" % (zip_path, str(e)))
         return False
+
+
+class _ChunkPipe(object):
+    """A file-like object reading the chunks another thread puts in it.
+
+    At most ``_PIPE_MAX_CHUNKS`` chunks wait to be read; then ``put()``
+    blocks, so a download can't get ahead of extraction by more than
+    that. Once the reader calls ``stop_reading()``, chunks are dropped.
+    """
+    def __init__(self):
+        self._chunks = queue.Queue(maxsize=_PIPE_MAX_CHUNKS)
+        self._current = b''
+        self._offset = 0
+        self._eof = False
+        self._stopped_reading = False
+
+    def put(self, chunk):
+        if not self._stopped_reading:
+            self._chunks.put(chunk)
+
+    def _discard_queued(self):
+        try:
+            while True:
+                self._chunks.get_nowait()
+        except queue.Empty:
+            pass
+
+    def stop_reading(self):
+        # the reader won't read any more (it's done or failed), so
+        # wake up and drop any put() waiting for room
+        self._stopped_reading = True
+        self._discard_queued()
+
+    def close(self, discard=False):
+        if discard:
+            self._discard_queued()
+        self.put(None)
+
+    def read(self, size=-1):
+        parts = []
+        while size != 0 and not self._eof:
+            if self._offset == len(self._current):
+                chunk = self._chunks.get()
+                if chunk is None:
+                    self._eof = True
+                    break
+                (self._current, self._offset) = (chunk, 0)
+            end = len(self._current) if size < 0 else self._offset + size
+            part = self._current[self._offset:end]
+            self._offset += len(part)
+            if size > 0:
+                size -= len(part)
+            parts.append(part)
+        return b''.join(parts)
+
+
+class StreamingUnpacker(object):
+    """Unpacks an archive to a target path as its bytes arrive, instead of from a file.
+
+    Tar archives (compressed or not) are extracted by a thread while
+    the download goes on. A zip lists what's in it at the end, so
+    it's kept (in memory if small) and extracted once it's all here.
+    Either way the files go into a staging directory next to the
+    target, which ``finish()`` moves into place like ``unpack_zip()``.
+    """
+    def __init__(self, target_path):
+        """Get ready to unpack to target_path; nothing happens until the first ``write()``."""
+        self._target_path = target_path
+        self._head = b''
+        self._tmp_dir = None
+        self._spool = None
+        self._pipe = None
+        self._thread = None
+        self._error = None
+
+    def _start(self):
+        target_dir = os.path.dirname(self._target_path)
+        makedirs_ok_if_exists(target_dir)
+        self._tmp_dir = tempfile.mkdtemp(prefix=(self._target_path + "_tmp"), dir=target_dir)
+        if self._head.startswith(b'PK'):
+            self._spool = tempfile.SpooledTemporaryFile(max_size=_SPOOL_MAX_MEMORY, dir=target_dir)
+        else:
+            self._pipe = _ChunkPipe()
+            self._thread = threading.Thread(target=self._extract_tar_stream, name="unpack %s" % self._target_path)
+            self._thread.daemon = True
+            self._thread.start()
+        (chunk, self._head) = (self._head, None)
+        self._write(chunk)
+
+    def _extract_tar_stream(self):
+        try:
+            with tarfile.open(fileobj=self._pipe, mode='r|*') as tf:
+                _extract_tar(tf, self._tmp_dir)
+        except Exception as e:
+            self._error = e
+        finally:
+            # tarfile may not read the padding at the end
+            self._pipe.stop_reading()
+
+    def _write(self, chunk):
+        if self._spool is not None:
+            self._spool.write(chunk)
+        else:
+            self._pipe.put(chunk)
+
+    def write(self, chunk):
+        """Unpack the next chunk of the archive; errors are reported by ``finish()``."""
+        if self._error is not None:
+            return
+        try:
+            if self._tmp_dir is None:
+                # enough to tell a zip from a tar
+                self._head += chunk
+                if len(self._head) >= 4:
+                    self._start()
+            else:
+                self._write(chunk)
+        except Exception as e:
+            self._error = e
+
+    def finish(self, errors):
+        """Finish unpacking the whole archive and move it to the target path.
+
+        Returns:
+            True on success, otherwise False with problems appended to errors
+        """
+        try:
+            if self._tmp_dir is None:
+                self._start()
+            if self._spool is not None:
+                self._spool.seek(0)
+                with zipfile.ZipFile(self._spool, mode='r') as zf:
+                    zf.extractall(self._tmp_dir)
+            else:
+                self._pipe.close()
+                self._thread.join()
+            if self._error is not None:
+                raise self._error
+            return _move_unpacked(self._tmp_dir, self._target_path, errors)
+        except Exception as e:
+            errors.append("Failed to unzip %s: %s" % (self._target_path, str(e)))
+            return False
+        finally:
+            self.abort()
+
+    def abort(self):
+        """Stop unpacking and remove anything unpacked that isn't at the target path yet."""
+        if self._pipe is not None:
+            self._pipe.close(discard=True)
+            self._thread.join()
+            self._pipe = None
+        if self._spool is not None:
+            self._spool.close()
+            self._spool = None
+        if self._tmp_dir is not None and os.path.isdir(self._tmp_dir):
+            shutil.rmtree(path=self._tmp_dir)
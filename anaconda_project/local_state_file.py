@@ -85,7 +85,10 @@ __dummy__: dummy
         strings value. The lists of strings are args to pass to
         exec. In order to shut down a service, we run all
         ``shutdown_commands`` and then delete the entire service
-        run state dict.
+        run state dict. If the state has a ``pidfile`` property, the
+        process it names is killed when a shutdown command times out;
+        ``start_time`` (seconds since the epoch) and ``program`` (the
+        executable's name) properties let us check it's the right process.
 
         This method does not save the file, call ``save()`` to do that.
 
@@ -10,13 +10,19 @@ from __future__ import absolute_import
 from __future__ import print_function
 
 from abc import ABCMeta, abstractmethod
+from collections import namedtuple, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 import os
+import threading
+import time
 from copy import deepcopy
 
+from anaconda_project.frontend import _new_serializing_frontends
 from anaconda_project.internal.metaclass import with_metaclass
 from anaconda_project.internal.simple_status import SimpleStatus
 from anaconda_project.internal.toposort import toposort_from_dependency_info
-from anaconda_project.internal import conda_api
+from anaconda_project.internal import conda_api, download_digests
 from anaconda_project.internal.py2_compat import is_string
 from anaconda_project.local_state_file import LocalStateFile
 from anaconda_project.provide import (_all_provide_modes, PROVIDE_MODE_DEVELOPMENT)
@@ -38,14 +44,102 @@ def _update_environ(dest, src):
             dest[key] = value
 
 
+PrepareTiming = namedtuple('PrepareTiming', ['phase', 'name', 'wall', 'cpu'])
+PrepareTiming.__doc__ = """Wall-clock and CPU seconds spent in one phase of a prepare.
+
+``phase`` is one of ``PREPARE_PHASES``. For the ``execute`` phase
+``name`` is the stage description; for the others it's the
+environment variable of the requirement, or a comma-separated list of
+them for requirements provided together (such as several downloads).
+CPU time is for the thread that did the work, so it excludes
+subprocesses such as ``conda``, and a stage's CPU time excludes
+requirements provided concurrently on other threads.
+"""
+
+PREPARE_PHASES = ('execute', 'check_status', 'analyze', 'provide')
+
+
+class PrepareTimings(object):
+    """Collects a ``PrepareTiming`` for each stage and requirement step of a prepare.
+
+    Pass one in to the prepare functions to collect timings across
+    several prepares, or read ``PrepareResult.timings`` to get the
+    one that was created for you.
+    """
+    def __init__(self):
+        """Construct an empty PrepareTimings."""
+        self._timings = []
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def record(self, phase, name, wall, cpu):
+        """Add one timing."""
+        assert phase in PREPARE_PHASES
+        with self._lock:
+            self._timings.append(PrepareTiming(phase=phase, name=name, wall=wall, cpu=cpu))
+
+    @contextmanager
+    def measure(self, phase, name):
+        """Context manager that records the time spent in its body."""
+        start_wall = time.monotonic()
+        start_cpu = time.thread_time()
+        try:
+            yield
+        finally:
+            self.record(phase, name, time.monotonic() - start_wall, time.thread_time() - start_cpu)
+
+    def record_metrics(self, name, metrics):
+        """Add the metrics dict a provider returned for a requirement (see ``ProvideResult.metrics``)."""
+        with self._lock:
+            self._metrics.append((name, metrics))
+
+    @property
+    def timings(self):
+        """Get a list of ``PrepareTiming`` in the order they were recorded."""
+        with self._lock:
+            return list(self._timings)
+
+    @property
+    def metrics(self):
+        """Get a list of (name, metrics dict) pairs in the order they were recorded."""
+        with self._lock:
+            return list(self._metrics)
+
+    def sorted_by_wall(self):
+        """Get a list of ``PrepareTiming``, slowest first."""
+        return sorted(self.timings, key=lambda timing: -timing.wall)
+
+    def total(self, phase):
+        """Get a ``PrepareTiming`` adding up every timing in the phase (name is None)."""
+        wall = 0.0
+        cpu = 0.0
+        for timing in self.timings:
+            if timing.phase == phase:
+                wall += timing.wall
+                cpu += timing.cpu
+        return PrepareTiming(phase=phase, name=None, wall=wall, cpu=cpu)
+
+
+def _timed_check_status(timings, requirement, check):
+    with timings.measure('check_status', requirement.env_var):
+        status = check()
+    if status.analysis_timing is not None:
+        (wall, cpu) = status.analysis_timing
+        timings.record('analyze', requirement.env_var, wall, cpu)
+    return status
+
+
 class PrepareResult(with_metaclass(ABCMeta)):
     """Abstract class describing the result of preparing the project to run."""
-    def __init__(self, statuses, environ, overrides, env_spec_name):
+    def __init__(self, statuses, environ, overrides, env_spec_name, timings=None):
         """Construct an abstract PrepareResult."""
         self._statuses = tuple(statuses)
         self._environ = environ
         self._overrides = overrides
         self._env_spec_name = env_spec_name
+        if timings is None:
+            timings = PrepareTimings()
+        self._timings = timings
 
     def __bool__(self):
         """True if we were successful."""
@@ -98,6 +192,14 @@ class PrepareResult(with_metaclass(ABCMeta)):
         """Override object which was passed to prepare()."""
         return self._overrides
 
+    @property
+    def timings(self):
+        """``PrepareTimings`` for the prepare that produced this result.
+
+        If we failed before we even checked statuses, this will be empty.
+        """
+        return self._timings
+
     @property
     def errors(self):
         """Get lines of error output."""
@@ -128,9 +230,9 @@ class PrepareResult(with_metaclass(ABCMeta)):
 
 class PrepareSuccess(PrepareResult):
     """Class describing the successful result of preparing the project to run."""
-    def __init__(self, statuses, command_exec_info, environ, overrides, env_spec_name):
+    def __init__(self, statuses, command_exec_info, environ, overrides, env_spec_name, timings=None):
         """Construct a PrepareSuccess indicating a successful prepare stage."""
-        super(PrepareSuccess, self).__init__(statuses, environ, overrides, env_spec_name)
+        super(PrepareSuccess, self).__init__(statuses, environ, overrides, env_spec_name, timings)
         self._command_exec_info = command_exec_info
         assert self.env_spec_name is not None
 
@@ -159,9 +261,9 @@ class PrepareSuccess(PrepareResult):
 
 class PrepareFailure(PrepareResult):
     """Class describing the failed result of preparing the project to run."""
-    def __init__(self, statuses, errors, environ, overrides, env_spec_name=None):
+    def __init__(self, statuses, errors, environ, overrides, env_spec_name=None, timings=None):
         """Construct a PrepareFailure indicating a failed prepare stage."""
-        super(PrepareFailure, self).__init__(statuses, environ, overrides, env_spec_name)
+        super(PrepareFailure, self).__init__(statuses, environ, overrides, env_spec_name, timings)
         self._errors = errors
 
     @property
@@ -275,7 +377,7 @@ def _refresh_status_list(old_statuses, rechecked_statuses):
 
 class _FunctionPrepareStage(PrepareStage):
     """A stage chain where the description and the execute function are passed in to the constructor."""
-    def __init__(self, environ, overrides, description, statuses, execute, config_context=None):
+    def __init__(self, environ, overrides, description, statuses, execute, config_context=None, timings=None):
         assert isinstance(environ, dict)
         assert config_context is None or isinstance(config_context, ConfigurePrepareContext)
         self._environ = environ
@@ -288,6 +390,9 @@ class _FunctionPrepareStage(PrepareStage):
         self._statuses_before_execute = statuses
         self._execute = execute
         self._config_context = config_context
+        if timings is None:
+            timings = PrepareTimings()
+        self._timings = timings
 
     # def __repr__(self):
     #    return "_FunctionPrepareStage(%r)" % (self._description)
@@ -304,7 +409,8 @@ class _FunctionPrepareStage(PrepareStage):
         return self._config_context
 
     def execute(self):
-        return self._execute(self)
+        with self._timings.measure('execute', self._description):
+            return self._execute(self)
 
     @property
     def result(self):
@@ -441,8 +547,108 @@ def _in_provide_whitelist(provide_whitelist, requirement):
     return False
 
 
+PROVIDE_WORKERS_ENV_VAR = 'ANACONDA_PROJECT_PROVIDE_WORKERS'
+
+
+def _provide_worker_count():
+    try:
+        return max(1, int(os.environ.get(PROVIDE_WORKERS_ENV_VAR, '1')))
+    except ValueError:
+        return 1
+
+
+def _provide_waves(statuses):
+    """Split toposorted statuses into lists whose members don't depend on each other."""
+    wave_by_env_var = dict()
+    waves = []
+    for status in statuses:
+        wave = 0
+        for env_var in status.analysis.missing_env_vars_to_provide:
+            if env_var in wave_by_env_var:
+                wave = max(wave, wave_by_env_var[env_var] + 1)
+        wave_by_env_var[status.requirement.env_var] = wave
+        while len(waves) <= wave:
+            waves.append([])
+        waves[wave].append(status)
+    return waves
+
+
+def _provide_batches(statuses):
+    """Split statuses into waves (see ``_provide_waves``) of lists to provide together.
+
+    Statuses in the same wave whose provider ``provides_in_batches`` go
+    together in one list, in place of the first of them; everything
+    else is on its own.
+    """
+    waves = []
+    for wave in _provide_waves(statuses):
+        batches = []
+        batch_by_provider_class = dict()
+        for status in wave:
+            provider_class = type(status.provider)
+            if not status.provider.provides_in_batches:
+                batches.append([status])
+            elif provider_class in batch_by_provider_class:
+                batch_by_provider_class[provider_class].append(status)
+            else:
+                batch_by_provider_class[provider_class] = [status]
+                batches.append(batch_by_provider_class[provider_class])
+        waves.append(batches)
+    return waves
+
+
+def _provide_batch(timings, batch, contexts):
+    with timings.measure('provide', ", ".join(status.requirement.env_var for status in batch)):
+        if len(batch) == 1:
+            results = [batch[0].provider.provide(batch[0].requirement, contexts[0])]
+        else:
+            results = batch[0].provider.provide_many([(status.requirement, context)
+                                                      for (status, context) in zip(batch, contexts)])
+    for (status, result) in zip(batch, results):
+        if result.metrics is not None:
+            timings.record_metrics(status.requirement.env_var, result.metrics)
+    return results
+
+
+def _merge_provided_environ(environ, original, provided):
+    for key in original:
+        if key not in provided:
+            environ.pop(key, None)
+    for key, value in provided.items():
+        if original.get(key) != value or key not in original:
+            environ[key] = value
+
+
+def _provide_concurrently(project, environ, local_state, default_env_spec_name, statuses, mode, timings, workers):
+    """Provide independent requirements on a thread pool.
+
+    Each provider gets its own copy of ``environ``; once they have all
+    finished we apply their changes in the order of ``statuses``, so
+    the result doesn't depend on which provider finished first.
+    """
+    results_by_status = dict()
+    for wave in _provide_batches(statuses):
+        original = dict(environ)
+        frontends = iter(_new_serializing_frontends(project.frontend, sum(len(batch) for batch in wave)))
+        contexts = [[
+            ProvideContext(dict(original), local_state, default_env_spec_name, status, mode, next(frontends))
+            for status in batch
+        ] for batch in wave]
+
+        with ThreadPoolExecutor(max_workers=min(workers, len(wave))) as executor:
+            futures = [
+                executor.submit(_provide_batch, timings, batch, batch_contexts)
+                for (batch, batch_contexts) in zip(wave, contexts)
+            ]
+        for (batch, batch_contexts, future) in zip(wave, contexts, futures):
+            for (status, context, result) in zip(batch, batch_contexts, future.result()):
+                results_by_status[status] = result
+                _merge_provided_environ(environ, original, context.environ)
+    return results_by_status
+
+
 def _configure_and_provide(project, environ, local_state, statuses, all_statuses, keep_going_until_success, mode,
-                           provide_whitelist, overrides, command, extra_command_args):
+                           provide_whitelist, overrides, command, extra_command_args, timings):
 
     default_env_spec_name = project.default_env_spec_name_for_command(command)
 
@@ -455,34 +661,47 @@ def _configure_and_provide(project, environ, local_state, statuses, all_statuses
         # we have to recheck all the statuses in case configuration happened
         rechecked = []
         for status in sorted:
-            rechecked.append(status.recheck(environ, local_state, default_env_spec_name, overrides))
+            rechecked.append(
+                _timed_check_status(timings, status.requirement,
+                                    lambda: status.recheck(environ, local_state, default_env_spec_name, overrides)))
 
         errors = []
-        did_any_providing = False
-        results_by_status = dict()
-
-        for status in rechecked:
-            if not _in_provide_whitelist(provide_whitelist, status.requirement):
-                continue
-            elif status.has_been_provided:
-                continue
-            else:
-                did_any_providing = True
-                context = ProvideContext(environ, local_state, default_env_spec_name, status, mode, project.frontend)
-                result = status.provider.provide(status.requirement, context)
-                errors.extend(result.errors)
-                results_by_status[status] = result
+        to_provide = [
+            status for status in rechecked
+            if _in_provide_whitelist(provide_whitelist, status.requirement) and not status.has_been_provided
+        ]
+        did_any_providing = len(to_provide) > 0
+        workers = _provide_worker_count()
+
+        if workers > 1 and len(to_provide) > 1:
+            results_by_status = _provide_concurrently(project, environ, local_state, default_env_spec_name, to_provide,
+                                                      mode, timings, workers)
+        else:
+            results_by_status = dict()
+            for wave in _provide_batches(to_provide):
+                for batch in wave:
+                    contexts = [
+                        ProvideContext(environ, local_state, default_env_spec_name, status, mode, project.frontend)
+                        for status in batch
+                    ]
+                    results_by_status.update(zip(batch, _provide_batch(timings, batch, contexts)))
+
+        # report errors in requirement order however we provided
+        for status in to_provide:
+            errors.extend(results_by_status[status].errors)
 
         if did_any_providing:
             old = rechecked
             rechecked = []
             for status in old:
                 rechecked.append(
-                    status.recheck(environ,
-                                   local_state,
-                                   default_env_spec_name,
-                                   overrides,
-                                   latest_provide_result=results_by_status.get(status)))
+                    _timed_check_status(
+                        timings, status.requirement,
+                        lambda: status.recheck(environ,
+                                               local_state,
+                                               default_env_spec_name,
+                                               overrides,
+                                               latest_provide_result=results_by_status.get(status))))
 
         failed = False
         for status in rechecked:
@@ -514,7 +733,8 @@ def _configure_and_provide(project, environ, local_state, statuses, all_statuses
                                errors=errors,
                                environ=environ,
                                overrides=overrides,
-                               env_spec_name=current_env_spec_name), rechecked)
+                               env_spec_name=current_env_spec_name,
+                               timings=timings), rechecked)
             if keep_going_until_success:
                 return _start_over(stage.statuses_after_execute, rechecked)
             else:
@@ -529,7 +749,8 @@ def _configure_and_provide(project, environ, local_state, statuses, all_statuses
                                command_exec_info=exec_info,
                                environ=environ,
                                overrides=overrides,
-                               env_spec_name=current_env_spec_name), rechecked)
+                               env_spec_name=current_env_spec_name,
+                               timings=timings), rechecked)
             return None
 
     def _start_over(updated_all_statuses, updated_statuses):
@@ -538,8 +759,13 @@ def _configure_and_provide(project, environ, local_state, statuses, all_statuses
                                                     default_env_spec_name=default_env_spec_name,
                                                     overrides=overrides,
                                                     statuses=updated_statuses)
-        return _FunctionPrepareStage(environ, overrides, "Set up project.", updated_all_statuses, provide_stage,
-                                     configure_context)
+        return _FunctionPrepareStage(environ,
+                                     overrides,
+                                     "Set up project.",
+                                     updated_all_statuses,
+                                     provide_stage,
+                                     configure_context,
+                                     timings=timings)
 
     return _start_over(all_statuses, statuses)
 
@@ -578,7 +804,7 @@ def _partition_first_group_to_configure(environ, local_state, statuses):
 
 def _process_requirement_statuses(project, environ, local_state, current_statuses, all_statuses,
                                   keep_going_until_success, mode, provide_whitelist, overrides, command,
-                                  extra_command_args):
+                                  extra_command_args, timings):
     (initial, remaining) = _partition_first_group_to_configure(environ, local_state, current_statuses)
 
     # a surprising thing here is that the "stages" from
@@ -591,7 +817,7 @@ def _process_requirement_statuses(project, environ, local_state, current_statuse
 
     def _stages_for(statuses):
         return _configure_and_provide(project, environ, local_state, statuses, all_statuses, keep_going_until_success,
-                                      mode, provide_whitelist, overrides, command, extra_command_args)
+                                      mode, provide_whitelist, overrides, command, extra_command_args, timings)
 
     if len(initial) > 0 and len(remaining) > 0:
 
@@ -600,7 +826,7 @@ def _process_requirement_statuses(project, environ, local_state, current_statuse
             updated = _refresh_status_list(remaining, updated_all_statuses)
             return _process_requirement_statuses(project, environ, local_state, updated, updated_all_statuses,
                                                  keep_going_until_success, mode, provide_whitelist, overrides, command,
-                                                 extra_command_args)
+                                                 extra_command_args, timings)
 
         return _after_stage_success(_stages_for(initial), process_remaining)
     elif len(initial) > 0:
@@ -651,19 +877,19 @@ def _assert_no_missing_env_var_requirements(project, environ, local_state, overr
 
 
 def _first_stage(project, environ, local_state, statuses, keep_going_until_success, mode, provide_whitelist, overrides,
-                 command, extra_command_args):
+                 command, extra_command_args, timings):
     assert 'PROJECT_DIR' in environ
 
     _assert_no_missing_env_var_requirements(project, environ, local_state, overrides, command, statuses)
 
     first_stage = _process_requirement_statuses(project, environ, local_state, statuses, statuses,
                                                 keep_going_until_success, mode, provide_whitelist, overrides, command,
-                                                extra_command_args)
+                                                extra_command_args, timings)
 
     return first_stage
 
 
-def _prepare_environ_and_overrides(project, environ=None, env_spec_name=None):
+def _prepare_environ_and_overrides(project, environ=None, env_spec_name=None, verify_downloads=False):
     if environ is None:
         environ = os.environ
 
@@ -697,13 +923,32 @@ def _prepare_environ_and_overrides(project, environ=None, env_spec_name=None):
     existing_env_prefix = conda_api.environ_get_prefix(environ_copy)
     conda_api.environ_delete_prefix_variables(environ_copy)
 
-    overrides = UserConfigOverrides(env_spec_name=env_spec_name, inherited_env=existing_env_prefix)
+    overrides = UserConfigOverrides(env_spec_name=env_spec_name,
+                                    inherited_env=existing_env_prefix,
+                                    verify_downloads=verify_downloads)
 
     return (environ_copy, overrides)
 
 
+def _verify_downloads(project, environ, local_state, overrides, timings):
+    # hash the downloads that changed since we last did (or all of them,
+    # if asked) at once, so their providers' analyze() finds them fresh;
+    # unzipped downloads don't have the file the checksum is for anymore.
+    files = []
+    for requirement in project.download_requirements(overrides.env_spec_name):
+        if requirement.hash_value is None or requirement.unzip:
+            continue
+        filename = os.path.join(environ['PROJECT_DIR'], requirement.filename)
+        if os.path.isfile(filename):
+            files.append((requirement.env_var, filename, requirement.hash_algorithm))
+    stale = download_digests.stale(local_state, files, force=overrides.verify_downloads)
+    if len(stale) > 0:
+        with timings.measure('analyze', ", ".join(env_var for (env_var, filename, hash_algorithm) in stale)):
+            download_digests.hash_all(local_state, stale)
+
+
 def _internal_prepare_in_stages(project, environ_copy, overrides, keep_going_until_success, mode, provide_whitelist,
-                                command_name, command, extra_command_args, refresh):
+                                command_name, command, extra_command_args, refresh, timings):
     assert not project.problems
     if mode not in _all_provide_modes:
         raise ValueError("invalid provide mode " + mode)
@@ -728,17 +973,20 @@ def _internal_prepare_in_stages(project, environ_copy, overrides, keep_going_unt
         env_name = overrides.env_spec_name or default_env_name
         _remove_env_path(project.env_specs[env_name].path(our_root), our_root)
 
+    if timings is None:
+        timings = PrepareTimings()
+
+    _verify_downloads(project, environ_copy, local_state, overrides, timings)
+
     statuses = []
     for requirement in project.requirements(overrides.env_spec_name):
-        status = requirement.check_status(environ_copy,
-                                          local_state,
-                                          default_env_name,
-                                          overrides,
-                                          latest_provide_result=None)
+        status = _timed_check_status(
+            timings, requirement, lambda: requirement.check_status(
+                environ_copy, local_state, default_env_name, overrides, latest_provide_result=None))
         statuses.append(status)
 
     return _first_stage(project, environ_copy, local_state, statuses, keep_going_until_success, mode, provide_whitelist,
-                        overrides, command, extra_command_args)
+                        overrides, command, extra_command_args, timings)
 
 
 def prepare_in_stages(project,
@@ -750,7 +998,9 @@ def prepare_in_stages(project,
                       command_name=None,
                       command=None,
                       extra_command_args=None,
-                      refresh=False):
+                      refresh=False,
+                      timings=None,
+                      verify_downloads=False):
     """Get a chain of all steps needed to get a project ready to execute.
 
     This function does not immediately do anything; it returns a
@@ -778,12 +1028,14 @@ def prepare_in_stages(project,
         command (ProjectCommand): command object, None for default
         extra_command_args (list of str): extra args for the command we prepare
         refresh (bool): do a full reinstall of the environment
+        timings (PrepareTimings): collector to add timings to, or None for a new one
+        verify_downloads (bool): hash every download with a checksum again, even if it looks unchanged
 
     Returns:
         The first ``PrepareStage`` in the chain of steps.
 
     """
-    (environ_copy, overrides) = _prepare_environ_and_overrides(project, environ, env_spec_name)
+    (environ_copy, overrides) = _prepare_environ_and_overrides(project, environ, env_spec_name, verify_downloads)
 
     return _internal_prepare_in_stages(project,
                                        environ_copy=environ_copy,
@@ -794,7 +1046,8 @@ def prepare_in_stages(project,
                                        command_name=command_name,
                                        command=command,
                                        extra_command_args=extra_command_args,
-                                       refresh=refresh)
+                                       refresh=refresh,
+                                       timings=timings)
 
 
 def _project_problems_to_prepare_failure(project, environ, overrides, would_have_used_env_spec):
@@ -886,7 +1139,9 @@ def prepare_without_interaction(project,
                                 command_name=None,
                                 command=None,
                                 extra_command_args=None,
-                                refresh=False):
+                                refresh=False,
+                                timings=None,
+                                verify_downloads=False):
     """Prepare a project to run one of its commands.
 
     This method doesn't ask the user any questions, so the
@@ -927,12 +1182,14 @@ def prepare_without_interaction(project,
         command_name (str): which named command to choose from the project, None for default
         command (ProjectCommand): command object, None for default
         extra_command_args (list): extra args to include in the returned command argv
+        timings (PrepareTimings): collector to add timings to, or None for a new one
+        verify_downloads (bool): hash every download with a checksum again, even if it looks unchanged
 
     Returns:
         a ``PrepareResult`` instance, which has a ``failed`` flag
 
     """
-    (environ_copy, overrides) = _prepare_environ_and_overrides(project, environ, env_spec_name)
+    (environ_copy, overrides) = _prepare_environ_and_overrides(project, environ, env_spec_name, verify_downloads)
 
     failure = _check_prepare_prerequisites(project, env_spec_name, command_name, command, environ_copy, overrides)
     if failure is not None:
@@ -947,7 +1204,8 @@ def prepare_without_interaction(project,
                                         command_name=command_name,
                                         command=command,
                                         extra_command_args=extra_command_args,
-                                        refresh=refresh)
+                                        refresh=refresh,
+                                        timings=timings)
 
     return prepare_execute_without_interaction(stage)
 
@@ -997,17 +1255,25 @@ def unprepare(project, prepare_result, whitelist=None):
 
     # note: if the prepare_result was a failure before statuses
     # were even checked, then statuses could be empty
+    # each provider gets all of its requirements at once, so it
+    # can (for example) stop all of its services together.
+    statuses = [status for status in prepare_result.statuses if _in_provide_whitelist(whitelist, status.requirement)]
+    statuses_by_provider_class = OrderedDict()
+    for status in statuses:
+        statuses_by_provider_class.setdefault(type(status.provider), []).append(status)
+    unprovide_statuses = dict()
+    for provider_statuses in statuses_by_provider_class.values():
+        requirements_and_statuses = [(status.requirement, status) for status in provider_statuses]
+        results = provider_statuses[0].provider.unprovide_many(requirements_and_statuses, prepare_result.environ,
+                                                               local_state_file, prepare_result.overrides)
+        unprovide_statuses.update(zip(provider_statuses, results))
+
     failed_statuses = []
     failed_requirements = []
     success_statuses = []
-    for status in prepare_result.statuses:
+    for status in statuses:
         requirement = status.requirement
-        if not _in_provide_whitelist(whitelist, requirement):
-            continue
-
-        provider = status.provider
-        unprovide_status = provider.unprovide(requirement, prepare_result.environ, local_state_file,
-                                              prepare_result.overrides, status)
+        unprovide_status = unprovide_statuses[status]
         if not unprovide_status:
             failed_requirements.append(requirement)
             failed_statuses.append(unprovide_status)
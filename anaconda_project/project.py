@@ -1601,6 +1601,8 @@ class Project(object):
 
                     if isinstance(req, DownloadRequirement):
                         data['url'] = req.url
+                        if req.mirrors:
+                            data['mirrors'] = list(req.mirrors)
                         downloads[req.env_var] = data
                     elif isinstance(req, ServiceRequirement):
                         data['type'] = req.service_type
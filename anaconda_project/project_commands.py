@@ -14,7 +14,6 @@ from collections import namedtuple
 import os
 import platform
 import sys
-from jinja2 import Template
 
 from anaconda_project.verbose import _verbose_logger
 from anaconda_project.internal import (conda_api, logged_subprocess, py2_compat)
@@ -156,6 +155,8 @@ class _TemplateArgsTransformer(_ArgsTransformer):
         items.update(environ)
 
         normalized = {self.arg_to_identifier(k): v for k, v in items.items()}
+        # only import jinja2 for commands that need it
+        from jinja2 import Template
         templated_command = Template(command).render(normalized)
         return [_append_extra_args_to_command_line(templated_command, extra_args)]
 
@@ -283,13 +284,12 @@ class CommandExecInfo(object):
                                        shell=self._shell,
                                        **kwargs)
 
-    def execvpe(self):
-        """Convenience method exec's the command replacing the current process.
+    def _args_for_exec(self):
+        """Add the env's conda env vars to our env and get the args to pass to execvpe.
 
-        Returns:
-            Does not return. May raise an OSError though.
+        On Windows with shell=True, the args aren't usable with
+        execvpe; ``execvpe()`` uses ``popen()`` in that case.
         """
-
         conda_prefix = self.env.get('CONDA_PREFIX', False)
         if conda_prefix:
             # make sure to add any Conda Environment variables to the environ
@@ -304,17 +304,26 @@ class CommandExecInfo(object):
         args = copy(self._args)
         if self._shell:
             assert len(args) == 1
-            if _is_windows():
-                # The issue here is that in Lib/subprocess.py in
-                # the Python distribution, if shell=True the code
-                # jumps through some funky hoops setting flags on
-                # the Windows API calls. We need to do that, rather
-                # than calling os.execvpe which doesn't let us set those
-                # flags. So we spawn the child and then exit.
-                sys.exit(self.popen().wait())
-            else:
+            if not _is_windows():
                 # this is all shell=True does on unix
                 args = ['/bin/sh', '-c'] + args
+        return args
+
+    def execvpe(self):
+        """Convenience method exec's the command replacing the current process.
+
+        Returns:
+            Does not return. May raise an OSError though.
+        """
+        args = self._args_for_exec()
+        if self._shell and _is_windows():
+            # The issue here is that in Lib/subprocess.py in
+            # the Python distribution, if shell=True the code
+            # jumps through some funky hoops setting flags on
+            # the Windows API calls. We need to do that, rather
+            # than calling os.execvpe which doesn't let us set those
+            # flags. So we spawn the child and then exit.
+            sys.exit(self.popen().wait())
 
         try:
             old_dir = os.getcwd()
@@ -19,7 +19,6 @@ except ImportError:
 
 from anaconda_project.project import Project, ALL_COMMAND_TYPES
 from anaconda_project import archiver
-from anaconda_project import client
 from anaconda_project import prepare
 from anaconda_project import provide
 from anaconda_project.local_state_file import LocalStateFile
@@ -1819,6 +1818,9 @@ def upload(project, private=None, site=None, username=None, token=None, suffix='
 
     # delete=True breaks on windows if you use tmp_tarfile.name to re-open the file,
     # so don't use delete=True.
+    # binstar_client is slow to import, so only import it when we need it
+    from anaconda_project import client
+
     tmp_tarfile = NamedTemporaryFile(delete=False, prefix="anaconda_upload_", suffix=suffix)
     tmp_tarfile.close()  # immediately un-use it to avoid file-in-use errors on Windows
     try:
@@ -1844,6 +1846,8 @@ def download(project, unpack=True, project_dir=None, parent_dir=None, site=None,
     Args:
         project: The project in format <username>/<project_name>
     """
+    from anaconda_project import client
+
     download_status = client._download(project,
                                        project_dir=project_dir,
                                        parent_dir=parent_dir,
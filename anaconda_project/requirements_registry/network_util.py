@@ -6,7 +6,10 @@
 # The full license is in the file LICENSE.txt, distributed with this software.
 # -----------------------------------------------------------------------------
 """Network utilities for use by plugins."""
+import errno
+import selectors
 import socket
+import time
 
 
 def _get_urlparse():
@@ -39,3 +42,82 @@ def can_connect_to_socket(host, port, timeout_seconds=0.5):
         return True
     except IOError:
         return False
+
+
+def can_connect_to_unix_socket(path, timeout_seconds=0.5):
+    """Check whether we can connect to a server listening on the Unix socket at path.
+
+    Args:
+        path (str): the socket's filename
+        timeout_seconds (float): how long to wait for failure
+    Returns:
+        True if we could connect
+    """
+    if not hasattr(socket, 'AF_UNIX'):  # pragma: no cover (Windows)
+        return False
+    s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        s.settimeout(timeout_seconds)
+        s.connect(path)
+        return True
+    except IOError:
+        return False
+    finally:
+        s.close()
+
+
+# what connect_ex() gives a non-blocking socket that is still connecting
+_CONNECTING = set([errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EAGAIN, getattr(errno, 'WSAEWOULDBLOCK', 10035)])
+
+
+def ports_in_use(host, ports, timeout_seconds=0.5):
+    """Check which of several ports on host we can connect to, trying them all at once.
+
+    Args:
+        host (str): the host
+        ports (list of int): the ports
+        timeout_seconds (float): how long to wait for all of them
+    Returns:
+        set of the ports we could connect to
+    """
+    try:
+        infos = socket.getaddrinfo(host, None, 0, socket.SOCK_STREAM)
+    except socket.gaierror:
+        return set()
+    # localhost may be both IPv4 and IPv6, and a server on either counts
+    addresses = []
+    for (family, _, _, _, sockaddr) in infos:
+        if (family, sockaddr[0]) not in addresses:
+            addresses.append((family, sockaddr[0]))
+
+    in_use = set()
+    selector = selectors.DefaultSelector()
+    try:
+        for port in ports:
+            for (family, address) in addresses:
+                s = socket.socket(family, socket.SOCK_STREAM)
+                s.setblocking(False)
+                error = s.connect_ex((address, port))
+                if error in _CONNECTING:
+                    selector.register(s, selectors.EVENT_WRITE, port)
+                    continue
+                if error == 0:
+                    in_use.add(port)
+                s.close()
+
+        deadline = time.monotonic() + timeout_seconds
+        while len(selector.get_map()) > 0:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                # like can_connect_to_socket(), a port that never answers isn't in use
+                break
+            for (key, _) in selector.select(remaining):
+                selector.unregister(key.fileobj)
+                if key.fileobj.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR) == 0:
+                    in_use.add(key.data)
+                key.fileobj.close()
+    finally:
+        for key in list(selector.get_map().values()):
+            key.fileobj.close()
+        selector.close()
+    return in_use
@@ -9,15 +9,32 @@
 from __future__ import absolute_import
 
 from abc import ABCMeta, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
 from copy import deepcopy
+import codecs
+import ctypes
+import ctypes.util
 import os
+import platform
+import select
 import shutil
+import signal
+import subprocess
+import sys
+import threading
+import time
 
 from anaconda_project.internal import conda_api
 from anaconda_project.internal import logged_subprocess
 from anaconda_project.internal.metaclass import with_metaclass
 from anaconda_project.internal.makedirs import makedirs_ok_if_exists
 from anaconda_project.internal.simple_status import SimpleStatus
+from anaconda_project.requirements_registry import network_util
+
+# providers may run concurrently and share one LocalStateFile, so we
+# serialize changing and saving it (and what's done while changing the
+# service run state, such as choosing a port and starting a service on it).
+_local_state_lock = threading.RLock()
 
 
 def _service_directory(local_state_file, relative_name):
@@ -69,13 +86,32 @@ class ProvideContext(object):
         Returns:
             Whatever ``func`` returns.
         """
-        old_state = self._local_state_file.get_service_run_state(service_name)
-        modified = deepcopy(old_state)
-        result = func(modified)
-        if modified != old_state:
-            self._local_state_file.set_service_run_state(service_name, modified)
+        with _local_state_lock:
+            old_state = self._local_state_file.get_service_run_state(service_name)
+            modified = deepcopy(old_state)
+            result = func(modified)
+            if modified != old_state:
+                self._local_state_file.set_service_run_state(service_name, modified)
+                self._local_state_file.save()
+            return result
+
+    def update_local_state(self, func):
+        """Run a function which modifies the LocalStateFile, then save it.
+
+        Providers may run at the same time on other threads, so use
+        this rather than changing and saving ``local_state_file``
+        directly.
+
+        Args:
+            func (function): function to run, passing it the LocalStateFile
+
+        Returns:
+            Whatever ``func`` returns.
+        """
+        with _local_state_lock:
+            result = func(self._local_state_file)
             self._local_state_file.save()
-        return result
+            return result
 
     @property
     def status(self):
@@ -106,10 +142,150 @@ class ProvideContext(object):
         return self._frontend
 
 
+SHUTDOWN_TIMEOUT_ENV_VAR = 'ANACONDA_PROJECT_SHUTDOWN_TIMEOUT'
+
+_DEFAULT_SHUTDOWN_TIMEOUT = 10
+
+
+def _shutdown_timeout_in_seconds():
+    try:
+        return max(0.1, float(os.environ.get(SHUTDOWN_TIMEOUT_ENV_VAR, _DEFAULT_SHUTDOWN_TIMEOUT)))
+    except ValueError:
+        return _DEFAULT_SHUTDOWN_TIMEOUT
+
+
+def _run_shutdown_command(command, timeout_seconds):
+    # None if it timed out (subprocess kills it for us)
+    try:
+        return logged_subprocess.call(command, timeout=timeout_seconds)
+    except subprocess.TimeoutExpired:
+        return None
+
+
+# filesystems record mtimes as coarsely as every two seconds
+_PIDFILE_MTIME_SLACK_SECONDS = 2
+
+
+def _process_command_line(pid):
+    # None where there's no /proc to ask
+    try:
+        with open('/proc/%d/cmdline' % pid, 'rb') as f:
+            return f.read().decode('utf-8', 'replace').split('\0')
+    except (IOError, OSError):
+        return None
+
+
+def _command_line_runs(command_line, program):
+    # some servers (redis-server for one) rewrite their argv[0] into
+    # a title like "redis-server *:6380", so look at each word
+    return any(os.path.basename(word) == program for arg in command_line for word in arg.split())
+
+
+def _kill_pid_in_pidfile(name, state):
+    """Kill the process a service wrote to its pidfile.
+
+    Returns a tuple (pid, error); pid is None if we didn't kill
+    anything, and error is why if we decided not to.
+    """
+    pidfile = state['pidfile']
+    try:
+        with codecs.open(pidfile, 'r', 'utf-8') as f:
+            pid = int(f.read().strip())
+        pidfile_mtime = os.path.getmtime(pidfile)
+    except (IOError, OSError, ValueError):
+        return (None, None)
+
+    # the pid in a pidfile from an earlier run may belong to some
+    # unrelated process by now, so make sure this is our service
+    if 'start_time' in state and pidfile_mtime < state['start_time'] - _PIDFILE_MTIME_SLACK_SECONDS:
+        return (None, "Not killing process %d for %s, because %s is older than the service." % (pid, name, pidfile))
+    if 'program' in state:
+        command_line = _process_command_line(pid)
+        if command_line is not None and not _command_line_runs(command_line, state['program']):
+            return (None, "Not killing process %d for %s, because it isn't running %s." % (pid, name, state['program']))
+
+    try:
+        os.kill(pid, getattr(signal, 'SIGKILL', signal.SIGTERM))
+    except OSError:
+        return (None, None)
+    return (pid, None)
+
+
+def _shutdown_service(name, state, timeout_seconds):
+    errors = []
+    killed = None
+    tried_kill = False
+    for command in state.get('shutdown_commands', []):
+        code = _run_shutdown_command(command, timeout_seconds)
+        if code is None:
+            if not tried_kill and 'pidfile' in state:
+                tried_kill = True
+                (killed, kill_error) = _kill_pid_in_pidfile(name, state)
+                if kill_error is not None:
+                    errors.append(kill_error)
+            if killed is None:
+                errors.append("Shutting down %s, command %s timed out after %g seconds." %
+                              (name, repr(command), timeout_seconds))
+        elif code != 0:
+            errors.append("Shutting down %s, command %s failed with code %d." % (name, repr(command), code))
+
+    if errors:
+        return SimpleStatus(success=False, description=("Shutdown commands failed for %s." % name), errors=errors)
+    elif killed is not None:
+        return SimpleStatus(success=True,
+                            description=("Killed process %d for %s after its shutdown timed out." % (killed, name)))
+    else:
+        return SimpleStatus(success=True, description=("Successfully shut down %s." % name))
+
+
+def shutdown_service_run_states(local_state_file, service_names, save=True):
+    """Run the shutdown commands from the local state file for several services at once.
+
+    The services shut down at the same time, each running its
+    commands in order. A command that doesn't finish within
+    ``ANACONDA_PROJECT_SHUTDOWN_TIMEOUT`` seconds is killed, and then
+    so is the process in the service's ``pidfile``, if its run state
+    has one. The process is left alone if the pidfile is older than
+    the run state's ``start_time``, or if /proc shows it isn't running
+    the run state's ``program``. The run states are cleared and the
+    file is saved once at the end.
+
+    Args:
+        local_state_file (LocalStateFile): local state
+        service_names (list of str): the names of the services, usually
+            variable names, each specific enough to uniquely identify the provider
+        save (bool): False to leave saving the file to the caller
+
+    Returns:
+        a list of `Status` instances potentially containing errors, one for each service
+    """
+    run_states = local_state_file.get_all_service_run_states()
+    running = [name for name in service_names if name in run_states]
+    timeout_seconds = _shutdown_timeout_in_seconds()
+    statuses_by_name = dict()
+    if len(running) > 0:
+        with ThreadPoolExecutor(max_workers=len(running)) as executor:
+            futures = [executor.submit(_shutdown_service, name, run_states[name], timeout_seconds) for name in running]
+        statuses_by_name = dict(zip(running, [future.result() for future in futures]))
+
+        with _local_state_lock:
+            # clear out the run states once we try to shut them down
+            for name in running:
+                local_state_file.set_service_run_state(name, dict())
+            if save:
+                local_state_file.save()
+
+    return [
+        statuses_by_name.get(name, SimpleStatus(success=True, description=("Nothing to do to shut down %s." % name)))
+        for name in service_names
+    ]
+
+
 def shutdown_service_run_state(local_state_file, service_name):
     """Run any shutdown commands from the local state file for the given service.
 
     Also remove the shutdown commands from the file.
+    See ``shutdown_service_run_states`` to shut down several at once.
 
     Args:
         local_state_file (LocalStateFile): local state
@@ -120,28 +296,137 @@ def shutdown_service_run_state(local_state_file, service_name):
     Returns:
         a `Status` instance potentially containing errors
     """
-    run_states = local_state_file.get_all_service_run_states()
-    if service_name not in run_states:
-        return SimpleStatus(success=True, description=("Nothing to do to shut down %s." % service_name))
+    return shutdown_service_run_states(local_state_file, [service_name])[0]
+
+
+# inotify events meaning a file in the directory appeared or was written
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+
+_libc_with_inotify = []
+
+
+def _inotify_libc():
+    if len(_libc_with_inotify) == 0:
+        libc = None
+        if platform.system() == 'Linux':
+            try:
+                libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+                if not hasattr(libc, 'inotify_init1'):
+                    libc = None
+            except OSError:
+                libc = None
+        _libc_with_inotify.append(libc)
+    return _libc_with_inotify[0]
+
+
+class _DirectoryWatcher(object):
+    """Lets us sleep until a file changes in a directory, with inotify if we have it."""
+    def __init__(self, directory):
+        self._fd = None
+        libc = _inotify_libc()
+        if libc is None or not os.path.isdir(directory):
+            return
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            return
+        mask = _IN_CREATE | _IN_MOVED_TO | _IN_CLOSE_WRITE
+        if libc.inotify_add_watch(fd, directory.encode(sys.getfilesystemencoding()), mask) < 0:
+            os.close(fd)
+            return
+        self._fd = fd
+
+    def wait(self, seconds):
+        """Sleep for seconds, or until something happens in the directory."""
+        if self._fd is None:
+            time.sleep(seconds)
+            return
+        (readable, _, _) = select.select([self._fd], [], [], seconds)
+        if len(readable) > 0:
+            try:
+                os.read(self._fd, 64 * 1024)
+            except OSError:
+                pass
+
+    def close(self):
+        """Stop watching."""
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+class ServiceReadiness(object):
+    """What ``wait_for_service()`` found out about a service we started."""
+    def __init__(self, accepting, pidfile_exists, seconds):
+        """Create a ServiceReadiness.
 
-    errors = []
-    state = run_states[service_name]
-    if 'shutdown_commands' in state:
-        commands = state['shutdown_commands']
-        for command in commands:
-            code = logged_subprocess.call(command)
-            if code != 0:
-                errors.append("Shutting down %s, command %s failed with code %d." % (service_name, repr(command), code))
-    # clear out the run state once we try to shut it down
-    local_state_file.set_service_run_state(service_name, dict())
-    local_state_file.save()
+        Args:
+            accepting (bool): whether the service accepted a connection
+            pidfile_exists (bool): whether the service wrote its pidfile
+            seconds (float): how long we waited
+        """
+        self.accepting = accepting
+        self.pidfile_exists = pidfile_exists
+        self.seconds = seconds
 
-    if errors:
-        return SimpleStatus(success=False,
-                            description=("Shutdown commands failed for %s." % service_name),
-                            errors=errors)
-    else:
-        return SimpleStatus(success=True, description=("Successfully shut down %s." % service_name))
+    @property
+    def ready(self):
+        """True if the service accepted a connection and wrote its pidfile."""
+        return self.accepting and self.pidfile_exists
+
+
+# the first and longest pause between checking on a starting service
+_FIRST_READINESS_DELAY = 0.005
+_MAX_READINESS_DELAY = 0.25
+
+
+def wait_for_service(host, port, pidfile=None, timeout_seconds=10, unix_socket=None):
+    """Wait for a service we just started to accept connections on host:port and write its pidfile.
+
+    We try connecting without blocking, pausing twice as long after
+    each try; while the pidfile is missing, we wake up as soon as it
+    appears, where inotify lets us.
+
+    Args:
+        host (str): the host
+        port (int): the port the service listens on
+        pidfile (str): the service's pidfile, or None to not wait for one
+        timeout_seconds (float): how long to give the service
+        unix_socket (str): filename of a Unix socket to connect to instead of host:port
+
+    Returns:
+        a ``ServiceReadiness``
+    """
+    start = time.monotonic()
+    deadline = start + timeout_seconds
+    accepting = False
+    pidfile_exists = pidfile is None
+    watcher = None if pidfile is None else _DirectoryWatcher(os.path.dirname(pidfile))
+    delay = _FIRST_READINESS_DELAY
+    try:
+        while True:
+            # we aren't sure whether the port or the pidfile comes first
+            if not pidfile_exists:
+                pidfile_exists = os.path.exists(pidfile)
+            if not accepting:
+                probe_timeout = max(0.0, min(0.5, deadline - time.monotonic()))
+                if unix_socket is not None:
+                    accepting = network_util.can_connect_to_unix_socket(unix_socket, timeout_seconds=probe_timeout)
+                else:
+                    accepting = port in network_util.ports_in_use(host, [port], timeout_seconds=probe_timeout)
+            remaining = deadline - time.monotonic()
+            if (accepting and pidfile_exists) or remaining <= 0:
+                break
+            if pidfile_exists:
+                time.sleep(min(delay, remaining))
+            else:
+                watcher.wait(min(delay, remaining))
+            delay = min(delay * 2, _MAX_READINESS_DELAY)
+    finally:
+        if watcher is not None:
+            watcher.close()
+    return ServiceReadiness(accepting=accepting, pidfile_exists=pidfile_exists, seconds=time.monotonic() - start)
 
 
 def delete_service_directory(local_state_file, relative_name):
@@ -204,27 +489,35 @@ class ProvideResult(object):
 
     Instances of this class are immutable, and are returned from ``provide()``.
     """
-    def __init__(self, errors=None):
+    def __init__(self, errors=None, metrics=None):
         """Create a ProvideResult."""
         if errors is None:
             errors = []
         self._errors = errors
+        self._metrics = metrics
 
-    def copy_with_additions(self, errors=None):
-        """Copy this result, appending additional errors."""
+    def copy_with_additions(self, errors=None, metrics=None):
+        """Copy this result, appending additional errors and setting metrics."""
         if errors is None:
             errors = []
-        if len(errors) == 0:
+        if len(errors) == 0 and metrics is None:
             # we don't have to actually copy since we are immutable
             return self
         else:
-            return ProvideResult(errors=(self._errors + errors))
+            if metrics is None:
+                metrics = self._metrics
+            return ProvideResult(errors=(self._errors + errors), metrics=metrics)
 
     @property
     def errors(self):
         """Get any fatal errors that occurred during provide() preventing success."""
         return self._errors
 
+    @property
+    def metrics(self):
+        """Get a dict of measurements the provider made, such as how fast a download went, or None."""
+        return self._metrics
+
     @classmethod
     def empty(cls):
         """Get an empty ProvideResult (currently a singleton since these are immutable)."""
@@ -237,6 +530,10 @@ _empty_provide_result = ProvideResult()
 
 class Provider(with_metaclass(ABCMeta)):
     """A Provider can take some action to meet a Requirement."""
+    # True if prepare should call provide_many() with all of this
+    # provider's requirements that don't depend on each other.
+    provides_in_batches = False
+
     @abstractmethod
     def missing_env_vars_to_configure(self, requirement, environ, local_state_file):
         """Get a list of unset environment variable names that must be set before configuring this provider.
@@ -341,6 +638,22 @@ class Provider(with_metaclass(ABCMeta)):
         """
         pass  # pragma: no cover
 
+    def provide_many(self, requirements_and_contexts):
+        """Execute the provider for several requirements which don't depend on each other.
+
+        This is only used if ``provides_in_batches`` is True, for
+        providers that can do better than one ``provide()`` at a time.
+        The default calls ``provide()`` for each requirement in turn.
+
+        Args:
+            requirements_and_contexts (list): (Requirement, ProvideContext) pairs
+
+        Returns:
+            a list of ``ProvideResult``, one for each requirement
+
+        """
+        return [self.provide(requirement, context) for (requirement, context) in requirements_and_contexts]
+
     @abstractmethod
     def unprovide(self, requirement, environ, local_state_file, overrides, requirement_status=None):
         """Undo the provide, cleaning up any files or processes we created.
@@ -360,6 +673,26 @@ class Provider(with_metaclass(ABCMeta)):
         """
         pass  # pragma: no cover
 
+    def unprovide_many(self, requirements_and_statuses, environ, local_state_file, overrides):
+        """Undo the provide for several requirements.
+
+        Providers that run services override this to stop them all at
+        once; the default calls ``unprovide()`` for each in turn.
+
+        Args:
+            requirements_and_statuses (list): (Requirement, RequirementStatus or None) pairs
+            environ (dict): current env vars, often from a previous prepare
+            local_state_file (LocalStateFile): the local state
+            overrides (UserConfigOverrides): overrides to state
+
+        Returns:
+            a list of `Status`, one for each requirement
+        """
+        return [
+            self.unprovide(requirement, environ, local_state_file, overrides, status)
+            for (requirement, status) in requirements_and_statuses
+        ]
+
 
 class EnvVarProvider(Provider):
     """Meets a requirement for an env var by letting people set it manually."""
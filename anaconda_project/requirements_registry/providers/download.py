@@ -11,25 +11,77 @@ from __future__ import print_function
 import os
 import shutil
 
+from tornado import gen
 from tornado.ioloop import IOLoop
 
-from anaconda_project.internal.http_client import FileDownloader
-from anaconda_project.internal.ziputils import unpack_zip
+from anaconda_project.internal import download_cache, download_digests, subprocess_trace
+from anaconda_project.internal.http_client import DownloadMetrics, FileDownloader, download_all, rank_mirrors
+from anaconda_project.internal.ziputils import StreamingUnpacker, unpack_zip
 from anaconda_project.internal.simple_status import SimpleStatus
 from anaconda_project.requirements_registry.provider import EnvVarProvider, ProviderAnalysis
 from anaconda_project.provide import PROVIDE_MODE_CHECK
-from anaconda_project.frontend import _new_error_recorder
+from anaconda_project.frontend import _new_error_recorder, _null_frontend
 
 
 class _DownloadProviderAnalysis(ProviderAnalysis):
     """Subtype of ProviderAnalysis showing if a filename exists."""
-    def __init__(self, config, missing_to_configure, missing_to_provide, existing_filename):
+    def __init__(self, config, missing_to_configure, missing_to_provide, existing_filename, mismatched_filename=None):
         super(_DownloadProviderAnalysis, self).__init__(config, missing_to_configure, missing_to_provide)
         self.existing_filename = existing_filename
+        # a file we found that doesn't match the checksum
+        self.mismatched_filename = mismatched_filename
+
+
+DOWNLOAD_CONNECTIONS_ENV_VAR = 'ANACONDA_PROJECT_DOWNLOAD_CONNECTIONS'
+
+
+def _download_connection_count():
+    try:
+        return max(1, int(os.environ.get(DOWNLOAD_CONNECTIONS_ENV_VAR, '4')))
+    except ValueError:
+        return 4
+
+
+# local state section where we keep what the server said about
+# each revalidated download, to ask it about changes next time
+_VALIDATORS_SECTION = 'download_validators'
+
+DOWNLOAD_SEGMENTS_ENV_VAR = 'ANACONDA_PROJECT_DOWNLOAD_SEGMENTS'
+
+
+def _download_segment_count():
+    try:
+        return max(1, int(os.environ.get(DOWNLOAD_SEGMENTS_ENV_VAR, '1')))
+    except ValueError:
+        return 1
+
+
+class _Download(object):
+    """One file we're downloading, with what we need to finish up afterward."""
+    def __init__(self, requirement, context, frontend, previous_validators=None):
+        self.requirement = requirement
+        self.context = context
+        self.frontend = frontend
+        # set when we're checking an existing download for changes
+        self.previous_validators = previous_validators
+        self.filename = os.path.abspath(os.path.join(context.environ['PROJECT_DIR'], requirement.filename))
+        if requirement.unzip:
+            self.download_filename = self.filename + ".zip"
+        else:
+            self.download_filename = self.filename
+        self.cached = False
+        self.unpacker = None
+        self.downloader = None
+        self.response = None
+        self.exception = None
+        self.metrics = None
 
 
 class DownloadProvider(EnvVarProvider):
     """Downloads a file according to the specified requirement."""
+    # so prepare gives us all the downloads it can at once
+    provides_in_batches = True
+
     def read_config(self, requirement, environ, local_state_file, default_env_spec_name, overrides):
         """Override superclass to return our config."""
         config = super(DownloadProvider, self).read_config(requirement, environ, local_state_file,
@@ -64,52 +116,123 @@ class DownloadProvider(EnvVarProvider):
         analysis = super(DownloadProvider, self).analyze(requirement, environ, local_state_file, default_env_spec_name,
                                                          overrides)
         filename = os.path.join(environ['PROJECT_DIR'], requirement.filename)
+        mismatched_filename = None
         if os.path.exists(filename):
             existing_filename = filename
+            # an unzipped download doesn't have the file the checksum is for; prepare
+            # hashes changed files before we get here, and otherwise we trust an
+            # unhashed file as we always have rather than hash it here
+            if requirement.hash_value is not None and not requirement.unzip and \
+               download_digests.matches(local_state_file, requirement.env_var, filename,
+                                        requirement.hash_algorithm, requirement.hash_value) is False:
+                existing_filename = None
+                mismatched_filename = filename
         else:
             existing_filename = None
         return _DownloadProviderAnalysis(analysis.config,
                                          analysis.missing_env_vars_to_configure,
                                          analysis.missing_env_vars_to_provide,
-                                         existing_filename=existing_filename)
+                                         existing_filename=existing_filename,
+                                         mismatched_filename=mismatched_filename)
 
-    def _provide_download(self, requirement, context, frontend):
-        filename = context.status.analysis.existing_filename
-        if filename is not None:
-            frontend.info("Previously downloaded file located at {}".format(filename))
-            return filename
+    def _run_downloads(self, downloads):
+        segments = _download_segment_count()
+        for download in downloads:
+            requirement = download.requirement
+            # unless we're keeping the archive for the cache, we unpack it as it arrives
+            if requirement.unzip and (requirement.hash_value is None or not download_cache.enabled()):
+                download.unpacker = StreamingUnpacker(download.filename)
 
-        filename = os.path.abspath(os.path.join(context.environ['PROJECT_DIR'], requirement.filename))
-        if requirement.unzip:
-            download_filename = filename + ".zip"
-        else:
-            download_filename = filename
-        download = FileDownloader(url=requirement.url,
-                                  filename=download_filename,
-                                  hash_algorithm=requirement.hash_algorithm)
+        @gen.coroutine
+        def rank_and_download():
+            # the fastest mirror of each download first
+            rankings = yield [rank_mirrors(download.requirement.urls) for download in downloads]
+            downloaders = [
+                FileDownloader(url=download.requirement.url,
+                               filename=download.download_filename,
+                               hash_algorithm=download.requirement.hash_algorithm,
+                               segments=segments,
+                               unpacker=download.unpacker,
+                               previous_validators=download.previous_validators,
+                               mirrors=urls) for (download, urls) in zip(downloads, rankings)
+            ]
+            results = yield download_all(downloaders, _download_connection_count())
+            raise gen.Return((downloaders, results))
+
+        _ioloop = IOLoop(make_current=False)
+        try:
+            (downloaders, results) = _ioloop.run_sync(rank_and_download)
+        finally:
+            _ioloop.close()
+        for (download, downloader, (response, exception)) in zip(downloads, downloaders, results):
+            download.downloader = downloader
+            download.response = response
+            download.exception = exception
+            download.metrics = downloader.metrics
+
+    def _fetch_from_cache(self, download):
+        requirement = download.requirement
+        if requirement.hash_value is None or not download_cache.enabled():
+            return False
+        metrics = DownloadMetrics(requirement.url, cached=True)
+        if not download_cache.fetch(requirement.hash_algorithm, requirement.hash_value, download.download_filename):
+            return False
+        metrics.finish(size=os.path.getsize(download.download_filename))
+        download.frontend.info("Using cached download of {}".format(requirement.url))
+        download.cached = True
+        download.metrics = metrics
+        return True
 
+    def _install(self, download):
+        frontend = download.frontend
+        filename = download.filename
+        download_filename = download.download_filename
+        if download.downloader is not None and download.downloader.streamed:
+            unzip_errors = []
+            if download.unpacker.finish(unzip_errors):
+                return filename
+            else:
+                for error in unzip_errors:
+                    frontend.error(error)
+                return None
+        elif download.requirement.unzip:
+            unzip_errors = []
+            if unpack_zip(download_filename, filename, unzip_errors):
+                os.remove(download_filename)
+                return filename
+            else:
+                for error in unzip_errors:
+                    frontend.error(error)
+                return None
+        return filename
+
+    def _finish_download(self, download):
+        requirement = download.requirement
+        frontend = download.frontend
+        download_filename = download.download_filename
+        response = download.response
         try:
-            _ioloop = IOLoop(make_current=False)
-            response = _ioloop.run_sync(download.run)
-            if response is None:
-                for error in download.errors:
+            if download.cached:
+                return self._install(download)
+            elif download.exception is not None:
+                raise download.exception
+            elif response is None:
+                for error in download.downloader.errors:
                     frontend.error(error)
                 return None
-            elif response.code == 200:
-                if requirement.hash_value is not None and requirement.hash_value != download.hash:
+            elif response.code == 304:
+                return download.filename
+            elif response.code in (200, 206):
+                if requirement.hash_value is not None and requirement.hash_value != download.downloader.hash:
                     frontend.error("Error downloading {}: mismatched hashes. Expected: {}, calculated: {}".format(
-                        requirement.url, requirement.hash_value, download.hash))
-                    return None
-                if requirement.unzip:
-                    unzip_errors = []
-                    if unpack_zip(download_filename, filename, unzip_errors):
+                        requirement.url, requirement.hash_value, download.downloader.hash))
+                    # so we start over next time, rather than using or resuming a bad file
+                    if os.path.isfile(download_filename):
                         os.remove(download_filename)
-                        return filename
-                    else:
-                        for error in unzip_errors:
-                            frontend.error(error)
-                        return None
-                return filename
+                    return None
+                if requirement.hash_value is not None and download_cache.enabled():
+                    download_cache.store(requirement.hash_algorithm, requirement.hash_value, download_filename)
+                return self._install(download)
             else:
                 frontend.error("Error downloading {}: response code {}".format(requirement.url, response.code))
                 return None
@@ -117,7 +240,9 @@ class DownloadProvider(EnvVarProvider):
             frontend.error("Error downloading {}: {}".format(requirement.url, str(e)))
             return None
         finally:
-            _ioloop.close()
+            # throw away anything half-unpacked
+            if download.unpacker is not None:
+                download.unpacker.abort()
 
     def provide(self, requirement, context):
         """Override superclass to start a download..
@@ -126,25 +251,118 @@ class DownloadProvider(EnvVarProvider):
         requirement's env var to that filename.
 
         """
-        super_result = super(DownloadProvider, self).provide(requirement, context)
+        return self.provide_many([(requirement, context)])[0]
+
+    def provide_many(self, requirements_and_contexts):
+        """Override superclass to download all the missing files at once."""
+        results = []
+        downloads = []
+        for (requirement, context) in requirements_and_contexts:
+            super_result = super(DownloadProvider, self).provide(requirement, context)
+
+            if context.mode == PROVIDE_MODE_CHECK:
+                results.append((super_result, None, None))
+                continue
+            # we do the download in both prod and dev mode
 
-        if context.mode == PROVIDE_MODE_CHECK:
-            return super_result
-        # we do the download in both prod and dev mode
+            frontend = _new_error_recorder(context.frontend)
+            download = None
+            if requirement.env_var not in context.environ or context.status.analysis.config['source'] == 'download':
+                filename = context.status.analysis.existing_filename
+                if filename is not None:
+                    if requirement.revalidate:
+                        # if we can't check, we say so ourselves and keep the file
+                        download = _Download(requirement,
+                                             context,
+                                             _new_error_recorder(_null_frontend()),
+                                             previous_validators=self._previous_validators(requirement, context))
+                    else:
+                        frontend.info("Previously downloaded file located at {}".format(filename))
+                        context.environ[requirement.env_var] = filename
+                else:
+                    mismatched_filename = context.status.analysis.mismatched_filename
+                    if mismatched_filename is not None:
+                        frontend.info("{} doesn't match its checksum; downloading it again".format(mismatched_filename))
+                    download = _Download(requirement, context, frontend)
+            if download is not None:
+                downloads.append(download)
+            results.append((super_result, frontend, download))
+
+        to_fetch = [download for download in downloads if not self._fetch_from_cache(download)]
+        if len(to_fetch) > 0:
+            try:
+                self._run_downloads(to_fetch)
+            except Exception as e:
+                for download in to_fetch:
+                    download.exception = e
 
-        frontend = _new_error_recorder(context.frontend)
-        if requirement.env_var not in context.environ or context.status.analysis.config['source'] == 'download':
-            filename = self._provide_download(requirement, context, frontend)
+        for download in downloads:
+            filename = self._finish_download(download)
+            requirement = download.requirement
+            context = download.context
+            if download.metrics is not None:
+                subprocess_trace.trace_download(download.metrics.to_json())
+            if download.previous_validators is not None and filename is None:
+                filename = context.status.analysis.existing_filename
+                context.frontend.info("Could not check {} for changes, using {}: {}".format(
+                    requirement.url, filename, "; ".join(download.frontend.pop_errors())))
+            elif requirement.revalidate and filename is not None:
+                if download.response is not None and download.response.code == 304:
+                    context.frontend.info("{} has not changed since it was downloaded to {}".format(
+                        requirement.url, filename))
+                self._save_validators(download)
             if filename is not None:
                 context.environ[requirement.env_var] = filename
+                self._save_digest(download)
+
+        return [
+            super_result if frontend is None else super_result.copy_with_additions(
+                errors=frontend.pop_errors(),
+                metrics=(None if download is None or download.metrics is None else download.metrics.to_json()))
+            for (super_result, frontend, download) in results
+        ]
+
+    def _previous_validators(self, requirement, context):
+        saved = context.local_state_file.get_value([_VALIDATORS_SECTION, requirement.env_var], default=dict())
+        if not isinstance(saved, dict) or saved.get('url') != requirement.url:
+            # so we download it again, and know what to ask next time
+            return dict()
+        return dict((name, saved[name]) for name in ('etag', 'last_modified') if saved.get(name))
+
+    def _save_validators(self, download):
+        if download.downloader is None:
+            return
+        validators = dict(download.previous_validators or {})
+        validators.update(download.downloader.validators)
+        validators['url'] = download.requirement.url
+        download.context.update_local_state(lambda local_state_file: local_state_file.set_value(
+            [_VALIDATORS_SECTION, download.requirement.env_var], validators))
 
-        return super_result.copy_with_additions(errors=frontend.pop_errors())
+    def _save_digest(self, download):
+        # we just checked it against the checksum, so the next prepare needn't
+        requirement = download.requirement
+        if requirement.hash_value is None or requirement.unzip:
+            return
+        if download.response is not None and download.response.code == 304:
+            return
+        download.context.update_local_state(
+            lambda local_state_file: download_digests.record(local_state_file, requirement.env_var, download.filename,
+                                                             requirement.hash_algorithm, requirement.hash_value))
 
     def unprovide(self, requirement, environ, local_state_file, overrides, requirement_status=None):
         """Override superclass to delete the downloaded file."""
         project_dir = environ['PROJECT_DIR']
         filename = os.path.abspath(os.path.join(project_dir, requirement.filename))
+        for section in (_VALIDATORS_SECTION, download_digests.SECTION):
+            if local_state_file.get_value([section, requirement.env_var]) is not None:
+                local_state_file.unset_value([section, requirement.env_var])
+                local_state_file.save()
         try:
+            # what's left of an interrupted download, which we'd otherwise resume
+            for download_filename in (filename, filename + ".zip"):
+                for partial in (download_filename + ".part", download_filename + ".part.json"):
+                    if os.path.isfile(partial):
+                        os.remove(partial)
             if os.path.isdir(filename):
                 shutil.rmtree(filename)
             elif os.path.isfile(filename):
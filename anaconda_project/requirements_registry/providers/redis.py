@@ -16,17 +16,94 @@ import sys
 import time
 
 from anaconda_project.requirements_registry.provider import (EnvVarProvider, ProviderAnalysis,
-                                                             shutdown_service_run_state, delete_service_directory)
+                                                             shutdown_service_run_state, shutdown_service_run_states,
+                                                             delete_service_directory, wait_for_service)
 import anaconda_project.requirements_registry.network_util as network_util
 from anaconda_project.provide import PROVIDE_MODE_DEVELOPMENT
 from anaconda_project.frontend import _new_error_recorder
+from anaconda_project.local_state_file import LocalStateFile
+from anaconda_project.internal.simple_status import SimpleStatus
 from anaconda_project.internal import py2_compat
 from anaconda_project.internal import logged_subprocess
+from anaconda_project.internal import port_leases
+from anaconda_project.internal import user_dirs
+from anaconda_project.internal.subprocess_trace import TracedProcess
+from anaconda_project.internal.env_flags import env_flag
 
 _DEFAULT_SYSTEM_REDIS_HOST = "localhost"
 _DEFAULT_SYSTEM_REDIS_PORT = 6379
 _DEFAULT_SYSTEM_REDIS_URL = "redis://%s:%d" % (_DEFAULT_SYSTEM_REDIS_HOST, _DEFAULT_SYSTEM_REDIS_PORT)
 
+POOL_ENV_VAR = 'ANACONDA_PROJECT_REDIS_POOL'
+
+# the shared redis-server's run state lives in a local state file
+# of its own, in the per-user cache, under this service name
+_POOL_SERVICE_NAME = 'REDIS_POOL'
+
+# each project/env spec using the shared redis-server gets one of these
+_POOL_DATABASES = 256
+
+# longest path bind() accepts for a Unix socket; sun_path is 104 bytes
+# on macOS and the BSDs and 108 on Linux, including the terminating NUL
+_MAX_UNIX_SOCKET_PATH_BYTES = 107 if sys.platform.startswith('linux') else 103
+
+
+def _pool_directory():
+    return user_dirs.user_cache_dir('redis-pool')
+
+
+def _locked_pool():
+    return user_dirs.locked_file(os.path.join(_pool_directory(), 'pool.lock'))
+
+
+def _pool_local_state_file():
+    return LocalStateFile.load_for_directory(_pool_directory(), scan_parents=False)
+
+
+def _pool_tenant(local_state_file, env_var, env_spec_name):
+    project_dir = os.path.dirname(os.path.abspath(local_state_file.filename))
+    return "{project_dir}:{env_var}:{env_spec}".format(project_dir=project_dir, env_var=env_var, env_spec=env_spec_name)
+
+
+def _release_pool_databases(tenants):
+    """Give back the shared redis-server's databases held by tenants.
+
+    Each database is emptied for whoever gets it next, and once no
+    tenants are left, the shared redis-server is shut down.
+
+    Returns:
+        a ``Status``
+    """
+    with _locked_pool():
+        pool_state_file = _pool_local_state_file()
+        state = pool_state_file.get_service_run_state(_POOL_SERVICE_NAME)
+        databases = state.get('tenants', dict())
+        port = state.get('port', None)
+        alive = port is not None and network_util.can_connect_to_socket(host='localhost', port=port)
+        errors = []
+        for tenant in tenants:
+            if tenant not in databases:
+                continue
+            db = databases.pop(tenant)
+            if alive:
+                command = ['redis-cli', '-p', str(port), '-n', str(db), 'flushdb']
+                code = logged_subprocess.call(command)
+                if code != 0:
+                    errors.append("Emptying Redis database %d, command %s failed with code %d." %
+                                  (db, repr(command), code))
+
+        if len(databases) > 0:
+            pool_state_file.set_service_run_state(_POOL_SERVICE_NAME, state)
+            pool_state_file.save()
+        elif alive or len(state) > 0:
+            status = shutdown_service_run_state(pool_state_file, _POOL_SERVICE_NAME)
+            errors.extend(status.errors)
+
+    if errors:
+        return SimpleStatus(success=False, description="Failed to release shared Redis databases.", errors=errors)
+    else:
+        return SimpleStatus(success=True, description="Released shared Redis databases.")
+
 
 class _RedisProviderAnalysis(ProviderAnalysis):
     """Subtype of ProviderAnalysis with extra fields RedisProvider needs to track."""
@@ -68,7 +145,8 @@ class RedisProvider(EnvVarProvider):
 
         section = self._config_section(requirement)
 
-        scope = local_state_file.get_value(section + ['scope'], default='all')
+        default_scope = 'pool' if env_flag(POOL_ENV_VAR, environ) else 'all'
+        scope = local_state_file.get_value(section + ['scope'], default=default_scope)
         if config['source'] == 'unset':
             config['source'] = 'find_' + scope
 
@@ -109,6 +187,8 @@ class RedisProvider(EnvVarProvider):
                 scope = 'project'
             elif values['source'] == 'find_system':
                 scope = 'system'
+            elif values['source'] == 'find_pool':
+                scope = 'pool'
             else:
                 scope = None
             if scope is not None:
@@ -129,7 +209,12 @@ class RedisProvider(EnvVarProvider):
                                                                 default_env_spec_name, overrides, values)
 
     def _previously_run_redis_url_if_alive(self, run_state):
-        if 'port' in run_state and network_util.can_connect_to_socket(host='localhost', port=run_state['port']):
+        if 'unixsocket' in run_state:
+            if network_util.can_connect_to_unix_socket(run_state['unixsocket']):
+                return "unix://{path}".format(path=run_state['unixsocket'])
+            else:
+                return None
+        elif 'port' in run_state and network_util.can_connect_to_socket(host='localhost', port=run_state['port']):
             return "redis://localhost:{port}".format(port=run_state['port'])
         else:
             return None
@@ -175,114 +260,199 @@ class RedisProvider(EnvVarProvider):
             run_state.clear()
 
             workdir = context.ensure_service_directory(requirement.env_var)
-            pidfile = os.path.join(workdir, "redis.pid")
-            logfile = os.path.join(workdir, "redis.log")
+
+            if requirement.socket_type == 'unix':
+                # nothing else can be using a socket in our own
+                # service directory, so there's no port to find.
+                return self._start_redis(None, workdir, run_state, context, frontend)
 
             # 6379 is the default Redis port; leave that one free
             # for a systemwide Redis. Try looking for a port above
-            # it. This is a pretty huge hack and a race condition,
-            # but Redis doesn't as far as I know have "let the OS
-            # pick the port" mode.
+            # it. Redis doesn't as far as I know have "let the OS
+            # pick the port" mode, so we lease the port until
+            # redis-server is listening on it, in case another
+            # project is starting one right now too.
             LOWER_PORT = config['lower_port']
             UPPER_PORT = config['upper_port']
-            port = LOWER_PORT
-            while port <= UPPER_PORT:
-                if not network_util.can_connect_to_socket(host='localhost', port=port):
-                    break
-                port += 1
-            if port > UPPER_PORT:
+            port = port_leases.lease_free_port('localhost', LOWER_PORT, UPPER_PORT, owner=workdir)
+            if port is None:
                 frontend.error(("All ports from {lower} to {upper} were in use, " +
                                 "could not start redis-server on one of them.").format(lower=LOWER_PORT,
                                                                                        upper=UPPER_PORT))
                 return None
-
-            # be sure we don't get confused by an old log file
-            try:
-                os.remove(logfile)
-            except IOError:  # pragma: no cover (py3 only)
-                pass
-            except OSError:  # pragma: no cover (py2 only)
-                pass
-
-            command = [
-                'redis-server', '--pidfile', pidfile, '--logfile', logfile, '--daemonize', 'yes', '--port',
-                str(port)
-            ]
-            frontend.info("Starting " + repr(command))
-
-            # we don't close_fds=True because on Windows that is documented to
-            # keep us from collected stderr. But on Unix it's kinda broken not
-            # to close_fds. Hmm.
             try:
-                popen = logged_subprocess.Popen(args=command,
-                                                stderr=subprocess.PIPE,
-                                                env=py2_compat.env_without_unicode(context.environ))
-            except Exception as e:
-                frontend.error("Error executing redis-server: %s" % (str(e)))
-                return None
+                return self._start_redis(port, workdir, run_state, context, frontend)
+            finally:
+                port_leases.release(port, owner=workdir)
+
+        return context.transform_service_run_state(requirement.env_var, ensure_redis)
 
-            # communicate() waits for the process to exit, which
-            # is supposed to happen immediately due to --daemonize
-            (out, err) = popen.communicate()
-            assert out is None  # because we didn't PIPE it
-            err = err.decode(errors='replace')
-
-            url = None
-            if popen.returncode == 0:
-                # now we need to wait for Redis to be ready; we
-                # are not sure whether it will create the port or
-                # pidfile first, so wait for both.
-                port_is_ready = False
-                pidfile_is_ready = False
-                MAX_WAIT_TIME = 10
-                so_far = 0
-                while so_far < MAX_WAIT_TIME:
-                    increment = MAX_WAIT_TIME / 500.0
-                    time.sleep(increment)
-                    so_far += increment
-                    if not port_is_ready:
-                        if network_util.can_connect_to_socket(host='localhost', port=port):
-                            port_is_ready = True
-
-                    if not pidfile_is_ready:
-                        if os.path.exists(pidfile):
-                            pidfile_is_ready = True
-
-                    if port_is_ready and pidfile_is_ready:
-                        break
-
-                # if we time out with no pidfile we forge ahead at this point
-                if port_is_ready:
+    def _provide_pool(self, requirement, context, frontend):
+        config = context.status.analysis.config
+        env_spec_name = context.status.env_spec_name or context.default_env_spec_name
+        tenant = _pool_tenant(context.local_state_file, requirement.env_var, env_spec_name)
+
+        def ensure_database(run_state):
+            url = self._pool_database_url(tenant, config, context, frontend)
+            # we only remember our tenants, so unprovide can give
+            # their databases back; the pool owns the process.
+            tenants = run_state.get('pool_tenants', [])
+            if url is not None and tenant not in tenants:
+                run_state['pool_tenants'] = sorted(tenants + [tenant])
+            return url
+
+        return context.transform_service_run_state(requirement.env_var, ensure_database)
+
+    def _pool_database_url(self, tenant, config, context, frontend):
+        with _locked_pool():
+            pool_state_file = _pool_local_state_file()
+            state = pool_state_file.get_service_run_state(_POOL_SERVICE_NAME)
+            if 'port' in state and not network_util.can_connect_to_socket(host='localhost', port=state['port']):
+                # it went away, and all its databases with it
+                state = dict()
+
+            if 'port' not in state:
+                state = dict()
+                workdir = user_dirs.ensure_user_cache_dir('redis-pool')
+                port = port_leases.lease_free_port('localhost',
+                                                   config['lower_port'],
+                                                   config['upper_port'],
+                                                   owner=workdir)
+                if port is None:
+                    frontend.error(
+                        ("All ports from {lower} to {upper} were in use, " +
+                         "could not start the shared redis-server on one of them.").format(lower=config['lower_port'],
+                                                                                           upper=config['upper_port']))
+                    return None
+                try:
+                    url = self._start_redis(port,
+                                            workdir,
+                                            state,
+                                            context,
+                                            frontend,
+                                            extra_args=['--databases', str(_POOL_DATABASES)])
+                finally:
+                    port_leases.release(port, owner=workdir)
+                if url is None:
+                    return None
+                state['tenants'] = dict()
+
+            databases = state['tenants']
+            if tenant in databases:
+                frontend.info("Using database {db} of the shared redis-server on port {port}".format(
+                    db=databases[tenant], port=state['port']))
+            else:
+                in_use = set(databases.values())
+                free = [db for db in range(_POOL_DATABASES) if db not in in_use]
+                if len(free) == 0:
+                    frontend.error("All {count} databases of the shared redis-server on port {port} are in use.".format(
+                        count=_POOL_DATABASES, port=state['port']))
+                    return None
+                databases[tenant] = free[0]
+
+            pool_state_file.set_service_run_state(_POOL_SERVICE_NAME, state)
+            pool_state_file.save()
+            return "redis://localhost:{port}/{db}".format(port=state['port'], db=databases[tenant])
+
+    def _start_redis(self, port, workdir, run_state, context, frontend, extra_args=()):
+        # port is None to listen only on a Unix socket in workdir
+        pidfile = os.path.join(workdir, "redis.pid")
+        logfile = os.path.join(workdir, "redis.log")
+        unixsocket = os.path.join(workdir, "redis.sock") if port is None else None
+
+        if unixsocket is not None and len(unixsocket.encode(sys.getfilesystemencoding())) > _MAX_UNIX_SOCKET_PATH_BYTES:
+            # redis-server would only log that it couldn't bind, then exit
+            frontend.error("Cannot start redis-server on Unix socket %s: the path is longer than the %d bytes "
+                           "the operating system allows for a socket. Move the project to a shorter directory, "
+                           "or use 'socket: tcp' for this service." % (unixsocket, _MAX_UNIX_SOCKET_PATH_BYTES))
+            return None
+
+        # be sure we don't get confused by an old log file
+        try:
+            os.remove(logfile)
+        except IOError:  # pragma: no cover (py3 only)
+            pass
+        except OSError:  # pragma: no cover (py2 only)
+            pass
+
+        command = ['redis-server', '--pidfile', pidfile, '--logfile', logfile, '--daemonize', 'yes']
+        if unixsocket is None:
+            command.extend(['--port', str(port)])
+        else:
+            # port 0 turns off TCP
+            command.extend(['--port', '0', '--unixsocket', unixsocket, '--unixsocketperm', '700'])
+        command.extend(extra_args)
+        frontend.info("Starting " + repr(command))
+
+        # we don't close_fds=True because on Windows that is documented to
+        # keep us from collected stderr. But on Unix it's kinda broken not
+        # to close_fds. Hmm.
+        traced = TracedProcess(command)
+        start_time = time.time()
+        try:
+            popen = logged_subprocess.Popen(args=command,
+                                            stderr=subprocess.PIPE,
+                                            env=py2_compat.env_without_unicode(context.environ))
+        except Exception as e:
+            traced.finish()
+            frontend.error("Error executing redis-server: %s" % (str(e)))
+            return None
+
+        # communicate() waits for the process to exit, which
+        # is supposed to happen immediately due to --daemonize
+        (out, err) = popen.communicate()
+        assert out is None  # because we didn't PIPE it
+        traced.returncode = popen.returncode
+        traced.stderr_bytes = len(err)
+        traced.finish()
+        err = err.decode(errors='replace')
+
+        url = None
+        if popen.returncode == 0:
+            # now we need to wait for Redis to be ready
+            readiness = wait_for_service('localhost', port, pidfile=pidfile, timeout_seconds=10, unix_socket=unixsocket)
+            where = "port %d" % port if unixsocket is None else unixsocket
+
+            # if we time out with no pidfile we forge ahead at this point
+            if readiness.accepting:
+                frontend.info("redis-server was ready on %s after %.2f seconds" % (where, readiness.seconds))
+                # so we can kill it if it doesn't shut down when asked,
+                # once we're sure the pidfile still names our redis-server
+                run_state['pidfile'] = pidfile
+                run_state['start_time'] = start_time
+                run_state['program'] = 'redis-server'
+                if unixsocket is None:
                     run_state['port'] = port
                     url = "redis://localhost:{port}".format(port=port)
 
                     # note: --port doesn't work, only -p, and the failure with --port is silent.
                     run_state['shutdown_commands'] = [['redis-cli', '-p', str(port), 'shutdown']]
                 else:
-                    frontend.info(
-                        "redis-server started successfully, but we timed out trying to connect to it on port %d" %
-                        (port))
+                    run_state['unixsocket'] = unixsocket
+                    url = "unix://{path}".format(path=unixsocket)
+                    run_state['shutdown_commands'] = [['redis-cli', '-s', unixsocket, 'shutdown']]
+            else:
+                frontend.info("redis-server started successfully, but we timed out trying to connect to it on %s" %
+                              (where))
 
-            if url is None:
-                for line in err.split("\n"):
-                    if line != "":
+        if url is None:
+            for line in err.split("\n"):
+                if line != "":
+                    frontend.info(line)
+            try:
+                with codecs.open(logfile, 'r', 'utf-8') as log:
+                    for line in log.readlines():
                         frontend.info(line)
-                try:
-                    with codecs.open(logfile, 'r', 'utf-8') as log:
-                        for line in log.readlines():
-                            frontend.info(line)
-                except IOError as e:
-                    # just be silent if redis-server failed before creating a log file,
-                    # that's fine. Hopefully it had some stderr.
-                    if e.errno != errno.ENOENT:
-                        frontend.info("Failed to read {logfile}: {error}".format(logfile=logfile, error=e))
-
-                frontend.error(
-                    "redis-server process failed or timed out, exited with code {code}".format(code=popen.returncode))
+            except IOError as e:
+                # just be silent if redis-server failed before creating a log file,
+                # that's fine. Hopefully it had some stderr.
+                if e.errno != errno.ENOENT:
+                    frontend.info("Failed to read {logfile}: {error}".format(logfile=logfile, error=e))
 
-            return url
+            frontend.error(
+                "redis-server process failed or timed out, exited with code {code}".format(code=popen.returncode))
 
-        return context.transform_service_run_state(requirement.env_var, ensure_redis)
+        return url
 
     def provide(self, requirement, context):
         """Override superclass to start a project-scoped redis-server.
@@ -315,6 +485,10 @@ class RedisProvider(EnvVarProvider):
             if context.mode == PROVIDE_MODE_DEVELOPMENT:
                 url = self._provide_project(requirement, context, frontend)
 
+        if url is None and source == 'find_pool':
+            if context.mode == PROVIDE_MODE_DEVELOPMENT:
+                url = self._provide_pool(requirement, context, frontend)
+
         if url is None:
             if system_failed:
                 frontend.error("Could not connect to system default Redis.")
@@ -324,7 +498,22 @@ class RedisProvider(EnvVarProvider):
         return super_result.copy_with_additions(errors=frontend.pop_errors())
 
     def unprovide(self, requirement, environ, local_state_file, overrides, requirement_status=None):
-        """Override superclass to shut down any redis-server we started."""
-        status = shutdown_service_run_state(local_state_file, requirement.env_var)
-        delete_service_directory(local_state_file, requirement.env_var)
-        return status
+        """Override superclass to shut down any redis-server we started.
+
+        If we used the shared redis-server, we give back our databases
+        in it instead, and it shuts down when nobody else is using it.
+        """
+        return self.unprovide_many([(requirement, requirement_status)], environ, local_state_file, overrides)[0]
+
+    def unprovide_many(self, requirements_and_statuses, environ, local_state_file, overrides):
+        """Override superclass to shut down all the redis-servers we started at once."""
+        env_vars = [requirement.env_var for (requirement, status) in requirements_and_statuses]
+        tenants = [local_state_file.get_service_run_state(env_var).get('pool_tenants', []) for env_var in env_vars]
+        statuses = shutdown_service_run_states(local_state_file, env_vars)
+        for (index, env_var) in enumerate(env_vars):
+            delete_service_directory(local_state_file, env_var)
+            if len(tenants[index]) > 0:
+                pool_status = _release_pool_databases(tenants[index])
+                if not pool_status:
+                    statuses[index] = pool_status
+        return statuses
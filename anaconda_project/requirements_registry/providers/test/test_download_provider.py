@@ -8,11 +8,15 @@
 from __future__ import absolute_import
 
 import codecs
+import hashlib
+import io
 import os
 import shutil
+import tarfile
 import zipfile
 
 from anaconda_project.test.project_utils import project_no_dedicated_env
+from anaconda_project.internal import download_cache, subprocess_trace, user_dirs
 from anaconda_project.internal.test.tmpfile_utils import (with_directory_contents,
                                                           with_directory_contents_completing_project_file,
                                                           with_tmp_zipfile, complete_project_file_content)
@@ -21,11 +25,13 @@ from anaconda_project.local_state_file import DEFAULT_LOCAL_STATE_FILENAME
 from anaconda_project.local_state_file import LocalStateFile
 from anaconda_project.requirements_registry.registry import RequirementsRegistry
 from anaconda_project.requirements_registry.requirements.download import DownloadRequirement
+from anaconda_project.requirements_registry.requirement import UserConfigOverrides
 from anaconda_project.prepare import (prepare_without_interaction, unprepare, prepare_in_stages)
 from anaconda_project import provide
 from anaconda_project.project_file import DEFAULT_PROJECT_FILENAME
 
 from tornado import gen
+from tornado.ioloop import IOLoop
 
 DATAFILE_CONTENT = ("downloads:\n"
                     "    DATAFILE:\n"
@@ -92,6 +98,42 @@ def test_prepare_and_unprepare_download(monkeypatch):
     with_directory_contents_completing_project_file({DEFAULT_PROJECT_FILENAME: DATAFILE_CONTENT}, provide_download)
 
 
+def test_prepare_download_from_fastest_mirror(monkeypatch):
+    def provide_download(dirname):
+        @gen.coroutine
+        def mock_rank_mirrors(urls):
+            assert ['http://localhost/data.csv', 'http://mirror/data.csv'] == urls
+            raise gen.Return(list(reversed(urls)))
+
+        @gen.coroutine
+        def mock_downloader_run(self):
+            class Res:
+                pass
+
+            assert 'http://localhost/data.csv' == self._url
+            assert ['http://mirror/data.csv', 'http://localhost/data.csv'] == self._sources
+            res = Res()
+            res.code = 200
+            with open(os.path.join(dirname, 'data.csv'), 'w') as out:
+                out.write('data')
+            self._hash = '12345abcdef'
+            raise gen.Return(res)
+
+        monkeypatch.setattr("anaconda_project.requirements_registry.providers.download.rank_mirrors", mock_rank_mirrors)
+        monkeypatch.setattr("anaconda_project.internal.http_client.FileDownloader.run", mock_downloader_run)
+        project = project_no_dedicated_env(dirname)
+        result = prepare_without_interaction(project, environ=minimal_environ(PROJECT_DIR=dirname))
+        assert result.errors == []
+        assert os.path.join(dirname, 'data.csv') == result.environ['DATAFILE']
+
+    with_directory_contents_completing_project_file(
+        {
+            DEFAULT_PROJECT_FILENAME:
+            DATAFILE_CONTENT.replace("url: http://localhost/data.csv",
+                                     "url: [http://localhost/data.csv, http://mirror/data.csv]")
+        }, provide_download)
+
+
 def test_prepare_download_mismatched_checksum_after_download(monkeypatch):
     def provide_download(dirname):
         @gen.coroutine
@@ -113,6 +155,7 @@ def test_prepare_download_mismatched_checksum_after_download(monkeypatch):
         assert not result
         assert ('Error downloading http://localhost/data.csv: mismatched hashes. '
                 'Expected: 12345abcdef, calculated: mismatched') in result.errors
+        assert not os.path.exists(os.path.join(dirname, 'data.csv'))
 
     with_directory_contents_completing_project_file({DEFAULT_PROJECT_FILENAME: DATAFILE_CONTENT}, provide_download)
 
@@ -142,6 +185,171 @@ def test_prepare_download_exception(monkeypatch):
     with_directory_contents_completing_project_file({DEFAULT_PROJECT_FILENAME: DATAFILE_CONTENT}, provide_download)
 
 
+def test_prepare_resumed_download(monkeypatch):
+    def provide_download(dirname):
+        @gen.coroutine
+        def mock_downloader_run(self):
+            class Res:
+                pass
+
+            res = Res()
+            res.code = 206
+            with open(os.path.join(dirname, 'data.csv'), 'w') as out:
+                out.write('data')
+            self._hash = '12345abcdef'
+            raise gen.Return(res)
+
+        monkeypatch.setattr("anaconda_project.internal.http_client.FileDownloader.run", mock_downloader_run)
+        project = project_no_dedicated_env(dirname)
+        result = prepare_without_interaction(project, environ=minimal_environ(PROJECT_DIR=dirname))
+        assert result.errors == []
+        assert os.path.join(dirname, 'data.csv') == result.environ['DATAFILE']
+
+    with_directory_contents_completing_project_file({DEFAULT_PROJECT_FILENAME: DATAFILE_CONTENT}, provide_download)
+
+
+def test_prepare_download_with_revalidate(monkeypatch):
+    def provide_download(dirname):
+        filename = os.path.join(dirname, 'data.csv')
+
+        class Res:
+            pass
+
+        @gen.coroutine
+        def mock_downloader_run(self):
+            assert self._previous_validators is None
+            with open(filename, 'w') as out:
+                out.write('data')
+            self._validators = dict(etag='"v1"')
+            res = Res()
+            res.code = 200
+            raise gen.Return(res)
+
+        monkeypatch.setattr("anaconda_project.internal.http_client.FileDownloader.run", mock_downloader_run)
+        project = project_no_dedicated_env(dirname)
+        result = prepare_without_interaction(project, environ=minimal_environ(PROJECT_DIR=dirname))
+        assert result.errors == []
+        local_state_file = LocalStateFile.load_for_directory(dirname)
+        assert dict(url='http://localhost/data.csv', etag='"v1"') == \
+            local_state_file.get_value(['download_validators', 'DATAFILE'])
+
+        # unchanged on the server, so we keep what we have
+        @gen.coroutine
+        def mock_not_modified_run(self):
+            assert dict(etag='"v1"') == self._previous_validators
+            self._validators = dict(last_modified='Tue, 15 Nov 1994 12:45:26 GMT')
+            res = Res()
+            res.code = 304
+            raise gen.Return(res)
+
+        monkeypatch.setattr("anaconda_project.internal.http_client.FileDownloader.run", mock_not_modified_run)
+        project.frontend.reset()
+        result = prepare_without_interaction(project, environ=minimal_environ(PROJECT_DIR=dirname))
+        assert result.errors == []
+        assert filename == result.environ['DATAFILE']
+        assert ["http://localhost/data.csv has not changed since it was downloaded to %s" % filename
+                ] == project.frontend.logs
+        local_state_file.load()
+        assert dict(url='http://localhost/data.csv', etag='"v1"', last_modified='Tue, 15 Nov 1994 12:45:26 GMT') == \
+            local_state_file.get_value(['download_validators', 'DATAFILE'])
+
+        # can't reach the server, so we also keep what we have
+        @gen.coroutine
+        def mock_offline_run(self):
+            self._errors.append("offline")
+            raise gen.Return(None)
+
+        monkeypatch.setattr("anaconda_project.internal.http_client.FileDownloader.run", mock_offline_run)
+        project.frontend.reset()
+        result = prepare_without_interaction(project, environ=minimal_environ(PROJECT_DIR=dirname))
+        assert result.errors == []
+        assert filename == result.environ['DATAFILE']
+        assert ["Could not check http://localhost/data.csv for changes, using %s: offline" % filename
+                ] == project.frontend.logs
+
+        unprepare(project, result)
+        local_state_file.load()
+        assert local_state_file.get_value(['download_validators', 'DATAFILE']) is None
+
+    with_directory_contents_completing_project_file(
+        {DEFAULT_PROJECT_FILENAME: DATAFILE_CONTENT.replace("md5: 12345abcdef", "revalidate: true")}, provide_download)
+
+
+def test_prepare_download_uses_shared_cache(monkeypatch, tmpdir):
+    content = b"shared data"
+    project_content = ("downloads:\n"
+                       "    DATAFILE:\n"
+                       "        url: http://localhost/data.csv\n"
+                       "        md5: %s\n" % hashlib.md5(content).hexdigest())
+    monkeypatch.setenv(user_dirs.CACHE_DIR_ENV_VAR, str(tmpdir))
+    monkeypatch.delenv(download_cache.DISABLE_ENV_VAR, raising=False)
+    runs = []
+
+    @gen.coroutine
+    def mock_downloader_run(self):
+        class Res:
+            pass
+
+        runs.append(self._filename)
+        res = Res()
+        res.code = 200
+        with open(self._filename, 'wb') as out:
+            out.write(content)
+        self._hash = hashlib.md5(content).hexdigest()
+        raise gen.Return(res)
+
+    monkeypatch.setattr("anaconda_project.internal.http_client.FileDownloader.run", mock_downloader_run)
+
+    def provide_download(dirname):
+        project = project_no_dedicated_env(dirname)
+        result = prepare_without_interaction(project, environ=minimal_environ(PROJECT_DIR=dirname))
+        assert result.errors == []
+        with open(os.path.join(dirname, 'data.csv'), 'rb') as f:
+            assert content == f.read()
+        return (project, result)
+
+    with_directory_contents_completing_project_file({DEFAULT_PROJECT_FILENAME: project_content}, provide_download)
+    assert 1 == len(runs)
+    trace = str(tmpdir.join('trace.jsonl'))
+    monkeypatch.setenv(subprocess_trace.TRACE_FILE_ENV_VAR, trace)
+    (project, result) = with_directory_contents_completing_project_file({DEFAULT_PROJECT_FILENAME: project_content},
+                                                                        provide_download)
+    assert 1 == len(runs)
+    assert "Using cached download of http://localhost/data.csv" in project.frontend.logs
+    metrics = result.status_for('DATAFILE').latest_provide_result.metrics
+    assert metrics['cached']
+    assert len(content) == metrics['bytes']
+    assert [('DATAFILE', metrics)] == result.timings.metrics
+    [record] = subprocess_trace.load_download_records(trace)
+    assert 'http://localhost/data.csv' == record['download']
+    assert record['cached']
+    monkeypatch.delenv(subprocess_trace.TRACE_FILE_ENV_VAR)
+
+    # and not if it's turned off
+    monkeypatch.setenv(download_cache.DISABLE_ENV_VAR, '1')
+    with_directory_contents_completing_project_file({DEFAULT_PROJECT_FILENAME: project_content}, provide_download)
+    assert 2 == len(runs)
+
+
+def test_unprepare_removes_partial_download():
+    def unprovide_download(dirname):
+        project = project_no_dedicated_env(dirname)
+        result = prepare_without_interaction(project,
+                                             environ=minimal_environ(PROJECT_DIR=dirname),
+                                             mode=provide.PROVIDE_MODE_CHECK)
+        status = unprepare(project, result)
+        assert status
+        assert not os.path.exists(os.path.join(dirname, 'data.csv.part'))
+        assert not os.path.exists(os.path.join(dirname, 'data.csv.part.json'))
+
+    with_directory_contents_completing_project_file(
+        {
+            DEFAULT_PROJECT_FILENAME: DATAFILE_CONTENT,
+            'data.csv.part': 'da',
+            'data.csv.part.json': '{"url": "http://localhost/data.csv", "validator": "\\"x\\"", "size": 2}'
+        }, unprovide_download)
+
+
 def test_unprepare_download_fails(monkeypatch):
     def provide_download(dirname):
         @gen.coroutine
@@ -206,6 +414,79 @@ def test_provide_minimal(monkeypatch):
     with_directory_contents_completing_project_file({DEFAULT_PROJECT_FILENAME: MIN_DATAFILE_CONTENT}, provide_download)
 
 
+def test_provide_several_downloads_at_once(monkeypatch):
+    SEVERAL_DATAFILES_CONTENT = ("downloads:\n"
+                                 "    DATAFILE1: http://localhost/data1.csv\n"
+                                 "    DATAFILE2: http://localhost/data2.csv\n"
+                                 "    DATAFILE3: http://localhost/data3.csv\n")
+
+    def provide_download(dirname):
+        running = dict(now=0, max=0, loops=set())
+
+        @gen.coroutine
+        def mock_downloader_run(self):
+            class Res:
+                pass
+
+            running['loops'].add(IOLoop.current())
+            running['now'] += 1
+            running['max'] = max(running['max'], running['now'])
+            yield gen.sleep(0.01)
+            running['now'] -= 1
+            res = Res()
+            res.code = 200
+            with open(self._filename, 'w') as out:
+                out.write('data')
+            raise gen.Return(res)
+
+        monkeypatch.setattr("anaconda_project.internal.http_client.FileDownloader.run", mock_downloader_run)
+        monkeypatch.setenv('ANACONDA_PROJECT_DOWNLOAD_CONNECTIONS', '2')
+        project = project_no_dedicated_env(dirname)
+        result = prepare_without_interaction(project, environ=minimal_environ(PROJECT_DIR=dirname))
+        assert result.errors == []
+        for i in (1, 2, 3):
+            assert result.environ['DATAFILE%d' % i] == os.path.join(dirname, 'data%d.csv' % i)
+        assert 2 == running['max']
+        assert 1 == len(running['loops'])
+        names = [timing.name for timing in result.timings.timings if timing.phase == 'provide']
+        assert ['DATAFILE1', 'DATAFILE2', 'DATAFILE3'] == sorted(names[-1].split(", "))
+
+    with_directory_contents_completing_project_file({DEFAULT_PROJECT_FILENAME: SEVERAL_DATAFILES_CONTENT},
+                                                    provide_download)
+
+
+def test_provide_several_downloads_one_fails(monkeypatch):
+    SEVERAL_DATAFILES_CONTENT = ("downloads:\n"
+                                 "    DATAFILE1: http://localhost/data1.csv\n"
+                                 "    DATAFILE2: http://localhost/data2.csv\n")
+
+    def provide_download(dirname):
+        @gen.coroutine
+        def mock_downloader_run(self):
+            class Res:
+                pass
+
+            if self._filename.endswith('data1.csv'):
+                raise Exception("connection refused")
+            res = Res()
+            res.code = 200
+            with open(self._filename, 'w') as out:
+                out.write('data')
+            raise gen.Return(res)
+
+        monkeypatch.setattr("anaconda_project.internal.http_client.FileDownloader.run", mock_downloader_run)
+        project = project_no_dedicated_env(dirname)
+        result = prepare_without_interaction(project, environ=minimal_environ(PROJECT_DIR=dirname))
+        assert not result
+        assert "Error downloading http://localhost/data1.csv: connection refused" in result.errors
+        assert os.path.isfile(os.path.join(dirname, 'data2.csv'))
+        assert result.status_for('DATAFILE2')
+        assert not result.status_for('DATAFILE1')
+
+    with_directory_contents_completing_project_file({DEFAULT_PROJECT_FILENAME: SEVERAL_DATAFILES_CONTENT},
+                                                    provide_download)
+
+
 def test_provide_no_download_in_check_mode(monkeypatch):
     MIN_DATAFILE_CONTENT = ("downloads:\n" "    DATAFILE: http://localhost/data.csv\n")
 
@@ -333,11 +614,106 @@ def test_file_exists(monkeypatch):
 
     with_directory_contents_completing_project_file(
         {
-            DEFAULT_PROJECT_FILENAME: DATAFILE_CONTENT,
+            DEFAULT_PROJECT_FILENAME: DATAFILE_CONTENT.replace('12345abcdef',
+                                                               hashlib.md5(b'data').hexdigest()),
             DEFAULT_LOCAL_STATE_FILENAME: LOCAL_STATE
         }, provide_download)
 
 
+def test_existing_file_checked_against_checksum_once(monkeypatch):
+    hashed = []
+
+    def mock_hash_file(filename, hash_algorithm):
+        hashed.append(filename)
+        return hashlib.md5(b'data').hexdigest()
+
+    monkeypatch.setattr('anaconda_project.internal.download_digests.hash_file', mock_hash_file)
+
+    def provide_download(dirname):
+        with open(os.path.join(dirname, 'data.csv'), 'w') as out:
+            out.write('data')
+        project = project_no_dedicated_env(dirname)
+
+        for i in range(2):
+            result = prepare_without_interaction(project, environ=minimal_environ(PROJECT_DIR=dirname))
+            assert result
+            assert os.path.join(dirname, 'data.csv') == result.environ['DATAFILE']
+        assert [os.path.join(dirname, 'data.csv')] == hashed
+
+        result = prepare_without_interaction(project,
+                                             environ=minimal_environ(PROJECT_DIR=dirname),
+                                             verify_downloads=True)
+        assert result
+        assert 2 == len(hashed)
+
+    with_directory_contents_completing_project_file(
+        {DEFAULT_PROJECT_FILENAME: DATAFILE_CONTENT.replace('12345abcdef',
+                                                            hashlib.md5(b'data').hexdigest())}, provide_download)
+
+
+def test_existing_file_status_does_not_hash_or_save(monkeypatch):
+    def mock_hash_file(filename, hash_algorithm):
+        raise AssertionError("should not hash %s" % filename)
+
+    monkeypatch.setattr('anaconda_project.internal.download_digests.hash_file', mock_hash_file)
+
+    def check_status(dirname):
+        with open(os.path.join(dirname, 'data.csv'), 'w') as out:
+            out.write('data')
+        local_state_file = LocalStateFile.load_for_directory(dirname)
+        requirement = DownloadRequirement(registry=RequirementsRegistry(),
+                                          env_var="DATAFILE",
+                                          url='http://localhost/data.csv',
+                                          filename='data.csv',
+                                          hash_algorithm='md5',
+                                          hash_value=hashlib.md5(b'data').hexdigest())
+        status = requirement.check_status(dict(PROJECT_DIR=dirname), local_state_file, 'default', UserConfigOverrides())
+        # we haven't hashed it, so we trust it
+        assert os.path.join(dirname, 'data.csv') == status.analysis.existing_filename
+        assert not os.path.exists(local_state_file.filename)
+
+    with_directory_contents(dict(), check_status)
+
+
+def test_existing_file_with_mismatched_checksum_downloaded_again(monkeypatch):
+    def provide_download(dirname):
+        downloaded = []
+
+        @gen.coroutine
+        def mock_downloader_run(self):
+            class Res:
+                pass
+
+            res = Res()
+            res.code = 200
+            with open(os.path.join(dirname, 'data.csv'), 'w') as out:
+                out.write('new data')
+            self._hash = '12345abcdef'
+            downloaded.append(self._filename)
+            raise gen.Return(res)
+
+        monkeypatch.setattr("anaconda_project.internal.http_client.FileDownloader.run", mock_downloader_run)
+        filename = os.path.join(dirname, 'data.csv')
+        with open(filename, 'w') as out:
+            out.write('corrupted')
+        project = project_no_dedicated_env(dirname)
+        result = prepare_without_interaction(project, environ=minimal_environ(PROJECT_DIR=dirname))
+        assert result
+        assert [filename] == downloaded
+        assert "%s doesn't match its checksum; downloading it again" % filename in project.frontend.logs
+
+        def mock_hash_file(filename, hash_algorithm):
+            raise AssertionError("should not hash %s" % filename)
+
+        # we remember the digest of what we downloaded
+        monkeypatch.setattr('anaconda_project.internal.download_digests.hash_file', mock_hash_file)
+        result = prepare_without_interaction(project, environ=minimal_environ(PROJECT_DIR=dirname))
+        assert result
+        assert [filename] == downloaded
+
+    with_directory_contents_completing_project_file({DEFAULT_PROJECT_FILENAME: DATAFILE_CONTENT}, provide_download)
+
+
 def test_prepare_download_of_zip_file(monkeypatch):
     def provide_download_of_zip(zipname, dirname):
         with codecs.open(os.path.join(dirname, DEFAULT_PROJECT_FILENAME), 'w', 'utf-8') as f:
@@ -505,6 +881,78 @@ def test_prepare_download_of_broken_zip_file(monkeypatch):
     with_directory_contents(dict(), provide_download_of_zip)
 
 
+TARRED_DATAFILE_CONTENT = ("downloads:\n"
+                           "    DATAFILE:\n"
+                           "        url: http://localhost/data.tar.gz\n"
+                           "        unzip: true\n"
+                           "        filename: data\n")
+
+
+def _tar_gz_bytes(contents):
+    out = io.BytesIO()
+    with tarfile.open(fileobj=out, mode='w:gz') as tf:
+        for key, value in contents.items():
+            info = tarfile.TarInfo(key)
+            info.size = len(value)
+            tf.addfile(info, io.BytesIO(value))
+    return out.getvalue()
+
+
+def _mock_streaming_run(data, hash_value):
+    @gen.coroutine
+    def mock_downloader_run(self):
+        class Res:
+            pass
+
+        res = Res()
+        res.code = 200
+        assert self._unpacker is not None
+        for i in range(0, len(data), 100):
+            self._unpacker.write(data[i:i + 100])
+        self._streamed = True
+        self._hash = hash_value
+        raise gen.Return(res)
+
+    return mock_downloader_run
+
+
+def test_prepare_download_of_tar_file_streams(monkeypatch):
+    def provide_download_of_tar(dirname):
+        with codecs.open(os.path.join(dirname, DEFAULT_PROJECT_FILENAME), 'w', 'utf-8') as f:
+            f.write(complete_project_file_content(TARRED_DATAFILE_CONTENT))
+        monkeypatch.setattr("anaconda_project.internal.http_client.FileDownloader.run",
+                            _mock_streaming_run(_tar_gz_bytes(dict(foo=b'hello\n')), None))
+
+        project = project_no_dedicated_env(dirname)
+        result = prepare_without_interaction(project, environ=minimal_environ(PROJECT_DIR=dirname))
+        assert result
+        assert codecs.open(os.path.join(dirname, 'data', 'foo')).read() == 'hello\n'
+        # no archive saved on the way
+        assert not os.path.exists(os.path.join(dirname, 'data.zip'))
+        assert [] == [name for name in os.listdir(dirname) if name.startswith('data_tmp')]
+
+    with_directory_contents(dict(), provide_download_of_tar)
+
+
+def test_prepare_download_streamed_with_mismatched_hash(monkeypatch):
+    def provide_download_of_tar(dirname):
+        with codecs.open(os.path.join(dirname, DEFAULT_PROJECT_FILENAME), 'w', 'utf-8') as f:
+            f.write(complete_project_file_content(TARRED_DATAFILE_CONTENT + "        md5: 12345abcdef\n"))
+        monkeypatch.setenv(download_cache.DISABLE_ENV_VAR, '1')
+        monkeypatch.setattr("anaconda_project.internal.http_client.FileDownloader.run",
+                            _mock_streaming_run(_tar_gz_bytes(dict(foo=b'hello\n')), 'fedcba54321'))
+
+        project = project_no_dedicated_env(dirname)
+        result = prepare_without_interaction(project, environ=minimal_environ(PROJECT_DIR=dirname))
+        assert not result
+        assert ("Error downloading http://localhost/data.tar.gz: mismatched hashes. "
+                "Expected: 12345abcdef, calculated: fedcba54321") in result.errors
+        assert not os.path.exists(os.path.join(dirname, 'data'))
+        assert [] == [name for name in os.listdir(dirname) if name.startswith('data_tmp')]
+
+    with_directory_contents(dict(), provide_download_of_tar)
+
+
 def _download_status(prepare_context):
     for status in prepare_context.statuses:
         if isinstance(status.requirement, DownloadRequirement):
@@ -14,19 +14,20 @@ import pytest
 import sys
 
 from anaconda_project.test.project_utils import project_no_dedicated_env
-from anaconda_project.internal.test.tmpfile_utils import (with_directory_contents,
+from anaconda_project.internal.test.tmpfile_utils import (with_directory_contents, complete_project_file_content,
                                                           with_directory_contents_completing_project_file)
 from anaconda_project.test.environ_utils import minimal_environ, strip_environ
 from anaconda_project.local_state_file import DEFAULT_LOCAL_STATE_FILENAME
 from anaconda_project.local_state_file import LocalStateFile
 from anaconda_project.requirements_registry.registry import RequirementsRegistry
 from anaconda_project.requirements_registry.requirement import UserConfigOverrides
-from anaconda_project.requirements_registry.providers.redis import RedisProvider
+from anaconda_project.requirements_registry.providers.redis import RedisProvider, POOL_ENV_VAR
 from anaconda_project.requirements_registry.requirements.redis import RedisRequirement
 from anaconda_project.prepare import prepare_without_interaction, unprepare
 from anaconda_project import provide
 from anaconda_project.project_file import DEFAULT_PROJECT_FILENAME
 from anaconda_project.internal import conda_api
+from anaconda_project.internal import user_dirs
 
 
 # This is kind of an awkward way to do it for historical reasons,
@@ -148,6 +149,25 @@ def test_set_config_values_as_strings():
     with_directory_contents(dict(), set_config)
 
 
+def test_pool_scope_config():
+    def check_pool_scope(dirname):
+        local_state = LocalStateFile.load_for_directory(dirname)
+        requirement = _redis_requirement()
+        provider = RedisProvider()
+        config = provider.read_config(requirement, {POOL_ENV_VAR: '1'}, local_state, 'default', UserConfigOverrides())
+        assert 'find_pool' == config['source']
+        config = provider.read_config(requirement, {POOL_ENV_VAR: '0'}, local_state, 'default', UserConfigOverrides())
+        assert 'find_all' == config['source']
+
+        provider.set_config_values_as_strings(requirement, dict(), local_state, 'default', UserConfigOverrides(),
+                                              dict(source='find_pool'))
+        assert 'pool' == local_state.get_value(['service_options', 'REDIS_URL', 'scope'])
+        config = provider.read_config(requirement, dict(), local_state, 'default', UserConfigOverrides())
+        assert 'find_pool' == config['source']
+
+    with_directory_contents(dict(), check_pool_scope)
+
+
 def _monkeypatch_can_connect_to_socket_to_succeed(monkeypatch):
     can_connect_args = dict()
 
@@ -194,8 +214,12 @@ def _monkeypatch_can_connect_to_socket_on_nonstandard_port_only(monkeypatch, rea
         else:
             return real_can_connect_to_socket(host, port, timeout_seconds)
 
+    def mock_ports_in_use(host, ports, timeout_seconds=0.5):
+        return set(port for port in ports if mock_can_connect_to_socket(host, port, timeout_seconds))
+
     monkeypatch.setattr("anaconda_project.requirements_registry.network_util.can_connect_to_socket",
                         mock_can_connect_to_socket)
+    monkeypatch.setattr("anaconda_project.requirements_registry.network_util.ports_in_use", mock_ports_in_use)
 
     return can_connect_args_list
 
@@ -251,6 +275,147 @@ services:
 """}, start_local_redis)
 
 
+@pytest.mark.skipif(platform.system() == 'Windows', reason='Windows has no Unix sockets')
+@pytest.mark.skipif(conda_api.current_platform() == 'osx-arm64', reason='We cannot install redis server on osx-arm64')
+def test_prepare_and_unprepare_local_redis_server_on_unix_socket(monkeypatch):
+    from anaconda_project.requirements_registry.network_util import can_connect_to_unix_socket
+    from anaconda_project.requirements_registry.network_util import can_connect_to_socket as real_can_connect_to_socket
+
+    can_connect_args_list = _monkeypatch_can_connect_to_socket_on_nonstandard_port_only(
+        monkeypatch, real_can_connect_to_socket)
+
+    def start_local_redis(dirname):
+        project = project_no_dedicated_env(dirname)
+        result = _prepare_printing_errors(project, environ=minimal_environ())
+        assert result
+
+        redisdir = os.path.join(dirname, "services", "REDIS_URL")
+        socket_path = os.path.join(redisdir, "redis.sock")
+
+        local_state_file = LocalStateFile.load_for_directory(dirname)
+        state = local_state_file.get_service_run_state('REDIS_URL')
+        assert 'port' not in state
+        assert socket_path == state['unixsocket']
+        assert [['redis-cli', '-s', socket_path, 'shutdown']] == state['shutdown_commands']
+
+        assert dict(REDIS_URL=("unix://" + socket_path),
+                    PROJECT_DIR=project.directory_path) == strip_environ(result.environ)
+        # we only looked for the systemwide redis, not for a free port
+        assert set([6379]) == set(args['port'] for args in can_connect_args_list)
+        assert can_connect_to_unix_socket(socket_path)
+
+        # preparing again uses the same server
+        result = _prepare_printing_errors(project, environ=minimal_environ())
+        assert result
+        assert "unix://" + socket_path == result.environ['REDIS_URL']
+        assert "Using redis-server we started previously at unix://" + socket_path in project.frontend.logs
+
+        status = unprepare(project, result)
+        assert status
+
+        assert not os.path.exists(redisdir)
+        assert not can_connect_to_unix_socket(socket_path)
+
+        local_state_file.load()
+        assert dict() == local_state_file.get_service_run_state("REDIS_URL")
+
+    with_directory_contents_completing_project_file(
+        {DEFAULT_PROJECT_FILENAME: """
+services:
+  REDIS_URL: { type: redis, socket: unix }
+"""}, start_local_redis)
+
+
+@pytest.mark.skipif(platform.system() == 'Windows', reason='Windows has no Unix sockets')
+def test_fail_to_prepare_local_redis_server_on_too_long_unix_socket_path(monkeypatch, capsys):
+    _monkeypatch_can_connect_to_socket_on_nonstandard_port_only(monkeypatch, lambda host, port, timeout_seconds: False)
+
+    def mock_Popen(*args, **kwargs):
+        raise AssertionError("redis-server should not be started")
+
+    monkeypatch.setattr("anaconda_project.internal.logged_subprocess.Popen", mock_Popen)
+
+    def start_local_redis(dirname):
+        project = project_no_dedicated_env(os.path.join(dirname, "p" * 120))
+        result = _prepare_printing_errors(project, environ=minimal_environ())
+        assert not result
+
+    # the project's own services directory is too deep for a socket path
+    with_directory_contents(
+        {
+            ("p" * 120) + "/" + DEFAULT_PROJECT_FILENAME:
+            complete_project_file_content("""
+services:
+  REDIS_URL: { type: redis, socket: unix }
+""")
+        }, start_local_redis)
+
+    out, err = capsys.readouterr()
+    assert "Cannot start redis-server on Unix socket" in err
+    assert "Move the project to a shorter directory, or use 'socket: tcp' for this service." in err
+
+
+@pytest.mark.skipif(platform.system() == 'Windows', reason='Windows has a hard time with read-only directories')
+@pytest.mark.skipif(conda_api.current_platform() == 'osx-arm64', reason='We cannot install redis server on osx-arm64')
+def test_prepare_and_unprepare_projects_sharing_redis_pool(monkeypatch, tmpdir):
+    from anaconda_project.requirements_registry.network_util import can_connect_to_socket as real_can_connect_to_socket
+
+    _monkeypatch_can_connect_to_socket_on_nonstandard_port_only(monkeypatch, real_can_connect_to_socket)
+    monkeypatch.setenv(user_dirs.CACHE_DIR_ENV_VAR, str(tmpdir))
+    monkeypatch.setattr('anaconda_project.requirements_registry.providers.redis._POOL_DATABASES', 2)
+    pool_state_file = LocalStateFile.load_for_directory(str(tmpdir.join('redis-pool')), scan_parents=False)
+
+    def pool_state():
+        pool_state_file.load()
+        return pool_state_file.get_service_run_state('REDIS_POOL')
+
+    project_file = {DEFAULT_PROJECT_FILENAME: """
+services:
+  REDIS_URL: redis
+"""}
+
+    def prepare_three_projects(first_dir, second_dir, third_dir):
+        environ = minimal_environ(**{POOL_ENV_VAR: '1'})
+        first = project_no_dedicated_env(first_dir)
+        first_result = _prepare_printing_errors(first, environ=environ)
+        assert first_result
+        port = pool_state()['port']
+        assert "redis://localhost:%d/0" % port == first_result.environ['REDIS_URL']
+
+        second = project_no_dedicated_env(second_dir)
+        second_result = _prepare_printing_errors(second, environ=environ)
+        assert second_result
+        assert "redis://localhost:%d/1" % port == second_result.environ['REDIS_URL']
+
+        # preparing again keeps the same database
+        again = _prepare_printing_errors(first, environ=environ)
+        assert first_result.environ['REDIS_URL'] == again.environ['REDIS_URL']
+
+        third = project_no_dedicated_env(third_dir)
+        assert not _prepare_printing_errors(third, environ=environ)
+        assert ("All 2 databases of the shared redis-server on port %d are in use." % port) in third.frontend.errors
+
+        tenants = sorted(pool_state()['tenants'].keys())
+        assert 2 == len(tenants)
+        local_state_file = LocalStateFile.load_for_directory(first_dir)
+        first_tenants = [tenant for tenant in tenants if tenant.startswith(first_dir + ":")]
+        assert dict(pool_tenants=first_tenants) == local_state_file.get_service_run_state('REDIS_URL')
+
+        # the pool keeps running until its last tenant leaves
+        assert unprepare(first, first_result)
+        assert 1 == len(pool_state()['tenants'])
+        assert real_can_connect_to_socket(host='localhost', port=port)
+
+        assert unprepare(second, second_result)
+        assert dict() == pool_state()
+        assert not real_can_connect_to_socket(host='localhost', port=port)
+
+    with_directory_contents_completing_project_file(
+        project_file, lambda first_dir: with_directory_contents_completing_project_file(
+            project_file, lambda second_dir: with_directory_contents_completing_project_file(
+                project_file, lambda third_dir: prepare_three_projects(first_dir, second_dir, third_dir))))
+
+
 @pytest.mark.skipif(platform.system() == 'Windows', reason='Windows has a hard time with read-only directories')
 @pytest.mark.skipif(conda_api.current_platform() == 'osx-arm64', reason='We cannot install redis server on osx-arm64')
 def test_prepare_and_unprepare_local_redis_server_with_failed_unprovide(monkeypatch):
@@ -384,24 +549,12 @@ def test_prepare_local_redis_server_times_out(monkeypatch, capsys):
         project = project_no_dedicated_env(dirname)
 
         from time import sleep as real_sleep
+        from anaconda_project.requirements_registry.provider import wait_for_service as real_wait_for_service
 
-        killed = {}
-
-        def mock_sleep_kills_redis(seconds):
-            # first time the Redis provider sleeps to wait for the
-            # server to appear, we kill the server; after that
-            # we make sleep into a no-op so we rapidly time out.
-            if 'done' in killed:
-                return
-
-            pidfile = os.path.join(dirname, "services", "REDIS_URL", "redis.pid")
-            count = 0
-            while count < 15:
-                if os.path.exists(pidfile):
-                    break
-                real_sleep(0.1)
-                count = count + 1
-
+        def mock_wait_kills_redis(host, port, pidfile, timeout_seconds, unix_socket=None):
+            # once the server is up we kill it, then we quickly time out
+            # waiting for it to accept connections.
+            real_wait_for_service(host, port, pidfile=pidfile, timeout_seconds=timeout_seconds)
             assert os.path.exists(pidfile)
 
             with codecs.open(pidfile, 'r', 'utf-8') as f:
@@ -414,9 +567,10 @@ def test_prepare_local_redis_server_times_out(monkeypatch, capsys):
 
             # be sure it's gone
             real_sleep(0.1)
-            killed['done'] = True
+            return real_wait_for_service(host, port, pidfile=None, timeout_seconds=0.1)
 
-        monkeypatch.setattr('time.sleep', mock_sleep_kills_redis)
+        monkeypatch.setattr('anaconda_project.requirements_registry.providers.redis.wait_for_service',
+                            mock_wait_kills_redis)
 
         result = _prepare_printing_errors(project, environ=minimal_environ())
         assert not result
@@ -442,8 +596,12 @@ def _monkeypatch_can_connect_to_socket_always_succeeds_on_nonstandard(monkeypatc
         can_connect_args_list.append(can_connect_args)
         return port != 6379
 
+    def mock_ports_in_use(host, ports, timeout_seconds=0.5):
+        return set(port for port in ports if mock_can_connect_to_socket(host, port, timeout_seconds))
+
     monkeypatch.setattr("anaconda_project.requirements_registry.network_util.can_connect_to_socket",
                         mock_can_connect_to_socket)
+    monkeypatch.setattr("anaconda_project.requirements_registry.network_util.ports_in_use", mock_ports_in_use)
 
     return can_connect_args_list
 
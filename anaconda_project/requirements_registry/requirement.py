@@ -10,6 +10,7 @@ from __future__ import absolute_import
 
 from abc import ABCMeta, abstractmethod
 from copy import deepcopy
+import time
 
 from anaconda_project.internal.metaclass import with_metaclass
 from anaconda_project.internal.py2_compat import is_string
@@ -18,10 +19,11 @@ from anaconda_project.status import Status
 
 class UserConfigOverrides(object):
     """Class containing user-forced configuration for the prepare process."""
-    def __init__(self, inherited_env=None, env_spec_name=None):
+    def __init__(self, inherited_env=None, env_spec_name=None, verify_downloads=False):
         """Construct a set of user overrides for the prepare process."""
         self._inherited_env = inherited_env
         self._env_spec_name = env_spec_name
+        self._verify_downloads = verify_downloads
 
     @property
     def env_spec_name(self):
@@ -33,6 +35,11 @@ class UserConfigOverrides(object):
         """The environment we started with before we ran the prepare process."""
         return self._inherited_env
 
+    @property
+    def verify_downloads(self):
+        """True if every download with a checksum should be hashed again, even if it looks unchanged."""
+        return self._verify_downloads
+
     @env_spec_name.setter
     def env_spec_name(self, value):
         """Change the conda environment name override."""
@@ -46,8 +53,15 @@ class RequirementStatus(Status):
     would call ``recheck()`` to get a new status.
 
     """
-    def __init__(self, requirement, has_been_provided, status_description, provider, analysis, latest_provide_result,
-                 env_spec_name):
+    def __init__(self,
+                 requirement,
+                 has_been_provided,
+                 status_description,
+                 provider,
+                 analysis,
+                 latest_provide_result,
+                 env_spec_name,
+                 analysis_timing=None):
         """Construct an abstract RequirementStatus."""
         self._requirement = requirement
         self._has_been_provided = has_been_provided
@@ -56,6 +70,7 @@ class RequirementStatus(Status):
         self._analysis = analysis
         self._latest_provide_result = latest_provide_result
         self._env_spec_name = env_spec_name
+        self._analysis_timing = analysis_timing
 
     def __repr__(self):
         """Repr of the status."""
@@ -94,6 +109,11 @@ class RequirementStatus(Status):
         """Get the provider's analysis of the status."""
         return self._analysis
 
+    @property
+    def analysis_timing(self):
+        """Get a ``(wall_seconds, cpu_seconds)`` tuple for the provider's analysis, or None if unknown."""
+        return self._analysis_timing
+
     @property
     def latest_provide_result(self):
         """Get the latest ``ProvideResult`` or None if we haven't provided yet."""
@@ -178,10 +198,17 @@ class Requirement(with_metaclass(ABCMeta)):
         """Set of ignore patterns for files this requirement's provider might autogenerate."""
         return set()
 
+    def _timed_analyze(self, provider, environ, local_state_file, default_env_spec_name, overrides):
+        start_wall = time.monotonic()
+        start_cpu = time.thread_time()
+        analysis = provider.analyze(self, environ, local_state_file, default_env_spec_name, overrides)
+        return (analysis, (time.monotonic() - start_wall, time.thread_time() - start_cpu))
+
     def _create_status(self, environ, local_state_file, default_env_spec_name, overrides, latest_provide_result,
                        has_been_provided, status_description, provider_class_name):
         provider = self.registry.find_provider_by_class_name(provider_class_name)
-        analysis = provider.analyze(self, environ, local_state_file, default_env_spec_name, overrides)
+        (analysis, analysis_timing) = self._timed_analyze(provider, environ, local_state_file, default_env_spec_name,
+                                                          overrides)
         env_spec_name = analysis.config.get('env_name', None)
         return RequirementStatus(self,
                                  has_been_provided=has_been_provided,
@@ -189,12 +216,14 @@ class Requirement(with_metaclass(ABCMeta)):
                                  provider=provider,
                                  analysis=analysis,
                                  latest_provide_result=latest_provide_result,
-                                 env_spec_name=env_spec_name)
+                                 env_spec_name=env_spec_name,
+                                 analysis_timing=analysis_timing)
 
     def _create_status_from_analysis(self, environ, local_state_file, default_env_spec_name, overrides,
                                      latest_provide_result, provider_class_name, status_getter):
         provider = self.registry.find_provider_by_class_name(provider_class_name)
-        analysis = provider.analyze(self, environ, local_state_file, default_env_spec_name, overrides)
+        (analysis, analysis_timing) = self._timed_analyze(provider, environ, local_state_file, default_env_spec_name,
+                                                          overrides)
         (has_been_provided, status_description) = status_getter(environ, local_state_file, analysis)
         env_spec_name = analysis.config.get('env_name', None)
 
@@ -204,7 +233,8 @@ class Requirement(with_metaclass(ABCMeta)):
                                  provider=provider,
                                  analysis=analysis,
                                  latest_provide_result=latest_provide_result,
-                                 env_spec_name=env_spec_name)
+                                 env_spec_name=env_spec_name,
+                                 analysis_timing=analysis_timing)
 
     @abstractmethod
     def check_status(self, environ, local_state_file, default_env_spec_name, overrides, latest_provide_result=None):
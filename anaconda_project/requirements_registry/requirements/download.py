@@ -25,10 +25,12 @@ class DownloadRequirement(EnvVarRequirement):
     def _parse(cls, varname, item, problems):
         """Parse an item from the downloads: section."""
         url = None
+        mirrors = []
         filename = None
         hash_algorithm = None
         hash_value = None
         unzip = None
+        revalidate = False
         description = None
         if is_string(item):
             url = item
@@ -66,12 +68,33 @@ class DownloadRequirement(EnvVarRequirement):
                     varname, unzip))
                 return None
 
+            revalidate = item.get('revalidate', False)
+            if not isinstance(revalidate, bool):
+                problems.append("Value of 'revalidate' for download item {} should be a boolean, not {}.".format(
+                    varname, revalidate))
+                return None
+            if revalidate and hash_algorithm is not None:
+                problems.append("Download item {} has a checksum, so it can't change and 'revalidate' "
+                                "should not be set.".format(varname))
+                return None
+
+        if isinstance(url, list):
+            if len(url) == 0 or not all(is_string(u) for u in url):
+                problems.append(
+                    "Value of 'url' for download item {} should be a URL string or a list of them.".format(varname))
+                return None
+            if len(url) > 1 and hash_algorithm is None:
+                problems.append("Download item {} has several URLs, so it needs a checksum to be sure "
+                                "they're the same file.".format(varname))
+                return None
+            (url, mirrors) = (url[0], url[1:])
+
         if url is None or not is_string(url):
             problems.append(("Download name {} should be followed by a URL string or a dictionary " +
                              "describing the download.").format(varname))
             return None
 
-        if url == '':
+        if url == '' or '' in mirrors:
             problems.append("Download item {} has an empty 'url' field.".format(varname))
             return None
 
@@ -105,10 +128,12 @@ class DownloadRequirement(EnvVarRequirement):
 
         return dict(env_var=varname,
                     url=url,
+                    mirrors=mirrors,
                     filename=filename,
                     hash_algorithm=hash_algorithm,
                     hash_value=hash_value,
                     unzip=unzip,
+                    revalidate=revalidate,
                     description=description)
 
     def __init__(self,
@@ -119,8 +144,14 @@ class DownloadRequirement(EnvVarRequirement):
                  hash_algorithm=None,
                  hash_value=None,
                  unzip=False,
-                 description=None):
-        """Extend init to accept url and hash parameters."""
+                 revalidate=False,
+                 description=None,
+                 mirrors=()):
+        """Extend init to accept url and hash parameters.
+
+        mirrors are more URLs of the same file, to use if they're
+        faster than url or url fails.
+        """
         options = None
         if description is not None:
             options = dict(description=description)
@@ -130,11 +161,19 @@ class DownloadRequirement(EnvVarRequirement):
         assert len(url) > 0
         assert len(filename) > 0
         self.url = url
+        self.mirrors = list(mirrors)
         self.filename = filename
         assert hash_algorithm is None or hash_algorithm in _hash_algorithms
         self.hash_algorithm = hash_algorithm
         self.hash_value = hash_value
         self.unzip = unzip
+        # check with the server for a newer file whenever we prepare
+        self.revalidate = revalidate
+
+    @property
+    def urls(self):
+        """All the URLs we can download the file from, url first."""
+        return [self.url] + self.mirrors
 
     @property
     def description(self):
@@ -144,7 +183,7 @@ class DownloadRequirement(EnvVarRequirement):
     @property
     def ignore_patterns(self):
         """Override superclass with our ignore patterns."""
-        return set(['/' + self.filename, '/' + self.filename + ".part"])
+        return set(['/' + self.filename, '/' + self.filename + ".part", '/' + self.filename + ".part.json"])
 
     def _why_not_provided(self, environ):
         if self.env_var not in environ:
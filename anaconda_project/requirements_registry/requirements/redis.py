@@ -24,8 +24,14 @@ class RedisRequirement(ServiceRequirement):
         if url is None:
             return self._unset_message()
         split = network_util.urlparse.urlsplit(url)
+        if split.scheme == 'unix':
+            if network_util.can_connect_to_unix_socket(split.path):
+                return None
+            else:
+                return "Cannot connect to Redis at {url}.".format(url=url)
         if split.scheme != 'redis':
-            return "{env_var} value '{url}' does not have 'redis:' scheme.".format(env_var=self.env_var, url=url)
+            return "{env_var} value '{url}' does not have 'redis:' or 'unix:' scheme.".format(env_var=self.env_var,
+                                                                                              url=url)
         port = 6379
         if split.port is not None:
             port = split.port
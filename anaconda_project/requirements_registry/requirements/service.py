@@ -36,6 +36,12 @@ class ServiceRequirement(EnvVarRequirement):
         if not EnvVarRequirement._parse_default(options, varname, problems):
             return None
 
+        socket_type = options.get('socket', 'tcp')
+        if socket_type not in ('tcp', 'unix'):
+            problems.append("Service {} has 'socket: {}' but it should be 'tcp' or 'unix'.".format(
+                varname, socket_type))
+            return None
+
         return dict(service_type=service_type, env_var=varname, options=options)
 
     @property
@@ -43,6 +49,11 @@ class ServiceRequirement(EnvVarRequirement):
         """Get service type string."""
         return self.options['type']
 
+    @property
+    def socket_type(self):
+        """Get whether the service should listen on 'tcp' (the default) or a 'unix' socket."""
+        return self.options.get('socket', 'tcp')
+
     @property
     def ignore_patterns(self):
         """Override superclass with our ignore patterns."""
@@ -162,6 +162,37 @@ def test_unzip_is_not_a_bool():
     assert kwargs is None
 
 
+def test_revalidate():
+    problems = []
+    kwargs = DownloadRequirement._parse(varname='FOO',
+                                        item=dict(url='http://example.com/', revalidate=True),
+                                        problems=problems)
+    assert [] == problems
+    assert kwargs['revalidate']
+    req = DownloadRequirement(RequirementsRegistry(), **kwargs)
+    assert req.revalidate
+    assert not DownloadRequirement(RequirementsRegistry(), env_var='FOO', url='http://example.com/',
+                                   filename='foo').revalidate
+
+
+def test_revalidate_is_not_a_bool():
+    problems = []
+    kwargs = DownloadRequirement._parse(varname='FOO',
+                                        item=dict(url='http://example.com/', revalidate='yes'),
+                                        problems=problems)
+    assert ["Value of 'revalidate' for download item FOO should be a boolean, not yes."] == problems
+    assert kwargs is None
+
+
+def test_revalidate_with_checksum():
+    problems = []
+    kwargs = DownloadRequirement._parse(varname='FOO',
+                                        item=dict(url='http://example.com/', md5='12345abcdef', revalidate=True),
+                                        problems=problems)
+    assert ["Download item FOO has a checksum, so it can't change and 'revalidate' should not be set."] == problems
+    assert kwargs is None
+
+
 def test_use_unzip_if_url_ends_in_zip():
     problems = []
     kwargs = DownloadRequirement._parse(varname='FOO', item='http://example.com/bar.zip', problems=problems)
@@ -211,3 +242,40 @@ def test_no_unzip_if_url_ends_in_zip_and_filename_also_does():
     assert kwargs['filename'] == 'something.zip'
     assert kwargs['url'] == 'http://example.com/bar.zip'
     assert not kwargs['unzip']
+
+
+def test_download_mirrors():
+    problems = []
+    kwargs = DownloadRequirement._parse(varname='FOO',
+                                        item=dict(
+                                            url=['http://example.com/bar.csv', 'http://mirror.example.com/bar.csv'],
+                                            md5='12345abcdef'),
+                                        problems=problems)
+    assert [] == problems
+    assert 'http://example.com/bar.csv' == kwargs['url']
+    assert ['http://mirror.example.com/bar.csv'] == kwargs['mirrors']
+    assert 'bar.csv' == kwargs['filename']
+    req = DownloadRequirement(RequirementsRegistry(), **kwargs)
+    assert ['http://example.com/bar.csv', 'http://mirror.example.com/bar.csv'] == req.urls
+    assert ['http://example.com/'] == DownloadRequirement(RequirementsRegistry(),
+                                                          env_var='FOO',
+                                                          url='http://example.com/',
+                                                          filename='foo').urls
+
+
+def test_download_mirrors_without_checksum():
+    problems = []
+    kwargs = DownloadRequirement._parse(
+        varname='FOO',
+        item=dict(url=['http://example.com/bar.csv', 'http://mirror.example.com/bar.csv']),
+        problems=problems)
+    assert ["Download item FOO has several URLs, so it needs a checksum to be sure they're the same file."] == problems
+    assert kwargs is None
+
+
+def test_download_mirrors_not_strings():
+    for url in ([], ['http://example.com/bar.csv', 42]):
+        problems = []
+        kwargs = DownloadRequirement._parse(varname='FOO', item=dict(url=url, md5='12345abcdef'), problems=problems)
+        assert ["Value of 'url' for download item FOO should be a URL string or a list of them."] == problems
+        assert kwargs is None
@@ -40,7 +40,8 @@ def test_redis_url_bad_scheme():
         status = requirement.check_status(dict(REDIS_URL="http://example.com/"), local_state, 'default',
                                           UserConfigOverrides())
         assert not status
-        assert "REDIS_URL value 'http://example.com/' does not have 'redis:' scheme." == status.status_description
+        expected = "REDIS_URL value 'http://example.com/' does not have 'redis:' or 'unix:' scheme."
+        assert expected == status.status_description
 
     with_directory_contents({}, check_bad_scheme)
 
@@ -74,3 +75,35 @@ def test_redis_url_cannot_connect(monkeypatch):
         assert expected == status.status_description
 
     with_directory_contents({}, check_cannot_connect)
+
+
+def test_redis_url_unix_socket(monkeypatch):
+    def check_unix_socket(dirname):
+        local_state = LocalStateFile.load_for_directory(dirname)
+        requirement = RedisRequirement(registry=RequirementsRegistry(), env_var="REDIS_URL")
+        paths = []
+
+        def mock_can_connect_to_unix_socket(path, timeout_seconds=0.5):
+            paths.append(path)
+            return path == '/running/redis.sock'
+
+        monkeypatch.setattr("anaconda_project.requirements_registry.network_util.can_connect_to_unix_socket",
+                            mock_can_connect_to_unix_socket)
+        status = requirement.check_status(dict(REDIS_URL="unix:///running/redis.sock"), local_state, 'default',
+                                          UserConfigOverrides())
+        assert status
+        assert "Using Redis server at unix:///running/redis.sock" == status.status_description
+
+        status = requirement.check_status(dict(REDIS_URL="unix:///stopped/redis.sock"), local_state, 'default',
+                                          UserConfigOverrides())
+        assert not status
+        assert "Cannot connect to Redis at unix:///stopped/redis.sock." == status.status_description
+        assert ['/running/redis.sock', '/stopped/redis.sock'] == paths[:2]
+
+    with_directory_contents({}, check_unix_socket)
+
+
+def test_redis_socket_type():
+    registry = RequirementsRegistry()
+    assert 'tcp' == RedisRequirement(registry, env_var='REDIS_URL').socket_type
+    assert 'unix' == RedisRequirement(registry, env_var='REDIS_URL', options=dict(socket='unix')).socket_type
@@ -70,6 +70,18 @@ services:
     """}, check)
 
 
+def test_service_dict_with_bad_socket():
+    def check(dirname):
+        project = Project(dirname)
+        assert ["Service FOOBAR has 'socket: udp' but it should be 'tcp' or 'unix'."] == project.problems
+
+    with_directory_contents_completing_project_file(
+        {DEFAULT_PROJECT_FILENAME: """
+services:
+    FOOBAR: { type: redis, socket: udp }
+    """}, check)
+
+
 def test_service_dict_bad_default():
     def check(dirname):
         project = Project(dirname)
@@ -7,6 +7,8 @@
 # -----------------------------------------------------------------------------
 import anaconda_project.requirements_registry.network_util as network_util
 
+import platform
+import pytest
 import socket
 
 
@@ -34,3 +36,39 @@ def test_cannot_connect_to_socket():
     s.close()
 
     assert not network_util.can_connect_to_socket("127.0.0.1", port)
+
+
+def test_ports_in_use():
+    listening = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listening.bind(("127.0.0.1", 0))
+    listening.listen(1)
+    closed = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    closed.bind(("127.0.0.1", 0))
+    closed.listen(1)
+    closed_port = closed.getsockname()[1]
+    closed.close()
+
+    try:
+        port = listening.getsockname()[1]
+        assert set([port]) == network_util.ports_in_use("127.0.0.1", [closed_port, port])
+    finally:
+        listening.close()
+
+
+def test_ports_in_use_unknown_host():
+    assert set() == network_util.ports_in_use("nowhere.invalid", [80])
+
+
+@pytest.mark.skipif(platform.system() == 'Windows', reason='Windows has no Unix sockets')
+def test_can_connect_to_unix_socket(tmpdir):
+    path = str(tmpdir.join("service.sock"))
+    assert not network_util.can_connect_to_unix_socket(path)
+
+    s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    s.bind(path)
+    s.listen(1)
+    try:
+        assert network_util.can_connect_to_unix_socket(path)
+    finally:
+        s.close()
+    assert not network_util.can_connect_to_unix_socket(path)
@@ -8,6 +8,13 @@
 from __future__ import absolute_import
 
 import os
+import platform
+import socket
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 import pytest
 
@@ -15,7 +22,9 @@ from anaconda_project.internal.test.tmpfile_utils import (with_directory_content
                                                           with_directory_contents_completing_project_file)
 from anaconda_project.local_state_file import LocalStateFile, DEFAULT_LOCAL_STATE_FILENAME
 from anaconda_project.requirements_registry.provider import (Provider, ProvideContext, EnvVarProvider, ProvideResult,
-                                                             shutdown_service_run_state)
+                                                             shutdown_service_run_state, shutdown_service_run_states,
+                                                             wait_for_service, _DirectoryWatcher,
+                                                             SHUTDOWN_TIMEOUT_ENV_VAR)
 from anaconda_project.requirements_registry.registry import RequirementsRegistry
 from anaconda_project.requirements_registry.requirement import EnvVarRequirement, UserConfigOverrides
 from anaconda_project.project import Project
@@ -496,6 +505,36 @@ def test_provide_context_transform_service_run_state():
     with_directory_contents(dict(), check_provide_contents)
 
 
+def test_provide_context_update_local_state_from_threads():
+    def check_provide_contents(dirname):
+        environ = dict()
+        local_state_file = LocalStateFile.load_for_directory(dirname)
+        requirement = EnvVarRequirement(RequirementsRegistry(), env_var="FOO")
+        status = requirement.check_status(environ, local_state_file, 'default', UserConfigOverrides())
+        context = ProvideContext(environ=environ,
+                                 local_state_file=local_state_file,
+                                 default_env_spec_name='default',
+                                 status=status,
+                                 mode=PROVIDE_MODE_DEVELOPMENT,
+                                 frontend=NullFrontend())
+
+        def update(i):
+            for j in range(20):
+                context.update_local_state(lambda state: state.set_value(['things', 'thing%d_%d' % (i, j)], j))
+                context.transform_service_run_state("service%d" % i, lambda state: state.update(count=j))
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            list(executor.map(update, range(4)))
+
+        # everything each thread changed got saved
+        reloaded = LocalStateFile.load_for_directory(dirname)
+        assert 80 == len(reloaded.get_value('things'))
+        for i in range(4):
+            assert dict(count=19) == reloaded.get_service_run_state("service%d" % i)
+
+    with_directory_contents(dict(), check_provide_contents)
+
+
 def test_shutdown_service_run_state_nothing_to_do():
     def check(dirname):
         local_state_file = LocalStateFile.load_for_directory(dirname)
@@ -533,3 +572,204 @@ sys.exit(1)
         assert status.errors == ["Shutting down FOO, command %r failed with code 1." % false_commandline]
 
     with_directory_contents(dict(), check)
+
+
+def test_shutdown_service_run_states_at_once(monkeypatch):
+    def check(dirname):
+        local_state_file = LocalStateFile.load_for_directory(dirname)
+        saves = []
+        real_save = local_state_file.save
+
+        def counting_save():
+            saves.append(1)
+            real_save()
+
+        monkeypatch.setattr(local_state_file, 'save', counting_save)
+        sleep_commandline = tmp_script_commandline("""import time
+time.sleep(1)
+""")
+        for name in ('FOO', 'BAR', 'BAZ'):
+            local_state_file.set_service_run_state(name, {'shutdown_commands': [sleep_commandline]})
+        start = time.monotonic()
+        statuses = shutdown_service_run_states(local_state_file, ['FOO', 'BAR', 'NOTRUNNING', 'BAZ'])
+        # three one-second shutdowns at the same time
+        assert time.monotonic() - start < 2.5
+        assert [
+            "Successfully shut down FOO.", "Successfully shut down BAR.", "Nothing to do to shut down NOTRUNNING.",
+            "Successfully shut down BAZ."
+        ] == [status.status_description for status in statuses]
+        assert all(statuses)
+        assert [1] == saves
+
+        local_state_file.load()
+        assert dict() == local_state_file.get_service_run_state('FOO')
+        assert dict() == local_state_file.get_service_run_state('BAZ')
+
+    with_directory_contents(dict(), check)
+
+
+@pytest.mark.skipif(platform.system() == 'Windows', reason='Windows has no SIGKILL, and this uses it')
+def test_shutdown_service_run_state_kills_pid_after_timeout(monkeypatch):
+    def check(dirname):
+        monkeypatch.setenv(SHUTDOWN_TIMEOUT_ENV_VAR, '0.5')
+        service = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(60)'])
+        pidfile = os.path.join(dirname, "service.pid")
+        with open(pidfile, 'w') as f:
+            f.write("%d\n" % service.pid)
+        hanging_commandline = tmp_script_commandline("""import time
+time.sleep(60)
+""")
+        local_state_file = LocalStateFile.load_for_directory(dirname)
+        program = os.path.basename(sys.executable)
+        local_state_file.set_service_run_state('FOO', {
+            'shutdown_commands': [hanging_commandline],
+            'pidfile': pidfile,
+            'start_time': time.time(),
+            'program': program
+        })
+        try:
+            start = time.monotonic()
+            status = shutdown_service_run_state(local_state_file, 'FOO')
+            assert time.monotonic() - start < 10
+            assert status
+            assert status.status_description == ("Killed process %d for FOO after its shutdown timed out." %
+                                                 service.pid)
+            assert service.wait(10) != 0
+        finally:
+            if service.poll() is None:
+                service.kill()
+                service.wait()
+
+    with_directory_contents(dict(), check)
+
+
+def _check_shutdown_does_not_kill(monkeypatch, dirname, state_for_pidfile, expected_error):
+    monkeypatch.setenv(SHUTDOWN_TIMEOUT_ENV_VAR, '0.5')
+    service = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(60)'])
+    pidfile = os.path.join(dirname, "service.pid")
+    with open(pidfile, 'w') as f:
+        f.write("%d\n" % service.pid)
+    hanging_commandline = tmp_script_commandline("""import time
+time.sleep(60)
+""")
+    local_state_file = LocalStateFile.load_for_directory(dirname)
+    state = state_for_pidfile(pidfile)
+    state['shutdown_commands'] = [hanging_commandline]
+    local_state_file.set_service_run_state('FOO', state)
+    try:
+        status = shutdown_service_run_state(local_state_file, 'FOO')
+        assert not status
+        assert status.errors == [
+            expected_error % dict(pid=service.pid, pidfile=pidfile),
+            "Shutting down FOO, command %r timed out after 0.5 seconds." % hanging_commandline
+        ]
+        assert service.poll() is None
+    finally:
+        service.kill()
+        service.wait()
+
+
+@pytest.mark.skipif(platform.system() == 'Windows', reason='Windows has no SIGKILL, and this uses it')
+def test_shutdown_service_run_state_does_not_kill_pid_in_stale_pidfile(monkeypatch):
+    def state_for_pidfile(pidfile):
+        # the pidfile was there a minute before the service started
+        start_time = time.time()
+        os.utime(pidfile, (start_time - 60, start_time - 60))
+        return {'pidfile': pidfile, 'start_time': start_time}
+
+    def check(dirname):
+        _check_shutdown_does_not_kill(
+            monkeypatch, dirname, state_for_pidfile,
+            "Not killing process %(pid)d for FOO, because %(pidfile)s is older than the service.")
+
+    with_directory_contents(dict(), check)
+
+
+@pytest.mark.skipif(not os.path.exists('/proc/self/cmdline'), reason='needs /proc to see what a process is running')
+def test_shutdown_service_run_state_does_not_kill_pid_running_another_program(monkeypatch):
+    def state_for_pidfile(pidfile):
+        return {'pidfile': pidfile, 'start_time': time.time(), 'program': 'redis-server'}
+
+    def check(dirname):
+        _check_shutdown_does_not_kill(monkeypatch, dirname, state_for_pidfile,
+                                      "Not killing process %(pid)d for FOO, because it isn't running redis-server.")
+
+    with_directory_contents(dict(), check)
+
+
+def test_shutdown_service_run_state_times_out_without_pidfile(monkeypatch):
+    def check(dirname):
+        monkeypatch.setenv(SHUTDOWN_TIMEOUT_ENV_VAR, '0.5')
+        hanging_commandline = tmp_script_commandline("""import time
+time.sleep(60)
+""")
+        local_state_file = LocalStateFile.load_for_directory(dirname)
+        local_state_file.set_service_run_state('FOO', {'shutdown_commands': [hanging_commandline]})
+        status = shutdown_service_run_state(local_state_file, 'FOO')
+        assert not status
+        assert status.status_description == "Shutdown commands failed for FOO."
+        assert status.errors == ["Shutting down FOO, command %r timed out after 0.5 seconds." % hanging_commandline]
+        assert dict() == local_state_file.get_service_run_state('FOO')
+
+    with_directory_contents(dict(), check)
+
+
+def test_wait_for_service(tmpdir):
+    listening = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listening.bind(("127.0.0.1", 0))
+    listening.listen(1)
+    pidfile = tmpdir.join("service.pid")
+    # the service writes its pidfile after it starts listening
+    timer = threading.Timer(0.2, lambda: pidfile.write("42"))
+    timer.start()
+    try:
+        readiness = wait_for_service("127.0.0.1", listening.getsockname()[1], pidfile=str(pidfile), timeout_seconds=10)
+    finally:
+        timer.cancel()
+        listening.close()
+    assert readiness.ready
+    assert readiness.accepting
+    assert readiness.pidfile_exists
+    assert 0.2 <= readiness.seconds < 5
+
+
+def test_wait_for_service_times_out():
+    listening = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listening.bind(("127.0.0.1", 0))
+    port = listening.getsockname()[1]
+    listening.close()
+    readiness = wait_for_service("127.0.0.1", port, timeout_seconds=0.3)
+    assert not readiness.ready
+    assert not readiness.accepting
+    assert readiness.pidfile_exists
+    assert readiness.seconds >= 0.3
+
+
+@pytest.mark.skipif(platform.system() == 'Windows', reason='Windows has no Unix sockets')
+def test_wait_for_service_on_unix_socket(tmpdir):
+    path = str(tmpdir.join("service.sock"))
+    listening = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    # the service creates its socket a little after it starts
+    timer = threading.Timer(0.2, lambda: (listening.bind(path), listening.listen(1)))
+    timer.start()
+    try:
+        readiness = wait_for_service(None, None, timeout_seconds=10, unix_socket=path)
+    finally:
+        timer.cancel()
+        listening.close()
+    assert readiness.ready
+    assert 0.2 <= readiness.seconds < 5
+
+
+@pytest.mark.skipif(platform.system() != 'Linux', reason='inotify is only on Linux')
+def test_directory_watcher_wakes_up_for_new_file(tmpdir):
+    watcher = _DirectoryWatcher(str(tmpdir))
+    timer = threading.Timer(0.1, lambda: tmpdir.join("service.pid").write("42"))
+    timer.start()
+    try:
+        start = time.monotonic()
+        watcher.wait(10)
+        assert time.monotonic() - start < 5
+    finally:
+        timer.cancel()
+        watcher.close()
@@ -84,7 +84,7 @@ def _test_prepare_without_interaction(monkeypatch, api_method, provide_mode):
     from anaconda_project.prepare import prepare_without_interaction
     _verify_args_match(getattr(api.AnacondaProject, api_method),
                        prepare_without_interaction,
-                       ignored=['self', 'mode', 'provide_whitelist', 'refresh'])
+                       ignored=['self', 'mode', 'provide_whitelist', 'refresh', 'timings'])
 
     params = _monkeypatch_prepare_without_interaction(monkeypatch)
     p = api.AnacondaProject()
@@ -93,7 +93,8 @@ def _test_prepare_without_interaction(monkeypatch, api_method, provide_mode):
                   env_spec_name='someenv',
                   command_name='foo',
                   command=1234,
-                  extra_command_args=['1', '2'])
+                  extra_command_args=['1', '2'],
+                  verify_downloads=True)
     result = getattr(p, api_method)(**kwargs)
     assert 42 == result
     assert params['kwargs']['mode'] == provide_mode
@@ -7,6 +7,7 @@
 # -----------------------------------------------------------------------------
 from __future__ import absolute_import, print_function
 
+import fnmatch
 import os
 
 from anaconda_project import archiver
@@ -167,3 +168,47 @@ def test_file_pattern_matcher_with_directories():
     tests['/foo/'] = tests['/foo']
 
     _test_file_pattern_matcher(tests, is_directory=True)
+
+
+def _fnmatch_each_parent(pattern_string, path, is_directory):
+    # the way _FilePattern used to match, one fnmatch per pattern per parent
+    pattern = pattern_string if pattern_string.startswith("/") else "*/" + pattern_string
+    if pattern.endswith("/"):
+        if not is_directory:
+            return False
+        pattern = pattern[:-1]
+    path = "/" + path
+    while path != '/':
+        if fnmatch.fnmatch(path, pattern):
+            return True
+        path = os.path.dirname(path)
+    return False
+
+
+def test_file_pattern_set_matches_like_each_pattern():
+    class FakeInfo(object):
+        def __init__(self, path, is_directory):
+            self.unixified_relative_path = path
+            self.is_directory = is_directory
+
+    pattern_strings = [
+        '*.pyc', '__pycache__/', '/build', '/envs/', 'data/*.csv', '/docs/*/tmp', '.Trash-*/', 'a?c', '[ab]x',
+        'foo/bar/', '/anaconda-project-local.yml', 'services/'
+    ]
+    paths = [
+        'foo.pyc', 'src/foo.pyc', 'src/foo.py', '__pycache__', 'src/__pycache__', 'src/__pycache__/x.pyc', 'build',
+        'build/lib/x.py', 'src/build', 'envs', 'envs/default/bin/python', 'src/envs', 'data/a.csv', 'data/sub/a.csv',
+        'x/data/b.csv', 'docs/api/tmp', 'docs/tmp', 'docs/a/b/tmp', '.Trash-1000', 'abc', 'aXc', 'q/axc', 'ax', 'bx',
+        'cx', 'foo/bar', 'x/foo/bar/baz', 'anaconda-project-local.yml', 'x/anaconda-project-local.yml', 'services',
+        'services/REDIS_URL/redis.pid'
+    ]
+    for count in range(len(pattern_strings) + 1):
+        patterns = [archiver._FilePattern(s) for s in pattern_strings[:count]]
+        pattern_set = archiver._FilePatternSet(patterns)
+        # twice, so the second time parents come from the cache
+        for repeat in range(2):
+            for path in paths:
+                for is_directory in (False, True):
+                    expected = any(_fnmatch_each_parent(s, path, is_directory) for s in pattern_strings[:count])
+                    assert (path, is_directory, expected) == (path, is_directory,
+                                                              pattern_set.matches(FakeInfo(path, is_directory)))
@@ -135,7 +135,7 @@ def test_upload_failing_commit(monkeypatch):
 def test_download(monkeypatch):
     def check(dirname):
         with fake_server(monkeypatch, expected_basename='fake_project.zip'):
-            status = _download('fake_username/fake_project', site='unit_test', token='fake_token')
+            status = _download('fake_username/fake_project', parent_dir=dirname, site='unit_test', token='fake_token')
             assert status
 
     with_directory_contents(dict(), check)
@@ -144,7 +144,7 @@ def test_download(monkeypatch):
 def test_download_no_username(monkeypatch):
     def check(dirname):
         with fake_server(monkeypatch, expected_basename='fake_project.zip'):
-            status = _download('fake_project', site='unit_test', token='fake_token')
+            status = _download('fake_project', parent_dir=dirname, site='unit_test', token='fake_token')
             assert status
 
     with_directory_contents(dict(), check)
@@ -153,7 +153,10 @@ def test_download_no_username(monkeypatch):
 def test_download_missing(monkeypatch):
     def check(dirname):
         with fake_server(monkeypatch, expected_basename='fake_project.zip'):
-            status = _download('fake_username/missing_project', site='unit_test', token='fake_token')
+            status = _download('fake_username/missing_project',
+                               parent_dir=dirname,
+                               site='unit_test',
+                               token='fake_token')
             assert '404' in status.errors[0]
 
     with_directory_contents(dict(), check)
@@ -162,7 +165,7 @@ def test_download_missing(monkeypatch):
 def test_download_missing_no_username(monkeypatch):
     def check(dirname):
         with fake_server(monkeypatch, expected_basename='fake_project.zip'):
-            status = _download('missing_project', site='unit_test', token='fake_token')
+            status = _download('missing_project', parent_dir=dirname, site='unit_test', token='fake_token')
             assert '404' in status.errors[0]
 
     with_directory_contents(dict(), check)
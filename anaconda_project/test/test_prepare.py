@@ -13,6 +13,8 @@ import platform
 import pytest
 import subprocess
 import sys
+import threading
+import time
 
 from anaconda_project.test.environ_utils import minimal_environ, strip_environ
 from anaconda_project.test.project_utils import project_no_dedicated_env
@@ -20,7 +22,7 @@ from anaconda_project.internal.test.tmpfile_utils import (with_directory_content
                                                           with_directory_contents_completing_project_file)
 from anaconda_project.internal import conda_api
 from anaconda_project.prepare import (prepare_without_interaction, unprepare, prepare_in_stages, PrepareSuccess,
-                                      PrepareFailure, _after_stage_success, _FunctionPrepareStage)
+                                      PrepareFailure, PrepareTimings, _after_stage_success, _FunctionPrepareStage)
 from anaconda_project.project import Project
 from anaconda_project.project_file import DEFAULT_PROJECT_FILENAME
 from anaconda_project.project_commands import ProjectCommand
@@ -168,6 +170,75 @@ variables:
 """}, prepare_some_env_var)
 
 
+def test_prepare_records_timings():
+    def prepare_some_env_var(dirname):
+        project = project_no_dedicated_env(dirname)
+        environ = minimal_environ(FOO='bar')
+        result = prepare_without_interaction(project, environ=environ)
+        assert result
+
+        timings = result.timings.timings
+        phases_by_name = dict()
+        for timing in timings:
+            assert timing.wall >= 0.0
+            assert timing.cpu >= 0.0
+            phases_by_name.setdefault(timing.name, set()).add(timing.phase)
+        assert set(['check_status', 'analyze']) <= phases_by_name['FOO']
+        assert set(['check_status', 'analyze', 'provide']) <= phases_by_name['CONDA_PREFIX']
+        assert set(['execute']) == phases_by_name['Set up project.']
+
+        sorted_timings = result.timings.sorted_by_wall()
+        assert sorted(timings, key=lambda timing: -timing.wall) == sorted_timings
+        # the stage's execute time includes the requirement steps it ran
+        assert sorted_timings[0].phase == 'execute'
+
+    with_directory_contents_completing_project_file({DEFAULT_PROJECT_FILENAME: """
+variables:
+  FOO: {}
+"""}, prepare_some_env_var)
+
+
+def test_prepare_uses_passed_in_timings():
+    def prepare_twice(dirname):
+        project = project_no_dedicated_env(dirname)
+        environ = minimal_environ(FOO='bar')
+        timings = PrepareTimings()
+        first = prepare_without_interaction(project, environ=environ, timings=timings)
+        count = len(timings.timings)
+        assert count > 0
+        second = prepare_without_interaction(project, environ=environ, timings=timings)
+        assert first.timings is timings
+        assert second.timings is timings
+        assert 2 * count == len(timings.timings)
+
+    with_directory_contents_completing_project_file({DEFAULT_PROJECT_FILENAME: """
+variables:
+  FOO: {}
+"""}, prepare_twice)
+
+
+def test_prepare_timings_total():
+    timings = PrepareTimings()
+    timings.record('provide', 'A', 1.0, 0.5)
+    timings.record('provide', 'B', 2.0, 0.25)
+    timings.record('execute', 'Set up project.', 4.0, 1.0)
+    with timings.measure('check_status', 'A'):
+        pass
+
+    total = timings.total('provide')
+    assert ('provide', None, 3.0, 0.75) == total
+    assert ['Set up project.', 'B', 'A'] == [timing.name for timing in timings.sorted_by_wall()[:3]]
+    assert 'check_status' == timings.timings[-1].phase
+
+    with pytest.raises(AssertionError):
+        timings.record('nonsense', 'A', 1.0, 1.0)
+
+
+def test_prepare_failure_has_empty_timings():
+    failure = PrepareFailure(statuses=(), errors=['bad'], environ=dict(), overrides=UserConfigOverrides())
+    assert [] == failure.timings.timings
+
+
 def test_prepare_some_env_var_not_set():
     def prepare_some_env_var(dirname):
         project = project_no_dedicated_env(dirname)
@@ -735,3 +806,98 @@ downloads:
   FOO: "http://example.com/nope"
 
 """}, check)
+
+
+def test_provide_waves():
+    from anaconda_project.prepare import _provide_waves
+
+    class Analysis(object):
+        def __init__(self, missing):
+            self.missing_env_vars_to_provide = missing
+
+    class Requirement(object):
+        def __init__(self, env_var):
+            self.env_var = env_var
+
+    class Status(object):
+        def __init__(self, env_var, missing):
+            self.requirement = Requirement(env_var)
+            self.analysis = Analysis(missing)
+
+    a = Status('A', [])
+    b = Status('B', [])
+    c = Status('C', ['A'])
+    d = Status('D', ['C', 'B'])
+    e = Status('E', ['NOT_PROVIDED_HERE'])
+    assert [[a, b, e], [c], [d]] == _provide_waves([a, b, c, d, e])
+    assert [] == _provide_waves([])
+
+
+_three_variables_with_defaults = """
+variables:
+  FOO: { default: foo }
+  BAR: { default: bar }
+  BAZ: { default: baz }
+"""
+
+
+def test_prepare_provides_concurrently(monkeypatch):
+    from anaconda_project.requirements_registry.provider import EnvVarProvider
+
+    monkeypatch.setenv('ANACONDA_PROJECT_PROVIDE_WORKERS', '4')
+    # all three providers have to be running at once to get past this
+    barrier = threading.Barrier(3, timeout=10)
+    real_provide = EnvVarProvider.provide
+    thread_names = set()
+
+    def mock_provide(self, requirement, context):
+        if requirement.env_var in ('FOO', 'BAR', 'BAZ'):
+            thread_names.add(threading.current_thread().name)
+            barrier.wait()
+        return real_provide(self, requirement, context)
+
+    monkeypatch.setattr('anaconda_project.requirements_registry.provider.EnvVarProvider.provide', mock_provide)
+
+    def check(dirname):
+        project = project_no_dedicated_env(dirname)
+        environ = minimal_environ()
+        result = prepare_without_interaction(project, environ=environ)
+        assert result.errors == []
+        assert result
+        assert 3 == len(thread_names)
+        assert dict(FOO='foo', BAR='bar', BAZ='baz',
+                    PROJECT_DIR=project.directory_path) == strip_environ(result.environ)
+        provided = [timing.name for timing in result.timings.timings if timing.phase == 'provide']
+        assert set(['FOO', 'BAR', 'BAZ']) <= set(provided)
+
+    with_directory_contents_completing_project_file({DEFAULT_PROJECT_FILENAME: _three_variables_with_defaults}, check)
+
+
+def test_prepare_concurrent_errors_in_requirement_order(monkeypatch):
+    from anaconda_project.requirements_registry.provider import ProvideResult
+
+    def mock_provide(self, requirement, context):
+        if requirement.env_var in ('FOO', 'BAR', 'BAZ'):
+            if requirement.env_var == 'FOO':
+                # finish last, so collecting errors as they arrive would put FOO last
+                time.sleep(0.2)
+            context.frontend.info("providing %s" % requirement.env_var)
+            return ProvideResult(errors=["failed %s" % requirement.env_var])
+        return ProvideResult.empty()
+
+    monkeypatch.setattr('anaconda_project.requirements_registry.provider.EnvVarProvider.provide', mock_provide)
+
+    def failed_order(project):
+        result = prepare_without_interaction(project, environ=minimal_environ())
+        assert not result
+        return [error for error in result.errors if error.startswith('failed ')]
+
+    def check(dirname):
+        project = project_no_dedicated_env(dirname)
+        monkeypatch.setenv('ANACONDA_PROJECT_PROVIDE_WORKERS', '1')
+        serial = failed_order(project)
+        assert ['failed BAR', 'failed BAZ', 'failed FOO'] == sorted(serial)
+        monkeypatch.setenv('ANACONDA_PROJECT_PROVIDE_WORKERS', '4')
+        assert serial == failed_order(project)
+
+    with_directory_contents_completing_project_file({DEFAULT_PROJECT_FILENAME: _three_variables_with_defaults}, check)
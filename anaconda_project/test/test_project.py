@@ -2653,6 +2653,26 @@ def test_get_publication_info_from_complex_project():
         }, check_publication_info_from_complex)
 
 
+def test_get_publication_info_download_mirrors():
+    def check_publication_info_download_mirrors(dirname):
+        project = project_no_dedicated_env(dirname)
+        downloads = project.publication_info()['env_specs']['default']['downloads']
+        assert 'https://example.com/blah' == downloads['FOO']['url']
+        assert ['https://mirror.example.com/blah'] == downloads['FOO']['mirrors']
+        assert 'mirrors' not in downloads['BAR']
+
+    with_directory_contents_completing_project_file(
+        {
+            DEFAULT_PROJECT_FILENAME: """
+downloads:
+  FOO:
+    url: [https://example.com/blah, https://mirror.example.com/blah]
+    md5: 12345abcdef
+  BAR: https://example.com/bar
+"""
+        }, check_publication_info_download_mirrors)
+
+
 def test_find_requirements():
     def check_find_requirements(dirname):
         project = project_no_dedicated_env(dirname)
@@ -4649,7 +4649,8 @@ downloads:
 """,
                 "foo.py": "print('hello')\n",
                 'downloaded.py': 'print("ignore me!")',
-                'downloaded.py.part': ''
+                'downloaded.py.part': '',
+                'downloaded.py.part.json': '{}'
             }), check)
 
     with_directory_contents_completing_project_file(dict(), archivetest)
@@ -4784,8 +4785,8 @@ def test_archive_unarchive_conda_pack(suffix):
 
             expected_files = [
                 'anaconda-project.yml', '.projectignore', 'foo.py', 'bar/blah.py', 'envs/default/conda-meta/.packed',
-                'envs/default/conda-meta/history', 'envs/default/conda-meta/_prefix', 'envs/default/conda-meta/created_at',
-                'envs/default/conda-meta/font-ttf-ubuntu-0.83-h8b1ccd4_0.json',
+                'envs/default/conda-meta/history', 'envs/default/conda-meta/_prefix',
+                'envs/default/conda-meta/created_at', 'envs/default/conda-meta/font-ttf-ubuntu-0.83-h8b1ccd4_0.json',
                 'envs/default/var/cache/anaconda-project/env-specs/7d832cfb38dabc7b1c20f98e15bfc4c601f21b62',
                 'envs/default/fonts/Ubuntu-M.ttf', 'envs/default/fonts/Ubuntu-L.ttf',
                 'envs/default/fonts/UbuntuMono-BI.ttf', 'envs/default/fonts/Ubuntu-BI.ttf',
@@ -4797,8 +4798,8 @@ def test_archive_unarchive_conda_pack(suffix):
             ]
 
             scripts_nix = [
-                'envs/default/bin/conda-unpack', 'envs/default/bin/deactivate',
-                'envs/default/bin/activate', 'envs/default/bin/activate.fish'
+                'envs/default/bin/conda-unpack', 'envs/default/bin/deactivate', 'envs/default/bin/activate',
+                'envs/default/bin/activate.fish'
             ]
 
             scripts_win = [
@@ -4806,10 +4807,7 @@ def test_archive_unarchive_conda_pack(suffix):
                 'envs/default/Scripts/conda-unpack.exe', 'envs/default/Scripts/deactivate.bat'
             ]
 
-            optional = [
-                'envs/default/bin/conda_unpack_progress.py',
-                'envs/default/Scripts/conda_unpack_progress.py'
-            ]
+            optional = ['envs/default/bin/conda_unpack_progress.py', 'envs/default/Scripts/conda_unpack_progress.py']
 
             if 'win' in current_platform():
                 expected_files.extend(scripts_win)
@@ -5595,7 +5593,10 @@ def test_upload_cannot_walk_directory(monkeypatch):
 def test_download(monkeypatch):
     def check(dirname):
         with fake_server(monkeypatch, expected_basename='fake_project.zip'):
-            status = project_ops.download('fake_username/fake_project', unpack=False, site='unit_test')
+            status = project_ops.download('fake_username/fake_project',
+                                          unpack=False,
+                                          parent_dir=dirname,
+                                          site='unit_test')
             assert status
 
     with_directory_contents_completing_project_file(
@@ -5608,7 +5609,10 @@ def test_download(monkeypatch):
 def test_download_unpack(monkeypatch):
     def check(dirname):
         with fake_server(monkeypatch, expected_basename='fake_project.zip'):
-            status = project_ops.download('fake_username/fake_project', unpack=True, site='unit_test')
+            status = project_ops.download('fake_username/fake_project',
+                                          unpack=True,
+                                          parent_dir=dirname,
+                                          site='unit_test')
             assert status
 
     with_directory_contents_completing_project_file(
@@ -5621,7 +5625,10 @@ def test_download_unpack(monkeypatch):
 def test_download_missing(monkeypatch):
     def check(dirname):
         with fake_server(monkeypatch, expected_basename='fake_project.zip'):
-            status = project_ops.download('fake_username/missing_project', unpack=False, site='unit_test')
+            status = project_ops.download('fake_username/missing_project',
+                                          unpack=False,
+                                          parent_dir=dirname,
+                                          site='unit_test')
             assert not status
 
     with_directory_contents_completing_project_file(
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (c) 2026, Anaconda, Inc. All rights reserved.
+#
+# Licensed under the terms of the BSD 3-Clause License.
+# The full license is in the file LICENSE.txt, distributed with this software.
+# -----------------------------------------------------------------------------
+"""Compare FileDownloader throughput with how fast a local server can send.
+
+Serves a stream of the given size from a local HTTP server, reads it
+once with a client that throws the bytes away (the line rate), then
+downloads it with ``FileDownloader`` to a temporary file, hashing it.
+
+    python scripts/benchmark_download.py --gigabytes 4 --hash sha256
+"""
+
+from __future__ import print_function, absolute_import
+
+import argparse
+import os
+import shutil
+import sys
+import subprocess
+import tempfile
+import time
+
+from tornado import gen, httpclient, httpserver, netutil, web
+from tornado.ioloop import IOLoop
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from anaconda_project.internal.http_client import FileDownloader  # noqa
+
+_BLOCK = b'x' * (1024 * 1024)
+
+
+class _StreamHandler(web.RequestHandler):
+    @gen.coroutine
+    def get(self):
+        size = self.application.settings['stream_size']
+        self.set_header('Content-Length', str(size))
+        sent = 0
+        while sent < size:
+            block = _BLOCK[:min(len(_BLOCK), size - sent)]
+            self.write(block)
+            yield self.flush()
+            sent += len(block)
+
+
+def _serve(size):
+    # in a process of its own, so it doesn't compete with us for the GIL
+    sockets = netutil.bind_sockets(0, '127.0.0.1')
+    server = httpserver.HTTPServer(web.Application([(r'/stream', _StreamHandler)], stream_size=size))
+    server.add_sockets(sockets)
+    print(sockets[0].getsockname()[1])
+    sys.stdout.flush()
+    IOLoop.current().start()
+
+
+def _start_server(size):
+    process = subprocess.Popen([sys.executable, __file__, '--serve', '--bytes', str(size)], stdout=subprocess.PIPE)
+    port = int(process.stdout.readline())
+    return ("http://127.0.0.1:%d/stream" % port, process)
+
+
+@gen.coroutine
+def _read_and_discard(url):
+    client = httpclient.AsyncHTTPClient(force_instance=True,
+                                        max_buffer_size=1024 * 1024,
+                                        max_body_size=100 * 1024 * 1024 * 1024)
+    try:
+        yield client.fetch(httpclient.HTTPRequest(url=url, streaming_callback=lambda chunk: None, request_timeout=0))
+    finally:
+        client.close()
+
+
+def _time(fn):
+    start = time.time()
+    IOLoop(make_current=False).run_sync(fn)
+    return time.time() - start
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--gigabytes', type=float, default=2, help="How much to download (default 2)")
+    parser.add_argument('--hash', default='sha256', help="hashlib algorithm to hash with, or 'none'")
+    parser.add_argument('--serve', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--bytes', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.serve:
+        _serve(args.bytes)
+        return 0
+
+    size = int(args.gigabytes * 1024 * 1024 * 1024)
+    hash_algorithm = None if args.hash == 'none' else args.hash
+    os.environ.setdefault('ANACONDA_PROJECT_DOWNLOADS_TIMEOUT', '0')
+    (url, server) = _start_server(size)
+    tmpdir = tempfile.mkdtemp(prefix="benchmark_download")
+    try:
+        line_seconds = _time(lambda: _read_and_discard(url))
+        downloader = FileDownloader(url=url, filename=os.path.join(tmpdir, 'stream'), hash_algorithm=hash_algorithm)
+        download_seconds = _time(downloader.run)
+        if len(downloader.errors) > 0:
+            print("\n".join(downloader.errors), file=sys.stderr)
+            return 1
+    finally:
+        shutil.rmtree(tmpdir)
+        server.kill()
+        server.wait()
+
+    mebibytes = size / 1024.0 / 1024.0
+    print("Line rate:     %8.1f MiB/s" % (mebibytes / line_seconds))
+    print("FileDownloader: %7.1f MiB/s (%s)" % (mebibytes / download_seconds, args.hash))
+    print("Ratio:         %8.2f" % (line_seconds / download_seconds))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
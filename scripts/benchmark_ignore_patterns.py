@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (c) 2026, Anaconda, Inc. All rights reserved.
+#
+# Licensed under the terms of the BSD 3-Clause License.
+# The full license is in the file LICENSE.txt, distributed with this software.
+# -----------------------------------------------------------------------------
+"""Compare matching ignore patterns one at a time with the compiled pattern set.
+
+Makes up a project tree (in memory; nothing is written to disk) and
+a list of ignore patterns like those in ``.projectignore``, then
+walks the tree the way ``archive`` does, skipping ignored
+directories, once with a ``fnmatch`` per pattern per parent (how
+patterns used to be matched) and once with ``_FilePatternSet``.
+Both walks have to find the same files.
+
+    python scripts/benchmark_ignore_patterns.py --files 200000 --patterns 50
+"""
+
+from __future__ import print_function, absolute_import
+
+import argparse
+import fnmatch
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from anaconda_project.archiver import _FilePattern, _FilePatternSet  # noqa
+
+_FIXED_PATTERNS = [
+    '/anaconda-project-local.yml', '/envs/', '/services/', '*.pyc', '*.pyd', '*.pyo', '__pycache__/',
+    '.ipynb_checkpoints/', '.Trash-*/', '/.spyderproject'
+]
+
+
+class _Info(object):
+    def __init__(self, path, is_directory):
+        self.unixified_relative_path = path
+        self.is_directory = is_directory
+
+
+def _make_tree(file_count, files_per_directory, depth):
+    """List (path, is_directory) in os.walk() order, with directories before what's in them."""
+    items = []
+    directories = []
+    for index in range((file_count + files_per_directory - 1) // files_per_directory):
+        # spread the directories over a few levels, with some names patterns pick out
+        pieces = ["pkg%d" % (index % 7), "mod%d" % (index % 13), "sub%d" % index][:depth]
+        if index % 11 == 0:
+            pieces.insert(1, "__pycache__")
+        if index % 17 == 0:
+            pieces.insert(1, "build")
+        directories.append("/".join(pieces))
+    seen = set()
+    remaining = file_count
+    for directory in sorted(directories):
+        pieces = directory.split("/")
+        for i in range(1, len(pieces) + 1):
+            parent = "/".join(pieces[:i])
+            if parent not in seen:
+                seen.add(parent)
+                items.append((parent, True))
+        for i in range(min(files_per_directory, remaining)):
+            extension = ('py', 'pyc', 'csv', 'txt', 'tmp')[i % 5]
+            items.append(("%s/file%d.%s" % (directory, i, extension), False))
+        remaining -= files_per_directory
+    return items
+
+
+def _make_patterns(count):
+    patterns = list(_FIXED_PATTERNS)
+    i = 0
+    while len(patterns) < count:
+        patterns.append(
+            ('*.tmp%d' % i, '/data%d/' % i, 'cache%d/' % i, 'mod%d/*.log' % i, '/pkg%d/generated' % i)[i % 5])
+        i += 1
+    return [_FilePattern(pattern) for pattern in patterns[:count]]
+
+
+def _fnmatch_each_parent(pattern, info):
+    glob = pattern.glob
+    if pattern.directories_only and not info.is_directory:
+        return False
+    path = "/" + info.unixified_relative_path
+    while path != '/':
+        if fnmatch.fnmatch(path, glob):
+            return True
+        path = os.path.dirname(path)
+    return False
+
+
+def _walk(items, is_ignored):
+    kept = []
+    ignored_directory = None
+    for (path, is_directory) in items:
+        # like os.walk() after we prune dirs, don't look inside an ignored directory
+        if ignored_directory is not None and path.startswith(ignored_directory + "/"):
+            continue
+        if is_ignored(_Info(path, is_directory)):
+            if is_directory:
+                ignored_directory = path
+        else:
+            kept.append(path)
+    return kept
+
+
+def _time(fn):
+    start = time.time()
+    result = fn()
+    return (time.time() - start, result)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--files', type=int, default=200000, help="How many files in the tree (default 200000)")
+    parser.add_argument('--patterns', type=int, default=50, help="How many ignore patterns (default 50)")
+    parser.add_argument('--files-per-directory', type=int, default=20, help="(default 20)")
+    parser.add_argument('--depth', type=int, default=3, help="Directory depth (default 3)")
+    args = parser.parse_args(argv)
+
+    items = _make_tree(args.files, args.files_per_directory, args.depth)
+    patterns = _make_patterns(args.patterns)
+
+    def each_pattern(info):
+        return any(_fnmatch_each_parent(pattern, info) for pattern in patterns)
+
+    (each_seconds, each_kept) = _time(lambda: _walk(items, each_pattern))
+    (set_seconds, set_kept) = _time(lambda: _walk(items, _FilePatternSet(patterns).matches))
+    if each_kept != set_kept:
+        print("Pattern set kept %d paths but matching each pattern kept %d" % (len(set_kept), len(each_kept)),
+              file=sys.stderr)
+        return 1
+
+    print("%d paths, %d patterns, %d kept" % (len(items), len(patterns), len(set_kept)))
+    print("Each pattern:  %8.3f s" % each_seconds)
+    print("Pattern set:   %8.3f s" % set_seconds)
+    print("Speedup:       %8.1fx" % (each_seconds / set_seconds))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))